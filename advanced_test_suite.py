@@ -59,8 +59,13 @@ class TestBetonarmeModuleAdvanced(unittest.TestCase):
             self.assertIn('def build_queries', content, "Query builder function not found")
             self.assertIn('def get_difficulty_multiplier_cached', content, "Difficulty multiplier function not found")
             self.assertIn('def monthly_role_cost_multinational', content, "Role cost function not found")
-            self.assertIn('def workdays_between', content, "Workdays calculation function not found")
-            self.assertIn('def gross_from_net', content, "Net to gross conversion function not found")
+            
+            # Calendar and payroll helpers live in the headless cost engine
+            engine_file = os.path.join(os.path.dirname(main_file), 'cost_engine.py')
+            with open(engine_file, 'r', encoding='utf-8') as f:
+                engine_content = f.read()
+            self.assertIn('def workdays_between', engine_content, "Workdays calculation function not found")
+            self.assertIn('def gross_from_net', engine_content, "Net to gross conversion function not found")
             
             print("✅ Main module structure verified")
             
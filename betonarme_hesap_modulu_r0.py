@@ -2,14 +2,29 @@
 # -*- coding: utf-8 -*-
 from __future__ import annotations
 
-import os, io, json, math, uuid, hashlib, requests  # pyright: ignore[reportMissingModuleSource]
+import os, re, json, time, uuid, hashlib, functools, tempfile, requests  # pyright: ignore[reportMissingModuleSource]
 import numpy as np  # pyright: ignore[reportMissingImports]
 import streamlit as st  # pyright: ignore[reportMissingImports]
+from streamlit.runtime.scriptrunner import get_script_run_ctx  # pyright: ignore[reportMissingImports]
 import pandas as pd  # pyright: ignore[reportMissingImports]
-from datetime import date, timedelta
-from pandas import ExcelWriter  # pyright: ignore[reportMissingImports]
-import matplotlib.pyplot as plt  # pyright: ignore[reportMissingImports]
-from rag_backend import init_backend, reset_backend, add_records, search, migrate_from_jsonl_if_needed, get_status
+from datetime import date, datetime, timedelta
+from rag_backend import init_backend, reset_backend, add_records, search, migrate_from_jsonl_if_needed, get_status, has_batch
+from rag_ingest import iter_file_chunks
+from ingest_queue import get_ingest_queue
+from boq_pricing import price_boq
+from report_writers import XLSXWorkbookWriter
+from chart_render import CHART_KINDS, MATPLOTLIB_AVAILABLE
+from manpower_distribution import distribution_weights, headcounts, role_month_matrix
+from manpower_scheduler import ScheduleTask, level_schedule
+from project_store import get_project_store
+from betonarme_postgresql_integration import render_revit_import
+from cost_engine import (NDFL_RUS, NDFL_SNG, NDFL_TUR, OPS, OSS, OMS, NSIPZ_RISK_RUS_SNG, NSIPZ_RISK_TUR_VKS,
+                         SNG_PATENT_MONTH, SNG_TAXED_BASE, TUR_TAXED_BASE, CASH_COMMISSION_RATE,
+                         OVERHEAD_RATE_DEFAULT, OVERHEAD_RATE_MAX, CONSUMABLES_RATE_DEFAULT,
+                         SCENARIO_NORMS, ELEMENT_ORDER, LABELS, role_monthly_cost, normalize_country,
+                         scenario_price_multiplier, evaluate_estimate, workdays_between)
+from cost_engine import difficulty_multiplier as state_difficulty_multiplier
+from portfolio_runner import evaluate_portfolio
 
 # =============== AUTO-RAG SİSTEMİ ===============
 @st.cache_data(ttl=300, show_spinner=False)
@@ -285,30 +300,7 @@ def apply_suggestions(selected_suggestions: List[dict]):
     st.success(f"✅ {len(selected_suggestions)} öneri uygulandı!")
 
 # =============== 0) SABİTLER ===============
-# NDFL: Net'ten brüt'e çevrimde kullanılıyor; işveren primleri "brüt"e uygulanır (brüt+NDFL DEĞİL)
-NDFL_RUS = 0.130
-NDFL_SNG = 0.130
-NDFL_TUR = 0.130  # VKS için sabit oran modu başlangıcı; progressive modda 13/15/18/20/22 kademeleri kullanılır
-
-# İşveren primleri (resmi BRÜT bazında)
-OPS = 0.220   # emeklilik
-OSS = 0.029  # sosyal
-OMS = 0.051  # sağlık
-NSIPZ_RISK_RUS_SNG = 0.009   # iş kazası/meslek hast. (RUS+SNG için tipik risk katsayısı)
-NSIPZ_RISK_TUR_VKS  = 0.018  # VKS (TR) için iş kazası riski
-
-# Patent + resmi tabanlar (sade model)
-SNG_PATENT_MONTH = 7000      # sabit aylık patent ödemesi (örn. Moskova ~8900 güncel olabilir)
-SNG_TAXED_BASE   = 33916     # resmi brüt tavan (aylık, sade model)
-TUR_TAXED_BASE   = 167000    # VKS için resmi brüt tavan (aylık, sade model)
-
-# Cash (elden) ödeme komisyonu — banka/çekim/kur riski gibi
-CASH_COMMISSION_RATE = 0.235
-
-# Varsayılan oranlar
-OVERHEAD_RATE_DEFAULT = 15.0  # Yüzde olarak (15.0%)
-OVERHEAD_RATE_MAX     = 25.0  # Yüzde olarak (25.0%)
-CONSUMABLES_RATE_DEFAULT = 5.0  # Yüzde olarak (5.0%)
+# Vergi/prim sabitleri, varsayılan oranlar, senaryo normları ve eleman etiketleri cost_engine'de
 
 # --- Gruplu Sarf ve Genel Gider preset'leri ---
 CONSUMABLES_PRESET = [
@@ -340,21 +332,13 @@ INDIRECT_PRESET_DEFAULTS = {
     "Temizlik/çöp/saha bakım (Уборка/вывоз/обслуживание)": 1.0,
 }
 
-# Adam-saat normları
-SCENARIO_NORMS = {
-    "İdeal":     {"Grobeton": 8.0,  "Rostverk": 12.0, "Temel": 14.0, "Döşeme": 15.0, "Perde": 18.0, "Merdiven": 22.0},
-    "Gerçekçi":  {"Grobeton": 10.0, "Rostverk": 14.0, "Temel": 16.0, "Döşeme": 18.0, "Perde": 21.0, "Merdiven": 26.0},
-    "Kötü":      {"Grobeton": 12.0, "Rostverk": 16.0, "Temel": 19.0, "Döşeme": 22.0, "Perde": 26.0, "Merdiven": 32.0},
-}
-
-ELEMENT_ORDER = ["grobeton","rostverk","temel","doseme","perde","merdiven"]
-LABELS = {
-    "grobeton": "Grobeton (Подбетонка)",
-    "rostverk": "Rostverk (Ростверк)",
-    "temel":    "Temel (Фундамент)",
-    "doseme":   "Döşeme (Плита перекрытия)",
-    "perde":    "Perde (Стена/диафрагма)",
-    "merdiven": "Merdiven (Лестница)",
+# Kaynak dengeli plan için varsayılan iş sırası (öncüller)
+ELEMENT_PREDECESSORS = {
+    "rostverk": ["grobeton"],
+    "temel":    ["grobeton"],
+    "doseme":   ["temel","rostverk"],
+    "perde":    ["temel","rostverk"],
+    "merdiven": ["doseme"],
 }
 
 # =============== Basit Versiyon Kontrol ===============
@@ -1494,8 +1478,6 @@ def clear_loading_placeholder():
             pass
 
 # --- Price & difficulty helpers (centralized) ---
-SCENARIO_BASELINE = "Gerçekçi"  # referans senaryo
-
 # Override'lı senaryo normları okuma helper'ı
 def get_effective_scenario_norms() -> dict:
     """SCENARIO_NORMS üzerine override varsa onu döndürür."""
@@ -1509,25 +1491,11 @@ def get_effective_scenario_norms() -> dict:
 
 def get_scenario_multiplier_for_price(current_scenario: str) -> float:
     # Temel (Gerçekçi) ile mevcut senaryonun 'Temel' normunu oranla
-    try:
-        norms_map = get_effective_scenario_norms()
-        ref = float(norms_map.get(SCENARIO_BASELINE, SCENARIO_NORMS["Gerçekçi"]) ["Temel"])
-        cur = float(norms_map.get(current_scenario, SCENARIO_NORMS["Gerçekçi"]) ["Temel"])
-        return (cur / ref) if ref > 0 else 1.0
-    except Exception:
-        return 1.0
+    return scenario_price_multiplier(get_effective_scenario_norms(), current_scenario)
 
 def _update_diff_cache():
     # Zorluk UI/State: her rerun'da taze hesapla ve cache'e yaz
-    keys = ["f_winter", "f_heavy", "f_repeat", "f_shared", "f_cong", "f_pump"]
-    z = 1.0
-    for k in keys:
-        try:
-            v = float(st.session_state.get(k, 0.0) or 0.0)
-        except Exception:
-            v = 0.0
-        # v örn. 0.20 ise +%20 verimsizlik => 1.20
-        z *= (1.0 + v)
+    z = state_difficulty_multiplier(st.session_state)
     st.session_state["_diff_total_mult_cache"] = z
     return z
 
@@ -1549,6 +1517,80 @@ def get_default_metraj_df(selected_elements):
             st.warning(f"Tanımsız eleman anahtarı atlandı: {k}")
     return pd.DataFrame(rows)
 
+# Eleman maliyet tablosu kolonları (price_boq sayısal kolonu -> etiket)
+ELEMENT_COST_COLUMNS = {
+    "wbs_key": "Eleman (Элемент)",
+    "norm_lh_per_u": "Norm (a·s/m³) (Норма, чел·ч/м³)",
+    "qty": "Metraj (m³) (Объём, м³)",
+    "core_per_u": "Çekirdek (₽/m³) (Ядро, ₽/м³)",
+    "overhead_per_u": "Genel (₽/м³) (Накладные, ₽/м³)",
+    "consumables_per_u": "Sarf (₽/м³) (Расходники, ₽/м³)",
+    "indirect_per_u": "Indirect (₽/м³) (Косвенные, ₽/м³)",
+    "total_per_u": "Toplam (₽/м³) (Итого, ₽/м³)",
+}
+
+def elements_cost_df(priced_df: pd.DataFrame) -> pd.DataFrame:
+    """Fiyatlanmış eleman tablosu (sayısal kolonlar, etiketli başlıklar)"""
+    return priced_df[list(ELEMENT_COST_COLUMNS)].rename(columns=ELEMENT_COST_COLUMNS)
+
+# Gösterim biçimleri (yalnızca render sırasında uygulanır; veriler sayısal kalır)
+ELEMENT_COST_FORMATS = {
+    "Norm (a·s/m³) (Норма, чел·ч/м³)": "{:.2f}",
+    "Metraj (m³) (Объём, м³)": "{:,.3f}",
+    "Çekirdek (₽/m³) (Ядро, ₽/м³)": "{:,.2f}",
+    "Genel (₽/м³) (Накладные, ₽/м³)": "{:,.2f}",
+    "Sarf (₽/м³) (Расходники, ₽/м³)": "{:,.2f}",
+    "Indirect (₽/м³) (Косвенные, ₽/м³)": "{:,.2f}",
+    "Toplam (₽/м³) (Итого, ₽/м³)": "{:,.2f}",
+}
+PORTFOLIO_FORMATS = {
+    "Metraj (m³) (Объём, м³)": "{:,.1f}",
+    "Toplam a·s (Итого чел·ч)": "{:,.0f}",
+    "Kişi-ay (Чел·мес)": "{:,.1f}",
+    "Tepe kişi (Пик численности)": "{:,.0f}",
+    "Çıplak A·S (₽/a·s)": "{:,.2f}",
+    "Giderli A·S (₽/a·s)": "{:,.2f}",
+    "Tam yüklü A·S (₽/a·s)": "{:,.2f}",
+    "Ortalama (₽/m³) (Средняя, ₽/м³)": "{:,.2f}",
+    "Toplam maliyet (₽) (Итого, ₽)": "{:,.0f}",
+}
+ROLE_CALC_FORMATS = {
+    "Ağırlık (Вес)": "{:.3f}",
+    "Pay (%) (Доля, %)": "{:.2f}",
+    "Ortalama Kişi (Средняя численность)": "{:.3f}",
+    "Maliyet/ay (₽)": "{:,.2f}",
+    "%RUS": "{:.1f}",
+    "%SNG": "{:.1f}",
+    "%TUR": "{:.1f}",
+    "Net Maaş (₽/ay)": "{:,.0f}",
+}
+
+def style_numeric(df: pd.DataFrame, formats: dict):
+    """Sayısal tabloyu gösterim için biçimlendir (Styler; veri değişmez)"""
+    return df.style.format({c: f for c, f in formats.items() if c in df.columns})
+
+def excel_num_formats(formats: dict) -> dict:
+    """'{:,.2f}' gösterim biçimlerini Excel sayı biçimine çevir ('#,##0.00')"""
+    out = {}
+    for col, f in formats.items():
+        m = re.fullmatch(r"\{:(,?)\.(\d+)f\}", f)
+        if m:
+            digits = int(m.group(2))
+            out[col] = ("#,##0" if m.group(1) else "0") + ("." + "0" * digits if digits else "")
+    return out
+
+def show_chart(kind: str, **chart_data):
+    """Grafik modu: istemci tarafı (Vega-Lite) ya da veriye göre önbelleklenmiş PNG"""
+    image_fn, spec_fn = CHART_KINDS[kind]
+    if st.session_state.get("chart_mode", "image") == "client" or not MATPLOTLIB_AVAILABLE:
+        st.vega_lite_chart(spec_fn(**chart_data), use_container_width=True)
+    else:
+        st.image(image_fn(**chart_data), use_container_width=True)
+
+BOQ_EXCEL_FORMATS = {
+    "qty": "#,##0.000", "norm_lh_per_u": "0.000", "labor_hours": "#,##0.00",
+}
+
 @st.cache_data(ttl=3600)  # 1 saat cache
 def get_default_roles_df():
     """Roller tablosu için varsayılan DataFrame'i cache'le"""
@@ -1561,62 +1603,6 @@ def get_default_roles_df():
         {"Rol (Роль)":"duz_isci","Ağırlık (Вес)":0.50,"Net Maaş (₽, na ruki) (Чистая з/п, ₽)":80000,"%RUS":10,"%SNG":70,"%TUR":20},
     ])
 
-def gross_from_net(net: float, ndfl_rate: float) -> float:
-    return float(net) if ndfl_rate<=0 else float(net)/(1.0-ndfl_rate)
-
-def employer_cost_for_gross(gross: float, ops: float, oss: float, oms: float, nsipz: float) -> float:
-    return float(gross)*(1.0+ops+oss+oms+nsipz)
-
-# --- Progressive NDFL helpers (resident brackets 2025) ---
-def _resident_ndfl_brackets_2025() -> list[tuple[float|None, float]]:
-    """Returns [(upper_limit, rate), ...] with last upper_limit=None as infinity."""
-    # Annual thresholds (RUB) and rates
-    return [
-        (2_400_000.0, 0.13),
-        (5_000_000.0, 0.15),
-        (20_000_000.0, 0.18),
-        (50_000_000.0, 0.20),
-        (None, 0.22),
-    ]
-
-def gross_from_net_progressive_resident(net_annual: float) -> float:
-    """Invert progressive tax to get annual gross from annual net, using resident brackets 2025."""
-    try:
-        target_net = max(0.0, float(net_annual))
-    except Exception:
-        target_net = 0.0
-    if target_net <= 0.0:
-        return 0.0
-
-    brackets = _resident_ndfl_brackets_2025()
-    gross_accum = 0.0
-    net_remaining = target_net
-    prev_limit = 0.0
-
-    for upper, rate in brackets:
-        segment_width = (upper - prev_limit) if upper is not None else None
-        segment_net_cap = (segment_width * (1.0 - rate)) if segment_width is not None else None
-
-        if segment_width is None:
-            # infinite top bracket
-            gross_accum += net_remaining / (1.0 - rate)
-            net_remaining = 0.0
-            break
-
-        if net_remaining >= segment_net_cap - 1e-9:
-            # fill entire segment
-            gross_accum += segment_width
-            net_remaining -= segment_net_cap
-            prev_limit = upper
-            continue
-        else:
-            # partial in this segment
-            gross_accum += net_remaining / (1.0 - rate)
-            net_remaining = 0.0
-            break
-
-    return gross_accum
-
 def try_fetch_json(url:str):
     try:
         r=requests.get(url, timeout=8, headers={"User-Agent":"Mozilla/5.0"})
@@ -1631,42 +1617,47 @@ def auto_fetch_rates():
         if isinstance(js,dict) and js: return js,u
     return None,None
 
-def workdays_between(start: date, end: date, mode: str) -> int:
-    if end < start: return 0
-    total=0
-    for i in range((end-start).days+1):
-        d = start + timedelta(days=i)
-        wd = d.weekday()
-        if mode=="tam_calisma": total+=1
-        elif mode=="her_pazar": total += (wd!=6)
-        elif mode=="hafta_sonu_tatil": total += (wd not in (5,6))
-        elif mode=="iki_haftada_bir_pazar":
-            if wd==6:
-                week_idx=((d-start).days//7)
-                if (week_idx%2)==1: continue
-            total+=1
-        else: total+=(wd!=6)
-    
-    return total
+# Proje deposuna kaydedilen durum: model anahtarları + değerleri taşıyan widget anahtarları
+PROJECT_STATE_KEYS = [
+    "roles_df", "metraj_df", "_met_for_keys", "use_metraj",
+    "start_date", "end_date", "holiday_mode", "holiday_idx", "hours_per_day", "scenario",
+    "food", "lodging", "transport", "ppe", "training",
+    "food_vat", "lodging_vat", "transport_vat", "ppe_vat", "training_vat", "vat_rate",
+    "prim_sng", "prim_tur", "use_progressive_ndfl",
+    "overhead_rate", "consumables_rate", "indirect_rate_total",
+    "overhead_rate_eff", "consumables_rate_eff", "indirect_rate_total_eff", "distribution_type",
+    "cons_custom_df", "ovh_custom_df", "ind_custom_df",
+    "cons_groups_state", "ovh_groups_state", "indirect_groups_state",
+    "resp_matrix_state", "use_matrix_override",
+    "diff", "difficulty_multiplier", "f_winter", "f_heavy", "f_cong", "f_pump", "f_repeat", "f_shared",
+    "SCENARIO_NORMS_OVR", "CONST_OVERRIDES",
+    "holiday_selbox", "scenario_sel",
+]
+PROJECT_STATE_PREFIXES = ("sel_", "diff_on_", "diff_pct_", "mx_on_", "mx_pct_", "mx_cat_",
+                          "cg_on_", "cg_pct_", "ig_on_", "ig_pct_", "og_on_", "og_pct_")
 
-def month_start(d: date)->date: return d.replace(day=1)
-def next_month(d: date)->date:
-    return d.replace(year=d.year+1, month=1, day=1) if d.month==12 else d.replace(month=d.month+1, day=1)
-def last_day_of_month(d: date)->date: return next_month(d)-timedelta(days=1)
+def _is_project_key(k: str) -> bool:
+    return k in PROJECT_STATE_KEYS or k.startswith(PROJECT_STATE_PREFIXES) or (k.endswith("_inp") and k != "target_file_inp")
 
-def iter_months(start:date,end:date):
-    cur=month_start(start)
-    while cur<=end:
-        yield cur
-        cur=next_month(cur)
+def collect_project_state() -> dict:
+    """Session state'ten kaydedilecek proje durumu"""
+    return {k: v for k, v in st.session_state.items() if _is_project_key(k)}
+
+def apply_project_state(state: dict):
+    """Yüklenen durumu session state'e yaz; tablo editörleri kaydedilen tablolardan yeniden kurulur"""
+    for k in [k for k in st.session_state.keys() if _is_project_key(k) or k.endswith("_form")]:
+        del st.session_state[k]
+    for k, v in state.items():
+        st.session_state[k] = v
+    st.session_state["calculation_results"] = None
 
-def workdays_in_month_range(start: date, end: date, mode: str) -> pd.DataFrame:
+def workdays_in_week_range(start: date, end: date, mode: str) -> pd.DataFrame:
     rows=[]
-    for m0 in iter_months(start,end):
-        m1=last_day_of_month(m0)
-        a,b=max(start,m0),min(end,m1)
-        if a>b: continue
-        rows.append({"Ay (Месяц)":m0.strftime("%Y-%m"),"İş Günü (Раб. день)":workdays_between(a,b,mode)})
+    w0=start-timedelta(days=start.weekday())
+    while w0<=end:
+        a,b=max(start,w0),min(end,w0+timedelta(days=6))
+        rows.append({"Hafta (Неделя)":w0.strftime("%Y-%m-%d"),"İş Günü (Раб. день)":workdays_between(a,b,mode)})
+        w0+=timedelta(days=7)
     return pd.DataFrame(rows)
 
 def percent_input(label:str, default_pct:float, min_val:float=0.0, max_val:float=100.0, help:str="", key:str|None=None, disabled:bool=False)->float:
@@ -1683,103 +1674,12 @@ def percent_input(label:str, default_pct:float, min_val:float=0.0, max_val:float
     )
     
     return v/100.0  # yüzde → oran
-def round_preserve_sum(values):
-    vals=[float(x) for x in values]
-    floors=[math.floor(x) for x in vals]
-    rem=int(round(sum(vals)))-sum(floors)
-    fracs=[(i, vals[i]-floors[i]) for i in range(len(vals))]
-    fracs.sort(key=lambda t:t[1], reverse=True)
-    res=floors[:]
-    for i,_ in fracs[:max(0,rem)]:
-        res[i]+=1
-    return res
 # =============== 3) İŞVEREN MALİYETİ (RUS/SNG/TUR) ===============
 def monthly_role_cost_multinational(row: pd.Series, prim_sng: bool, prim_tur: bool, extras_person_ex_vat: float) -> dict:
-    """
-    ÖNEMLİ:
-    - İşveren primleri, yalnız RESMİ BRÜT tutara uygulanır (OPS/OSS/OMS + NSiPZ). Brüt+NDFL değil.
-    - 'Gayriresmî/Elden' (nakit) kısma hiçbir vergi/prim eklenmez; sadece komisyon (CASH_COMMISSION_RATE) eklenir.
-    - SNG (patent): resmi brüt, SNG_TAXED_BASE ile sınırlanır; + aylık patent tutarı eklenir.
-    - VKS (TR): yalnız NSiPZ uygulanır (OPS/OSS/OMS = 0).
-    """
-    net=float(row["Net Maaş (₽, na ruki) (Чистая з/п, ₽)"])
-
-    # Get constants with override support
-    OVR = st.session_state.get("CONST_OVERRIDES", {})
-    ndfl_rus = OVR.get("NDFL_RUS", NDFL_RUS)
-    ndfl_sng = OVR.get("NDFL_SNG", NDFL_SNG)
-    ndfl_tur = OVR.get("NDFL_TUR", NDFL_TUR)
-    ops = OVR.get("OPS", OPS)
-    oss = OVR.get("OSS", OSS)
-    oms = OVR.get("OMS", OMS)
-    nsipz_risk_rus_sng = OVR.get("NSIPZ_RISK_RUS_SNG", NSIPZ_RISK_RUS_SNG)
-    nsipz_risk_tur_vks = OVR.get("NSIPZ_RISK_TUR_VKS", NSIPZ_RISK_TUR_VKS)
-    sng_patent_month = OVR.get("SNG_PATENT_MONTH", SNG_PATENT_MONTH)
-    sng_taxed_base = OVR.get("SNG_TAXED_BASE", SNG_TAXED_BASE)
-    tur_taxed_base = OVR.get("TUR_TAXED_BASE", TUR_TAXED_BASE)
-    cash_commission_rate = OVR.get("CASH_COMMISSION_RATE", CASH_COMMISSION_RATE)
-
-    # Vergi rejimi: Artan (2025) mı, sabit oran mı?
-    use_progressive_ndfl = bool(st.session_state.get("use_progressive_ndfl", True))
-
-    # RUS (tam sigortalı)
-    if use_progressive_ndfl:
-        gross_rus = gross_from_net_progressive_resident(net*12.0) / 12.0
-    else:
-        gross_rus = gross_from_net(net, ndfl_rus)
-    per_rus   = employer_cost_for_gross(gross_rus, ops, oss, oms, nsipz_risk_rus_sng) + extras_person_ex_vat
-
-    # SNG (patent; tüm sigorta sistemleri + patent; resmi brüt asgariyi sağlar)
-    if use_progressive_ndfl:
-        # 2025 kademeli NDFL’i yıllık bazda uygula (patent avansı mahsup edilmez — sade model)
-        gross_sng_full = gross_from_net_progressive_resident(net*12.0) / 12.0
-    else:
-        gross_sng_full = gross_from_net(net, ndfl_sng)
-    # Resmi brüt asgariyi sağla
-    min_off_sng = float(sng_taxed_base)
-    if gross_sng_full < min_off_sng:
-        gross_sng_full = min_off_sng
-    if prim_sng:
-        gross_sng_off = min_off_sng                               # resmi brüt en az asgari
-        prim_amount   = max(gross_sng_full - gross_sng_off, 0.0)   # elden kısım (vergisiz/primsiz)
-        commission    = prim_amount * cash_commission_rate
-    else:
-        gross_sng_off = gross_sng_full                             # prim yoksa tamamı resmi olabilir
-        prim_amount   = 0.0
-        commission    = 0.0
-    per_sng = employer_cost_for_gross(gross_sng_off, ops, oss, oms, nsipz_risk_rus_sng) \
-              + sng_patent_month + extras_person_ex_vat + prim_amount + commission
-
-    # TUR (VKS; yalnız iş kazası primi; resmi brüt asgariyi sağlar)
-    if use_progressive_ndfl:
-        # VKS (TR) — progressive NDFL resident brackets on annualized basis (12 aylık varsayım)
-        gross_tur_full = gross_from_net_progressive_resident(net*12.0) / 12.0
-    else:
-        gross_tur_full = gross_from_net(net, ndfl_tur)
-    # Resmi brüt asgariyi sağla
-    min_off_tur = float(tur_taxed_base)
-    if gross_tur_full < min_off_tur:
-        gross_tur_full = min_off_tur
-    if prim_tur:
-        gross_tur_off = min_off_tur
-        prim_tr       = max(gross_tur_full - gross_tur_off, 0.0)
-        comm_tr       = prim_tr * cash_commission_rate
-    else:
-        gross_tur_off = gross_tur_full
-        prim_tr       = 0.0
-        comm_tr       = 0.0
-    per_tur = employer_cost_for_gross(gross_tur_off, 0.0,0.0,0.0,nsipz_risk_tur_vks) \
-              + extras_person_ex_vat + prim_tr + comm_tr
-
-    # Uzaktan çalışma senaryoları kaldırıldı — standart yerinde çalışma varsayımı
-
-    # Ülke karması
-    p_rus=max(float(row["%RUS"]),0.0); p_sng=max(float(row["%SNG"]),0.0); p_tur=max(float(row["%TUR"]),0.0)
-    tot=p_rus+p_sng+p_tur or 100.0
-    p_rus,p_sng,p_tur = p_rus/tot, p_sng/tot, p_tur/tot
-    blended=p_rus*per_rus+p_sng*per_sng+p_tur*per_tur
-
-    return {"per_person":{"RUS":per_rus,"SNG":per_sng,"TUR":per_tur,"BLENDED":blended}}
+    """Rol aylık işveren maliyeti (cost_engine.role_monthly_cost; sabit override'ları ve NDFL rejimi session state'ten)"""
+    return role_monthly_cost(row, prim_sng, prim_tur, extras_person_ex_vat,
+                             overrides=st.session_state.get("CONST_OVERRIDES", {}),
+                             progressive_ndfl=bool(st.session_state.get("use_progressive_ndfl", True)))
 
 # =============== 4) NORM OLUŞTURMA ===============
 def build_norms_for_scenario(scenario: str, selected_elements: list[str]) -> tuple[float, dict[str, float]]:
@@ -2016,33 +1916,9 @@ def save_rag_records(recs:list[dict]):
     with open(RAG_FILE,"a",encoding="utf-8") as f:
         for r in recs: f.write(json.dumps(r,ensure_ascii=False)+"\n")
 
-def chunk_text(s: str, max_words: int=220):
-    words=s.split()
-    return [" ".join(words[i:i+max_words]) for i in range(0,len(words),max_words)]
-
 def file_to_chunks(uploaded) -> list[dict]:
-    name=uploaded.name; ext=name.lower().split(".")[-1]; chunks=[]
-    try:
-        if ext=="txt":
-            txt=uploaded.read().decode("utf-8","ignore")
-            for i,ch in enumerate(chunk_text(txt)): chunks.append({"text":ch,"meta":{"filename":name,"kind":"txt","part":i}})
-        elif ext=="csv":
-            df=pd.read_csv(uploaded)
-            for i,row in df.iterrows():
-                s=", ".join(f"{c}={row[c]}" for c in df.columns)
-                for j,ch in enumerate(chunk_text(s,120)):
-                    chunks.append({"text":ch,"meta":{"filename":name,"kind":"csv","row":int(i),"part":j}})
-        elif ext in ("xlsx","xls"):
-            df=pd.read_excel(uploaded)
-            for i,row in df.iterrows():
-                s=", ".join(f"{c}={row[c]}" for c in df.columns)
-                for j,ch in enumerate(chunk_text(s,120)):
-                    chunks.append({"text":ch,"meta":{"filename":name,"kind":"xlsx","row":int(i),"part":j}})
-        else:
-            chunks.append({"text":f"[desteklenmeyen tür] {name}","meta":{"filename":name,"kind":ext}})
-    except Exception as e:
-        chunks.append({"text":f"[okuma hatası: {e}]","meta":{"filename":name,"kind":"err"}})
-    return chunks
+    # Akış tabanlı okuyucu (rag_ingest) üzerinden; küçük dosyalar/uyumluluk için listeye çevirir
+    return list(iter_file_chunks(uploaded.name, uploaded))
 
 def embed_texts(texts:list[str]) -> list[list[float]]|None:
     client=get_openai_client()
@@ -2053,6 +1929,14 @@ def embed_texts(texts:list[str]) -> list[list[float]]|None:
     except Exception:
         return None
 
+def make_embed_fn(api_key: str):
+    """Arka plan thread'i için embed fonksiyonu (session_state'e erişmez)"""
+    def _embed(texts: list[str]) -> list[list[float]]|None:
+        if not (_OPENAI_AVAILABLE and api_key): return None
+        res = OpenAI(api_key=api_key).embeddings.create(model="text-embedding-3-small", input=texts)
+        return [d.embedding for d in res.data]
+    return _embed
+
 def cosine_sim(a: np.ndarray, b: np.ndarray) -> float:
     na=np.linalg.norm(a); nb=np.linalg.norm(b)
     if na==0 or nb==0: return 0.0
@@ -2211,6 +2095,38 @@ with st.sidebar:
         placeholder="tvly-..."
     )
     
+    # Proje kaydet / yükle (SQLite, sürümlü)
+    st.markdown("---")
+    st.markdown(bi("**💾 Proje**", "**💾 Проект**"))
+    try:
+        store = get_project_store()
+        projects = store.list_projects()
+        proj_name = st.text_input(bi("Proje adı","Название проекта"), key="project_name")
+        proj_note = st.text_input(bi("Not (opsiyonel)","Заметка (необязательно)"), key="project_note")
+        if st.button(bi("💾 Kaydet","💾 Сохранить"), disabled=not proj_name.strip()):
+            v = store.save(proj_name.strip(), collect_project_state(), proj_note)
+            st.toast(bi(f"Kaydedildi: {proj_name} v{v}", f"Сохранено: {proj_name} v{v}"))
+            projects = store.list_projects()
+        if not projects.empty:
+            sel_proj = st.selectbox(bi("Kayıtlı projeler","Сохранённые проекты"), projects["name"].tolist(), key="project_sel")
+            versions = store.list_versions(sel_proj)
+            sel_ver = st.selectbox(bi("Sürüm","Версия"), versions["version"].tolist(), key="project_ver_sel",
+                                   format_func=lambda v: f"v{v} · " + str(versions.loc[versions["version"] == v, "note"].iloc[0] or ""))
+            if st.button(bi("📂 Yükle","📂 Загрузить")):
+                apply_project_state(store.load(sel_proj, int(sel_ver)))
+                st.rerun()
+            if len(versions) > 1:
+                with st.expander(bi("🔍 Sürüm farkı","🔍 Разница версий")):
+                    base_ver = st.selectbox(bi("Karşılaştır","Сравнить с"), [v for v in versions["version"] if v != sel_ver], key="project_diff_base")
+                    changes = store.diff(sel_proj, int(base_ver), int(sel_ver))
+                    if changes:
+                        st.dataframe(pd.DataFrame([{"Alan": c.path, "Değişim": c.change, "Eski": str(c.old), "Yeni": str(c.new)} for c in changes]),
+                                     hide_index=True, use_container_width=True)
+                    else:
+                        st.caption(bi("Fark yok","Различий нет"))
+    except Exception as e:
+        st.error(bi(f"Proje deposu hatası: {e}", f"Ошибка хранилища проектов: {e}"))
+
     # Sidebar alt bilgi
     st.markdown("---")
     # Alt bilgi kaldırıldı (tekrarlı sürüm gösterimini sadeleştiriyoruz)
@@ -2226,6 +2142,94 @@ st.markdown("""
 </div>
 """, unsafe_allow_html=True)
 
+# ---------- Sekme fragment'ları ----------
+# Her sekme gövdesi bir st.fragment'tır: sekme içindeki widget değişince yalnız o sekme yeniden
+# çalışır. Sekmeler arası canlı bağımlılıklar burada açıkça yazılır: "writes" sekmenin başka
+# sekmelere verdiği session anahtarları, "reads" başka sekmelerden gelip ekranda hemen görünmesi
+# gereken anahtarlar ("*" önek eşleşmesi). Fragment yeniden çalışmasında başka bir sekmenin
+# okuduğu bir anahtar değişirse tüm uygulama yeniden çalıştırılır. HESAPLA/Excel gibi yalnız
+# butona basınca okunan anahtarlar sözleşmeye girmez.
+TAB_STATE_CONTRACTS = {
+    "kapak":    {"reads": (), "writes": ()},
+    "mantik":   {"reads": (), "writes": ()},
+    "sabitler": {"reads": (), "writes": ("CONST_OVERRIDES", "use_progressive_ndfl")},
+    "genel":    {"reads": ("scenario", "hours_per_day"),
+                 "writes": ("start_date", "end_date", "holiday_mode", "hours_per_day", "scenario", "prim_sng",
+                            "prim_tur", "f_*", "SCENARIO_NORMS_OVR", "diff", "difficulty_multiplier")},
+    "eleman":   {"reads": ("sel_*", "met_*", "metraj_df"), "writes": ("sel_*", "use_metraj", "metraj_df", "_met_for_keys")},
+    "roller":   {"reads": ("roles_df",), "writes": ("roles_df",)},
+    "gider":    {"reads": ("overhead_rate", "consumables_rate"),
+                 "writes": ("food", "lodging", "transport", "ppe", "training", "*_vat", "vat_rate",
+                            "consumables_rate", "overhead_rate", "indirect_rate_total")},
+    "matris":   {"reads": (), "writes": ("use_matrix_override", "resp_matrix_state", "overhead_rate_eff",
+                                         "consumables_rate_eff", "indirect_rate_total_eff")},
+    "sonuclar": {"reads": (), "writes": ("calculation_results", "manpower_month_df", "boq_priced_df", "metraj_df")},
+    "import":   {"reads": (), "writes": ("roles_df", "sel_*", "met_*", "portfolio_df")},
+    "asistan":  {"reads": (), "writes": ("scenario", "hours_per_day", "overhead_rate", "consumables_rate")},
+}
+
+
+def _in_fragment_rerun() -> bool:
+    """Bu çalıştırma yalnız fragment(lar)ı mı yeniden çalıştırıyor?"""
+    ctx = get_script_run_ctx()
+    return bool(ctx and ctx.fragment_ids_this_run)
+
+
+def _key_matches(key: str, pattern: str) -> bool:
+    if pattern.startswith("*"):
+        return key.endswith(pattern[1:])
+    if pattern.endswith("*"):
+        return key.startswith(pattern[:-1])
+    return key == pattern
+
+
+def _shared_snapshot(patterns) -> dict:
+    """Sözleşme anahtarlarının o anki değerleri (tablolar yerinde düzenlemeye karşı kopyalanır)"""
+    snap = {}
+    for k in list(st.session_state.keys()):
+        if any(_key_matches(k, p) for p in patterns):
+            v = st.session_state[k]
+            snap[k] = v.copy() if isinstance(v, pd.DataFrame) else v
+    return snap
+
+
+def _same_value(a, b) -> bool:
+    if isinstance(a, pd.DataFrame) or isinstance(b, pd.DataFrame):
+        return isinstance(a, pd.DataFrame) and isinstance(b, pd.DataFrame) and a.equals(b)
+    try:
+        return bool(a == b)
+    except Exception:
+        return a is b
+
+
+def tab_fragment(name: str):
+    """Sekme gövdesini st.fragment yap; süreyi ölç, paylaşılan anahtar değişirse uygulamayı yenile"""
+    exported = tuple(p for p in TAB_STATE_CONTRACTS[name]["writes"]
+                     if any(p in c["reads"] for n, c in TAB_STATE_CONTRACTS.items() if n != name))
+
+    def decorate(body):
+        @st.fragment
+        @functools.wraps(body)
+        def run():
+            before = _shared_snapshot(exported) if exported and _in_fragment_rerun() else None
+            t0 = time.perf_counter()
+            try:
+                body()
+            finally:
+                st.session_state.setdefault("_tab_timings", {})[name] = round((time.perf_counter() - t0) * 1000, 1)
+            if before is not None:
+                after = _shared_snapshot(exported)
+                if any(not _same_value(before.get(k), after.get(k)) for k in before.keys() | after.keys()):
+                    st.rerun()   # başka sekmeler de yeni değeri göstersin
+        return run
+    return decorate
+
+
+def rerun_tab():
+    """Yalnız bulunulan sekmeyi yeniden çalıştır (tam çalıştırmada bütün uygulama)"""
+    st.rerun(scope="fragment" if _in_fragment_rerun() else "app")
+
+
 # ---------- Modern Sekmeler ----------
 tab_kapak, tab_mantik, tab_sabitler, tab_genel, tab_eleman, tab_roller, tab_gider, tab_matris, tab_sonuclar, tab_asistan, tab_import = st.tabs([
     f"🏠 {bi('Kapak','Обложка')}",
@@ -2240,7 +2244,8 @@ tab_kapak, tab_mantik, tab_sabitler, tab_genel, tab_eleman, tab_roller, tab_gide
     f"🤖 {bi('Asistan','Ассистент')}",
     f"📥 {bi('Import','Импорт')}"
 ])
-with tab_kapak:
+@tab_fragment("kapak")
+def render_tab_kapak():
     # Modern Kapak Sayfası
     st.markdown("""
     <div style="text-align: center; padding: 4rem 2rem; background: linear-gradient(135deg, #a8d8ea 0%, #c7d2fe 100%); color: #333; border-radius: 25px; margin: 2rem 0; box-shadow: 0 20px 40px rgba(168, 216, 234, 0.15);">
@@ -2311,7 +2316,11 @@ with tab_kapak:
     </div>
     """, unsafe_allow_html=True)
 
-with tab_mantik:
+with tab_kapak:
+    render_tab_kapak()
+
+@tab_fragment("mantik")
+def render_tab_mantik():
     # Sekme başlığı
     st.markdown("""
     <div style="text-align: center; padding: 2rem; background: linear-gradient(135deg, #e8f4fd 0%, #d1e7dd 100%); color: #333; border-radius: 15px; margin-bottom: 2rem; border: 1px solid #e9ecef;">
@@ -2551,8 +2560,12 @@ with tab_mantik:
             except Exception as e:
                 st.warning(f"PDF yerine metin çıktı üretildi: {e}")
 
+with tab_mantik:
+    render_tab_mantik()
+
 # ==================== 0) SABİTLER ====================
-with tab_sabitler:
+@tab_fragment("sabitler")
+def render_tab_sabitler():
     # Sekme başlığı
     st.markdown("""
     <div style="text-align: center; padding: 2rem; background: linear-gradient(135deg, #e8f4fd 0%, #d1e7dd 100%); color: #333; border-radius: 15px; margin-bottom: 2rem; border: 1px solid #e9ecef;">
@@ -2690,7 +2703,7 @@ with tab_sabitler:
         with col1:
             if st.button("Tümü Sıfırla", type="secondary"):
                 st.session_state["CONST_OVERRIDES"] = {}
-                st.rerun()
+                rerun_tab()
         with col2:
             st.caption("💡 Override'ları sıfırlamak için butona tıklayın.")
     else:
@@ -2723,12 +2736,12 @@ with tab_sabitler:
             with col1:
                 if st.button("Kaydet", key="save_NDFL_RUS"):
                     OVR["NDFL_RUS"] = pct_to_ratio(st.session_state["inp_NDFL_RUS"])
-                    st.rerun()
+                    rerun_tab()
             with col2:
                 if st.button("Vazgeç", key="cancel_NDFL_RUS"):
                     del st.session_state["inp_NDFL_RUS"]
                     st.session_state["edit_NDFL_RUS"] = False
-                    st.rerun()
+                    rerun_tab()
             st.markdown('</div>', unsafe_allow_html=True)
         st.markdown('</div>', unsafe_allow_html=True)
         
@@ -2747,12 +2760,12 @@ with tab_sabitler:
             with col1:
                 if st.button("Kaydet", key="save_OPS"):
                     OVR["OPS"] = pct_to_ratio(st.session_state["inp_OPS"])
-                    st.rerun()
+                    rerun_tab()
             with col2:
                 if st.button("Vazgeç", key="cancel_OPS"):
                     del st.session_state["inp_OPS"]
                     st.session_state["edit_OPS"] = False
-                    st.rerun()
+                    rerun_tab()
             st.markdown('</div>', unsafe_allow_html=True)
         st.markdown('</div>', unsafe_allow_html=True)
         
@@ -2771,12 +2784,12 @@ with tab_sabitler:
             with col1:
                 if st.button("Kaydet", key="save_OSS"):
                     OVR["OSS"] = pct_to_ratio(st.session_state["inp_OSS"])
-                    st.rerun()
+                    rerun_tab()
             with col2:
                 if st.button("Vazgeç", key="cancel_OSS"):
                     del st.session_state["inp_OSS"]
                     st.session_state["edit_OSS"] = False
-                    st.rerun()
+                    rerun_tab()
             st.markdown('</div>', unsafe_allow_html=True)
         st.markdown('</div>', unsafe_allow_html=True)
         
@@ -2795,12 +2808,12 @@ with tab_sabitler:
             with col1:
                 if st.button("Kaydet", key="save_OMS"):
                     OVR["OMS"] = pct_to_ratio(st.session_state["inp_OMS"])
-                    st.rerun()
+                    rerun_tab()
             with col2:
                 if st.button("Vazgeç", key="cancel_OMS"):
                     del st.session_state["inp_OMS"]
                     st.session_state["edit_OMS"] = False
-                    st.rerun()
+                    rerun_tab()
             st.markdown('</div>', unsafe_allow_html=True)
         st.markdown('</div>', unsafe_allow_html=True)
         
@@ -2819,12 +2832,12 @@ with tab_sabitler:
             with col1:
                 if st.button("Kaydet", key="save_NSIPZ_RUS_SNG"):
                     OVR["NSIPZ_RISK_RUS_SNG"] = pct_to_ratio(st.session_state["inp_NSIPZ_RUS_SNG"])
-                    st.rerun()
+                    rerun_tab()
             with col2:
                 if st.button("Vazgeç", key="cancel_NSIPZ_RUS_SNG"):
                     del st.session_state["inp_NSIPZ_RUS_SNG"]
                     st.session_state["edit_NSIPZ_RUS_SNG"] = False
-                    st.rerun()
+                    rerun_tab()
             st.markdown('</div>', unsafe_allow_html=True)
         st.markdown('</div>', unsafe_allow_html=True)
         
@@ -2849,12 +2862,12 @@ with tab_sabitler:
             with col1:
                 if st.button("Kaydet", key="save_NDFL_SNG"):
                     OVR["NDFL_SNG"] = pct_to_ratio(st.session_state["inp_NDFL_SNG"])
-                    st.rerun()
+                    rerun_tab()
             with col2:
                 if st.button("Vazgeç", key="cancel_NDFL_SNG"):
                     del st.session_state["inp_NDFL_SNG"]
                     st.session_state["edit_NDFL_SNG"] = False
-                    st.rerun()
+                    rerun_tab()
             st.markdown('</div>', unsafe_allow_html=True)
         st.markdown('</div>', unsafe_allow_html=True)
         
@@ -2873,12 +2886,12 @@ with tab_sabitler:
             with col1:
                 if st.button("Kaydet", key="save_SNG_PATENT"):
                     OVR["SNG_PATENT_MONTH"] = st.session_state["inp_SNG_PATENT"]
-                    st.rerun()
+                    rerun_tab()
             with col2:
                 if st.button("Vazgeç", key="cancel_SNG_PATENT"):
                     del st.session_state["inp_SNG_PATENT"]
                     st.session_state["edit_SNG_PATENT"] = False
-                    st.rerun()
+                    rerun_tab()
             st.markdown('</div>', unsafe_allow_html=True)
         st.markdown('</div>', unsafe_allow_html=True)
         
@@ -2897,12 +2910,12 @@ with tab_sabitler:
             with col1:
                 if st.button("Kaydet", key="save_SNG_BASE"):
                     OVR["SNG_TAXED_BASE"] = st.session_state["inp_SNG_BASE"]
-                    st.rerun()
+                    rerun_tab()
             with col2:
                 if st.button("Vazgeç", key="cancel_SNG_BASE"):
                     del st.session_state["inp_SNG_BASE"]
                     st.session_state["edit_SNG_BASE"] = False
-                    st.rerun()
+                    rerun_tab()
             st.markdown('</div>', unsafe_allow_html=True)
         st.markdown('</div>', unsafe_allow_html=True)
         
@@ -2921,12 +2934,12 @@ with tab_sabitler:
             with col1:
                 if st.button("Kaydet", key="save_CASH_COMMISSION"):
                     OVR["CASH_COMMISSION_RATE"] = pct_to_ratio(st.session_state["inp_CASH_COMMISSION"])
-                    st.rerun()
+                    rerun_tab()
             with col2:
                 if st.button("Vazgeç", key="cancel_CASH_COMMISSION"):
                     del st.session_state["inp_CASH_COMMISSION"]
                     st.session_state["edit_CASH_COMMISSION"] = False
-                    st.rerun()
+                    rerun_tab()
             st.markdown('</div>', unsafe_allow_html=True)
         st.markdown('</div>', unsafe_allow_html=True)
         
@@ -2955,12 +2968,12 @@ with tab_sabitler:
             with col1:
                 if st.button("Kaydet", key="save_NDFL_TUR"):
                     OVR["NDFL_TUR"] = pct_to_ratio(st.session_state["inp_NDFL_TUR"])
-                    st.rerun()
+                    rerun_tab()
             with col2:
                 if st.button("Vazgeç", key="cancel_NDFL_TUR"):
                     del st.session_state["inp_NDFL_TUR"]
                     st.session_state["edit_NDFL_TUR"] = False
-                    st.rerun()
+                    rerun_tab()
             st.markdown('</div>', unsafe_allow_html=True)
         st.markdown('</div>', unsafe_allow_html=True)
         
@@ -2979,12 +2992,12 @@ with tab_sabitler:
             with col1:
                 if st.button("Kaydet", key="save_NSIPZ_TUR_VKS"):
                     OVR["NSIPZ_RISK_TUR_VKS"] = pct_to_ratio(st.session_state["inp_NSIPZ_TUR_VKS"])
-                    st.rerun()
+                    rerun_tab()
             with col2:
                 if st.button("Vazgeç", key="cancel_NSIPZ_TUR_VKS"):
                     del st.session_state["inp_NSIPZ_TUR_VKS"]
                     st.session_state["edit_NSIPZ_TUR_VKS"] = False
-                    st.rerun()
+                    rerun_tab()
             st.markdown('</div>', unsafe_allow_html=True)
         st.markdown('</div>', unsafe_allow_html=True)
         
@@ -3003,18 +3016,22 @@ with tab_sabitler:
             with col1:
                 if st.button("Kaydet", key="save_TUR_BASE"):
                     OVR["TUR_TAXED_BASE"] = st.session_state["inp_TUR_BASE"]
-                    st.rerun()
+                    rerun_tab()
             with col2:
                 if st.button("Vazgeç", key="cancel_TUR_BASE"):
                     del st.session_state["inp_TUR_BASE"]
                     st.session_state["edit_TUR_BASE"] = False
-                    st.rerun()
+                    rerun_tab()
             st.markdown('</div>', unsafe_allow_html=True)
         st.markdown('</div>', unsafe_allow_html=True)
         
         st.markdown('</div>', unsafe_allow_html=True)
+
+with tab_sabitler:
+    render_tab_sabitler()
 # ==================== 1) GENEL ====================
-with tab_genel:
+@tab_fragment("genel")
+def render_tab_genel():
     # Sekme başlığı
     st.markdown("""
     <div style="text-align: center; padding: 2rem; background: linear-gradient(135deg, #e8f4fd 0%, #d1e7dd 100%); color: #333; border-radius: 15px; margin-bottom: 2rem; border: 1px solid #e9ecef;">
@@ -3069,7 +3086,7 @@ with tab_genel:
         # Hesaplamaları güncelle
         st.session_state["_holiday_mode_changed"] = True
         # Sayfayı yenile ki hesaplamalar güncellensin
-        st.rerun()
+        rerun_tab()
 
     cC, cD = st.columns(2)
     with cC:
@@ -3090,8 +3107,7 @@ with tab_genel:
     st.caption(bi("Patent bedeli her ay sabit maliyet olarak kabul edilir; NDFL mahsup edilmez (basitleştirilmiş yaklaşım).",
                   "Платёж за патент учитывается как фиксированная ежемесячная затрата; в НДФЛ не засчитывается (упрощённая модель)."))
 
-# ==================== 1B) ADAM-SAAT NORMLARI (ayrı başlık) ====================
-with tab_genel:
+    # ==================== 1B) ADAM-SAAT NORMLARI (ayrı başlık) ====================
     with st.expander("👷‍♂️ Adam-saat Normları (Senaryolar) / 👷‍♂️ Нормы трудозатрат (сценарии)", expanded=False):
         st.caption(bi("Senaryolara göre eleman bazında a·s/m³ normlarını düzenleyin. Boş bırakılanlar varsayılanı kullanır.",
                       "Редактируйте нормы a·ч/м³ по элементам для каждого сценария. Пустые — по умолчанию."))
@@ -3176,7 +3192,7 @@ with tab_genel:
                 st.session_state.pop(f"diff_pct_{it['key']}", None)
             # Önbellekleri temizle
             st.session_state.pop("difficulty_multiplier_cache", None)
-            st.rerun()
+            rerun_tab()
 
         # Widget key'lerini oluştur
         for k, rec in st.session_state["diff"].items():
@@ -3245,7 +3261,7 @@ with tab_genel:
             with cA:
                 if st.button("🧼 DEĞERLERİ SIFIRLA", key="diff_reset_bottom"):
                     st.session_state["diff__do_reset"] = True
-                    st.rerun()
+                    rerun_tab()
             with cB:
                 # Toplam çarpanı hesapla
                 total_mult = 1.0
@@ -3287,8 +3303,12 @@ with tab_genel:
     _update_diff_cache()
     # END: Çevresel/Zorluk Faktörleri
 
+with tab_genel:
+    render_tab_genel()
+
 # ==================== 2) ELEMAN & METRAJ ====================
-with tab_eleman:
+@tab_fragment("eleman")
+def render_tab_eleman():
     # Sekme başlığı
     st.markdown("""
     <div style="text-align: center; padding: 2rem; background: linear-gradient(135deg, #e8f4fd 0%, #d1e7dd 100%); color: #333; border-radius: 15px; margin-bottom: 2rem; border: 1px solid #e9ecef;">
@@ -3309,6 +3329,7 @@ with tab_eleman:
         st.warning(bi("En az bir betonarme eleman seçin.", "Выберите хотя бы один элемент."))
 
     bih("📏 Metraj","📏 Объёмы", level=3)
+    render_revit_import(selected_elements)   # metraj_df/use_metraj'ı kutu oluşmadan yazar
     use_metraj = st.checkbox(bi("Eleman metrajlarım mevcut, girmek istiyorum",
                                  "У меня есть объёмы по элементам, хочу ввести"),
                              value=st.session_state.get("use_metraj", False), key="use_metraj")
@@ -3336,8 +3357,12 @@ with tab_eleman:
                 # Mevcut değerleri kullan
                 st.session_state["metraj_df"] = edited_metraj
 
+with tab_eleman:
+    render_tab_eleman()
+
 # ==================== 3) ROLLER ====================
-with tab_roller:
+@tab_fragment("roller")
+def render_tab_roller():
     # Sekme başlığı
     st.markdown("""
     <div style="text-align: center; padding: 2rem; background: linear-gradient(135deg, #e8f4fd 0%, #d1e7dd 100%); color: #333; border-radius: 15px; margin-bottom: 2rem; border: 1px solid #e9ecef;">
@@ -3384,9 +3409,13 @@ with tab_roller:
         ])
         st.success("Varsayılan roller yüklendi.")
 
+with tab_roller:
+    render_tab_roller()
+
 
 # ==================== 4) GİDERLER (sade) ====================
-with tab_gider:
+@tab_fragment("gider")
+def render_tab_gider():
     # Sekme başlığı
     st.markdown("""
     <div style="text-align: center; padding: 2rem; background: linear-gradient(135deg, #e8f4fd 0%, #d1e7dd 100%); color: #333; border-radius: 15px; margin-bottom: 2rem; border: 1px solid #e9ecef;">
@@ -3613,8 +3642,12 @@ with tab_gider:
     grand_total = cons_total + ovh_total + ind_total
     st.success(bi(f"✅ Genel Toplam: {grand_total:.2f}% ({grand_total/100.0:.3f})",
                   f"✅ Итого по группам: {grand_total:.2f}% ({grand_total/100.0:.3f})"))
+
+with tab_gider:
+    render_tab_gider()
 # ==================== 5) SORUMLULUK MATRİSİ (şık) ====================
-with tab_matris:
+@tab_fragment("matris")
+def render_tab_matris():
     # Sekme başlığı
     st.markdown("""
     <div style="text-align: center; padding: 2rem; background: linear-gradient(135deg, #e8f4fd 0%, #d1e7dd 100%); color: #333; border-radius: 15px; margin-bottom: 2rem; border: 1px solid #e9ecef;">
@@ -4013,8 +4046,12 @@ with tab_matris:
         st.info(bi("ℹ️ Override kapalı: Manuel Sarf/Overhead/Indirect oranları kullanılacak; матрица sadece gösterim amaçlı.",
                    "ℹ️ Перекрытие выключено: используются ручные проценты; суммы матрицы — только для отображения."))
 
+with tab_matris:
+    render_tab_matris()
+
 # ==================== 6) SONUÇLAR: Tüm Hesaplama Sonuçları ====================
-with tab_sonuclar:
+@tab_fragment("sonuclar")
+def render_tab_sonuclar():
     # Sekme başlığı
     st.markdown("""
     <div style="text-align: center; padding: 2rem; background: linear-gradient(135deg, #e8f4fd 0%, #d1e7dd 100%); color: #333; border-radius: 15px; margin-bottom: 2rem; border: 1px solid #e9ecef;">
@@ -4026,6 +4063,11 @@ with tab_sonuclar:
     left, right = st.columns([0.8,0.2])
     with left:
         bih("📊 Hesap Sonuçları Özeti","📊 Сводка результатов расчёта", level=2)
+        st.radio(bi("Grafik modu","Режим графиков"), ["image", "client"], key="chart_mode", horizontal=True,
+                 format_func=lambda m: bi("Statik (önbellekli PNG)","Статичные (кэш PNG)") if m == "image"
+                 else bi("Etkileşimli (tarayıcıda)","Интерактивные (в браузере)"),
+                 help=bi("Etkileşimli mod grafikleri tarayıcıda çizer; sunucuda matplotlib çalışmaz",
+                         "Интерактивный режим рисует графики в браузере, без matplotlib на сервере"))
     with right:
         if st.button(bi("🧹 Sonuçları Temizle","🧹 Очистить результаты"), type="secondary"):
             # Varsayılan/boş hal
@@ -4074,293 +4116,55 @@ with tab_sonuclar:
                     st.stop()
                 
                 if len(selected_elements) > 0 and len(roles_df) > 0:
-                    # Temel parametreleri al
-                    start_date = st.session_state.get("start_date", date.today().replace(day=1))
-                    end_date = st.session_state.get("end_date", date.today().replace(day=30))
-                    holiday_mode = st.session_state.get("holiday_mode", "her_pazar")
-                    hours_per_day = st.session_state.get("hours_per_day", 10.0)
-                    scenario = st.session_state.get("scenario", "Gerçekçi")
-                    
-                    # SENARYO NORMALARI VE ZORLUK - TAM ALGORİTMA
-                    # Senaryoya göre temel norm (Temel için)
-                    # Senaryo bazı — override destekli
-                    _norms_map = get_effective_scenario_norms()
-                    scenario_base = float((_norms_map.get(scenario) or SCENARIO_NORMS["Gerçekçi"]) ["Temel"])
-                    
-                    # Zorluk çarpanı tek merkezden hesaplanır ve cache'e yazılır
-                    z_mult = get_difficulty_multiplier_cached()
-                    difficulty_multiplier = z_mult  # norm hesapları bunu kullanıyor
-                    
-                    # Eleman normları - göreli katsayılar (Temel'e oranlanır) - CANONICAL KEYS kullanarak
-                    element_relative_factors = {
-                        "grobeton": 0.8,   # Grobeton
-                        "rostverk": 0.9,   # Rostverk
-                        "temel": 1.0,      # Temel (baz)
-                        "doseme": 1.1,     # Döşeme
-                        "perde": 1.2,      # Perde
-                        "merdiven": 1.3    # Merdiven
-                    }
-                    
-                    # Seçili elemanlar arasında normalize et (ortalama 1 olacak şekilde)
-                    selected_factors = {k: element_relative_factors.get(k, 1.0) for k in selected_elements if k in element_relative_factors}
-                    if selected_factors:
-                        avg_factor = sum(selected_factors.values()) / len(selected_factors)
-                        norm_mult = {k: v / avg_factor for k, v in selected_factors.items()}
-                    else:
-                        norm_mult = {"temel": 1.0}  # varsayılan
-                    
-                    # Metraj kontrolü
-                    use_metraj = st.session_state.get("use_metraj", False)
-                    metraj_df = st.session_state.get("metraj_df", pd.DataFrame())
-                    
-                    if use_metraj and not metraj_df.empty:
-                        iterable = metraj_df.to_dict(orient="records")
-                        col_ele = "Eleman (Элемент)"
-                        col_met = "Metraj (m³) (Объём, м³)"
+                    # Arayüzsüz motor: session state ile aynı anahtarlar (portföy çalıştırıcısı da bunu kullanır)
+                    est = evaluate_estimate(st.session_state)
+                    if est.uses_metraj:
                         st.success("✅ Metraj verileri kullanılıyor!")
                     else:
-                        # Use canonical keys and safe label helpers
-                        iterable = []
-                        for k in selected_elements:
-                            if k in LABELS:
-                                iterable.append({"Eleman (Элемент)": LABELS[k], "Metraj (m³) (Объём, м³)": 1.0})
-                            else:
-                                st.warning(f"Tanımsız eleman anahtarı atlandı: {k}")
-                        if not iterable:
-                            st.error("Hiç geçerli eleman kalmadı!")
-                            st.stop()
-                        col_ele = "Eleman (Элемент)"
-                        col_met = "Metraj (m³) (Объём, м³)"
                         st.warning("⚠️ Metraj verileri kullanılmıyor - varsayılan 1.0 m³ değerleri kullanılıyor")
-                    
-                    # Norm × Metraj hesaplaması - DÜZELTİLDİ
-                    norms_used = {}
-                    total_metraj = 0.0
-                    total_adamsaat = 0.0
-                    
-                    # Rusça etiketleri Türkçe anahtarlara eşleştir - CANONICAL KEYS kullanarak
-                    russian_to_turkish = {
-                        "Подбетонка": "grobeton",
-                        "Ростверк": "rostverk", 
-                        "Фундамент": "temel",
-                        "Плита перекрытия": "doseme",
-                        "Стена/диафрагма": "perde",
-                        "Лестница": "merdiven",
-                        # Tam etiket eşleştirmesi - metraj_df'den gelen tam etiketler için
-                        "Grobeton (Подбетонка)": "grobeton",
-                        "Rostverk (Ростверк)": "rostverk",
-                        "Temel (Фундамент)": "temel",
-                        "Döşeme (Плита перекрытия)": "doseme",
-                        "Perde (Стена/диафрагма)": "perde",
-                        "Merdiven (Лестница)": "merdiven"
-                    }
-                    
-                    # NORM HESAPLAMASI - TAM ALGORİTMA
-                    
-                    for r in iterable:
-                        lbl = str(r[col_ele])
-                        met = float(r.get(col_met, 0.0) or 0.0)
-                        
-                        # Rusça etiketi Türkçe anahtara çevir
-                        turkish_key = russian_to_turkish.get(lbl, lbl)
-                        norm_multiplier = norm_mult.get(turkish_key, 1.0)
-                        
-                        # Eleman normu: n_e = senaryo_temel * göreli_katsayı * difficulty_multiplier
-                        n_e = scenario_base * norm_multiplier * difficulty_multiplier
-                        norms_used[lbl] = n_e
-                        total_metraj += met
-                        total_adamsaat += met * n_e
-                        
-
-                    
-
-                    # TAKVİM HESAPLAMASI - TAM ALGORİTMA
-                    
-                    workdays = workdays_between(start_date, end_date, holiday_mode)
-                    project_days = max((end_date - start_date).days + 1, 1)
-                    
-                    avg_workdays_per_month = workdays * 30.0 / project_days
-                    hours_per_person_month = max(avg_workdays_per_month * hours_per_day, 1e-9)
-                    
-                    # Rol maliyeti hesaplaması - YENİ ALGORİTMA
-                    sum_w = float(roles_df["Ağırlık (Вес)"].clip(lower=0.0).sum()) if not roles_df.empty else 0.0
-                    month_wd_df = workdays_in_month_range(start_date, end_date, holiday_mode)
-                    n_months = len(month_wd_df) if not month_wd_df.empty else 1
-                    person_months_total = total_adamsaat / hours_per_person_month
-                    
-                    # PRIM ve gider parametreleri
+                    scenario = est.scenario
+                    scenario_base = est.scenario_base
+                    difficulty_multiplier = est.difficulty_multiplier
+                    norm_mult = est.norm_mult
+                    norms_used = est.norms_used
+                    total_metraj = est.total_metraj
+                    total_adamsaat = est.total_labor_hours
+                    start_date, end_date = est.start_date, est.end_date
+                    holiday_mode, hours_per_day = est.holiday_mode, est.hours_per_day
+                    workdays, project_days = est.workdays, est.project_days
+                    avg_workdays_per_month = est.avg_workdays_per_month
+                    hours_per_person_month = est.hours_per_person_month
+                    month_wd_df, n_months = est.month_wd_df, est.n_months
+                    person_months_total = est.person_months_total
+                    extras_base, extras_per_person = est.extras_base, est.extras_per_person
+                    M_with, M_bare = est.monthly_cost_with, est.monthly_cost_bare
+                    bare_as_price = est.bare_as_price
+                    with_extras_as_price = est.with_extras_as_price
+                    fully_loaded_as_price = est.fully_loaded_as_price
+                    overhead_rate_eff = est.overhead_rate_eff
+                    consumables_rate_eff = est.consumables_rate_eff
+                    indirect_rate_total = est.indirect_rate_total
+                    priced_df = est.priced_df
+                    project_total_cost = est.project_total_cost
+                    indirect_total = est.totals.indirect_total
+                    roles_calc_df = est.roles_calc_df
+                    scenario_sweep_df = est.scenario_sweep_df
+                    elements_df = elements_cost_df(priced_df)
                     PRIM_SNG = st.session_state.get("prim_sng", True)
                     PRIM_TUR = st.session_state.get("prim_tur", True)
-                    
-                    # Global kişi-başı giderler (giderler sekmesinden hesapla)
-                    food = float(st.session_state.get("food", 10000.0))
-                    lodging = float(st.session_state.get("lodging", 12000.0))
-                    transport = float(st.session_state.get("transport", 3000.0))
-                    ppe = float(st.session_state.get("ppe", 1500.0))
-                    training = float(st.session_state.get("training", 500.0))
-                    
-                    # KDV işaretleri (giderler sekmesinden al)
                     food_vat = bool(st.session_state.get("food_vat", True))
                     lodging_vat = bool(st.session_state.get("lodging_vat", True))
                     transport_vat = bool(st.session_state.get("transport_vat", False))
                     ppe_vat = bool(st.session_state.get("ppe_vat", True))
                     training_vat = bool(st.session_state.get("training_vat", True))
-                    
-                    # Toplam KDV'li giderler
-                    extras_base = food + lodging + transport + ppe + training
-                    
-                    # KDV ayrıştırma (işaretli ise)
-                    def net_of_vat(x, tick):
-                        vat_rate = float(st.session_state.get("vat_rate", 0.20))
-                        return x / (1 + vat_rate) if tick else x
-                    
-                    # Toplam KDV'siz ek giderler (gerçek değerlerden hesapla)
-                    extras_per_person = sum([
-                        net_of_vat(food, food_vat),           # Yemek
-                        net_of_vat(lodging, lodging_vat),     # Barınma
-                        net_of_vat(transport, transport_vat), # Ulaşım
-                        net_of_vat(ppe, ppe_vat),            # PPE
-                        net_of_vat(training, training_vat)    # Eğitim
-                    ])
-                    
-                    # YENİ ADAM-SAAT ALGORİTMASI - KURŞUN GEÇİRMEZ
-                    # 1. Ülke yüzdelerini normalize et (0-0-0 ise eşit böl)
-                    def _normalize_country(p_rus, p_sng, p_tur):
-                        vals = [max(float(p_rus), 0.0), max(float(p_sng), 0.0), max(float(p_tur), 0.0)]
-                        s = sum(vals)
-                        if s <= 0:  # hepsi 0 ise eşit böl
-                            return (1/3.0, 1/3.0, 1/3.0)
-                        return (vals[0]/s, vals[1]/s, vals[2]/s)
-                    
-                    # 2. A·S fiyatını doğrudan hesapla (ara "kişi-ay" dağıtımı olmadan)
-                    M_with = 0.0
-                    M_bare = 0.0
-                    
-                    if not roles_df.empty and sum_w > 0:
-                        for _, row in roles_df.iterrows():
-                            share = float(row["Ağırlık (Вес)"]) / sum_w
-                            
-                            # Ülke yüzdelerini normalize et
-                            p_rus, p_sng, p_tur = _normalize_country(row["%RUS"], row["%SNG"], row["%TUR"])
-                            
-                            # monthly_role_cost_multinational fonksiyonunu kullan
-                            with_ex = monthly_role_cost_multinational(row, PRIM_SNG, PRIM_TUR, extras_per_person)["per_person"]["BLENDED"]
-                            bare_ex = monthly_role_cost_multinational(row, PRIM_SNG, PRIM_TUR, 0.0)["per_person"]["BLENDED"]
-                            
-                            M_with += share * with_ex
-                            M_bare += share * bare_ex
-                    
-                    # 3. A·S fiyatları - TEK SATIRLIK FORMÜL
-                    with_extras_as_price = M_with / hours_per_person_month
-                    bare_as_price = M_bare / hours_per_person_month
-
-                    # --- NEW: price follows productivity (scenario + difficulty) ---
-                    s_mult  = get_scenario_multiplier_for_price(scenario)   # senaryo etkisi
-                    z_mult  = get_difficulty_multiplier_cached()            # çevresel zorluk etkisi
-                    # Ayarlanabilir katsayılar (ileride istersen UI ekleyebilirsin)
-                    BETA_SCENARIO_TO_PRICE  = 1.0    # 0..1 (1=tam, 0=sızdırma)
-                    BETA_DIFFICULTY_TO_PRICE= 1.0    # 0..1 (1=tam, 0=sızdırma)
-
-                    price_mult = (1 + BETA_SCENARIO_TO_PRICE  * (s_mult - 1)) \
-                               * (1 + BETA_DIFFICULTY_TO_PRICE* (z_mult - 1))
-
-                    bare_as_price        *= price_mult
-                    with_extras_as_price *= price_mult
-
-                    core_as_price        = with_extras_as_price  # m³ maliyetleri bu fiyattan üretilecek
-                    
-                    # Roller hesaplama tablosu için
-                    roles_calc = []
-                    if not roles_df.empty and sum_w > 0:
-                        for _, row in roles_df.iterrows():
-                            w = max(float(row["Ağırlık (Вес)"]), 0.0)
-                            share = (w / sum_w)
-                            persons_role = (person_months_total / n_months) * share
-                            
-                            # Ülke yüzdelerini normalize et
-                            p_rus, p_sng, p_tur = _normalize_country(row["%RUS"], row["%SNG"], row["%TUR"])
-                            
-                            # monthly_role_cost_multinational kullan
-                            bundle_with = monthly_role_cost_multinational(row, PRIM_SNG, PRIM_TUR, extras_per_person)
-                            bundle_bare = monthly_role_cost_multinational(row, PRIM_SNG, PRIM_TUR, 0.0)
-                            per_with = bundle_with["per_person"]["BLENDED"]
-                            per_bare = bundle_bare["per_person"]["BLENDED"]
-                            
-                            roles_calc.append({
-                                "Rol (Роль)": row["Rol (Роль)"],
-                                "Ağırlık (Вес)": f"{w:.3f}",
-                                "Pay (%) (Доля, %)": f"{share * 100:.2f}",
-                                "Ortalama Kişi (Средняя численность)": f"{persons_role:.3f}",
-                                "Maliyet/ay (₽)": f"{per_with:,.2f}",
-                                "%RUS": f"{p_rus * 100:.1f}",
-                                "%SNG": f"{p_sng * 100:.1f}",
-                                "%TUR": f"{p_tur * 100:.1f}",
-                                "Net Maaş (₽/ay)": f"{float(row.get('Net Maaş (₽, na ruki) (Чистая з/п, ₽)', 0)):,.0f}"
-                            })
-                    
-                    roles_calc_df = pd.DataFrame(roles_calc)
-                    
-                    # m³ maliyetleri - ELEMAN ÖZGÜ NORM KULLAN
-                    # Matrix override kontrolü ile oranları al
-                    use_matrix_override = st.session_state.get("use_matrix_override", False)
-                    if use_matrix_override:
-                        # Matrix override aktif - effective rates kullan
-                        overhead_rate_eff = st.session_state.get("overhead_rate_eff", OVERHEAD_RATE_DEFAULT/100.0)
-                        consumables_rate_eff = st.session_state.get("consumables_rate_eff", CONSUMABLES_RATE_DEFAULT/100.0)
-                        indirect_rate_total = st.session_state.get("indirect_rate_total_eff", 0.12)
-                    else:
-                        # Matrix override kapalı - grup hesaplanan rates kullan
-                        overhead_rate_eff = st.session_state.get("overhead_rate", OVERHEAD_RATE_DEFAULT/100.0)
-                        consumables_rate_eff = st.session_state.get("consumables_rate", CONSUMABLES_RATE_DEFAULT/100.0)
-                        indirect_rate_total = st.session_state.get("indirect_rate_total", 0.12)
-                    
-                    sum_core_overhead_total = 0.0
-                    tmp_store = []
-                    
-                    for r in iterable:
-                        lbl = str(r[col_ele])
-                        met = float(r.get(col_met, 0.0) or 0.0)
-                        n = norms_used[lbl]  # Eleman özgü norm
-                        core_m3 = with_extras_as_price * n  # Eleman özgü norm ile çarp
-                        genel_m3 = min(max(overhead_rate_eff, 0.0), OVERHEAD_RATE_MAX/100.0) * core_m3
-                        total_m3_core_genel = core_m3 + genel_m3
-                        sum_core_overhead_total += total_m3_core_genel * met
-                        tmp_store.append((lbl, met, total_m3_core_genel, core_m3, genel_m3, n))
-                    
-                    # Sarf + Indirect - (core_m3 + genel_m3) * metraj tabanı üzerinden
-                    consumables_total = sum_core_overhead_total * max(consumables_rate_eff, 0.0)
-                    indirect_total = (sum_core_overhead_total + consumables_total) * max(indirect_rate_total, 0.0)
-                    
-                    # Elemanlara dağıt - oransal dağıtım
-                    elem_rows = []
-                    project_total_cost = 0.0
-                    
-                    for (lbl, met, base_total, core_m3, genel_m3, n) in tmp_store:
-                        # Sarf ve indirect dağıtımı: (core_m3 + genel_m3) * metraj oranı
-                        weight = (base_total * met) / max(sum_core_overhead_total, 1e-9)
-                        sarf_alloc = consumables_total * weight
-                        indir_alloc = indirect_total * weight
-                        sarf_m3 = sarf_alloc / max(met, 1e-9) if met > 0 else 0.0
-                        indir_m3 = indir_alloc / max(met, 1e-9) if met > 0 else 0.0
-                        total_m3 = core_m3 + genel_m3 + sarf_m3 + indir_m3
-                        project_total_cost += total_m3 * max(met, 0.0)
-                        
-                        elem_rows.append({
-                            "Eleman (Элемент)": lbl,
-                            "Norm (a·s/m³) (Норма, чел·ч/м³)": f"{n:.2f}",
-                            "Metraj (m³) (Объём, м³)": f"{met:,.3f}",
-                            "Çekirdek (₽/m³) (Ядро, ₽/м³)": f"{core_m3:,.2f}",
-                            "Genel (₽/м³) (Накладные, ₽/м³)": f"{genel_m3:,.2f}",
-                            "Sarf (₽/м³) (Расходники, ₽/м³)": f"{sarf_m3:,.2f}",
-                            "Indirect (₽/м³) (Косвенные, ₽/м³)": f"{indir_m3:,.2f}",
-                            "Toplam (₽/м³) (Итого, ₽/м³)": f"{total_m3:,.2f}"
-                        })
-                    
-                    elements_df = pd.DataFrame(elem_rows)
+                    food = float(st.session_state.get("food", 10000.0))
+                    lodging = float(st.session_state.get("lodging", 12000.0))
+                    transport = float(st.session_state.get("transport", 3000.0))
+                    ppe = float(st.session_state.get("ppe", 1500.0))
+                    training = float(st.session_state.get("training", 500.0))
                     
                     # Özet metrikler
-                    general_avg_m3 = project_total_cost / max(total_metraj, 1e-9) if total_metraj > 0 else 0.0
-                    fully_loaded_as_price = project_total_cost / max(total_adamsaat, 1e-9) if total_adamsaat > 0 else 0.0
+                    general_avg_m3 = est.general_avg_m3
                     avg_norm_per_m3 = total_adamsaat / max(total_metraj, 1e-9) if total_metraj > 0 else 0.0
                     indirect_share = indirect_total / max(project_total_cost, 1e-9) if project_total_cost > 0 else 0.0
                     
@@ -4383,7 +4187,13 @@ with tab_sonuclar:
                             "indirect_share": indirect_share,
                             "elements_df": elements_df,
                             "roles_calc_df": roles_calc_df,
+                            "scenario_sweep_df": scenario_sweep_df,
                             "month_wd_df": month_wd_df,
+                            "element_hours": priced_df.groupby("wbs_key", sort=False)["labor_hours"].sum().to_dict(),
+                            "start_date": start_date,
+                            "end_date": end_date,
+                            "holiday_mode": holiday_mode,
+                            "hours_per_day": hours_per_day,
                             "person_months_total": person_months_total,
                             "hours_per_person_month": hours_per_person_month,
                             "norms_used": norms_used,
@@ -4453,7 +4263,7 @@ with tab_sonuclar:
                         if not roles_df.empty:
                             st.markdown("### 👥 Rol Bazında Detaylar")
                             for _, row in roles_df.iterrows():
-                                p_rus, p_sng, p_tur = _normalize_country(row["%RUS"], row["%SNG"], row["%TUR"])
+                                p_rus, p_sng, p_tur = normalize_country(row["%RUS"], row["%SNG"], row["%TUR"])
                                 bundle_with = monthly_role_cost_multinational(row, PRIM_SNG, PRIM_TUR, extras_per_person)
                                 bundle_bare = monthly_role_cost_multinational(row, PRIM_SNG, PRIM_TUR, 0.0)
                                 
@@ -4737,8 +4547,6 @@ with tab_sonuclar:
             indirect_percent_of_total = 0
         
         # Pasta grafikleri için veri hazırlama
-        import matplotlib.pyplot as plt  # pyright: ignore[reportMissingImports]
-        
         # 1. Ana Maliyet Dağılımı Pasta Grafiği (Sarf + Overhead'in kendi arasındaki dağılımı)
         # Sadece pozitif değerler varsa grafik bölümünü göster
         if sum([data['consumables_rate_eff'] * 100, data['overhead_rate_eff'] * 100]) > 0:
@@ -4752,18 +4560,9 @@ with tab_sonuclar:
                 pie_sizes = [data['consumables_rate_eff'] * 100, data['overhead_rate_eff'] * 100]
                 pie_colors = ['#ff9999', '#66b3ff']
                 
-                # Pasta grafik oluştur
-                fig, ax = plt.subplots(figsize=(8, 6))
-                wedges, texts, autotexts = ax.pie(pie_sizes, labels=pie_labels, colors=pie_colors, 
-                                                autopct='%1.1f%%', startangle=90)
-                ax.set_title('Sarf ve Overhead Dağılımı', fontsize=14, fontweight='bold')
-                
-                # Grafik stilini ayarla
-                plt.setp(autotexts, size=10, weight="bold")
-                plt.setp(texts, size=12)
-                
-                st.pyplot(fig)
-                plt.close()
+                # Pasta grafik (aynı oranlarla yeniden çizilmez)
+                show_chart("pie", sizes=pie_sizes, labels=pie_labels, colors=pie_colors,
+                           title='Sarf ve Overhead Dağılımı')
             
             with col_pie2:
                 st.markdown("**🎯 Toplam Proje Maliyetine Göre Dağılım**")
@@ -4780,18 +4579,8 @@ with tab_sonuclar:
                 
                 # Sadece pozitif değerler varsa grafik göster
                 if sum(total_pie_sizes) > 0:
-                    # Pasta grafik oluştur
-                    fig2, ax2 = plt.subplots(figsize=(8, 6))
-                    wedges2, texts2, autotexts2 = ax2.pie(total_pie_sizes, labels=total_pie_labels, colors=total_pie_colors, 
-                                                        autopct='%1.1f%%', startangle=90)
-                    ax2.set_title('Toplam Proje Maliyetine Göre Dağılım', fontsize=14, fontweight='bold')
-                    
-                    # Grafik stilini ayarla
-                    plt.setp(autotexts2, size=10, weight="bold")
-                    plt.setp(texts2, size=12)
-                    
-                    st.pyplot(fig2)
-                    plt.close()
+                    show_chart("pie", sizes=total_pie_sizes, labels=total_pie_labels, colors=total_pie_colors,
+                               title='Toplam Proje Maliyetine Göre Dağılım')
                 else:
                     st.warning("🎯 **Toplam Proje Maliyeti Sıfır**")
                     st.info("""
@@ -4844,16 +4633,8 @@ with tab_sonuclar:
                 
                 # Sadece pozitif değerler varsa grafik göster
                 if sum(impact_sizes) > 0:
-                    fig3, ax3 = plt.subplots(figsize=(8, 6))
-                    wedges3, texts3, autotexts3 = ax3.pie(impact_sizes, labels=impact_labels, colors=impact_colors, 
-                                                        autopct='%1.1f%%', startangle=90)
-                    ax3.set_title('Sorumluluk Matrisi Etkisi Dağılımı', fontsize=14, fontweight='bold')
-                    
-                    plt.setp(autotexts3, size=10, weight="bold")
-                    plt.setp(texts3, size=12)
-                    
-                    st.pyplot(fig3)
-                    plt.close()
+                    show_chart("pie", sizes=impact_sizes, labels=impact_labels, colors=impact_colors,
+                               title='Sorumluluk Matrisi Etkisi Dağılımı')
                 else:
                     st.info("Sorumluluk matrisi etkisi bulunmuyor.")
             else:
@@ -4978,16 +4759,55 @@ with tab_sonuclar:
         </div>
         """, unsafe_allow_html=True)
         st.markdown('<div class="custom-table-wrapper">', unsafe_allow_html=True)
-        st.dataframe(data['elements_df'], use_container_width=True, hide_index=True)
+        st.dataframe(style_numeric(data['elements_df'], ELEMENT_COST_FORMATS), use_container_width=True, hide_index=True)
         st.markdown('</div>', unsafe_allow_html=True)
         
+        # BoQ modu: ihale metraj listesi (wbs_key, qty, unit[, norm_lh_per_u]) aynı A·S fiyatı ve oranlarla
+        with st.expander(bi("📋 BoQ Fiyatlama (metraj listesi)", "📋 Расценка ведомости объёмов (BoQ)"), expanded=False):
+            boq_file = st.file_uploader(bi("BoQ dosyası (CSV/XLSX): wbs_key, qty, unit [, norm_lh_per_u]",
+                                           "Файл BoQ (CSV/XLSX): wbs_key, qty, unit [, norm_lh_per_u]"),
+                                        type=["csv", "xlsx"], key="boq_file")
+            boq_locale = st.selectbox(bi("Norm dili (norm kolonu yoksa)", "Язык норм (если нет столбца норм)"),
+                                      ["tr", "ru", "en"], key="boq_locale")
+            if boq_file is not None:
+                try:
+                    boq_df = pd.read_excel(boq_file) if boq_file.name.lower().endswith(".xlsx") else pd.read_csv(boq_file, sep=None, engine="python")
+                    boq_norms = None
+                    if "norm_lh_per_u" not in boq_df.columns:
+                        # Norm kolonu yoksa RAG norm indeksi (kaynak önceliği + koşul çarpanı)
+                        from betonarme_postgresql_integration import get_rag_integration
+                        from boq_pricing import norms_frame
+                        rag_system = get_rag_integration().rag_system
+                        if rag_system is None:
+                            raise ValueError("norm_lh_per_u kolonu yok ve RAG norm indeksi kullanılamıyor")
+                        boq_norms = norms_frame(rag_system.norm_index.table(boq_locale))
+                    boq_priced, boq_totals = price_boq(
+                        boq_df, data["with_extras_as_price"], boq_norms,
+                        difficulty_multiplier=data["difficulty_multiplier"] if boq_norms is not None else 1.0,
+                        overhead_rate=min(max(data["overhead_rate_eff"], 0.0), OVERHEAD_RATE_MAX/100.0),
+                        consumables_rate=data["consumables_rate_eff"], indirect_rate=data["indirect_rate_total"])
+                    st.session_state["boq_priced_df"] = boq_priced  # Excel raporu için
+                    c1, c2, c3 = st.columns(3)
+                    c1.metric(bi("Satır", "Строк"), f"{len(boq_priced):,}")
+                    c2.metric(bi("Toplam a·s", "Итого чел·ч"), f"{boq_totals.total_labor_hours:,.0f}")
+                    c3.metric(bi("Toplam maliyet (₽)", "Итого стоимость (₽)"), f"{boq_totals.project_total_cost:,.0f}")
+                    if boq_totals.missing_norms:
+                        st.warning(bi(f"{boq_totals.missing_norms} satırın normu bulunamadı (0 alındı)",
+                                      f"Для {boq_totals.missing_norms} строк норма не найдена (принята 0)"))
+                    st.dataframe(boq_priced.head(1000), use_container_width=True, hide_index=True)
+                    st.download_button(bi("💾 Fiyatlanmış BoQ (CSV)", "💾 Расценённая ведомость (CSV)"),
+                                       boq_priced.to_csv(index=False).encode("utf-8-sig"),
+                                       file_name="boq_priced.csv", mime="text/csv")
+                except Exception as e:
+                    st.error(f"BoQ fiyatlama hatası: {e}")
+        
         st.markdown("""
         <div style="background: #f8f9fa; padding: 1.5rem; border-radius: 15px; margin-bottom: 1.5rem; border: 1px solid #e9ecef;">
             <h3 style="color: #333; margin: 0; text-align: center;">🧑‍🔧 Rol Dağılımı — Aylık Ortalama</h3>
         </div>
         """, unsafe_allow_html=True)
         st.markdown('<div class="custom-table-wrapper">', unsafe_allow_html=True)
-        st.dataframe(data['roles_calc_df'], use_container_width=True, hide_index=True)
+        st.dataframe(style_numeric(data['roles_calc_df'], ROLE_CALC_FORMATS), use_container_width=True, hide_index=True)
         st.markdown('</div>', unsafe_allow_html=True)
 
         # Aylık Manpower Distribution grafiği
@@ -5007,6 +4827,7 @@ with tab_sonuclar:
                 "📊 Dağıtım Türü",
                 ["Klasik Parabolik", "Gelişmiş Parabolik", "Sigmoid", "Üçgen"],
                 index=0,
+                key="distribution_type",
                 help="Şantiye gerçeklerine en uygun dağıtım türünü seçin (Varsayılan: Klasik Parabolik)"
             )
         
@@ -5085,139 +4906,20 @@ with tab_sonuclar:
         if not data['month_wd_df'].empty:
             n_months = len(data['month_wd_df'])
             
-            # Farklı dağıtım türleri - şantiye gerçeklerine uygun
-            def get_distribution_weights(n_months, dist_type, peak_pos=0.45, left_smooth=2.5, right_smooth=1.8, min_weight=0.15):
-                if n_months <= 1:
-                    return [1.0]
-                
-                if dist_type == "Gelişmiş Parabolik":
-                    # Gelişmiş parabolik: Hazırlık, yoğun çalışma, kapanış
-                    
-                    weights = []
-                    for i in range(n_months):
-                        x = i / (n_months - 1) if n_months > 1 else 0.5
-                        
-                        if x <= peak_pos:
-                            # Hazırlık dönemi: Yumuşak artış
-                            normalized_x = x / peak_pos
-                            weight = (normalized_x ** left_smooth) * (1 - min_weight) + min_weight
-                        else:
-                            # Kapanış dönemi: Yumuşak azalış
-                            normalized_x = (x - peak_pos) / (1 - peak_pos)
-                            weight = ((1 - normalized_x) ** right_smooth) * (1 - min_weight) + min_weight
-                        
-                        weights.append(weight)
-                
-                elif dist_type == "Klasik Parabolik":
-                    # Klasik parabolik: y = -4(x-0.5)² + 1
-                    weights = []
-                    for i in range(n_months):
-                        x = i / (n_months - 1) if n_months > 1 else 0.5
-                        weight = -4 * (x - 0.5)**2 + 1
-                        weights.append(max(weight, min_weight))
-                
-                elif dist_type == "Sigmoid":
-                    # Sigmoid: Çok yumuşak geçişler
-                    weights = []
-                    for i in range(n_months):
-                        x = i / (n_months - 1) if n_months > 1 else 0.5
-                        # Sigmoid fonksiyonu: 1 / (1 + e^(-k(x-0.5)))
-                        k = 6.0  # Yumuşaklık parametresi
-                        sigmoid = 1 / (1 + math.exp(-k * (x - 0.5)))
-                        weights.append(max(sigmoid, min_weight))
-                
-                elif dist_type == "Üçgen":
-                    # Üçgen: Doğrusal artış ve azalış
-                    weights = []
-                    for i in range(n_months):
-                        x = i / (n_months - 1) if n_months > 1 else 0.5
-                        if x <= 0.5:
-                            weight = 2 * x  # 0'dan 1'e doğrusal artış
-                        else:
-                            weight = 2 * (1 - x)  # 1'den 0'a doğrusal azalış
-                        weights.append(max(weight, min_weight))
-                
-                else:
-                    # Varsayılan: Eşit dağılım
-                    weights = [1.0] * n_months
-                
-                # Toplamı 1'e normalize et
-                total_weight = sum(weights)
-                normalized_weights = [w / total_weight for w in weights]
-                return normalized_weights
-            
-            # Parametreleri dağıtım fonksiyonuna geçir
+            # Dağıtım profili (NumPy) + toplamı koruyan en büyük kalan yuvarlaması
             if distribution_type == "Gelişmiş Parabolik":
-                weights = get_distribution_weights(n_months, distribution_type, peak_position, left_smoothness, right_smoothness, min_weight)
+                weights = distribution_weights(n_months, distribution_type, peak_position, left_smoothness, right_smoothness, min_weight)
             else:
-                weights = get_distribution_weights(n_months, distribution_type, min_weight=min_weight)
-            headcounts_float = [data['person_months_total'] * wi for wi in weights]
-            
-            # Toplam adam-ay korunmalı - yuvarlama hatası düzeltmesi
-            def round_preserve_sum(values):
-                """Toplamı koruyarak yuvarlama"""
-                rounded = [round(v) for v in values]
-                total_diff = sum(values) - sum(rounded)
-                
-                if abs(total_diff) >= 1:
-                    # En büyük farkı olan değeri düzelt
-                    diffs = [(i, abs(v - r)) for i, (v, r) in enumerate(zip(values, rounded))]
-                    diffs.sort(key=lambda x: x[1], reverse=True)
-                    
-                    for i, _ in diffs:
-                        if total_diff > 0:
-                            rounded[i] += 1
-                            total_diff -= 1
-                        elif total_diff < 0:
-                            rounded[i] -= 1
-                            total_diff += 1
-                        if abs(total_diff) < 1:
-                            break
-                
-                return rounded
-            
-            headcounts_int = round_preserve_sum(headcounts_float)
+                weights = distribution_weights(n_months, distribution_type, min_weight=min_weight)
+            headcounts_int = headcounts(data['person_months_total'], weights).tolist()
             
             month_wd_df_copy = data['month_wd_df'].copy()
             month_wd_df_copy["Manpower (Численность)"] = headcounts_int
+            st.session_state["manpower_month_df"] = month_wd_df_copy  # Excel raporu için
 
-            # Daha estetik grafik
-            fig, ax = plt.subplots(figsize=(12, 6))
-            
-            # Bar grafiği
-            bars = ax.bar(month_wd_df_copy["Ay (Месяц)"], month_wd_df_copy["Manpower (Численность)"], 
-                         color='skyblue', alpha=0.7, edgecolor='navy', linewidth=1)
-            
-            # Çizgi grafiği (trend)
-            ax.plot(range(n_months), headcounts_int, 'o-', color='red', linewidth=2, 
-                   markersize=8, markerfacecolor='white', markeredgecolor='red')
-            
-            # Değer etiketleri
-            for rect, val in zip(bars, headcounts_int):
-                ax.text(rect.get_x() + rect.get_width()/2, rect.get_height() + 0.5, 
-                       f"{int(val)}", ha="center", va="bottom", fontsize=11, 
-                       fontweight='bold', color='darkblue')
-            
-            # Grafik stilleri
-            ax.set_xlabel("Ay (Месяц)", fontsize=12, fontweight='bold')
-            ax.set_ylabel("Kişi (Человек)", fontsize=12, fontweight='bold')
-            ax.set_title(f"Manpower Distribution - Aylık Adam Dağılımı ({distribution_type})", 
-                        fontsize=14, fontweight='bold', pad=20)
-            
-            # Grid ve eksen
-            ax.grid(True, axis="y", alpha=0.3, linestyle='--')
-            ax.spines['top'].set_visible(False)
-            ax.spines['right'].set_visible(False)
-            
-            # X ekseni etiketleri
-            plt.xticks(rotation=45, ha="right", fontsize=10)
-            plt.yticks(fontsize=10)
-            
-            # Y ekseni başlangıcı 0'dan başlasın
-            ax.set_ylim(bottom=0)
-            
-            plt.tight_layout()
-            st.pyplot(fig)
+            # Bar + trend grafiği (aynı dağılımla yeniden çizilmez)
+            show_chart("manpower", months=month_wd_df_copy["Ay (Месяц)"].tolist(), headcounts=headcounts_int,
+                       title=f"Manpower Distribution - Aylık Adam Dağılımı ({distribution_type})")
             
             # Dağıtım bilgileri
             st.markdown(f"**📊 Dağıtım Detayları ({distribution_type}):**")
@@ -5236,6 +4938,68 @@ with tab_sonuclar:
             
             # Toplam kontrol
             st.info(f"✅ **Toplam Adam-Ay:** {data['person_months_total']:.2f} → **Dağıtılan:** {sum(headcounts_int)} kişi")
+
+            roles_calc_df = data.get("roles_calc_df")
+            if roles_calc_df is not None and not roles_calc_df.empty:
+                with st.expander(bi("👥 Rol × Ay Dağılımı","👥 Распределение роль × месяц")):
+                    # Her rolün adam-ayı (pay x toplam) aylara toplamı korunarak dağıtılır
+                    role_months = role_month_matrix(data['person_months_total'], roles_calc_df["Pay (%) (Доля, %)"], weights)
+                    st.dataframe(pd.DataFrame(role_months, index=roles_calc_df["Rol (Роль)"],
+                                              columns=month_wd_df_copy["Ay (Месяц)"]), use_container_width=True)
+
+            if data.get("element_hours"):
+                with st.expander(bi("🗓️ Kaynak Dengeli Plan","🗓️ План с выравниванием ресурсов")):
+                    bitr("Eleman işleri öncül sırasıyla planlanır; tepe kişi sayısı ekip ve konaklama sınırları içinde en aza indirilir.",
+                         "Работы планируются по предшественникам; пиковая численность минимизируется в пределах ограничений бригад и проживания.")
+                    c_per, c_cap = st.columns(2)
+                    grain = c_per.radio(bi("Periyot","Период"), ["Ay", "Hafta"], horizontal=True, key="level_grain")
+                    lodging_cap = c_cap.number_input(bi("Konaklama kapasitesi (kişi, 0 = sınırsız)","Вместимость проживания (чел., 0 = без ограничения)"),
+                                                     min_value=0, value=0, step=5, key="level_lodging_cap")
+                    key_by_label = {v: k for k, v in LABELS.items()}
+                    labels_present = set(data["element_hours"])
+                    task_df = st.data_editor(pd.DataFrame([{
+                        "Eleman (Элемент)": lbl,
+                        "a·s (чел·ч)": float(hrs),
+                        "Min. süre (periyot)": 1,
+                        "Maks. ekip (kişi, 0 = sınırsız)": 0,
+                        "Öncüller (Предшественники)": ", ".join(LABELS[p] for p in ELEMENT_PREDECESSORS.get(key_by_label.get(lbl), [])
+                                                                if LABELS[p] in labels_present),
+                    } for lbl, hrs in data["element_hours"].items()]), hide_index=True, use_container_width=True,
+                        disabled=["Eleman (Элемент)", "a·s (чел·ч)"], key="level_tasks")
+                    caps_df = st.data_editor(pd.DataFrame({
+                        "Rol (Роль)": roles_calc_df["Rol (Роль)"] if roles_calc_df is not None and not roles_calc_df.empty else [],
+                        "Maks. kişi (0 = sınırsız)": 0,
+                    }), hide_index=True, use_container_width=True, disabled=["Rol (Роль)"], key="level_role_caps")
+
+                    if grain == "Hafta":
+                        period_df = workdays_in_week_range(data["start_date"], data["end_date"], data["holiday_mode"])
+                    else:
+                        period_df = data["month_wd_df"]
+                    try:
+                        plan = level_schedule(
+                            [ScheduleTask(str(r["Eleman (Элемент)"]), float(r["a·s (чел·ч)"]),
+                                          tuple(p.strip() for p in str(r["Öncüller (Предшественники)"] or "").split(",") if p.strip()),
+                                          int(r["Min. süre (periyot)"] or 1), float(r["Maks. ekip (kişi, 0 = sınırsız)"] or 0) or None)
+                             for _, r in task_df.iterrows()],
+                            period_df["İş Günü (Раб. день)"].to_numpy(dtype=float) * float(data["hours_per_day"]),
+                            periods=period_df.iloc[:, 0].tolist(),
+                            role_shares=dict(zip(roles_calc_df["Rol (Роль)"], roles_calc_df["Pay (%) (Доля, %)"])) if roles_calc_df is not None and not roles_calc_df.empty else None,
+                            role_caps=dict(zip(caps_df["Rol (Роль)"], caps_df["Maks. kişi (0 = sınırsız)"])),
+                            max_headcount=lodging_cap or None)
+                    except ValueError as e:
+                        st.error(bi(f"Plan kurulamadı: {e}", f"План не построен: {e}"))
+                    else:
+                        m1, m2, m3 = st.columns(3)
+                        m1.metric(bi("Tepe (kişi)","Пик (чел.)"), int(plan.headcount.max()) if len(plan.headcount) else 0)
+                        m2.metric(bi("Ortalama (kişi)","Среднее (чел.)"), f"{plan.headcount.mean():.1f}" if len(plan.headcount) else "0")
+                        m3.metric(bi("Planlanamayan a·s","Не вошло, чел·ч"), f"{plan.unscheduled_hours:,.0f}")
+                        if not plan.feasible:
+                            st.warning(bi("Sınırlar içinde işler proje süresine sığmıyor; sınırları gevşetin ya da süreyi uzatın.",
+                                          "В пределах ограничений работы не укладываются в срок; ослабьте ограничения или увеличьте срок."))
+                        show_chart("manpower", months=plan.periods, headcounts=plan.headcount.tolist(),
+                                   title=bi("Kaynak Dengeli Adam Planı","План численности с выравниванием"))
+                        st.dataframe(plan.role_matrix, use_container_width=True)
+                        st.dataframe(plan.task_crew.round(1), use_container_width=True)
             
         else:
             st.info("Grafik için tarih aralığında en az bir ay olmalı.")
@@ -5249,8 +5013,12 @@ with tab_sonuclar:
         st.markdown("2. **Eleman & Metraj** sekmesinde betonarme elemanları seçin")
         st.markdown("3. **Roller** sekmesinde rol kompozisyonunu belirleyin")
         st.markdown("4. **HESAPLA** butonuna tıklayarak sonuçları görün")
+
+with tab_sonuclar:
+    render_tab_sonuclar()
 # ==================== 7.1) IMPORT: Gelişmiş Veri İçe Aktarma ====================
-with tab_import:
+@tab_fragment("import")
+def render_tab_import():
     # Sekme başlığı
     st.markdown("""
     <div style="text-align: center; padding: 2rem; background: linear-gradient(135deg, #e8f4fd 0%, #d1e7dd 100%); color: #333; border-radius: 15px; margin-bottom: 2rem; border: 1px solid #e9ecef;">
@@ -5337,52 +5105,80 @@ with tab_import:
     bitr("Şık formatlı özet rapor üretir.","Генерирует красиво оформленный сводный отчёт.")
 
     if st.button(bi("📥 Excel üret","📥 Сформировать Excel"), type="primary"):
+        # constant_memory: satırlar yazıldıkça diske akıtılır; 1M+ satırlık BoQ '<ad> (2)' sayfasında sürer
+        # (bellekte BytesIO + getvalue() kopyası yerine geçici dosya, indirmeye dosyadan okunur)
+        tmp = tempfile.NamedTemporaryFile(suffix=".xlsx", delete=False)
+        tmp.close()
         try:
-            buf = io.BytesIO()
-            with ExcelWriter(buf, engine="xlsxwriter") as xw:
-                wb = xw.book
-                fmt_title = wb.add_format({"bold": True, "font_size": 18})
-                fmt_kpi = wb.add_format({"bold": True, "font_size": 14, "bg_color": "#EEF3FF", "border":1})
-                fmt_hdr = wb.add_format({"bold": True, "bg_color": "#DCE6F1", "border":1})
-                fmt_num = wb.add_format({"num_format": "#,##0.00", "border":1})
-                fmt_int = wb.add_format({"num_format": "#,##0", "border":1})
-
-                sheet = wb.add_worksheet("Summary")
-                sheet.write(0,0, bi("İşçilik Özet Raporu","Сводный отчёт по трудозатратам"), fmt_title)
-
-                data = st.session_state.get("calculation_results") or {}
-                total_pm = float(data.get("person_months_total", 0.0))
-                roles_df = st.session_state.get("roles_calc_df", pd.DataFrame())
-                elements_df = st.session_state.get("elements_df", pd.DataFrame())
-
-                sheet.write(2,0, bi("Toplam Adam-Ay","Всего чел-месяцев"), fmt_kpi); sheet.write_number(2,1, total_pm, fmt_kpi)
-                sheet.write(3,0, bi("Rol sayısı","Кол-во ролей"), fmt_kpi); sheet.write_number(3,1, 0 if roles_df is None or roles_df is pd.DataFrame() or roles_df.empty else len(roles_df), fmt_kpi)
-                sheet.write(4,0, bi("Eleman sayısı","Кол-во элементов"), fmt_kpi); sheet.write_number(4,1, 0 if elements_df is None or elements_df is pd.DataFrame() or elements_df.empty else len(elements_df), fmt_kpi)
-
-                if elements_df is not None and not elements_df.empty:
-                    elements_df.to_excel(xw, sheet_name="Elements", index=False)
-                    ws = xw.sheets["Elements"]
-                    for col_i, col in enumerate(elements_df.columns):
-                        ws.write(0, col_i, str(col), fmt_hdr)
-                    ws.set_column(0, len(elements_df.columns)-1, 18, fmt_num)
-                if roles_df is not None and not roles_df.empty:
-                    roles_df.to_excel(xw, sheet_name="Roles", index=False)
-                    ws2 = xw.sheets["Roles"]
-                    for col_i, col in enumerate(roles_df.columns):
-                        ws2.write(0, col_i, str(col), fmt_hdr)
-                    ws2.set_column(0, len(roles_df.columns)-1, 18, fmt_num)
-
-            st.download_button(
-                bi("📥 Excel İndir (.xlsx)","📥 Скачать Excel (.xlsx)"),
-                data=buf.getvalue(),
-                file_name="yonetici_ozeti.xlsx",
-                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                use_container_width=True
-            )
+            xw = XLSXWorkbookWriter(tmp.name)
+            # Hesap sonuçları sayısal tutulur: tablolar doğrudan sayı olarak yazılır
+            data = (st.session_state.get("calculation_results") or {}).get("data", {})
+            roles_df = data.get("roles_calc_df")
+            elements_df = data.get("elements_df")
+            month_df = st.session_state.get("manpower_month_df")
+            boq_df = st.session_state.get("boq_priced_df")
+            sweep_df = data.get("scenario_sweep_df")
+
+            def _rows(df):
+                return 0 if df is None or df.empty else len(df)
+
+            xw.add_summary("Summary", [
+                (bi("Toplam Adam-Ay","Всего чел-месяцев"), float(data.get("person_months_total", 0.0))),
+                (bi("Rol sayısı","Кол-во ролей"), _rows(roles_df)),
+                (bi("Eleman sayısı","Кол-во элементов"), _rows(elements_df)),
+                (bi("BoQ satırı","Строк BoQ"), _rows(boq_df)),
+            ], title=bi("İşçilik Özet Raporu","Сводный отчёт по трудозатратам"), num_format="#,##0.##")
+            if _rows(elements_df):
+                xw.add_dataframe("Elements", elements_df, excel_num_formats(ELEMENT_COST_FORMATS))
+            if _rows(roles_df):
+                xw.add_dataframe("Roles", roles_df, excel_num_formats(ROLE_CALC_FORMATS))
+            if _rows(month_df):
+                xw.add_dataframe("Manpower", month_df, {"İş Günü (Раб. день)": "0", "Manpower (Численность)": "0"})
+            if _rows(boq_df):
+                xw.add_dataframe("BoQ", boq_df, BOQ_EXCEL_FORMATS)
+            if _rows(sweep_df):
+                xw.add_dataframe("Scenarios", sweep_df, {"Toplam a·s (Итого чел·ч)": "#,##0"})
+            xw.close()
+
+            with open(tmp.name, "rb") as fh:
+                st.download_button(
+                    bi("📥 Excel İndir (.xlsx)","📥 Скачать Excel (.xlsx)"),
+                    data=fh,
+                    file_name="yonetici_ozeti.xlsx",
+                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                    use_container_width=True
+                )
         except Exception as e:
             st.error(bi(f"Excel oluşturma hatası: {e}", f"Ошибка формирования Excel: {e}"))
+        finally:
+            os.unlink(tmp.name)
+
+    # --- Portföy karşılaştırması: kayıtlı projeler arayüzsüz motorla süreç havuzunda değerlendirilir ---
+    with st.expander(bi("📁 Portföy Karşılaştırması","📁 Сравнение портфеля"), expanded=False):
+        try:
+            saved = get_project_store().list_projects()["name"].tolist()
+        except Exception as e:
+            saved = []
+            st.error(bi(f"Proje deposu hatası: {e}", f"Ошибка хранилища проектов: {e}"))
+        if not saved:
+            st.info(bi("Kayıtlı proje yok (kenar çubuğundan 💾 Kaydet)","Нет сохранённых проектов (💾 Сохранить на боковой панели)"))
+        else:
+            pf_names = st.multiselect(bi("Projeler","Проекты"), saved, default=saved, key="portfolio_sel")
+            if st.button(bi("⚡ Portföyü Değerlendir","⚡ Оценить портфель"), disabled=not pf_names, key="portfolio_run"):
+                with st.spinner(bi("Projeler değerlendiriliyor...","Оценка проектов...")):
+                    st.session_state["portfolio_df"] = evaluate_portfolio(pf_names)
+            pf_df = st.session_state.get("portfolio_df")
+            if pf_df is not None and not pf_df.empty:
+                pf_df = pf_df.dropna(axis=1, how="all")
+                st.dataframe(style_numeric(pf_df, PORTFOLIO_FORMATS), hide_index=True, use_container_width=True)
+                st.download_button(bi("📥 CSV İndir","📥 Скачать CSV"), pf_df.to_csv(index=False, sep=";").encode("utf-8-sig"),
+                                   file_name="portfoy_karsilastirma.csv", mime="text/csv", key="portfolio_csv")
+
+with tab_import:
+    render_tab_import()
 # ==================== 7) ASİSTAN: GPT Öneri + Oran Kontrol + RAG + DEV CONSOLE ====================
-with tab_asistan:
+@tab_fragment("asistan")
+def render_tab_asistan():
     # Sekme başlığı
     st.markdown("""
     <div style="text-align: center; padding: 2rem; background: linear-gradient(135deg, #e8f4fd 0%, #d1e7dd 100%); color: #333; border-radius: 15px; margin-bottom: 2rem; border: 1px solid #e9ecef;">
@@ -5636,7 +5432,7 @@ with tab_asistan:
             if st.button("🗑️ Analizi Temizle"):
                 st.session_state.pop("gpt_analysis", None)
                 st.success("Analiz temizlendi.")
-                st.rerun()
+                rerun_tab()
 
     # ---------- RAG ----------
     bih("📚 RAG: Dosya yükle → indeksle → ara","📚 RAG: загрузить → проиндексировать → искать", level=3)
@@ -5662,52 +5458,37 @@ with tab_asistan:
             if not uploads:
                 st.warning(bi("Dosya seçin.","Выберите файл(ы)."))
             else:
-                # Progress bar başlat
-                progress_bar = st.progress(0)
-                status_text = st.empty()
-                
                 try:
-                    # 1. Dosyaları parçalara ayır
-                    status_text.text("📄 Dosyalar parçalara ayrılıyor...")
-                    chunks = []
-                    for up in uploads: 
-                        chunks += file_to_chunks(up)
-                    progress_bar.progress(25)
-                    
-                    if not chunks:
-                        st.warning(bi("Parça yok.","Нет фрагментов."))
-                    else:
-                        # 2. Metinleri ve meta verileri hazırla
-                        status_text.text("🔤 Metinler hazırlanıyor...")
-                        texts = [c["text"] for c in chunks]
-                        metas = [c.get("meta", {}) for c in chunks]
-                        progress_bar.progress(50)
-                        
-                        # 3. Embedding'leri al
-                        status_text.text("🧠 Embedding'ler oluşturuluyor...")
-                        embs = embed_texts(texts)
-                        progress_bar.progress(75)
-                        
-                        if not embs:
-                            st.error(bi("Embed alınamadı (OpenAI anahtarı gerekli).","Не удалось получить эмбеддинги (нужен ключ OpenAI)."))
-                        else:
-                            # 4. FAISS backend'e ekle
-                            status_text.text("💾 FAISS indeksine kaydediliyor...")
-                            import numpy as np
-                            embs_np = np.array(embs, dtype=np.float32)
-                            
-                            ids = add_records(texts, metas, embs_np)
-                            progress_bar.progress(100)
-                            status_text.text("✅ Tamamlandı!")
-                            
-                            st.success(f"✅ FAISS indeksine {len(ids)} kayıt eklendi.")
-                    
+                    # Arka plan kuyruğu: sekme kapansa da iş devam eder, hata olursa kaldığı yerden sürer
+                    iq = get_ingest_queue()
+                    api_key = (st.session_state.get("OPENAI_API_KEY","") or os.getenv("OPENAI_API_KEY",""))
+                    job_id = iq.enqueue([(up.name, up.getvalue()) for up in uploads])
+                    iq.start_worker(make_embed_fn(api_key), add_records, has_batch)
+                    st.session_state["rag_ingest_job"] = job_id
+                    st.success(bi(f"✅ İndeksleme işi kuyruğa alındı: {job_id}", f"✅ Задача индексации поставлена в очередь: {job_id}"))
                 except Exception as e:
                     st.error(f"❌ İndeksleme sırasında hata: {str(e)}")
-                finally:
-                    # Progress bar'ı temizle
-                    progress_bar.empty()
-                    status_text.empty()
+
+        # İş durumu (panel yenilendikçe kuyruktan okunur)
+        job_id = st.session_state.get("rag_ingest_job")
+        job = get_ingest_queue().get_status(job_id) if job_id else None
+        if job:
+            st.progress(int(job["progress"] * 100))
+            st.caption(f"🗂️ {job['id']}: {job['status']} — {job['added']} parça indekslendi")
+            for f in job["files"]:
+                batches = f"{f['done_batches']}/{f['total_batches']}" if f["total_batches"] is not None else str(f["done_batches"])
+                st.caption(f"• {f['name']}: {f['status']} ({batches} grup)" + (f" — {f['error']}" if f["error"] else ""))
+            c_j1, c_j2 = st.columns(2)
+            with c_j1:
+                if st.button(bi("🔄 Durumu yenile","🔄 Обновить статус"), key="rag_job_refresh"):
+                    rerun_tab()
+            with c_j2:
+                if job["status"] == "failed" and st.button(bi("↻ Tekrar dene","↻ Повторить"), key="rag_job_retry"):
+                    iq = get_ingest_queue()
+                    iq.retry_job(job_id)
+                    api_key = (st.session_state.get("OPENAI_API_KEY","") or os.getenv("OPENAI_API_KEY",""))
+                    iq.start_worker(make_embed_fn(api_key), add_records, has_batch)
+                    rerun_tab()
     with cR2:
         if st.button(bi("🧹 RAG temizle","🧹 Очистить RAG")):
             try:
@@ -5733,7 +5514,6 @@ with tab_asistan:
                     if not qemb:
                         st.error("❌ Query embedding alınamadı.")
                     else:
-                        import numpy as np
                         qemb_np = np.array(qemb[0], dtype=np.float32)
                         
                         # Filtreleri hazırla
@@ -5878,7 +5658,6 @@ with tab_asistan:
 
     # küçük yardımcılar (lokal — Part 1'e dokunmuyoruz)
     import difflib
-    from datetime import datetime
 
     def _read_text(p):
         try:
@@ -5900,29 +5679,20 @@ with tab_asistan:
                                             fromfile=f"{fname} (old)", tofile=f"{fname} (new)"))
 
     def _extract_section(full_text:str, part_tag:str):
-        tags = {
-            "PART1": "# app.py — PART 1/3",
-            "PART2": "# ========= PART 2/3",
-            "PART3": "# ========= PART 3/3",
-        }
-        start_tag = tags["PART1"]
-        mid_tag   = tags["PART2"]
-        end_tag   = tags["PART3"]
+        # Hesaplar cost_engine.py'de; dosyada PART 1 (yardımcılar) ve PART 2 (UI) kaldı
+        start_tag = "# app.py — PART 1/3"
+        mid_tag   = "# ========= PART 2/3"
         start = 0; end = len(full_text)
         if part_tag == "PART1":
             start = full_text.find(start_tag)
             end   = full_text.find(mid_tag)
         elif part_tag == "PART2":
             start = full_text.find(mid_tag)
-            end   = full_text.find(end_tag)
-        elif part_tag == "PART3":
-            start = full_text.find(end_tag)
-            end   = len(full_text)
         else:
-            return full_text, 0, len(full_text), start_tag, end_tag
+            return full_text, 0, len(full_text), start_tag, ""
         if start < 0: start = 0
         if end < 0: end = len(full_text)
-        return full_text[start:end], start, end, (mid_tag if part_tag!="PART1" else start_tag), (end_tag if part_tag!="PART3" else "")
+        return full_text[start:end], start, end, (mid_tag if part_tag!="PART1" else start_tag), (mid_tag if part_tag=="PART1" else "")
 
     # hedef dosya seçimi
     default_target = st.session_state.get("TARGET_FILE", os.path.abspath(__file__))
@@ -5932,8 +5702,8 @@ with tab_asistan:
     st.caption(f"Dosya uzunluğu: {len(file_text):,} karakter".replace(",", " "))
 
     # seçenekler
-    part_choice = st.selectbox(bi("Değişiklik kapsamı","Область изменений"), ["PART2 (UI)", "PART1 (Helpers/Tax/Logic)", "PART3 (Hesap/Çıktı)", "WHOLE FILE"], index=0)
-    part_key = {"PART2 (UI)":"PART2","PART1 (Helpers/Tax/Logic)":"PART1","PART3 (Hesap/Çıktı)":"PART3","WHOLE FILE":"WHOLE"}[part_choice]
+    part_choice = st.selectbox(bi("Değişiklik kapsamı","Область изменений"), ["PART2 (UI)", "PART1 (Helpers/Tax/Logic)", "WHOLE FILE"], index=0)
+    part_key = {"PART2 (UI)":"PART2","PART1 (Helpers/Tax/Logic)":"PART1","WHOLE FILE":"WHOLE"}[part_choice]
 
     protect_crit = st.toggle(bi("🛡️ Kritik alanları koru (vergi/prim sabitleri vs.)","🛡️ Защитить критичные разделы (ставки налогов/взносов и т.п.)"), value=st.session_state.get("protect_crit", True))
     st.session_state["protect_crit"] = protect_crit
@@ -6065,354 +5835,5 @@ with tab_asistan:
         except Exception as e:
             st.error(f"Patch uygula hazırlığında hata: {e}")
 
-
-# ========= PART 3/3 — HESAPLAR, TABLOLAR, GRAFİK, ÇIKTILAR =========
-
-# --- Güvenli yardımcı: KDV ayrıştırma (Part 1'de yoksa ekle) ---
-if "net_of_vat" not in globals():
-    def net_of_vat(x, tick):
-        vr = float(st.session_state.get("vat_rate", 0.20))
-        return float(x)/(1.0+vr) if bool(tick) else float(x)
-
-# KDV ayrıştırma (işaretli ise) - Part 3 için
-def net_of_vat_part3(x, tick):
-    vat_rate = float(st.session_state.get("vat_rate", 0.20))
-    return x / (1 + vat_rate) if tick else x
-
-# --- Kısa alias'lar (state'ten oku) ---
-PRIM_SNG = bool(st.session_state.get("prim_sng", True))
-PRIM_TUR = bool(st.session_state.get("prim_tur", True))
-
-start_date   = st.session_state.get("start_date", date.today().replace(day=1))
-end_date     = st.session_state.get("end_date", date.today().replace(day=30))
-holiday_mode = st.session_state.get("holiday_mode","her_pazar")
-hours_per_day= float(st.session_state.get("hours_per_day",10.0))
-scenario     = st.session_state.get("scenario","Gerçekçi")
-
-
-
-# --- Difficulty multiplier: single source of truth ---
-def get_difficulty_multiplier_cached() -> float:
-    try:
-        return float(st.session_state.get("_diff_total_mult_cache", 1.0))
-    except Exception:
-        return 1.0
-
-# Zorluk çarpanı tek merkezden hesaplanır ve cache'e yazılır
-z_mult = get_difficulty_multiplier_cached()
-difficulty_multiplier = z_mult  # norm hesapları bunu kullanıyor
-
-# Seçili elemanlar
-selected_elements = [k for k in ELEMENT_ORDER if st.session_state.get(f"sel_{k}", True)]
-if not selected_elements:
-    st.warning("En az bir betonarme eleman seçin."); st.stop()
-
-# Norm çarpanlarını oluştur
-as_norm_base_from_scn, norm_mult = build_norms_for_scenario(scenario, selected_elements)
-
-# Metraj DF (varsa)
-use_metraj = bool(st.session_state.get("use_metraj", False))
-metraj_df  = st.session_state.get("metraj_df", pd.DataFrame(columns=["Eleman (Элемент)","Metraj (m³) (Объём, м³)"]))
-
-# Global kişi-başı giderleri (KDV ayrıştır)
-food       = float(st.session_state.get("food",10000.0))
-food_vat   = bool(st.session_state.get("food_vat",True))
-ppe        = float(st.session_state.get("ppe",1500.0))
-ppe_vat    = bool(st.session_state.get("ppe_vat",True))
-lodging    = float(st.session_state.get("lodging",12000.0))
-lodging_vat= bool(st.session_state.get("lodging_vat",True))
-training   = float(st.session_state.get("training",500.0))
-training_vat=bool(st.session_state.get("training_vat",True))
-transport  = float(st.session_state.get("transport",3000.0))
-transport_vat=bool(st.session_state.get("transport_vat",False))
-
-extras_per_person = sum([
-    net_of_vat_part3(food,food_vat),
-    net_of_vat_part3(lodging,lodging_vat),
-    net_of_vat_part3(transport,transport_vat),
-    net_of_vat_part3(ppe,ppe_vat),
-    net_of_vat_part3(training,training_vat),
-])
-
-# Manuel üst oranlar (sade): sarf, overhead, indirect
-# Not: Part 2'deki "override" açıksa *_eff değerleri yazılmış olur; onları kullan.
-consumables_rate = float(st.session_state.get("consumables_rate", CONSUMABLES_RATE_DEFAULT/100.0))          # 0..1
-overhead_rate    = float(st.session_state.get("overhead_rate", OVERHEAD_RATE_DEFAULT))                      # 0..1
-ind_rows         = st.session_state.get("ind_rows", [])
-ind_custom_rows  = st.session_state.get("ind_custom_rows", [])
-
-# Etkili oranlar (override'a bak)
-# Session state'ten oranları al (0-1), yoksa default kullan
-consumables_rate_eff = float(st.session_state.get("consumables_rate", CONSUMABLES_RATE_DEFAULT/100.0))
-overhead_rate_eff    = float(st.session_state.get("overhead_rate", OVERHEAD_RATE_DEFAULT/100.0))
-
-# Indirect toplamını topla (sade)
-indirect_rate_total = 0.0
-for r in ind_rows:
-    if r.get("On"): indirect_rate_total += float(r.get("Rate",0.0))
-for rr in ind_custom_rows:
-    if rr.get("on"): indirect_rate_total += float(rr.get("rate",0.0))
-# override varsa geç
-indirect_rate_total = float(st.session_state.get("indirect_rate_total_eff", indirect_rate_total))
-
-# ----------------- TAKVİM & SAATLER -----------------
-
-# Tatil günleri değişikliğinde hesaplamaları güncelle
-if st.session_state.get("_holiday_mode_changed", False):
-    st.session_state["_holiday_mode_changed"] = False
-
-# Tarih hesaplama mantığı: Her zaman gerçek tarihler kullan, metraj sadece m³ değerlerini etkiler
-workdays = workdays_between(start_date, end_date, holiday_mode)
-project_days = max((end_date-start_date).days+1, 1)
-
-avg_workdays_per_month = workdays * 30.0 / project_days
-hours_per_person_month = max(avg_workdays_per_month * hours_per_day, 1e-9)
-                    
-# ----------------- NORM × METRAJ -----------------
-if use_metraj and not metraj_df.empty:
-    iterable = metraj_df.to_dict(orient="records"); col_ele="Eleman (Элемент)"; col_met="Metraj (m³) (Объём, м³)"
-else:
-    iterable = [{"Eleman (Элемент)": LABELS[k], "Metraj (m³) (Объём, м³)": 1.0} for k in selected_elements]
-    col_ele="Eleman (Элемент)"; col_met="Metraj (m³) (Объём, м³)"
-
-# Rusça etiketleri Türkçe anahtarlara eşleştir - Part 3 için
-russian_to_turkish_part3 = {
-    "Колонна": "kolon", "Балка": "kiriş", "Плита": "döşeme", 
-    "Стена": "duvar", "Лестница": "merdiven", "Фундамент": "temel", 
-    "Крыша": "çatı", "Лифт": "asansör", "Подбетонка": "grobeton",
-    "Плита перекрытия": "döşeme", "Стена/диафрагма": "perde",
-    # Tam etiket eşleştirmesi - metraj_df'den gelen tam etiketler için
-    "Grobeton (Подбетонка)": "grobeton",
-    "Temel (Фундамент)": "temel",
-    "Döşeme (Плита перекрытия)": "döşeme",
-    "Perde (Стена/диафрагма)": "perde",
-    "Merdiven (Лестница)": "merdiven"
-}
-
-norms_used={}; total_metraj=0.0; total_adamsaat=0.0
-for r in iterable:
-    lbl=str(r[col_ele]); met=float(r.get(col_met,0.0) or 0.0)
-    
-    # Rusça etiketi Türkçe anahtara çevir
-    turkish_key = russian_to_turkish_part3.get(lbl, lbl)
-    norm_multiplier = norm_mult.get(turkish_key, 1.0)
-    
-    n_e = as_norm_base_from_scn * norm_multiplier * get_difficulty_multiplier_cached()
-    norms_used[lbl]=n_e
-    total_metraj += met
-    total_adamsaat += met*n_e
-
-# ----------------- ROL MALİYETİ (PRIM VERGİSİ YOK!) -----------------
-# ÖNEMLİ: Sigorta/vakıf kesintileri yalnız "resmî brüt" üzerinden; 'prim' (elden) kısma vergi/prim YOK.
-
-# Global kişi-başı giderler (giderler sekmesinden hesapla)
-food = float(st.session_state.get("food", 10000.0))
-lodging = float(st.session_state.get("lodging", 12000.0))
-transport = float(st.session_state.get("transport", 3000.0))
-ppe = float(st.session_state.get("ppe", 1500.0))
-training = float(st.session_state.get("training", 500.0))
-
-# KDV işaretleri (giderler sekmesinden al)
-food_vat = bool(st.session_state.get("food_vat", True))
-lodging_vat = bool(st.session_state.get("lodging_vat", True))
-transport_vat = bool(st.session_state.get("transport_vat", False))
-ppe_vat = bool(st.session_state.get("ppe_vat", True))
-training_vat = bool(st.session_state.get("training_vat", True))
-
-# KDV ayrıştırma (işaretli ise)
-def net_of_vat(x, tick):
-    vat_rate = float(st.session_state.get("vat_rate", 0.20))
-    return x / (1 + vat_rate) if tick else x
-
-# Toplam KDV'siz ek giderler (gerçek değerlerden hesapla)
-extras_per_person = sum([
-    net_of_vat(food, food_vat),           # Yemek
-    net_of_vat(lodging, lodging_vat),     # Barınma
-    net_of_vat(transport, transport_vat), # Ulaşım
-    net_of_vat(ppe, ppe_vat),            # PPE
-    net_of_vat(training, training_vat)    # Eğitim
-])
-
-roles_df = st.session_state.get("roles_df", pd.DataFrame())
-sum_w = float(roles_df["Ağırlık (Вес)"].clip(lower=0.0).sum()) if not roles_df.empty else 0.0
-month_wd_df = workdays_in_month_range(start_date, end_date, holiday_mode)
-n_months = len(month_wd_df) if not month_wd_df.empty else 1
-person_months_total = total_adamsaat / hours_per_person_month
-
-
-
-# YENİ ADAM-SAAT ALGORİTMASI - KURŞUN GEÇİRMEZ (Part 3 için)
-# 1. Ülke yüzdelerini normalize et (0-0-0 ise eşit böl)
-def _normalize_country_part3(p_rus, p_sng, p_tur):
-    vals = [max(float(p_rus), 0.0), max(float(p_sng), 0.0), max(float(p_tur), 0.0)]
-    s = sum(vals)
-    if s <= 0:  # hepsi 0 ise eşit böl
-        return (1/3.0, 1/3.0, 1/3.0)
-    return (vals[0]/s, vals[1]/s, vals[2]/s)
-
-# 2. A·S fiyatını doğrudan hesapla (ara "kişi-ay" dağıtımı olmadan)
-M_with = 0.0
-M_bare = 0.0
-
-if not roles_df.empty and sum_w > 0:
-    for _, row in roles_df.iterrows():
-        share = float(row["Ağırlık (Вес)"]) / sum_w
-        
-        # Ülke yüzdelerini normalize et
-        p_rus, p_sng, p_tur = _normalize_country_part3(row["%RUS"], row["%SNG"], row["%TUR"])
-        
-        # monthly_role_cost_multinational fonksiyonunu kullan
-        with_ex = monthly_role_cost_multinational(row, PRIM_SNG, PRIM_TUR, extras_per_person)["per_person"]["BLENDED"]
-        bare_ex = monthly_role_cost_multinational(row, PRIM_SNG, PRIM_TUR, 0.0)["per_person"]["BLENDED"]
-        
-        M_with += share * with_ex
-        M_bare += share * bare_ex
-
-# 3. A·S fiyatları - TEK SATIRLIK FORMÜL
-with_extras_as_price = M_with / hours_per_person_month
-bare_as_price = M_bare / hours_per_person_month
-
-
-
-# --- NEW: price follows productivity (scenario + difficulty) ---
-s_mult  = get_scenario_multiplier_for_price(scenario)   # senaryo etkisi
-z_mult  = get_difficulty_multiplier_cached()            # çevresel zorluk etkisi
-# Ayarlanabilir katsayılar (ileride istersen UI ekleyebilirsin)
-BETA_SCENARIO_TO_PRICE  = 1.0    # 0..1 (1=tam, 0=sızdırma)
-BETA_DIFFICULTY_TO_PRICE= 1.0    # 0..1 (1=tam, 0=sızdırma)
-
-price_mult = (1 + BETA_SCENARIO_TO_PRICE  * (s_mult - 1)) \
-           * (1 + BETA_DIFFICULTY_TO_PRICE* (z_mult - 1))
-
-bare_as_price        *= price_mult
-with_extras_as_price *= price_mult
-
-core_as_price        = with_extras_as_price  # m³ maliyetleri bu fiyattan üretilecek
-
-
-
-# Part 3 hesaplama tamamlandı
-
-# Roller hesaplama tablosu için
-roles_calc = []
-if not roles_df.empty and sum_w > 0:
-    for _, row in roles_df.iterrows():
-        w = max(float(row["Ağırlık (Вес)"]), 0.0)
-        share = (w / sum_w)
-        persons_role = (person_months_total / n_months) * share
-        
-        # Ülke yüzdelerini normalize et
-        p_rus, p_sng, p_tur = _normalize_country_part3(row["%RUS"], row["%SNG"], row["%TUR"])
-        
-        # monthly_role_cost_multinational kullan
-        bundle_with = monthly_role_cost_multinational(row, PRIM_SNG, PRIM_TUR, extras_per_person)
-        bundle_bare = monthly_role_cost_multinational(row, PRIM_SNG, PRIM_TUR, 0.0)
-        per_with = bundle_with["per_person"]["BLENDED"]
-        per_bare = bundle_bare["per_person"]["BLENDED"]
-        
-        roles_calc.append({
-            "Rol (Роль)": row["Rol (Роль)"],
-            "Ağırlık (Вес)": w,
-            "Pay (%) (Доля, %)": f"{share * 100:.2f}",
-            "Ortalama Kişi (Средняя численность)": f"{persons_role:.3f}",
-            "Maliyet/ay (₽)": f"{per_with:,.2f}",
-            "%RUS": f"{p_rus * 100:.1f}",
-            "%SNG": f"{p_sng * 100:.1f}",
-            "%TUR": f"{p_tur * 100:.1f}",
-            "Net Maaş (₽/ay)": f"{float(row.get('Net Maaş (₽, na ruki) (Чистая з/п, ₽)', 0)):,.0f}"
-        })
-roles_calc_df = pd.DataFrame(roles_calc)
-
-# ----------------- m³ MALİYETLERİ - ELEMAN ÖZGÜ NORM KULLAN -----------------
-sum_core_overhead_total=0.0; tmp_store=[]
-for r in iterable:
-    lbl=str(r[col_ele]); met=float(r.get(col_met,0.0) or 0.0); n=norms_used[lbl]
-    core_m3  = with_extras_as_price * n  # Eleman özgü norm ile çarp
-    genel_m3 = min(max(overhead_rate_eff,0.0), OVERHEAD_RATE_MAX/100.0) * core_m3  # üst sınır
-    total_m3_core_genel = core_m3 + genel_m3
-    sum_core_overhead_total += total_m3_core_genel * met
-    tmp_store.append((lbl,met,total_m3_core_genel,core_m3,genel_m3,n))
-                    
-# Sarf + Indirect - (core_m3 + genel_m3) * metraj tabanı üzerinden
-consumables_total = sum_core_overhead_total * max(consumables_rate_eff,0.0)
-indirect_total    = (sum_core_overhead_total + consumables_total) * max(indirect_rate_total,0.0)
-                    
-# Elemanlara dağıt - oransal dağıtım
-elem_rows=[]; project_total_cost=0.0
-for (lbl,met,base_total,core_m3,genel_m3,n) in tmp_store:
-    # Sarf ve indirect dağıtımı: (core_m3 + genel_m3) * metraj oranı
-    weight    = (base_total*met) / max(sum_core_overhead_total,1e-9)
-    sarf_alloc  = consumables_total * weight
-    indir_alloc = indirect_total    * weight
-    sarf_m3  = sarf_alloc / max(met,1e-9) if met > 0 else 0.0
-    indir_m3 = indir_alloc/ max(met,1e-9) if met>0 else 0.0
-    total_m3 = core_m3 + genel_m3 + sarf_m3 + indir_m3
-    project_total_cost += total_m3 * max(met,0.0)
-    elem_rows.append({
-        "Eleman (Элемент)":lbl,
-        "Norm (a·s/m³) (Норма, чел·ч/м³)":f"{n:.2f}",
-        "Metraj (m³) (Объём, м³)":f"{met:,.3f}",
-        "Çekirdek (₽/м³) (Ядро, ₽/м³)":f"{core_m3:,.2f}",
-        "Genel (₽/м³) (Накладные, ₽/м³)":f"{genel_m3:,.2f}",
-        "Sarf (₽/м³) (Расходники, ₽/м³)":f"{sarf_m3:,.2f}",
-        "Indirect (₽/м³) (Косвенные, ₽/м³)":f"{indir_m3:,.2f}",
-        "Toplam (₽/м³) (Итого, ₽/м³)":f"{total_m3:,.2f}"
-    })
-elements_df = pd.DataFrame(elem_rows)
-
-# Özet metrikler
-general_avg_m3      = project_total_cost / max(total_metraj,1e-9) if total_metraj>0 else 0.0
-fully_loaded_as_price = project_total_cost / max(total_adamsaat,1e-9) if total_adamsaat>0 else 0.0
-avg_norm_per_m3       = total_adamsaat / max(total_metraj,1e-9) if total_metraj>0 else 0.0
-indirect_share        = indirect_total / max(project_total_cost,1e-9) if project_total_cost>0 else 0.0
-
-# ----------------- PARABOLİK MANPOWER DAĞILIMI (Part 3 için) -----------------
-# Şantiye gerçeklerine uygun parabolik dağıtım
-def parabolic_distribution_part3(n_months):
-    if n_months <= 1:
-        return [1.0]
-    
-    # Parabolik ağırlıklar: y = -4(x-0.5)² + 1
-    # Başlangıç: düşük, orta: yüksek, son: düşük
-    weights = []
-    for i in range(n_months):
-        x = i / (n_months - 1) if n_months > 1 else 0.5
-        weight = -4 * (x - 0.5)**2 + 1
-        weights.append(max(weight, 0.1))  # Minimum %10
-    
-    # Toplamı 1'e normalize et
-    total_weight = sum(weights)
-    normalized_weights = [w / total_weight for w in weights]
-    return normalized_weights
-
-# Parabolik dağıtım hesapla
-if not month_wd_df.empty:
-    n_months_part3 = len(month_wd_df)
-    weights_part3 = parabolic_distribution_part3(n_months_part3)
-    headcounts_float_part3 = [person_months_total * wi for wi in weights_part3]
-    
-    # Toplam adam-ay korunmalı - yuvarlama hatası düzeltmesi
-    def round_preserve_sum_part3(values):
-        rounded = [round(v) for v in values]
-        total_diff = sum(values) - sum(rounded)
-        
-        if abs(total_diff) >= 1:
-            diffs = [(i, abs(v - r)) for i, (v, r) in enumerate(zip(values, rounded))]
-            diffs.sort(key=lambda x: x[1], reverse=True)
-            
-            for i, _ in diffs:
-                if total_diff > 0:
-                    rounded[i] += 1
-                    total_diff -= 1
-                elif total_diff < 0:
-                    rounded[i] -= 1
-                    total_diff += 1
-                if abs(total_diff) < 1:
-                    break
-        
-        return rounded
-    
-    headcounts_int_part3 = round_preserve_sum_part3(headcounts_float_part3)
-    
-    # month_wd_df'ye parabolik dağıtım ekle
-    month_wd_df["Manpower (Численность)"] = headcounts_int_part3
\ No newline at end of file
+with tab_asistan:
+    render_tab_asistan()
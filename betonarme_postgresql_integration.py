@@ -5,20 +5,53 @@ Bu modül, mevcut betonarme_hesap_modulu_r0.py ile PostgreSQL RAG sistemini ente
 """
 
 import os
+import re
 import sys
+import shutil
+import tempfile
+import asyncio
 import logging
+import threading
+from collections import Counter
 from datetime import date, timedelta
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 import pandas as pd
 
+from rag_common import RAGConfig
+
 # Mevcut modülü import et
 try:
-    from postgresql_rag_system import PostgreSQLRAGSystem, RAGConfig
+    from postgresql_rag_system import PostgreSQLRAGSystem
     RAG_AVAILABLE = True
 except ImportError:
     RAG_AVAILABLE = False
     logging.warning("PostgreSQL RAG system not available")
 
+# Sunucusuz yerel arka uç (RAG_BACKEND=sqlite)
+try:
+    from sqlite_rag_system import SQLiteRAGSystem
+    SQLITE_RAG_AVAILABLE = True
+except ImportError:
+    SQLITE_RAG_AVAILABLE = False
+
+# Asenkron istemci (opsiyonel: asyncpg ile eşzamanlı arama/norm sorguları)
+try:
+    from postgresql_rag_async import ASYNCPG_AVAILABLE, AsyncLoopThread, AsyncPostgreSQLRAGSystem
+    ASYNC_RAG_AVAILABLE = RAG_AVAILABLE and ASYNCPG_AVAILABLE
+except ImportError:
+    ASYNC_RAG_AVAILABLE = False
+
+from revit_import import ImportStats, RevitImporter
+
+# OpenAI (opsiyonel: semantik/hibrit arama için sorgu embedding'i)
+try:
+    from openai import OpenAI
+    OPENAI_AVAILABLE = True
+except ImportError:
+    OPENAI_AVAILABLE = False
+
+EMBEDDING_MODEL = "text-embedding-3-small"
+
 # Streamlit import (mevcut modülden)
 try:
     import streamlit as st
@@ -26,37 +59,161 @@ try:
 except ImportError:
     STREAMLIT_AVAILABLE = False
 
+# Eleman tipi -> WBS anahtarı
+WBS_MAPPING = {
+    'grobeton': 'CONC.SLAB',
+    'rostverk': 'CONC.BEAM', 
+    'temel': 'CONC.FOUNDATION',
+    'doseme': 'CONC.SLAB',
+    'perde': 'CONC.WALL',
+    'merdiven': 'CONC.STAIR'
+}
+
+# Metraj tablosu (betonarme_hesap_modulu_r0: LABELS ve metraj_df kolonları)
+ELEMENT_LABELS = {
+    'grobeton': 'Grobeton (Подбетонка)',
+    'rostverk': 'Rostverk (Ростверк)',
+    'temel': 'Temel (Фундамент)',
+    'doseme': 'Döşeme (Плита перекрытия)',
+    'perde': 'Perde (Стена/диафрагма)',
+    'merdiven': 'Merdiven (Лестница)',
+}
+METRAJ_ELEMENT_COL = "Eleman (Элемент)"
+METRAJ_QTY_COL = "Metraj (m³) (Объём, м³)"
+
+# Faktör tipi -> RAG sorgusu
+FACTOR_QUERIES = {
+    'winter_factor': 'kış şartı işçilik verimsizlik yüzdesi beton dökümü',
+    'heavy_rebar': 'ağır donatı yoğunluğu norm artışı',
+    'site_congestion': 'şantiye sıkışıklığı işçilik verimsizlik',
+    'pump_height': 'yüksek pompa beton işçilik zorluğu',
+    'form_repeat': 'kalıp tekrarı işçilik verimsizlik'
+}
+
+def _wbs_key(element_type: str) -> str:
+    return WBS_MAPPING.get(element_type, f'CONC.{element_type.upper()}')
+
+def _labor_hours_query(element_type: str, unit: str) -> str:
+    return f"{element_type} {unit} işçilik normu adam saat"
+
+def _labor_hours_suggestion(theoretical_hours: float, norm_results: List[Dict]) -> Dict[str, Any]:
+    """Teorik saat + norm sonuçlarından öneri sözlüğü"""
+    # Güven skoru hesapla
+    confidence = 0.8 if norm_results else 0.3
+    
+    return {
+        'suggestion': theoretical_hours,
+        'source': norm_results[0]['source'] if norm_results else 'Default',
+        'confidence': confidence,
+        'norm_results': norm_results[:3]  # İlk 3 sonuç
+    }
+
+def _metraj_df(aggregates: pd.DataFrame, elements: List[str]) -> pd.DataFrame:
+    """WBS x birim toplamlarından metraj tablosu (m³).
+    Aynı WBS anahtarını paylaşan elemanlar (grobeton/döşeme: CONC.SLAB) toplamı eşit böler"""
+    volumes = aggregates[aggregates['unit'] == 'm3'].groupby('wbs_key')['qty'].sum().to_dict()
+    keys = [_wbs_key(element) for element in elements]
+    shares = Counter(keys)
+    rows = []
+    for element, key in zip(elements, keys):
+        rows.append({METRAJ_ELEMENT_COL: ELEMENT_LABELS[element],
+                     METRAJ_QTY_COL: float(volumes.get(key, 0.0)) / shares[key]})
+    return pd.DataFrame(rows)
+
+def _factor_suggestion(results: List[Dict]) -> Dict[str, Any]:
+    """İlk sonuçtan sayısal faktör değeri çıkar"""
+    if not results:
+        return {'suggestion': 0.0, 'source': 'No data', 'confidence': 0.0}
+    
+    text = results[0]['text']
+    
+    # Yüzde değerleri ara
+    percent_matches = re.findall(r'(\d+(?:\.\d+)?)\s*%', text)
+    if percent_matches:
+        suggestion = float(percent_matches[0]) / 100  # Yüzdeyi ondalığa çevir
+    else:
+        # Sayısal değerler ara
+        number_matches = re.findall(r'(\d+(?:\.\d+)?)', text)
+        if number_matches:
+            suggestion = float(number_matches[0]) / 100
+        else:
+            suggestion = 0.0
+    
+    return {
+        'suggestion': suggestion,
+        'source': results[0]['source'],
+        'confidence': 0.7,
+        'norm_results': results[:2]
+    }
+
 class BetonarmeRAGIntegration:
     """Betonarme modülü ile PostgreSQL RAG sistemi entegrasyonu"""
     
     def __init__(self):
         self.rag_system = None
+        self.async_rag = None
+        self._loop = None
         self.config = None
         self._initialize_rag()
     
     def _initialize_rag(self):
         """RAG sistemini başlat"""
-        if not RAG_AVAILABLE:
+        if not (RAG_AVAILABLE or SQLITE_RAG_AVAILABLE):
             return
         
         try:
-            # Konfigürasyon
-            self.config = RAGConfig(
-                db_host="localhost",
-                db_port=5432,
-                db_name="betonarme_rag",
-                db_user="postgres",
-                db_password="1905"  # PostgreSQL şifreniz
-            )
+            # Konfigürasyon (.env: DB_HOST, DB_PORT, ..., DB_POOL_MIN, DB_POOL_MAX)
+            self.config = RAGConfig.from_env()
+            
+            if os.getenv("RAG_BACKEND", "postgresql").lower() == "sqlite":
+                # Tek makine kurulumu: SQLITE_PATH dosyası, FTS5 arama (async istemci yok)
+                self.rag_system = SQLiteRAGSystem(self.config)
+                logging.info("SQLite RAG system initialized successfully")
+                return
             
-            # RAG sistemi başlat
-            self.rag_system = PostgreSQLRAGSystem(self.config)
+            # RAG sistemi başlat (thread-safe bağlantı havuzu ile)
+            self.rag_system = PostgreSQLRAGSystem(self.config, embed_fn=self._make_embed_fn())
             
             logging.info("PostgreSQL RAG system initialized successfully")
             
         except Exception as e:
             logging.error(f"RAG system initialization failed: {e}")
             self.rag_system = None
+            return
+        
+        self._initialize_async_rag()
+    
+    def _initialize_async_rag(self):
+        """Asenkron istemciyi başlat (audit yazıcısı ve norm indeksi senkron sistemle ortak)"""
+        if not ASYNC_RAG_AVAILABLE:
+            return
+        
+        try:
+            self._loop = AsyncLoopThread()
+            self.async_rag = self._loop.run(AsyncPostgreSQLRAGSystem.create(
+                self.config,
+                embed_fn=self.rag_system.embed_fn,
+                audit_log=self.rag_system.audit_log,
+                norm_index=self.rag_system.norm_index,
+            ))
+        except Exception as e:
+            logging.error(f"Async RAG client initialization failed: {e}")
+            self.async_rag = None
+            if self._loop:
+                self._loop.stop()
+                self._loop = None
+    
+    def _make_embed_fn(self):
+        """OPENAI_API_KEY varsa embedding fonksiyonu, yoksa None"""
+        api_key = os.getenv("OPENAI_API_KEY")
+        if not (OPENAI_AVAILABLE and api_key):
+            return None
+        client = OpenAI(api_key=api_key)
+        
+        def _embed(texts: List[str]) -> List[List[float]]:
+            res = client.embeddings.create(model=EMBEDDING_MODEL, input=texts)
+            return [d.embedding for d in res.data]
+        return _embed
     
     def search_norms(self, query: str, locales: List[str] = None) -> List[Dict]:
         """Norm arama"""
@@ -67,6 +224,10 @@ class BetonarmeRAGIntegration:
             if not locales:
                 locales = ['tr', 'ru', 'en']
             
+            # Embedding'ler veritabanında: tüm worker'lar aynı indeksi kullanır
+            if self.rag_system.embed_fn and self.rag_system.features.get('vector'):
+                return self.rag_system.search_hybrid(query, locales=locales)
+            
             results = self.rag_system.search(query, locales=locales)
             return results
             
@@ -74,97 +235,85 @@ class BetonarmeRAGIntegration:
             logging.error(f"Norm search failed: {e}")
             return []
     
+    async def _search_norms_async(self, query: str, locales: List[str] = None) -> List[Dict]:
+        """Norm arama (asenkron istemci)"""
+        try:
+            if not locales:
+                locales = ['tr', 'ru', 'en']
+            if self.async_rag.embed_fn and self.async_rag.features.get('vector'):
+                return await self.async_rag.search_hybrid(query, locales=locales)
+            return await self.async_rag.search(query, locales=locales)
+        except Exception as e:
+            logging.error(f"Norm search failed: {e}")
+            return []
+    
     def get_labor_hours_suggestion(self, element_type: str, qty: float, unit: str) -> Dict[str, Any]:
         """İşçilik saati önerisi"""
+        return self.get_labor_hours_suggestions([(element_type, qty, unit)])[0]
+    
+    def get_labor_hours_suggestions(self, elements: List[Tuple[str, float, str]]) -> List[Dict[str, Any]]:
+        """Birden çok eleman için işçilik saati önerileri (asyncpg varsa tüm sorgular eşzamanlı)"""
         if not self.rag_system:
-            return {'suggestion': 0.0, 'source': 'No RAG system', 'confidence': 0.0}
+            return [{'suggestion': 0.0, 'source': 'No RAG system', 'confidence': 0.0} for _ in elements]
         
-        try:
-            # WBS key mapping
-            wbs_mapping = {
-                'grobeton': 'CONC.SLAB',
-                'rostverk': 'CONC.BEAM', 
-                'temel': 'CONC.FOUNDATION',
-                'doseme': 'CONC.SLAB',
-                'perde': 'CONC.WALL',
-                'merdiven': 'CONC.STAIR'
-            }
-            
-            wbs_key = wbs_mapping.get(element_type, f'CONC.{element_type.upper()}')
-            
-            # Teorik adam-saat hesapla
-            theoretical_hours = self.rag_system.calculate_labor_hours(
-                wbs_key=wbs_key,
-                qty=qty,
-                unit=unit,
-                locale='tr'
-            )
-            
-            # RAG'dan norm bilgisi al
-            norm_query = f"{element_type} {unit} işçilik normu adam saat"
-            norm_results = self.search_norms(norm_query)
-            
-            # Güven skoru hesapla
-            confidence = 0.8 if norm_results else 0.3
-            
-            return {
-                'suggestion': theoretical_hours,
-                'source': norm_results[0]['source'] if norm_results else 'Default',
-                'confidence': confidence,
-                'norm_results': norm_results[:3]  # İlk 3 sonuç
-            }
-            
-        except Exception as e:
-            logging.error(f"Labor hours suggestion failed: {e}")
-            return {'suggestion': 0.0, 'source': 'Error', 'confidence': 0.0}
+        if self.async_rag:
+            async def _gather():
+                return await asyncio.gather(*(self._labor_hours_suggestion_async(*e) for e in elements))
+            try:
+                return self._loop.run(_gather())
+            except Exception as e:
+                logging.error(f"Labor hours suggestion failed: {e}")
+                return [{'suggestion': 0.0, 'source': 'Error', 'confidence': 0.0} for _ in elements]
+        
+        results = []
+        for element_type, qty, unit in elements:
+            try:
+                # Teorik adam-saat hesapla
+                theoretical_hours = self.rag_system.calculate_labor_hours(
+                    wbs_key=_wbs_key(element_type),
+                    qty=qty,
+                    unit=unit,
+                    locale='tr'
+                )
+                
+                # RAG'dan norm bilgisi al
+                norm_results = self.search_norms(_labor_hours_query(element_type, unit))
+                results.append(_labor_hours_suggestion(theoretical_hours, norm_results))
+            except Exception as e:
+                logging.error(f"Labor hours suggestion failed: {e}")
+                results.append({'suggestion': 0.0, 'source': 'Error', 'confidence': 0.0})
+        return results
+    
+    async def _labor_hours_suggestion_async(self, element_type: str, qty: float, unit: str) -> Dict[str, Any]:
+        """Norm hesabı ve norm araması aynı anda"""
+        theoretical_hours, norm_results = await asyncio.gather(
+            self.async_rag.calculate_labor_hours(_wbs_key(element_type), qty, unit, locale='tr'),
+            self._search_norms_async(_labor_hours_query(element_type, unit)),
+        )
+        return _labor_hours_suggestion(theoretical_hours, norm_results)
     
     def get_factor_suggestions(self, factor_type: str) -> Dict[str, Any]:
         """Faktör önerileri"""
+        return self.get_all_factor_suggestions([factor_type])[factor_type]
+    
+    def get_all_factor_suggestions(self, factor_types: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Birden çok faktör için öneriler (asyncpg varsa aramalar eşzamanlı)"""
         if not self.rag_system:
-            return {'suggestion': 0.0, 'source': 'No RAG system', 'confidence': 0.0}
+            return {f: {'suggestion': 0.0, 'source': 'No RAG system', 'confidence': 0.0} for f in factor_types}
         
         try:
-            # Faktör tipine göre sorgu oluştur
-            queries = {
-                'winter_factor': 'kış şartı işçilik verimsizlik yüzdesi beton dökümü',
-                'heavy_rebar': 'ağır donatı yoğunluğu norm artışı',
-                'site_congestion': 'şantiye sıkışıklığı işçilik verimsizlik',
-                'pump_height': 'yüksek pompa beton işçilik zorluğu',
-                'form_repeat': 'kalıp tekrarı işçilik verimsizlik'
-            }
-            
-            query = queries.get(factor_type, f"{factor_type} faktörü")
-            results = self.search_norms(query)
-            
-            if results:
-                # İlk sonuçtan sayısal değer çıkarmaya çalış
-                text = results[0]['text']
-                import re
-                
-                # Yüzde değerleri ara
-                percent_matches = re.findall(r'(\d+(?:\.\d+)?)\s*%', text)
-                if percent_matches:
-                    suggestion = float(percent_matches[0]) / 100  # Yüzdeyi ondalığa çevir
-                else:
-                    # Sayısal değerler ara
-                    number_matches = re.findall(r'(\d+(?:\.\d+)?)', text)
-                    if number_matches:
-                        suggestion = float(number_matches[0]) / 100
-                    else:
-                        suggestion = 0.0
-                
-                return {
-                    'suggestion': suggestion,
-                    'source': results[0]['source'],
-                    'confidence': 0.7,
-                    'norm_results': results[:2]
-                }
-            
-            return {'suggestion': 0.0, 'source': 'No data', 'confidence': 0.0}
+            queries = [FACTOR_QUERIES.get(f, f"{f} faktörü") for f in factor_types]
+            if self.async_rag:
+                async def _gather():
+                    return await asyncio.gather(*(self._search_norms_async(q) for q in queries))
+                all_results = self._loop.run(_gather())
+            else:
+                all_results = [self.search_norms(q) for q in queries]
+            return {f: _factor_suggestion(results) for f, results in zip(factor_types, all_results)}
             
         except Exception as e:
             logging.error(f"Factor suggestion failed: {e}")
-            return {'suggestion': 0.0, 'source': 'Error', 'confidence': 0.0}
+            return {f: {'suggestion': 0.0, 'source': 'Error', 'confidence': 0.0} for f in factor_types}
     
     def export_productivity_report(self, start_date: date, end_date: date) -> Dict[str, str]:
         """Verimlilik raporu ihraç et"""
@@ -179,28 +328,87 @@ class BetonarmeRAGIntegration:
             logging.error(f"Productivity report export failed: {e}")
             return {}
     
+    def import_revit_schedule(self, path: str, model_id: str,
+                              elements: List[str] = None) -> Tuple[Optional[ImportStats], pd.DataFrame]:
+        """Revit/IFC çizelgesini revit_quantities'e yükle; modelin metraj tablosunu döndür"""
+        if not self.rag_system:
+            return None, pd.DataFrame()
+        
+        try:
+            backend = 'sqlite' if SQLITE_RAG_AVAILABLE and isinstance(self.rag_system, SQLiteRAGSystem) else 'postgresql'
+            importer = RevitImporter(self.rag_system.pool, backend=backend)
+            stats = importer.import_file(path, model_id)
+            return stats, _metraj_df(importer.aggregate(model_id), elements or list(ELEMENT_LABELS))
+            
+        except Exception as e:
+            logging.error(f"Revit import failed: {e}")
+            return None, pd.DataFrame()
+    
     def close(self):
         """RAG sistemini kapat"""
+        if self.async_rag:
+            self._loop.run(self.async_rag.close())
+            self._loop.stop()
+            self.async_rag = None
         if self.rag_system:
             self.rag_system.close()
 
 # Global RAG entegrasyon instance'ı
 rag_integration = None
+_rag_integration_lock = threading.Lock()
 
 def get_rag_integration():
-    """RAG entegrasyon instance'ını al"""
+    """RAG entegrasyon instance'ını al (tüm Streamlit oturumları aynı havuzu paylaşır)"""
     global rag_integration
     if rag_integration is None:
-        rag_integration = BetonarmeRAGIntegration()
+        with _rag_integration_lock:
+            if rag_integration is None:
+                rag_integration = BetonarmeRAGIntegration()
     return rag_integration
 
 # ===============================================
 # Streamlit UI Entegrasyonu
 # ===============================================
 
+def apply_revit_metraj(state, metraj_df: pd.DataFrame, elements: List[str]):
+    """Yüklenen metrajı Eleman & Metraj sekmesinin tablosuna aktar (sekme varsayılanla ezmez)"""
+    state["metraj_df"] = metraj_df
+    state["_met_for_keys"] = tuple(elements)
+    state["use_metraj"] = True
+    if "metraj_editor_form" in state:      # eski tablonun düzenlemeleri yeni tabloya uygulanmasın
+        del state["metraj_editor_form"]
+
+def render_revit_import(elements: List[str]):
+    """Revit/IFC metraj çizelgesi -> metraj tablosu (use_metraj kutusundan önce çağrılmalı)"""
+    if not STREAMLIT_AVAILABLE or not (RAG_AVAILABLE or SQLITE_RAG_AVAILABLE):
+        return
+    
+    with st.expander("📐 Revit/IFC Metraj Yükle"):
+        schedule = st.file_uploader("Çizelge (CSV/XLSX)", type=["csv", "xlsx"], key="revit_schedule")
+        model_id = st.text_input("Model ID", value="model_001", key="revit_model_id")
+        if schedule is None or not elements or not st.button("Metrajı Yükle", key="revit_import_btn"):
+            return
+        
+        # Akış halinde okunabilmesi için geçici dosyaya yaz
+        suffix = os.path.splitext(schedule.name)[1]
+        with tempfile.NamedTemporaryFile(suffix=suffix, delete=False) as tmp:
+            shutil.copyfileobj(schedule, tmp)
+        try:
+            stats, metraj_df = get_rag_integration().import_revit_schedule(tmp.name, model_id, elements)
+        finally:
+            os.unlink(tmp.name)
+        if not stats:
+            st.error("Metraj yüklenemedi")
+            return
+        
+        apply_revit_metraj(st.session_state, metraj_df, elements)
+        st.success(f"{stats.upserted} eleman yüklendi ({stats.seconds:.1f} sn), metraj tablosuna aktarıldı")
+        if stats.unmapped:
+            st.warning(f"{stats.unmapped} eleman WBS eşlemesiz (mappings tablosu)")
+
 def render_rag_suggestions():
     """RAG önerilerini Streamlit'te göster"""
-    if not STREAMLIT_AVAILABLE or not RAG_AVAILABLE:
+    if not STREAMLIT_AVAILABLE or not (RAG_AVAILABLE or SQLITE_RAG_AVAILABLE):
         return
     
     try:
@@ -234,25 +442,29 @@ def render_rag_suggestions():
                 with st.sidebar:
                     st.markdown("#### 📊 İşçilik Saati Önerileri")
                     
+                    elements = []
                     for element in active_elements:
                         element_name = element.replace('use_', '').title()
                         qty = st.session_state.get(f"{element}_qty", 0)
                         unit = st.session_state.get(f"{element}_unit", "m3")
-                        
                         if qty > 0:
-                            suggestion = rag.get_labor_hours_suggestion(element_name, qty, unit)
-                            
-                            st.write(f"**{element_name}** ({qty} {unit})")
-                            st.write(f"Önerilen: {suggestion['suggestion']:.2f} adam-saat")
-                            st.write(f"Kaynak: {suggestion['source']}")
-                            st.write(f"Güven: {suggestion['confidence']:.1%}")
-                            
-                            if suggestion['norm_results']:
-                                with st.expander("Norm Detayları"):
-                                    for result in suggestion['norm_results']:
-                                        st.write(f"**{result['source']}**: {result['text'][:100]}...")
-                                        st.write(f"Skor: {result['score']:.3f}")
-                            st.write("---")
+                            elements.append((element_name, qty, unit))
+                    
+                    # Tüm elemanların norm/arama sorguları tek seferde (eşzamanlı)
+                    suggestions = rag.get_labor_hours_suggestions(elements)
+                    
+                    for (element_name, qty, unit), suggestion in zip(elements, suggestions):
+                        st.write(f"**{element_name}** ({qty} {unit})")
+                        st.write(f"Önerilen: {suggestion['suggestion']:.2f} adam-saat")
+                        st.write(f"Kaynak: {suggestion['source']}")
+                        st.write(f"Güven: {suggestion['confidence']:.1%}")
+                        
+                        if suggestion['norm_results']:
+                            with st.expander("Norm Detayları"):
+                                for result in suggestion['norm_results']:
+                                    st.write(f"**{result['source']}**: {result['text'][:100]}...")
+                                    st.write(f"Skor: {result['score']:.3f}")
+                        st.write("---")
         
         # Faktör önerileri
         if st.sidebar.button("Faktör Önerileri"):
@@ -267,8 +479,10 @@ def render_rag_suggestions():
                     ('form_repeat', 'Kalıp Tekrarı')
                 ]
                 
+                suggestions = rag.get_all_factor_suggestions([key for key, _ in factors])
+                
                 for factor_key, factor_name in factors:
-                    suggestion = rag.get_factor_suggestions(factor_key)
+                    suggestion = suggestions[factor_key]
                     
                     st.write(f"**{factor_name}**")
                     st.write(f"Önerilen: {suggestion['suggestion']:.1%}")
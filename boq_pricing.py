@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+"""
+BoQ Pricing
+Metraj listesinin (wbs_key, qty, unit) tek vektörel geçişte fiyatlanması: norm eşleme,
+zorluk çarpanı, çekirdek + genel gider ve sarf/indirect'in (çekirdek + genel) x metraj
+ağırlığıyla dağıtımı. Sonuç kolonları sayısaldır (biçimlendirme gösterimde yapılır).
+"""
+
+import logging
+from dataclasses import dataclass
+from typing import Mapping, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+BOQ_KEY_COLUMNS = ['wbs_key', 'unit']
+
+PRICED_COLUMNS = [
+    'wbs_key', 'qty', 'unit', 'norm_lh_per_u', 'labor_hours',
+    'core_per_u', 'overhead_per_u', 'consumables_per_u', 'indirect_per_u',
+    'total_per_u', 'total_cost',
+]
+
+
+@dataclass
+class BoQTotals:
+    """Fiyatlanmış metraj listesinin toplamları"""
+    total_qty: float
+    total_labor_hours: float
+    core_overhead_total: float
+    consumables_total: float
+    indirect_total: float
+    project_total_cost: float
+    missing_norms: int
+
+
+def norms_frame(table: Mapping[Tuple[str, str], object]) -> pd.DataFrame:
+    """NormIndex.table() sözlüğünden (wbs_key, unit, norm_lh_per_u) tablosu (koşul çarpanı dahil)"""
+    return pd.DataFrame(
+        [(key, unit, entry.effective_lh_per_u) for (key, unit), entry in table.items()],
+        columns=BOQ_KEY_COLUMNS + ['norm_lh_per_u'],
+    )
+
+
+def price_boq(boq: pd.DataFrame, as_price: float,
+              norms: Optional[Union[pd.DataFrame, Mapping[Tuple[str, str], float]]] = None,
+              difficulty_multiplier: float = 1.0, overhead_rate: float = 0.0,
+              consumables_rate: float = 0.0, indirect_rate: float = 0.0) -> Tuple[pd.DataFrame, BoQTotals]:
+    """Metraj listesini fiyatla.
+
+    boq: wbs_key, qty, unit kolonları; norm_lh_per_u kolonu varsa norms yerine o kullanılır.
+    norms: (wbs_key, unit, norm_lh_per_u) tablosu ya da {(wbs_key, unit): norm} sözlüğü.
+    as_price: adam-saat fiyatı (₽/a·s). Oranlar kesir olarak (0.15 = %15).
+    Normu bulunamayan satırların normu 0 alınır ve missing_norms'ta sayılır.
+    """
+    priced = boq.reset_index(drop=True)
+    if 'norm_lh_per_u' not in priced.columns:
+        if norms is None:
+            raise ValueError("norm_lh_per_u kolonu ya da norms tablosu gerekli")
+        if not isinstance(norms, pd.DataFrame):
+            norms = pd.DataFrame([(k, u, n) for (k, u), n in norms.items()],
+                                 columns=BOQ_KEY_COLUMNS + ['norm_lh_per_u'])
+        # Tek join: (wbs_key, unit) -> norm (tekrarlı anahtarda ilk kayıt)
+        lookup = norms.drop_duplicates(BOQ_KEY_COLUMNS).set_index(BOQ_KEY_COLUMNS)['norm_lh_per_u']
+        keys = pd.MultiIndex.from_arrays([priced['wbs_key'], priced['unit']])
+        priced['norm_lh_per_u'] = lookup.reindex(keys).to_numpy()
+
+    qty = pd.to_numeric(priced['qty'], errors='coerce').fillna(0.0).to_numpy(dtype=float)
+    norm = pd.to_numeric(priced['norm_lh_per_u'], errors='coerce').to_numpy(dtype=float)
+    missing = np.isnan(norm)
+    if missing.any():
+        logger.warning(f"Norm bulunamadı: {int(missing.sum())} satır (norm 0)")
+    norm = np.where(missing, 0.0, norm) * difficulty_multiplier
+
+    core = as_price * norm
+    overhead = max(overhead_rate, 0.0) * core
+    base = core + overhead
+    base_cost = base * qty
+    core_overhead_total = float(base_cost.sum())
+    consumables_total = core_overhead_total * max(consumables_rate, 0.0)
+    indirect_total = (core_overhead_total + consumables_total) * max(indirect_rate, 0.0)
+
+    # Sarf/indirect dağıtımı: satır ağırlığı = (çekirdek + genel) x metraj / toplam
+    weight = base_cost / max(core_overhead_total, 1e-9)
+    positive = qty > 0
+    safe_qty = np.where(positive, qty, 1.0)
+    consumables = np.where(positive, consumables_total * weight / safe_qty, 0.0)
+    indirect = np.where(positive, indirect_total * weight / safe_qty, 0.0)
+    total = base + consumables + indirect
+
+    priced['qty'] = qty
+    priced['norm_lh_per_u'] = norm
+    priced['labor_hours'] = qty * norm
+    priced['core_per_u'] = core
+    priced['overhead_per_u'] = overhead
+    priced['consumables_per_u'] = consumables
+    priced['indirect_per_u'] = indirect
+    priced['total_per_u'] = total
+    priced['total_cost'] = total * np.clip(qty, 0.0, None)
+
+    totals = BoQTotals(
+        total_qty=float(qty.sum()),
+        total_labor_hours=float(priced['labor_hours'].sum()),
+        core_overhead_total=core_overhead_total,
+        consumables_total=consumables_total,
+        indirect_total=indirect_total,
+        project_total_cost=float(priced['total_cost'].sum()),
+        missing_norms=int(missing.sum()),
+    )
+    extra = [c for c in priced.columns if c not in PRICED_COLUMNS]
+    return priced[PRICED_COLUMNS + extra], totals
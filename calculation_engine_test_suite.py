@@ -0,0 +1,328 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Calculation Engine Test Suite
+Tests the importable calculation modules used by the Streamlit app
+"""
+
+import sys
+import os
+import time
+import unittest
+import tempfile
+import shutil
+from datetime import date
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+# Add the current directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from boq_pricing import price_boq
+import report_writers
+from report_writers import XLSXWorkbookWriter
+from chart_render import ChartCache, chart_key, manpower_spec
+from manpower_distribution import distribution_weights, round_preserve_sum, role_month_matrix
+from manpower_scheduler import ScheduleTask, level_schedule
+from project_store import ProjectStore, diff_states
+from cost_engine import evaluate_estimate
+from portfolio_runner import evaluate_portfolio
+
+
+class TestCalculationEngine(unittest.TestCase):
+    """Test suite for the calculation engine modules"""
+
+    def test_boq_pricing_matches_element_loop(self):
+        """Vectorized BoQ pricing joins norms and allocates consumables/indirect by weight"""
+        boq = pd.DataFrame({
+            "wbs_key": ["CONC.WALL", "CONC.SLAB", "CONC.SLAB", "CONC.STAIR"],
+            "qty": [10.0, 0.0, 30.0, 5.0],
+            "unit": ["m3", "m3", "m3", "m3"],
+        })
+        norms = {("CONC.WALL", "m3"): 6.0, ("CONC.SLAB", "m3"): 4.0}
+        priced, totals = price_boq(boq, 500.0, norms, difficulty_multiplier=1.1,
+                                   overhead_rate=0.15, consumables_rate=0.05, indirect_rate=0.12)
+
+        # Reference: the app's per-element loop
+        norm = np.array([6.0, 4.0, 4.0, 0.0]) * 1.1
+        base = 500.0 * norm * 1.15
+        base_total = (base * boq["qty"]).sum()
+        consumables_total = base_total * 0.05
+        indirect_total = (base_total + consumables_total) * 0.12
+        expected = base + (consumables_total + indirect_total) * base / base_total
+        expected[boq["qty"] == 0] = base[boq["qty"] == 0]
+
+        np.testing.assert_allclose(priced["total_per_u"], expected)
+        self.assertAlmostEqual(totals.project_total_cost, base_total + consumables_total + indirect_total)
+        self.assertEqual(totals.missing_norms, 1)
+        self.assertEqual(priced["total_cost"].dtype, np.float64)
+        print("✅ BoQ pricing tested successfully")
+
+    def test_workbook_writer_streams_numeric_sheets(self):
+        """Multi-sheet export keeps numbers numeric with per-column formats and spills past the row limit"""
+        from openpyxl import load_workbook
+
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(tmp_dir, "report.xlsx")
+            boq = pd.DataFrame({"wbs_key": ["A", "B", "C", "D", "E"], "qty": [1.5, 2.0, np.nan, 4.0, 5.0]})
+            with mock.patch.object(report_writers, "XLSX_MAX_ROWS", 3):
+                writer = XLSXWorkbookWriter(path)
+                writer.add_summary("Summary", [("Toplam", 12.5)], title="Rapor")
+                written = writer.add_dataframe("BoQ", boq, {"qty": "0.000"})
+                writer.close()
+            self.assertEqual(written, 5)
+
+            wb = load_workbook(path)
+            self.assertEqual(wb.sheetnames, ["Summary", "BoQ", "BoQ (2)", "BoQ (3)"])
+            self.assertEqual(wb["Summary"]["B3"].value, 12.5)
+            ws = wb["BoQ"]
+            self.assertEqual([c.value for c in ws[1]], ["wbs_key", "qty"])
+            self.assertEqual(ws["B2"].value, 1.5)
+            self.assertEqual(ws["B2"].number_format, "0.000")
+            self.assertIsNone(wb["BoQ (2)"]["B2"].value)
+            self.assertEqual(wb["BoQ (3)"]["A2"].value, "E")
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+        print("✅ Workbook writer tested successfully")
+
+    def test_report_writers_keep_schema_across_row_groups(self):
+        """Parquet uses the declared column types even when the first row group is all None; xlsx rolls over"""
+        import pyarrow.parquet as pq
+        from openpyxl import load_workbook
+
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            columns = ["work_date", "wbs_key", "qty", "weather"]
+            types = {"work_date": "date32", "qty": "float64"}
+            rows = [(date(2024, 1, d), "CONC.WALL", float(d), None) for d in range(1, 4)]
+            rows += [(date(2024, 1, 4), "CONC.SLAB", None, "rain"), (date(2024, 1, 5), "CONC.SLAB", 7, "sun")]
+            with mock.patch.object(report_writers, "PARQUET_ROW_GROUP", 2), \
+                    mock.patch.object(report_writers, "XLSX_MAX_ROWS", 4):
+                paths = report_writers.write_report(iter(rows), os.path.join(tmp_dir, "obs"), columns,
+                                                    ("parquet", "xlsx"), types)
+
+            table = pq.read_table(paths["parquet"])
+            self.assertEqual(str(table.schema.field("weather").type), "string")
+            self.assertEqual(str(table.schema.field("qty").type), "double")
+            self.assertEqual(table.column("weather").to_pylist(), [None, None, None, "rain", "sun"])
+            self.assertEqual(table.column("qty").to_pylist(), [1.0, 2.0, 3.0, None, 7.0])
+
+            wb = load_workbook(paths["xlsx"])
+            self.assertEqual(wb.sheetnames, ["Rapor", "Rapor (2)"])
+            self.assertEqual(wb["Rapor (2)"]["D3"].value, "sun")
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+        print("✅ Report writer schemas tested successfully")
+
+    def test_csv_report_keeps_float_precision(self):
+        """CSV keeps full float precision unless a column format is given, matching Parquet"""
+        import pyarrow.parquet as pq
+
+        tmp_dir = tempfile.mkdtemp()
+        try:
+            columns = ["wbs_key", "qty", "tutar"]
+            rows = [("CONC.SLAB", 1.125, 1234.5678), ("CONC.WALL", 0.0005, 10.0)]
+            paths = report_writers.write_report(iter(rows), os.path.join(tmp_dir, "rapor"), columns,
+                                                ("csv", "parquet"), {"qty": "float64", "tutar": "float64"},
+                                                float_formats={"tutar": "{:.2f}"})
+            with open(paths["csv"], encoding="utf-8-sig") as f:
+                lines = f.read().splitlines()
+            self.assertEqual(lines[1:], ["CONC.SLAB;1.125;1234.57", "CONC.WALL;0.0005;10.00"])
+            self.assertEqual(pq.read_table(paths["parquet"]).column("qty").to_pylist(), [1.125, 0.0005])
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+        print("✅ CSV report precision tested successfully")
+
+    def test_chart_cache_keys_on_data(self):
+        """Charts render once per numeric input and the least recently used entry is evicted"""
+        cache = ChartCache(max_entries=2)
+        renders = []
+
+        def render(tag):
+            renders.append(tag)
+            return tag.encode() * 10
+
+        key_a = chart_key("pie", "png", sizes=[np.float64(60.0), 40.0], labels=["a", "b"])
+        self.assertEqual(key_a, chart_key("pie", "png", sizes=[60.0, 40.0], labels=["a", "b"]))
+        key_b = chart_key("pie", "png", sizes=[50.0, 50.0], labels=["a", "b"])
+        key_c = chart_key("pie", "svg", sizes=[50.0, 50.0], labels=["a", "b"])
+
+        cache.get_or_render(key_a, lambda: render("a"))
+        cache.get_or_render(key_b, lambda: render("b"))
+        cache.get_or_render(key_a, lambda: render("a"))
+        cache.get_or_render(key_c, lambda: render("c"))
+        cache.get_or_render(key_b, lambda: render("b"))
+        self.assertEqual(renders, ["a", "b", "c", "b"])
+        self.assertEqual(cache.stats(), {"entries": 2, "bytes": 20, "hits": 1, "misses": 4})
+
+        spec = manpower_spec(["2025-01", "2025-02"], [np.int64(3), 5], "Manpower")
+        self.assertEqual(spec["data"]["values"][1], {"month": "2025-02", "headcount": 5})
+        print("✅ Chart cache tested successfully")
+
+    def test_manpower_distribution_rounding(self):
+        """Profiles match the app's formulas and largest-remainder rounding keeps row totals"""
+        weights = distribution_weights(5, "Klasik Parabolik", min_weight=0.1)
+        raw = np.maximum(-4 * (np.linspace(0, 1, 5) - 0.5) ** 2 + 1, 0.1)
+        np.testing.assert_allclose(weights, raw / raw.sum())
+        advanced = distribution_weights(11, "Gelişmiş Parabolik", peak_pos=0.4)
+        self.assertAlmostEqual(advanced.sum(), 1.0)
+        self.assertEqual(int(np.argmax(advanced)), 4)
+
+        self.assertEqual(round_preserve_sum([1.4, 1.4, 1.2]).tolist(), [2, 1, 1])
+        self.assertEqual(round_preserve_sum([0.5, 0.5, 0.5, 0.5]).tolist(), [1, 1, 0, 0])
+
+        matrix = role_month_matrix(100.0, [0.2, 0.3, 0.5], distribution_weights(36, "Sigmoid"))
+        self.assertEqual(matrix.shape, (3, 36))
+        self.assertEqual(matrix.sum(axis=1).tolist(), [20, 30, 50])
+        columns = round_preserve_sum(np.full((4, 3), 0.75), axis=0)
+        self.assertEqual(columns.sum(axis=0).tolist(), [3, 3, 3])
+        print("✅ Manpower distribution tested successfully")
+
+    def test_leveled_schedule_respects_caps(self):
+        """The scheduler follows predecessors, levels the peak and keeps role and lodging caps"""
+        tasks = [
+            ScheduleTask("grobeton", 1000),
+            ScheduleTask("temel", 4000, ("grobeton",)),
+            ScheduleTask("perde", 6000, ("temel",), min_periods=3),
+            ScheduleTask("merdiven", 1000, ("perde",), max_crew=2),
+        ]
+        period_hours = np.full(12, 200.0)
+        plan = level_schedule(tasks, period_hours, role_shares={"usta": 0.25, "isci": 0.75},
+                              role_caps={"usta": 2}, max_headcount=10)
+        self.assertTrue(plan.feasible)
+        np.testing.assert_allclose((plan.task_crew.to_numpy() * period_hours).sum(axis=1), [1000, 4000, 6000, 1000])
+        self.assertLessEqual(plan.headcount.max(), 8)
+        self.assertLessEqual(plan.role_matrix.loc["usta"].max(), 2)
+        self.assertTrue((plan.role_matrix.sum(axis=0).to_numpy() == plan.headcount).all())
+        self.assertLessEqual(plan.task_crew.loc["merdiven"].max(), 2 + 1e-9)
+        first_perde = int(np.argmax(plan.task_crew.loc["perde"].to_numpy() > 0))
+        last_temel = int(np.nonzero(plan.task_crew.loc["temel"].to_numpy())[0][-1])
+        self.assertGreaterEqual(first_perde, last_temel)
+
+        tight = level_schedule(tasks, period_hours, max_headcount=2)
+        self.assertFalse(tight.feasible)
+        self.assertGreater(tight.unscheduled_hours, 0)
+        with self.assertRaises(ValueError):
+            level_schedule([ScheduleTask("a", 1, ("b",)), ScheduleTask("b", 1, ("a",))], period_hours)
+        print("✅ Leveled schedule tested successfully")
+
+    def test_project_store_versions(self):
+        """Project state round-trips through SQLite versions, dedupes saves and diffs versions"""
+        tmp_dir = tempfile.mkdtemp()
+        store = ProjectStore(os.path.join(tmp_dir, "projects.db"))
+        try:
+            roles = pd.DataFrame({"Rol (Роль)": ["brigadir", "betoncu"], "Ağırlık (Вес)": [0.1, 1.0]})
+            metraj = pd.DataFrame({"Eleman (Элемент)": [f"E{i}" for i in range(5000)],
+                                   "Metraj (m³) (Объём, м³)": np.linspace(0, 100, 5000)})
+            state = {"roles_df": roles, "metraj_df": metraj, "start_date": date(2025, 3, 1),
+                     "diff": {"winter": {"on": True, "pct": 5.0}}, "food_inp": 10000.0, "sel_temel": True}
+            self.assertEqual(store.save("Blok A", state, "ilk"), 1)
+            self.assertEqual(store.save("Blok A", dict(state)), 1)
+            changed = dict(state, food_inp=12000.0, diff={"winter": {"on": True, "pct": 7.5}},
+                           roles_df=roles.assign(**{"Ağırlık (Вес)": [0.2, 1.0]}))
+            self.assertEqual(store.save("Blok A", changed, "yemek"), 2)
+
+            start = time.perf_counter()
+            loaded = store.load("Blok A", 1)
+            self.assertLess(time.perf_counter() - start, 0.1)
+            pd.testing.assert_frame_equal(loaded["metraj_df"], metraj, check_dtype=False)
+            self.assertEqual(loaded["start_date"], date(2025, 3, 1))
+            self.assertEqual(store.list_versions("Blok A")["version"].tolist(), [2, 1])
+
+            changes = {c.path: c for c in store.diff("Blok A", 1)}
+            self.assertEqual(set(changes), {"diff.winter.pct", "food_inp", "roles_df"})
+            self.assertEqual((changes["food_inp"].old, changes["food_inp"].new), (10000.0, 12000.0))
+            with self.assertRaises(KeyError):
+                store.load("Blok A", 9)
+        finally:
+            store.close()
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+        print("✅ Project store tested successfully")
+
+    def test_project_store_reuse_after_close(self):
+        """A closed store reopens its connection on the next call"""
+        tmp_dir = tempfile.mkdtemp()
+        store = ProjectStore(os.path.join(tmp_dir, "projects.db"))
+        try:
+            store.save("Blok B", {"food_inp": 10000.0})
+            store.close()
+            self.assertEqual(store.load("Blok B")["food_inp"], 10000.0)
+            self.assertEqual(store.save("Blok B", {"food_inp": 11000.0}), 2)
+        finally:
+            store.close()
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+        print("✅ Project store reuse after close tested successfully")
+
+    def test_diff_states_frames(self):
+        """NaN cells equal on both sides are unchanged; a table replaced by a scalar is one change"""
+        old = pd.DataFrame({"qty": [1.0, np.nan, 3.0], "note": ["a", None, "c"]})
+        self.assertEqual(diff_states({"t": old}, {"t": old.copy()}), [])
+        changes = diff_states({"t": old, "m": old}, {"t": old.assign(qty=[1.0, np.nan, 4.0]), "m": None})
+        self.assertEqual([(c.path, c.old, c.new) for c in changes],
+                         [("m", "3 satır x 2 kolon", None), ("t", "3 satır x 2 kolon", "1 hücre değişti")])
+        print("✅ State diff tested successfully")
+
+    def test_portfolio_runner_evaluates_saved_projects(self):
+        """Saved projects are evaluated headlessly; the process pool matches the serial run"""
+        tmp_dir = tempfile.mkdtemp()
+        db_path = os.path.join(tmp_dir, "projects.db")
+        store = ProjectStore(db_path)
+        try:
+            roles = pd.DataFrame({"Rol (Роль)": ["brigadir", "betoncu"], "Ağırlık (Вес)": [0.2, 1.0],
+                                  "Net Maaş (₽, na ruki) (Чистая з/п, ₽)": [150000, 90000],
+                                  "%RUS": [50, 10], "%SNG": [50, 70], "%TUR": [0, 20]})
+            base = {"roles_df": roles, "start_date": date(2025, 3, 1), "end_date": date(2025, 12, 31),
+                    "use_metraj": True, **{f"sel_{k}": k == "temel" for k in
+                                           ("grobeton", "rostverk", "temel", "doseme", "perde", "merdiven")}}
+            for i, scenario in enumerate(["İdeal", "Gerçekçi", "Kötü", "Gerçekçi", "Kötü"]):
+                metraj = pd.DataFrame({"Eleman (Элемент)": ["Temel (Фундамент)"],
+                                       "Metraj (m³) (Объём, м³)": [100.0 * (i + 1)]})
+                store.save(f"Bina {i}", dict(base, metraj_df=metraj, scenario=scenario, f_winter=0.1))
+            store.save("Boş", dict(base, roles_df=pd.DataFrame()))
+
+            est = evaluate_estimate(store.load("Bina 1"))
+            self.assertAlmostEqual(est.total_labor_hours, 200.0 * 16.0 * 1.1)
+            self.assertAlmostEqual(est.general_avg_m3 * est.total_metraj, est.project_total_cost)
+            self.assertEqual(len(est.scenario_sweep_df), 3)
+        finally:
+            store.close()
+
+        try:
+            serial = evaluate_portfolio(store_path=db_path, max_workers=1)
+            pooled = evaluate_portfolio(store_path=db_path, max_workers=2)
+            pd.testing.assert_frame_equal(serial, pooled)
+            ok = pooled.set_index("Proje (Проект)")
+            self.assertEqual(len(ok), 6)
+            self.assertIn("Rol", ok.loc["Boş", "Hata (Ошибка)"])
+            self.assertTrue(ok.drop("Boş")["Hata (Ошибка)"].isna().all())
+            self.assertEqual(ok.loc["Bina 2", "Sürüm (Версия)"], 1)
+            peaks = ok.drop("Boş")["Tepe kişi (Пик численности)"]
+            self.assertTrue((peaks >= ok.drop("Boş")["Kişi-ay (Чел·мес)"] / 10).all())
+            self.assertGreater(ok.loc["Bina 2", "Giderli A·S (₽/a·s)"], ok.loc["Bina 0", "Giderli A·S (₽/a·s)"])
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+        print("✅ Portfolio runner tested successfully")
+
+
+def run_calculation_engine_tests():
+    """Run all calculation engine tests"""
+    print("🧪 Starting Calculation Engine Test Suite")
+    print("=" * 80)
+
+    test_suite = unittest.TestLoader().loadTestsFromTestCase(TestCalculationEngine)
+    runner = unittest.TextTestRunner(verbosity=2)
+    result = runner.run(test_suite)
+
+    print("\n" + "=" * 80)
+    print(f"Tests run: {result.testsRun}")
+    print(f"Failures: {len(result.failures)}")
+    print(f"Errors: {len(result.errors)}")
+    return result.wasSuccessful()
+
+
+if __name__ == "__main__":
+    success = run_calculation_engine_tests()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,194 @@
+# -*- coding: utf-8 -*-
+"""
+Chart Render
+Sonuçlar sekmesi grafikleri (pasta, aylık manpower) sayısal veriden anahtarlanan bir
+önbellekte bir kez PNG/SVG baytına çizilir; aynı girdilerle yeniden çalıştırmada
+matplotlib hiç çağrılmaz. İstemci tarafı çizim için aynı veriden Vega-Lite şablonu üretilir.
+"""
+
+import io
+import json
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Sequence
+
+logger = logging.getLogger(__name__)
+
+# Opsiyonel bağımlılık: pyplot yerine Figure kullanılır (global durum yok, thread-safe)
+try:
+    from matplotlib.figure import Figure
+    MATPLOTLIB_AVAILABLE = True
+except ImportError:
+    MATPLOTLIB_AVAILABLE = False
+
+CHART_CACHE_MAX_ENTRIES = 64
+CHART_CACHE_MAX_BYTES = 32 * 1024 * 1024
+
+
+def _json_default(value):
+    # numpy sayıları -> Python sayısı
+    return value.item() if hasattr(value, "item") else str(value)
+
+
+def chart_key(kind: str, fmt: str, **params) -> str:
+    """Grafik türü + format + sayısal veriden kararlı anahtar"""
+    payload = json.dumps({"kind": kind, "fmt": fmt, **params}, sort_keys=True, default=_json_default)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+class ChartCache:
+    """Çizilmiş grafik baytları için LRU önbellek (adet ve toplam bayt sınırlı)"""
+
+    def __init__(self, max_entries: int = CHART_CACHE_MAX_ENTRIES, max_bytes: int = CHART_CACHE_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._items: "OrderedDict[str, bytes]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_render(self, key: str, render: Callable[[], bytes]) -> bytes:
+        with self._lock:
+            data = self._items.get(key)
+            if data is not None:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return data
+            self.misses += 1
+        data = render()
+        with self._lock:
+            if key not in self._items:
+                self._items[key] = data
+                self._bytes += len(data)
+                self._evict()
+        return data
+
+    def _evict(self):
+        while self._items and (len(self._items) > self.max_entries or self._bytes > self.max_bytes):
+            _, old = self._items.popitem(last=False)
+            self._bytes -= len(old)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"entries": len(self._items), "bytes": self._bytes, "hits": self.hits, "misses": self.misses}
+
+
+_chart_cache = None
+
+
+def get_chart_cache() -> ChartCache:
+    """Global grafik önbelleği (oturumlar arası paylaşılır)"""
+    global _chart_cache
+    if _chart_cache is None:
+        _chart_cache = ChartCache()
+    return _chart_cache
+
+
+def _figure_bytes(fig, fmt: str) -> bytes:
+    buf = io.BytesIO()
+    fig.savefig(buf, format=fmt, dpi=100, bbox_inches="tight")
+    return buf.getvalue()
+
+
+def _render_pie(sizes, labels, colors, title, fmt) -> bytes:
+    fig = Figure(figsize=(8, 6))
+    ax = fig.subplots()
+    _, texts, autotexts = ax.pie(sizes, labels=labels, colors=colors, autopct='%1.1f%%', startangle=90)
+    ax.set_title(title, fontsize=14, fontweight='bold')
+    for t in autotexts:
+        t.set_fontsize(10)
+        t.set_fontweight("bold")
+    for t in texts:
+        t.set_fontsize(12)
+    return _figure_bytes(fig, fmt)
+
+
+def _render_manpower(months, headcounts, title, fmt) -> bytes:
+    fig = Figure(figsize=(12, 6))
+    ax = fig.subplots()
+    bars = ax.bar(months, headcounts, color='skyblue', alpha=0.7, edgecolor='navy', linewidth=1)
+    ax.plot(range(len(months)), headcounts, 'o-', color='red', linewidth=2,
+            markersize=8, markerfacecolor='white', markeredgecolor='red')
+    for rect, val in zip(bars, headcounts):
+        ax.text(rect.get_x() + rect.get_width()/2, rect.get_height() + 0.5,
+                f"{int(val)}", ha="center", va="bottom", fontsize=11, fontweight='bold', color='darkblue')
+    ax.set_xlabel("Ay (Месяц)", fontsize=12, fontweight='bold')
+    ax.set_ylabel("Kişi (Человек)", fontsize=12, fontweight='bold')
+    ax.set_title(title, fontsize=14, fontweight='bold', pad=20)
+    ax.grid(True, axis="y", alpha=0.3, linestyle='--')
+    ax.spines['top'].set_visible(False)
+    ax.spines['right'].set_visible(False)
+    ax.tick_params(axis="x", labelrotation=45, labelsize=10)
+    for label in ax.get_xticklabels():
+        label.set_horizontalalignment("right")
+    ax.tick_params(axis="y", labelsize=10)
+    ax.set_ylim(bottom=0)
+    fig.tight_layout()
+    return _figure_bytes(fig, fmt)
+
+
+def pie_chart(sizes: Sequence[float], labels: Sequence[str], colors: Sequence[str], title: str,
+              fmt: str = "png") -> bytes:
+    """Pasta grafiği baytları (önbellekten ya da bir kez çizilerek)"""
+    sizes = [float(s) for s in sizes]
+    key = chart_key("pie", fmt, sizes=sizes, labels=list(labels), colors=list(colors), title=title)
+    return get_chart_cache().get_or_render(key, lambda: _render_pie(sizes, labels, colors, title, fmt))
+
+
+def manpower_chart(months: Sequence[str], headcounts: Sequence[int], title: str, fmt: str = "png") -> bytes:
+    """Aylık manpower bar + trend grafiği baytları"""
+    months = [str(m) for m in months]
+    headcounts = [int(h) for h in headcounts]
+    key = chart_key("manpower", fmt, months=months, headcounts=headcounts, title=title)
+    return get_chart_cache().get_or_render(key, lambda: _render_manpower(months, headcounts, title, fmt))
+
+
+def pie_spec(sizes: Sequence[float], labels: Sequence[str], colors: Sequence[str], title: str) -> Dict[str, Any]:
+    """İstemci tarafı pasta grafiği (Vega-Lite)"""
+    total = sum(float(s) for s in sizes) or 1.0
+    values = [{"label": l, "value": float(s), "share": float(s) / total} for l, s in zip(labels, sizes)]
+    return {
+        "title": title,
+        "data": {"values": values},
+        "mark": {"type": "arc", "tooltip": True},
+        "encoding": {
+            "theta": {"field": "value", "type": "quantitative", "stack": True},
+            "color": {"field": "label", "type": "nominal", "sort": None,
+                      "scale": {"domain": list(labels), "range": list(colors)}},
+            "tooltip": [{"field": "label", "type": "nominal"},
+                        {"field": "share", "type": "quantitative", "format": ".1%"}],
+        },
+    }
+
+
+def manpower_spec(months: Sequence[str], headcounts: Sequence[int], title: str) -> Dict[str, Any]:
+    """İstemci tarafı manpower grafiği (bar + trend çizgisi + değer etiketleri)"""
+    values = [{"month": str(m), "headcount": int(h)} for m, h in zip(months, headcounts)]
+    x = {"field": "month", "type": "ordinal", "title": "Ay (Месяц)", "axis": {"labelAngle": -45}}
+    y = {"field": "headcount", "type": "quantitative", "title": "Kişi (Человек)"}
+    return {
+        "title": title,
+        "data": {"values": values},
+        "encoding": {"x": x, "y": y},
+        "layer": [
+            {"mark": {"type": "bar", "color": "skyblue", "opacity": 0.7, "stroke": "navy", "tooltip": True}},
+            {"mark": {"type": "line", "color": "red", "point": {"filled": False, "fill": "white", "color": "red"}}},
+            {"mark": {"type": "text", "dy": -8, "fontWeight": "bold", "color": "darkblue"},
+             "encoding": {"text": {"field": "headcount", "type": "quantitative"}}},
+        ],
+    }
+
+
+# Grafik türü -> (önbellekli görüntü, istemci tarafı şablon)
+CHART_KINDS = {
+    "pie": (pie_chart, pie_spec),
+    "manpower": (manpower_chart, manpower_spec),
+}
@@ -0,0 +1,568 @@
+# -*- coding: utf-8 -*-
+"""
+Cost Engine
+Arayüzsüz maliyet motoru: HESAPLA adımı (senaryo normu x zorluk x metraj, takvim, rol bazlı
+işveren maliyeti, A·S fiyatı, metraj fiyatlama, senaryo taraması) session state ile aynı
+anahtarları taşıyan herhangi bir sözlük üzerinde çalışır. Uygulama st.session_state'i,
+portföy çalıştırıcısı proje deposundan yüklenen durumu verir.
+"""
+
+import logging
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from typing import Any, Dict, List, Mapping, Optional
+
+import pandas as pd
+
+from boq_pricing import BoQTotals, price_boq
+from manpower_distribution import distribution_weights, headcounts
+
+logger = logging.getLogger(__name__)
+
+# =============== Sabitler ===============
+# NDFL: Net'ten brüt'e çevrimde kullanılıyor; işveren primleri "brüt"e uygulanır (brüt+NDFL DEĞİL)
+NDFL_RUS = 0.130
+NDFL_SNG = 0.130
+NDFL_TUR = 0.130  # VKS için sabit oran modu başlangıcı; progressive modda 13/15/18/20/22 kademeleri kullanılır
+
+# İşveren primleri (resmi BRÜT bazında)
+OPS = 0.220   # emeklilik
+OSS = 0.029  # sosyal
+OMS = 0.051  # sağlık
+NSIPZ_RISK_RUS_SNG = 0.009   # iş kazası/meslek hast. (RUS+SNG için tipik risk katsayısı)
+NSIPZ_RISK_TUR_VKS  = 0.018  # VKS (TR) için iş kazası riski
+
+# Patent + resmi tabanlar (sade model)
+SNG_PATENT_MONTH = 7000      # sabit aylık patent ödemesi (örn. Moskova ~8900 güncel olabilir)
+SNG_TAXED_BASE   = 33916     # resmi brüt tavan (aylık, sade model)
+TUR_TAXED_BASE   = 167000    # VKS için resmi brüt tavan (aylık, sade model)
+
+# Cash (elden) ödeme komisyonu — banka/çekim/kur riski gibi
+CASH_COMMISSION_RATE = 0.235
+
+# Varsayılan oranlar
+OVERHEAD_RATE_DEFAULT = 15.0  # Yüzde olarak (15.0%)
+OVERHEAD_RATE_MAX     = 25.0  # Yüzde olarak (25.0%)
+CONSUMABLES_RATE_DEFAULT = 5.0  # Yüzde olarak (5.0%)
+INDIRECT_RATE_DEFAULT = 0.12
+
+# Adam-saat normları
+SCENARIO_NORMS = {
+    "İdeal":     {"Grobeton": 8.0,  "Rostverk": 12.0, "Temel": 14.0, "Döşeme": 15.0, "Perde": 18.0, "Merdiven": 22.0},
+    "Gerçekçi":  {"Grobeton": 10.0, "Rostverk": 14.0, "Temel": 16.0, "Döşeme": 18.0, "Perde": 21.0, "Merdiven": 26.0},
+    "Kötü":      {"Grobeton": 12.0, "Rostverk": 16.0, "Temel": 19.0, "Döşeme": 22.0, "Perde": 26.0, "Merdiven": 32.0},
+}
+SCENARIO_BASELINE = "Gerçekçi"  # referans senaryo
+
+ELEMENT_ORDER = ["grobeton","rostverk","temel","doseme","perde","merdiven"]
+LABELS = {
+    "grobeton": "Grobeton (Подбетонка)",
+    "rostverk": "Rostverk (Ростверк)",
+    "temel":    "Temel (Фундамент)",
+    "doseme":   "Döşeme (Плита перекрытия)",
+    "perde":    "Perde (Стена/диафрагма)",
+    "merdiven": "Merdiven (Лестница)",
+}
+# Eleman normları - göreli katsayılar (Temel'e oranlanır)
+ELEMENT_RELATIVE_FACTORS = {
+    "grobeton": 0.8,
+    "rostverk": 0.9,
+    "temel":    1.0,   # baz
+    "doseme":   1.1,
+    "perde":    1.2,
+    "merdiven": 1.3,
+}
+# Metraj tablosundaki Rusça/tam etiketler -> kanonik anahtar
+ELEMENT_LABEL_KEYS = {
+    "Подбетонка": "grobeton",
+    "Ростверк": "rostverk",
+    "Фундамент": "temel",
+    "Плита перекрытия": "doseme",
+    "Стена/диафрагма": "perde",
+    "Лестница": "merdiven",
+    **{full: k for k, full in LABELS.items()},
+}
+DIFFICULTY_KEYS = ("f_winter", "f_heavy", "f_repeat", "f_shared", "f_cong", "f_pump")
+DEFAULT_DISTRIBUTION = "Klasik Parabolik"
+
+COL_ELEMENT = "Eleman (Элемент)"
+COL_METRAJ = "Metraj (m³) (Объём, м³)"
+COL_NET = "Net Maaş (₽, na ruki) (Чистая з/п, ₽)"
+COL_WEIGHT = "Ağırlık (Вес)"
+
+
+# =============== Vergi / işveren maliyeti ===============
+
+def gross_from_net(net: float, ndfl_rate: float) -> float:
+    return float(net) if ndfl_rate<=0 else float(net)/(1.0-ndfl_rate)
+
+def employer_cost_for_gross(gross: float, ops: float, oss: float, oms: float, nsipz: float) -> float:
+    return float(gross)*(1.0+ops+oss+oms+nsipz)
+
+# --- Progressive NDFL helpers (resident brackets 2025) ---
+def _resident_ndfl_brackets_2025() -> list[tuple[float|None, float]]:
+    """Returns [(upper_limit, rate), ...] with last upper_limit=None as infinity."""
+    # Annual thresholds (RUB) and rates
+    return [
+        (2_400_000.0, 0.13),
+        (5_000_000.0, 0.15),
+        (20_000_000.0, 0.18),
+        (50_000_000.0, 0.20),
+        (None, 0.22),
+    ]
+
+def gross_from_net_progressive_resident(net_annual: float) -> float:
+    """Invert progressive tax to get annual gross from annual net, using resident brackets 2025."""
+    try:
+        target_net = max(0.0, float(net_annual))
+    except Exception:
+        target_net = 0.0
+    if target_net <= 0.0:
+        return 0.0
+
+    brackets = _resident_ndfl_brackets_2025()
+    gross_accum = 0.0
+    net_remaining = target_net
+    prev_limit = 0.0
+
+    for upper, rate in brackets:
+        segment_width = (upper - prev_limit) if upper is not None else None
+        segment_net_cap = (segment_width * (1.0 - rate)) if segment_width is not None else None
+
+        if segment_width is None:
+            # infinite top bracket
+            gross_accum += net_remaining / (1.0 - rate)
+            net_remaining = 0.0
+            break
+
+        if net_remaining >= segment_net_cap - 1e-9:
+            # fill entire segment
+            gross_accum += segment_width
+            net_remaining -= segment_net_cap
+            prev_limit = upper
+            continue
+        else:
+            # partial in this segment
+            gross_accum += net_remaining / (1.0 - rate)
+            net_remaining = 0.0
+            break
+
+    return gross_accum
+
+
+def role_monthly_cost(row: Mapping[str, Any], prim_sng: bool, prim_tur: bool, extras_person_ex_vat: float,
+                      overrides: Optional[Mapping[str, float]] = None, progressive_ndfl: bool = True) -> dict:
+    """
+    Rol başına aylık işveren maliyeti (RUS/SNG/TUR ve ülke karmasına göre BLENDED).
+    - İşveren primleri, yalnız RESMİ BRÜT tutara uygulanır (OPS/OSS/OMS + NSiPZ). Brüt+NDFL değil.
+    - 'Gayriresmî/Elden' (nakit) kısma hiçbir vergi/prim eklenmez; sadece komisyon (CASH_COMMISSION_RATE) eklenir.
+    - SNG (patent): resmi brüt, SNG_TAXED_BASE ile sınırlanır; + aylık patent tutarı eklenir.
+    - VKS (TR): yalnız NSiPZ uygulanır (OPS/OSS/OMS = 0).
+    overrides: sabitler sekmesindeki CONST_OVERRIDES sözlüğü.
+    """
+    net=float(row[COL_NET])
+
+    OVR = overrides or {}
+    ndfl_rus = OVR.get("NDFL_RUS", NDFL_RUS)
+    ndfl_sng = OVR.get("NDFL_SNG", NDFL_SNG)
+    ndfl_tur = OVR.get("NDFL_TUR", NDFL_TUR)
+    ops = OVR.get("OPS", OPS)
+    oss = OVR.get("OSS", OSS)
+    oms = OVR.get("OMS", OMS)
+    nsipz_risk_rus_sng = OVR.get("NSIPZ_RISK_RUS_SNG", NSIPZ_RISK_RUS_SNG)
+    nsipz_risk_tur_vks = OVR.get("NSIPZ_RISK_TUR_VKS", NSIPZ_RISK_TUR_VKS)
+    sng_patent_month = OVR.get("SNG_PATENT_MONTH", SNG_PATENT_MONTH)
+    sng_taxed_base = OVR.get("SNG_TAXED_BASE", SNG_TAXED_BASE)
+    tur_taxed_base = OVR.get("TUR_TAXED_BASE", TUR_TAXED_BASE)
+    cash_commission_rate = OVR.get("CASH_COMMISSION_RATE", CASH_COMMISSION_RATE)
+
+    # Vergi rejimi: Artan (2025) mı, sabit oran mı?
+    # RUS (tam sigortalı)
+    if progressive_ndfl:
+        gross_rus = gross_from_net_progressive_resident(net*12.0) / 12.0
+    else:
+        gross_rus = gross_from_net(net, ndfl_rus)
+    per_rus   = employer_cost_for_gross(gross_rus, ops, oss, oms, nsipz_risk_rus_sng) + extras_person_ex_vat
+
+    # SNG (patent; tüm sigorta sistemleri + patent; resmi brüt asgariyi sağlar)
+    if progressive_ndfl:
+        # 2025 kademeli NDFL’i yıllık bazda uygula (patent avansı mahsup edilmez — sade model)
+        gross_sng_full = gross_from_net_progressive_resident(net*12.0) / 12.0
+    else:
+        gross_sng_full = gross_from_net(net, ndfl_sng)
+    # Resmi brüt asgariyi sağla
+    min_off_sng = float(sng_taxed_base)
+    if gross_sng_full < min_off_sng:
+        gross_sng_full = min_off_sng
+    if prim_sng:
+        gross_sng_off = min_off_sng                               # resmi brüt en az asgari
+        prim_amount   = max(gross_sng_full - gross_sng_off, 0.0)   # elden kısım (vergisiz/primsiz)
+        commission    = prim_amount * cash_commission_rate
+    else:
+        gross_sng_off = gross_sng_full                             # prim yoksa tamamı resmi olabilir
+        prim_amount   = 0.0
+        commission    = 0.0
+    per_sng = employer_cost_for_gross(gross_sng_off, ops, oss, oms, nsipz_risk_rus_sng) \
+              + sng_patent_month + extras_person_ex_vat + prim_amount + commission
+
+    # TUR (VKS; yalnız iş kazası primi; resmi brüt asgariyi sağlar)
+    if progressive_ndfl:
+        # VKS (TR) — progressive NDFL resident brackets on annualized basis (12 aylık varsayım)
+        gross_tur_full = gross_from_net_progressive_resident(net*12.0) / 12.0
+    else:
+        gross_tur_full = gross_from_net(net, ndfl_tur)
+    # Resmi brüt asgariyi sağla
+    min_off_tur = float(tur_taxed_base)
+    if gross_tur_full < min_off_tur:
+        gross_tur_full = min_off_tur
+    if prim_tur:
+        gross_tur_off = min_off_tur
+        prim_tr       = max(gross_tur_full - gross_tur_off, 0.0)
+        comm_tr       = prim_tr * cash_commission_rate
+    else:
+        gross_tur_off = gross_tur_full
+        prim_tr       = 0.0
+        comm_tr       = 0.0
+    per_tur = employer_cost_for_gross(gross_tur_off, 0.0,0.0,0.0,nsipz_risk_tur_vks) \
+              + extras_person_ex_vat + prim_tr + comm_tr
+
+    # Ülke karması
+    p_rus=max(float(row["%RUS"]),0.0); p_sng=max(float(row["%SNG"]),0.0); p_tur=max(float(row["%TUR"]),0.0)
+    tot=p_rus+p_sng+p_tur or 100.0
+    p_rus,p_sng,p_tur = p_rus/tot, p_sng/tot, p_tur/tot
+    blended=p_rus*per_rus+p_sng*per_sng+p_tur*per_tur
+
+    return {"per_person":{"RUS":per_rus,"SNG":per_sng,"TUR":per_tur,"BLENDED":blended}}
+
+
+def normalize_country(p_rus, p_sng, p_tur) -> tuple:
+    """Ülke yüzdelerini normalize et (0-0-0 ise eşit böl)"""
+    vals = [max(float(p_rus), 0.0), max(float(p_sng), 0.0), max(float(p_tur), 0.0)]
+    s = sum(vals)
+    if s <= 0:
+        return (1/3.0, 1/3.0, 1/3.0)
+    return (vals[0]/s, vals[1]/s, vals[2]/s)
+
+
+# =============== Takvim ===============
+
+def workdays_between(start: date, end: date, mode: str) -> int:
+    if end < start: return 0
+    total=0
+    for i in range((end-start).days+1):
+        d = start + timedelta(days=i)
+        wd = d.weekday()
+        if mode=="tam_calisma": total+=1
+        elif mode=="her_pazar": total += (wd!=6)
+        elif mode=="hafta_sonu_tatil": total += (wd not in (5,6))
+        elif mode=="iki_haftada_bir_pazar":
+            if wd==6:
+                week_idx=((d-start).days//7)
+                if (week_idx%2)==1: continue
+            total+=1
+        else: total+=(wd!=6)
+
+    return total
+
+def month_start(d: date)->date: return d.replace(day=1)
+def next_month(d: date)->date:
+    return d.replace(year=d.year+1, month=1, day=1) if d.month==12 else d.replace(month=d.month+1, day=1)
+def last_day_of_month(d: date)->date: return next_month(d)-timedelta(days=1)
+
+def iter_months(start:date,end:date):
+    cur=month_start(start)
+    while cur<=end:
+        yield cur
+        cur=next_month(cur)
+
+def workdays_in_month_range(start: date, end: date, mode: str) -> pd.DataFrame:
+    rows=[]
+    for m0 in iter_months(start,end):
+        m1=last_day_of_month(m0)
+        a,b=max(start,m0),min(end,m1)
+        if a>b: continue
+        rows.append({"Ay (Месяц)":m0.strftime("%Y-%m"),"İş Günü (Раб. день)":workdays_between(a,b,mode)})
+    return pd.DataFrame(rows)
+
+
+# =============== Senaryo / zorluk ===============
+
+def effective_scenario_norms(state: Mapping[str, Any]) -> dict:
+    """SCENARIO_NORMS üzerine override varsa onu döndürür."""
+    ovr = state.get("SCENARIO_NORMS_OVR")
+    return ovr if isinstance(ovr, dict) and ovr else SCENARIO_NORMS
+
+
+def scenario_price_multiplier(norms_map: Mapping[str, Mapping[str, float]], scenario: str) -> float:
+    """Temel (Gerçekçi) ile senaryonun 'Temel' normu oranı"""
+    try:
+        ref = float(norms_map.get(SCENARIO_BASELINE, SCENARIO_NORMS["Gerçekçi"])["Temel"])
+        cur = float(norms_map.get(scenario, SCENARIO_NORMS["Gerçekçi"])["Temel"])
+        return (cur / ref) if ref > 0 else 1.0
+    except Exception:
+        return 1.0
+
+
+def difficulty_multiplier(state: Mapping[str, Any]) -> float:
+    """Zorluk faktörlerinin çarpımı: her f_k için (1 + f_k); 0.20 => +%20 verimsizlik"""
+    z = 1.0
+    for k in DIFFICULTY_KEYS:
+        try:
+            v = float(state.get(k, 0.0) or 0.0)
+        except Exception:
+            v = 0.0
+        z *= (1.0 + v)
+    return z
+
+
+def elements_boq_df(iterable, col_ele, col_met, norms_used) -> pd.DataFrame:
+    """Metraj satırlarından price_boq girdisi (eleman etiketi = anahtar, norm eleman özgü)"""
+    labels = [str(r[col_ele]) for r in iterable]
+    return pd.DataFrame({
+        "wbs_key": labels,
+        "qty": [float(r.get(col_met, 0.0) or 0.0) for r in iterable],
+        "unit": "m3",
+        "norm_lh_per_u": [norms_used[lbl] for lbl in labels],
+    })
+
+
+# =============== Motor ===============
+
+@dataclass
+class Estimate:
+    """Tek projenin HESAPLA çıktısı (sayısal; biçimlendirme gösterimde yapılır)"""
+    selected_elements: List[str]
+    scenario: str
+    scenario_base: float
+    difficulty_multiplier: float
+    scenario_multiplier: float
+    norm_mult: Dict[str, float]
+    norms_used: Dict[str, float]
+    uses_metraj: bool
+    total_metraj: float
+    total_labor_hours: float
+    start_date: date
+    end_date: date
+    holiday_mode: str
+    hours_per_day: float
+    workdays: int
+    project_days: int
+    avg_workdays_per_month: float
+    hours_per_person_month: float
+    month_wd_df: pd.DataFrame
+    n_months: int
+    person_months_total: float
+    extras_base: float
+    extras_per_person: float
+    monthly_cost_with: float
+    monthly_cost_bare: float
+    bare_as_price: float
+    with_extras_as_price: float
+    fully_loaded_as_price: float
+    overhead_rate_eff: float
+    consumables_rate_eff: float
+    indirect_rate_total: float
+    boq_df: pd.DataFrame
+    priced_df: pd.DataFrame
+    totals: BoQTotals
+    roles_calc_df: pd.DataFrame
+    scenario_sweep_df: pd.DataFrame = field(default_factory=pd.DataFrame)
+
+    @property
+    def project_total_cost(self) -> float:
+        return self.totals.project_total_cost
+
+    @property
+    def general_avg_m3(self) -> float:
+        return self.project_total_cost / max(self.total_metraj, 1e-9) if self.total_metraj > 0 else 0.0
+
+    def peak_headcount(self, dist_type: str = DEFAULT_DISTRIBUTION) -> int:
+        """Aylık tam kişi dağılımının tepesi (sonuçlar sekmesindeki dağılımla aynı)"""
+        weights = distribution_weights(self.n_months, dist_type)
+        return int(headcounts(self.person_months_total, weights).max()) if self.n_months else 0
+
+
+def selected_elements_from(state: Mapping[str, Any]) -> List[str]:
+    """sel_<anahtar> işaretli elemanlar (işaret yoksa seçili sayılır)"""
+    return [k for k in ELEMENT_ORDER if state.get(f"sel_{k}", True)]
+
+
+def _effective_rates(state: Mapping[str, Any]) -> tuple:
+    # Matrix override aktifse matris oranları, değilse grup hesaplanan oranlar
+    if state.get("use_matrix_override", False):
+        return (state.get("overhead_rate_eff", OVERHEAD_RATE_DEFAULT/100.0),
+                state.get("consumables_rate_eff", CONSUMABLES_RATE_DEFAULT/100.0),
+                state.get("indirect_rate_total_eff", INDIRECT_RATE_DEFAULT))
+    return (state.get("overhead_rate", OVERHEAD_RATE_DEFAULT/100.0),
+            state.get("consumables_rate", CONSUMABLES_RATE_DEFAULT/100.0),
+            state.get("indirect_rate_total", INDIRECT_RATE_DEFAULT))
+
+
+def evaluate_estimate(state: Mapping[str, Any], scenario_sweep: bool = True) -> Estimate:
+    """Session state anahtarlarıyla tahmini hesapla.
+
+    Eleman seçilmemişse ya da rol tablosu boşsa ValueError. scenario_sweep=False
+    senaryo taramasını atlar (portföy karşılaştırması için gerekmez).
+    """
+    roles_df = state.get("roles_df")
+    if roles_df is None:
+        roles_df = pd.DataFrame()
+    selected_elements = selected_elements_from(state)
+    if not selected_elements:
+        raise ValueError("En az bir betonarme eleman seçilmeli")
+    if roles_df.empty:
+        raise ValueError("Rol tablosu boş")
+
+    today = date.today()
+    start_date = state.get("start_date", today.replace(day=1))
+    end_date = state.get("end_date", last_day_of_month(today))
+    holiday_mode = state.get("holiday_mode", "her_pazar")
+    hours_per_day = float(state.get("hours_per_day", 10.0))
+    scenario = state.get("scenario", "Gerçekçi")
+
+    # Senaryo bazı (override destekli) ve zorluk çarpanı
+    norms_map = effective_scenario_norms(state)
+    scenario_base = float((norms_map.get(scenario) or SCENARIO_NORMS["Gerçekçi"])["Temel"])
+    z_mult = difficulty_multiplier(state)
+
+    # Seçili elemanlar arasında normalize et (ortalama 1 olacak şekilde)
+    selected_factors = {k: ELEMENT_RELATIVE_FACTORS[k] for k in selected_elements if k in ELEMENT_RELATIVE_FACTORS}
+    if selected_factors:
+        avg_factor = sum(selected_factors.values()) / len(selected_factors)
+        norm_mult = {k: v / avg_factor for k, v in selected_factors.items()}
+    else:
+        norm_mult = {"temel": 1.0}
+
+    metraj_df = state.get("metraj_df")
+    uses_metraj = bool(state.get("use_metraj", False)) and metraj_df is not None and not metraj_df.empty
+    if uses_metraj:
+        iterable = metraj_df.to_dict(orient="records")
+    else:
+        iterable = [{COL_ELEMENT: LABELS[k], COL_METRAJ: 1.0} for k in selected_elements if k in LABELS]
+
+    # Eleman normu: n_e = senaryo_temel * göreli_katsayı * zorluk
+    norms_used: Dict[str, float] = {}
+    total_metraj = 0.0
+    total_labor_hours = 0.0
+    for r in iterable:
+        lbl = str(r[COL_ELEMENT])
+        met = float(r.get(COL_METRAJ, 0.0) or 0.0)
+        n_e = scenario_base * norm_mult.get(ELEMENT_LABEL_KEYS.get(lbl, lbl), 1.0) * z_mult
+        norms_used[lbl] = n_e
+        total_metraj += met
+        total_labor_hours += met * n_e
+
+    # Takvim
+    workdays = workdays_between(start_date, end_date, holiday_mode)
+    project_days = max((end_date - start_date).days + 1, 1)
+    avg_workdays_per_month = workdays * 30.0 / project_days
+    hours_per_person_month = max(avg_workdays_per_month * hours_per_day, 1e-9)
+    month_wd_df = workdays_in_month_range(start_date, end_date, holiday_mode)
+    n_months = len(month_wd_df) if not month_wd_df.empty else 1
+    person_months_total = total_labor_hours / hours_per_person_month
+
+    # Kişi-başı giderler (KDV işaretliyse KDV'siz tutar)
+    vat_rate = float(state.get("vat_rate", 0.20))
+    extras = [
+        (float(state.get("food", 10000.0)), bool(state.get("food_vat", True))),
+        (float(state.get("lodging", 12000.0)), bool(state.get("lodging_vat", True))),
+        (float(state.get("transport", 3000.0)), bool(state.get("transport_vat", False))),
+        (float(state.get("ppe", 1500.0)), bool(state.get("ppe_vat", True))),
+        (float(state.get("training", 500.0)), bool(state.get("training_vat", True))),
+    ]
+    extras_base = sum(x for x, _ in extras)
+    extras_per_person = sum(x / (1 + vat_rate) if tick else x for x, tick in extras)
+
+    # Rol ağırlıklı aylık maliyet -> A·S fiyatı
+    prim_sng = state.get("prim_sng", True)
+    prim_tur = state.get("prim_tur", True)
+    overrides = state.get("CONST_OVERRIDES", {}) or {}
+    progressive = bool(state.get("use_progressive_ndfl", True))
+    sum_w = float(roles_df[COL_WEIGHT].clip(lower=0.0).sum())
+    M_with = M_bare = 0.0
+    roles_calc = []
+    for _, row in (roles_df.iterrows() if sum_w > 0 else ()):
+        w = max(float(row[COL_WEIGHT]), 0.0)
+        share = w / sum_w
+        per_with = role_monthly_cost(row, prim_sng, prim_tur, extras_per_person, overrides, progressive)["per_person"]["BLENDED"]
+        per_bare = role_monthly_cost(row, prim_sng, prim_tur, 0.0, overrides, progressive)["per_person"]["BLENDED"]
+        M_with += share * per_with
+        M_bare += share * per_bare
+        p_rus, p_sng, p_tur = normalize_country(row["%RUS"], row["%SNG"], row["%TUR"])
+        roles_calc.append({
+            "Rol (Роль)": row["Rol (Роль)"],
+            "Ağırlık (Вес)": w,
+            "Pay (%) (Доля, %)": share * 100,
+            "Ortalama Kişi (Средняя численность)": (person_months_total / n_months) * share,
+            "Maliyet/ay (₽)": per_with,
+            "%RUS": p_rus * 100,
+            "%SNG": p_sng * 100,
+            "%TUR": p_tur * 100,
+            "Net Maaş (₽/ay)": float(row.get(COL_NET, 0)),
+        })
+
+    # Fiyat verimliliği izler (senaryo + zorluk)
+    s_mult = scenario_price_multiplier(norms_map, scenario)
+    price_mult = s_mult * z_mult
+    with_extras_as_price = M_with / hours_per_person_month * price_mult
+    bare_as_price = M_bare / hours_per_person_month * price_mult
+
+    overhead_rate_eff, consumables_rate_eff, indirect_rate_total = _effective_rates(state)
+    overhead_rate = min(max(overhead_rate_eff, 0.0), OVERHEAD_RATE_MAX/100.0)
+    boq_df = elements_boq_df(iterable, COL_ELEMENT, COL_METRAJ, norms_used)
+    priced_df, totals = price_boq(boq_df, with_extras_as_price, overhead_rate=overhead_rate,
+                                  consumables_rate=consumables_rate_eff, indirect_rate=indirect_rate_total)
+
+    # Senaryo taraması: aynı metraj, senaryonun Temel normu ve A·S fiyat çarpanı oranlanarak
+    sweep_rows = []
+    for sc in (SCENARIO_NORMS if scenario_sweep else ()):
+        norm_ratio = float((norms_map.get(sc) or SCENARIO_NORMS[sc])["Temel"]) / max(scenario_base, 1e-9)
+        price_ratio = scenario_price_multiplier(norms_map, sc) / max(s_mult, 1e-9)
+        _, sc_totals = price_boq(boq_df.assign(norm_lh_per_u=boq_df["norm_lh_per_u"] * norm_ratio),
+                                 with_extras_as_price * price_ratio, overhead_rate=overhead_rate,
+                                 consumables_rate=consumables_rate_eff, indirect_rate=indirect_rate_total)
+        sweep_rows.append({
+            "Senaryo (Сценарий)": sc,
+            "Toplam a·s (Итого чел·ч)": sc_totals.total_labor_hours,
+            "Toplam maliyet (₽) (Итого, ₽)": sc_totals.project_total_cost,
+            "Ortalama (₽/m³) (Средняя, ₽/м³)": sc_totals.project_total_cost / max(total_metraj, 1e-9) if total_metraj > 0 else 0.0,
+        })
+
+    return Estimate(
+        selected_elements=selected_elements,
+        scenario=scenario,
+        scenario_base=scenario_base,
+        difficulty_multiplier=z_mult,
+        scenario_multiplier=s_mult,
+        norm_mult=norm_mult,
+        norms_used=norms_used,
+        uses_metraj=uses_metraj,
+        total_metraj=total_metraj,
+        total_labor_hours=total_labor_hours,
+        start_date=start_date,
+        end_date=end_date,
+        holiday_mode=holiday_mode,
+        hours_per_day=hours_per_day,
+        workdays=workdays,
+        project_days=project_days,
+        avg_workdays_per_month=avg_workdays_per_month,
+        hours_per_person_month=hours_per_person_month,
+        month_wd_df=month_wd_df,
+        n_months=n_months,
+        person_months_total=person_months_total,
+        extras_base=extras_base,
+        extras_per_person=extras_per_person,
+        monthly_cost_with=M_with,
+        monthly_cost_bare=M_bare,
+        bare_as_price=bare_as_price,
+        with_extras_as_price=with_extras_as_price,
+        fully_loaded_as_price=totals.project_total_cost / max(total_labor_hours, 1e-9) if total_labor_hours > 0 else 0.0,
+        overhead_rate_eff=overhead_rate_eff,
+        consumables_rate_eff=consumables_rate_eff,
+        indirect_rate_total=indirect_rate_total,
+        boq_df=boq_df,
+        priced_df=priced_df,
+        totals=totals,
+        roles_calc_df=pd.DataFrame(roles_calc),
+        scenario_sweep_df=pd.DataFrame(sweep_rows),
+    )
@@ -0,0 +1,430 @@
+# -*- coding: utf-8 -*-
+"""
+RAG Ingestion Job Queue
+SQLite tabanlı arka plan ingestion kuyruğu: grup bazlı checkpoint,
+kaldığı yerden (idempotent) devam ve RAG panelinin sorgulayacağı durum API'si.
+İşçi dosyaları süreç havuzunda ayrıştırır; embedding ve indeksleme ayrı thread'lerde,
+sınırlı kuyruklarla bağlı bir hat üzerinde yürür.
+"""
+
+import os
+import uuid
+import queue
+import sqlite3
+import hashlib
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from rag_ingest import EMBED_BATCH_SIZE, parse_spooled_file
+
+logger = logging.getLogger(__name__)
+
+QUEUE_DIR = "rag_data"
+QUEUE_DB = os.path.join(QUEUE_DIR, "ingest_jobs.db")
+SPOOL_DIR = os.path.join(QUEUE_DIR, "ingest_spool")
+
+# İşçi hattı: ayrıştırma süreçleri → embedding thread'i → indeksleme
+PARSE_WORKERS = max(1, min(4, (os.cpu_count() or 2) - 1))
+PARSE_QUEUE_SIZE = 8   # ayrıştırılmış, embedding bekleyen grup sayısı
+INDEX_QUEUE_SIZE = 4   # embedding'i alınmış, indeksleme bekleyen grup sayısı
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL DEFAULT 'pending',      -- pending | running | done | failed
+    error TEXT,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS job_files (
+    job_id TEXT NOT NULL,
+    file_idx INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    sha256 TEXT NOT NULL,
+    path TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',      -- pending | running | done | failed | skipped
+    total_batches INTEGER,
+    done_batches INTEGER NOT NULL DEFAULT 0,
+    added INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    PRIMARY KEY (job_id, file_idx)
+);
+CREATE TABLE IF NOT EXISTS checkpoints (
+    batch_key TEXT PRIMARY KEY,                  -- '<sha256[:16]>:<batch_no>'
+    job_id TEXT NOT NULL,
+    file_idx INTEGER NOT NULL,
+    state TEXT NOT NULL,                         -- indexing | done
+    n_records INTEGER NOT NULL DEFAULT 0,
+    updated_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_job_files_sha ON job_files(sha256, status);
+"""
+
+
+def _now() -> str:
+    return datetime.now().isoformat(timespec="seconds")
+
+
+class IngestQueue:
+    """SQLite destekli ingestion iş kuyruğu (tek arka plan işçisi)"""
+
+    def __init__(self, db_path: str = QUEUE_DB, spool_dir: str = SPOOL_DIR,
+                 batch_size: int = EMBED_BATCH_SIZE, max_workers: int = PARSE_WORKERS):
+        self.db_path = db_path
+        self.spool_dir = spool_dir
+        self.batch_size = batch_size
+        self.max_workers = max_workers
+
+        self._worker: Optional[threading.Thread] = None
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._embed_fn = None
+        self._add_fn = None
+        self._has_batch_fn = None
+
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        os.makedirs(spool_dir, exist_ok=True)
+        with self._conn() as conn:
+            conn.executescript(SCHEMA)
+
+    @contextmanager
+    def _conn(self) -> Iterator[sqlite3.Connection]:
+        """Thread başına kısa ömürlü bağlantı (WAL ile okuyucular yazıcıyı beklemez)"""
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        try:
+            yield conn
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+    # ---------- İş ekleme ----------
+    def enqueue(self, files: List[Tuple[str, bytes]], skip_duplicates: bool = True) -> str:
+        """Dosyaları diske biriktirip yeni iş oluştur; iş kimliğini döndür"""
+        job_id = uuid.uuid4().hex[:12]
+        now = _now()
+        with self._conn() as conn:
+            conn.execute("INSERT INTO jobs (id, status, created_at, updated_at) VALUES (?, 'pending', ?, ?)",
+                         (job_id, now, now))
+            for idx, (name, data) in enumerate(files):
+                sha = hashlib.sha256(data).hexdigest()
+                path = os.path.join(self.spool_dir, f"{sha}{os.path.splitext(name)[1].lower()}")
+                if not os.path.exists(path):
+                    with open(path, "wb") as f:
+                        f.write(data)
+
+                status = "pending"
+                if skip_duplicates and conn.execute(
+                        "SELECT 1 FROM job_files WHERE sha256 = ? AND status = 'done' LIMIT 1", (sha,)).fetchone():
+                    status = "skipped"  # aynı içerik daha önce indekslendi
+                conn.execute("""
+                INSERT INTO job_files (job_id, file_idx, name, sha256, path, status)
+                VALUES (?, ?, ?, ?, ?, ?)
+                """, (job_id, idx, name, sha, path, status))
+        self._wakeup.set()
+        logger.info(f"Ingestion işi kuyruğa eklendi: {job_id} ({len(files)} dosya)")
+        return job_id
+
+    # ---------- Durum API'si ----------
+    def get_status(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """İş ve dosya bazlı ilerleme"""
+        with self._conn() as conn:
+            job = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if job is None:
+                return None
+            files = [dict(r) for r in conn.execute(
+                "SELECT * FROM job_files WHERE job_id = ? ORDER BY file_idx", (job_id,))]
+
+        finished = sum(1 for f in files if f["status"] in ("done", "failed", "skipped"))
+        return {
+            "id": job["id"],
+            "status": job["status"],
+            "error": job["error"],
+            "created_at": job["created_at"],
+            "updated_at": job["updated_at"],
+            "files": files,
+            "added": sum(f["added"] for f in files),
+            "progress": finished / len(files) if files else 1.0,
+        }
+
+    def list_jobs(self, limit: int = 20) -> List[Dict[str, Any]]:
+        """Son işler"""
+        with self._conn() as conn:
+            rows = conn.execute("SELECT id FROM jobs ORDER BY created_at DESC LIMIT ?", (limit,)).fetchall()
+        return [self.get_status(r["id"]) for r in rows]
+
+    # ---------- İşçi ----------
+    def start_worker(self, embed_fn: Callable[[List[str]], Optional[List[List[float]]]],
+                     add_fn: Callable[[List[str], List[Dict], np.ndarray], List[int]],
+                     has_batch_fn: Callable[[str], bool]):
+        """Arka plan işçisini başlat (çalışıyorsa yalnız fonksiyonları güncelle)"""
+        self._embed_fn, self._add_fn, self._has_batch_fn = embed_fn, add_fn, has_batch_fn
+        if self._worker is not None and self._worker.is_alive():
+            self._wakeup.set()
+            return
+        self._stop.clear()
+        self._worker = threading.Thread(target=self._worker_loop, name="rag-ingest-worker", daemon=True)
+        self._worker.start()
+
+    def stop_worker(self, timeout: float = 5.0):
+        self._stop.set()
+        self._wakeup.set()
+        if self._worker is not None:
+            self._worker.join(timeout)
+
+    def _worker_loop(self):
+        while not self._stop.is_set():
+            job_id = self._next_job()
+            if job_id is None:
+                self._wakeup.wait(timeout=5.0)
+                self._wakeup.clear()
+                continue
+            try:
+                self.process_job(job_id)
+            except Exception as e:
+                logger.error(f"Ingestion işi {job_id} hata ile durdu: {e}")
+                self._set_job(job_id, "failed", str(e))
+
+    def _next_job(self) -> Optional[str]:
+        """Yarım kalan (running) işler önce, sonra en eski bekleyen iş"""
+        with self._conn() as conn:
+            row = conn.execute("""
+            SELECT id FROM jobs WHERE status IN ('running', 'pending')
+            ORDER BY CASE status WHEN 'running' THEN 0 ELSE 1 END, created_at
+            LIMIT 1
+            """).fetchone()
+        return row["id"] if row else None
+
+    def _set_job(self, job_id: str, status: str, error: Optional[str] = None):
+        with self._conn() as conn:
+            conn.execute("UPDATE jobs SET status = ?, error = ?, updated_at = ? WHERE id = ?",
+                         (status, error, _now(), job_id))
+
+    def _set_file(self, job_id: str, file_idx: int, **fields):
+        cols = ", ".join(f"{k} = ?" for k in fields)
+        with self._conn() as conn:
+            conn.execute(f"UPDATE job_files SET {cols} WHERE job_id = ? AND file_idx = ?",
+                         (*fields.values(), job_id, file_idx))
+
+    def process_job(self, job_id: str):
+        """İşi çalıştır; tamamlanmış gruplar atlanır, yarım gruplar doğrulanır"""
+        self._set_job(job_id, "running")
+        with self._conn() as conn:
+            files = {r["file_idx"]: r for r in conn.execute("""
+            SELECT * FROM job_files WHERE job_id = ? AND status IN ('pending', 'running')
+            ORDER BY file_idx
+            """, (job_id,))}
+
+        job_failed = bool(files) and not self._run_pipeline(job_id, files)
+        if self._stop.is_set():
+            return  # iş 'running' kalır, bir sonraki başlatmada devam eder
+
+        self._set_job(job_id, "failed" if job_failed else "done",
+                      "Bazı dosyalar indekslenemedi" if job_failed else None)
+
+    def _run_pipeline(self, job_id: str, files: Dict[int, sqlite3.Row]) -> bool:
+        """Süreç havuzunda ayrıştırma → embedding thread'i → indeksleme (bu thread).
+        Aşamalar sınırlı kuyruklarla bağlı; bellekte en fazla birkaç grup bulunur.
+        Tüm dosyalar indekslendiyse True döner."""
+        with self._conn() as conn:
+            # Anahtar içerik özetine bağlı: aynı dosya başka bir işte indekslendiyse de atlanır
+            states = {idx: {r["batch_key"]: (r["state"], r["n_records"]) for r in conn.execute(
+                "SELECT batch_key, state, n_records FROM checkpoints WHERE batch_key LIKE ?",
+                (f"{f['sha256'][:16]}:%",))} for idx, f in files.items()}
+
+        progress = {idx: {"done_batches": 0, "added": 0, "failed": False} for idx in files}
+        failed = set()   # embedding aşamasının atlayacağı dosyalar
+        with multiprocessing.Manager() as manager, \
+                ProcessPoolExecutor(max_workers=self.max_workers) as pool:
+            parse_q = manager.Queue(maxsize=PARSE_QUEUE_SIZE)
+            abort = manager.Event()
+            index_q: "queue.Queue" = queue.Queue(maxsize=INDEX_QUEUE_SIZE)
+            stages = [
+                threading.Thread(target=self._parse_stage, args=(pool, job_id, files, parse_q, abort),
+                                 name="rag-ingest-parse", daemon=True),
+                threading.Thread(target=self._embed_stage, args=(files, states, failed, parse_q, index_q, abort),
+                                 name="rag-ingest-embed", daemon=True),
+            ]
+            for t in stages:
+                t.start()
+            try:
+                while True:
+                    event = index_q.get()
+                    if event is None:
+                        break
+                    if self._stop.is_set():
+                        abort.set()   # hat boşaltılıp kapanır
+                        continue
+                    self._index_event(job_id, files, event, progress, failed)
+            except BaseException:
+                abort.set()
+                while index_q.get() is not None:
+                    pass
+                raise
+            finally:
+                for t in stages:
+                    t.join()
+        return not any(p["failed"] for p in progress.values())
+
+    def _parse_stage(self, pool: ProcessPoolExecutor, job_id: str, files: Dict[int, sqlite3.Row],
+                     parse_q, abort):
+        """Dosyaları süreç havuzunda ayrıştır (aynı anda en fazla max_workers + 1 dosya).
+        Grupları işçiler parse_q'ya akıtır; dosya bitince ('parsed', idx, n) ya da ('error', idx, mesaj)"""
+        pending = list(files.values())
+        running = {}
+        try:
+            while pending or running:
+                while pending and len(running) <= self.max_workers and not abort.is_set():
+                    f = pending.pop(0)
+                    self._set_file(job_id, f["file_idx"], status="running")
+                    fut = pool.submit(parse_spooled_file, f["name"], f["path"], self.batch_size,
+                                      parse_q, f["file_idx"], abort)
+                    running[fut] = f["file_idx"]
+                if not running:
+                    break
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    idx = running.pop(fut)
+                    try:
+                        parse_q.put(("parsed", idx, fut.result()))
+                    except Exception as e:
+                        parse_q.put(("error", idx, str(e)))
+        finally:
+            parse_q.put(None)
+
+    def _embed_stage(self, files: Dict[int, sqlite3.Row], states: Dict[int, Dict[str, Tuple[str, int]]],
+                     failed: set, parse_q, index_q: "queue.Queue", abort):
+        """Ayrıştırılan grupları embed edip indeksleme kuyruğuna aktar;
+        tamamlanmış gruplar embedding'e gönderilmez"""
+        try:
+            while True:
+                event = parse_q.get()
+                if event is None:
+                    break
+                if event[0] != "batch":
+                    index_q.put(event)
+                    continue
+                _, idx, batch_no, batch = event
+                if self._stop.is_set():
+                    abort.set()
+                if idx in failed or abort.is_set():
+                    continue
+
+                batch_key = f"{files[idx]['sha256'][:16]}:{batch_no}"
+                state, n_prev = states[idx].get(batch_key, (None, 0))
+                # 'indexing' durumunda kalan grup: kayıtlar yazıldıysa tekrar ekleme
+                if state == "indexing" and self._has_batch_fn(batch_key):
+                    index_q.put(("verified", idx, batch_key, len(batch)))
+                    continue
+                if state == "done":
+                    index_q.put(("skipped", idx, batch_key, n_prev))
+                    continue
+
+                texts = [c["text"] for c in batch]
+                metas = [dict(c.get("meta", {}), ingest_batch=batch_key) for c in batch]
+                try:
+                    embs = self._embed_fn(texts)
+                    if not embs:
+                        raise RuntimeError("Embedding alınamadı (OpenAI anahtarı gerekli)")
+                except Exception as e:
+                    logger.error(f"{files[idx]['name']} grup {batch_no} embed edilemedi: {e}")
+                    failed.add(idx)
+                    index_q.put(("error", idx, str(e)))
+                    continue
+                index_q.put(("batch", idx, batch_key, texts, metas, np.asarray(embs, dtype=np.float32)))
+        finally:
+            index_q.put(None)
+
+    def _index_event(self, job_id: str, files: Dict[int, sqlite3.Row], event: tuple,
+                     progress: Dict[int, Dict[str, Any]], failed: set):
+        """Tek hat olayını işle: grubu indeksle, checkpoint ve dosya ilerlemesini yaz"""
+        kind, idx = event[0], event[1]
+        p = progress[idx]
+        if p["failed"]:
+            return
+        if kind == "parsed":
+            self._set_file(job_id, idx, status="done", total_batches=event[2],
+                           done_batches=p["done_batches"], added=p["added"], error=None)
+            return
+
+        try:
+            if kind == "error":
+                raise RuntimeError(event[2])
+            if kind == "batch":
+                _, _, batch_key, texts, metas, embs = event
+                self._checkpoint(batch_key, job_id, idx, "indexing", 0)
+                n = len(self._add_fn(texts, metas, embs))
+                self._checkpoint(batch_key, job_id, idx, "done", n)
+            else:  # verified | skipped
+                _, _, batch_key, n = event
+                if kind == "verified":
+                    self._checkpoint(batch_key, job_id, idx, "done", n)
+        except Exception as e:
+            logger.error(f"{files[idx]['name']} indekslenemedi: {e}")
+            p["failed"] = True
+            failed.add(idx)
+            self._set_file(job_id, idx, status="failed", error=str(e),
+                           done_batches=p["done_batches"], added=p["added"])
+            return
+
+        p["done_batches"] += 1
+        p["added"] += n
+        if kind == "batch":
+            self._set_file(job_id, idx, done_batches=p["done_batches"], added=p["added"])
+
+    def _checkpoint(self, batch_key: str, job_id: str, file_idx: int, state: str, n_records: int):
+        with self._conn() as conn:
+            conn.execute("""
+            INSERT INTO checkpoints (batch_key, job_id, file_idx, state, n_records, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT (batch_key) DO UPDATE SET
+                job_id = excluded.job_id, file_idx = excluded.file_idx,
+                state = excluded.state, n_records = excluded.n_records, updated_at = excluded.updated_at
+            """, (batch_key, job_id, file_idx, state, n_records, _now()))
+
+    def retry_job(self, job_id: str):
+        """Başarısız dosyaları tekrar kuyruğa al (tamamlanan gruplar atlanır)"""
+        with self._conn() as conn:
+            conn.execute("UPDATE job_files SET status = 'pending', error = NULL WHERE job_id = ? AND status = 'failed'",
+                         (job_id,))
+            conn.execute("UPDATE jobs SET status = 'pending', error = NULL, updated_at = ? WHERE id = ?",
+                         (_now(), job_id))
+        self._wakeup.set()
+
+    def clear(self):
+        """Tüm işleri, checkpoint'leri ve biriktirilmiş dosyaları sil (RAG sıfırlamasıyla birlikte)"""
+        self.stop_worker()
+        if self._worker is None or not self._worker.is_alive():
+            self._stop.clear()   # kuyruk sıfırlamadan sonra da kullanılabilir kalsın
+        with self._conn() as conn:
+            conn.execute("DELETE FROM checkpoints")
+            conn.execute("DELETE FROM job_files")
+            conn.execute("DELETE FROM jobs")
+        for name in os.listdir(self.spool_dir):
+            try:
+                os.remove(os.path.join(self.spool_dir, name))
+            except OSError as e:
+                logger.warning(f"Biriktirilmiş dosya silinemedi: {name}: {e}")
+        logger.info("Ingestion kuyruğu temizlendi")
+
+
+# Global kuyruk instance'ı (tüm Streamlit oturumları tek işçiyi paylaşır)
+ingest_queue = None
+
+def get_ingest_queue() -> IngestQueue:
+    """Kuyruk instance'ını al"""
+    global ingest_queue
+    if ingest_queue is None:
+        ingest_queue = IngestQueue()
+    return ingest_queue
@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+"""
+Manpower Distribution
+Aylık adam dağılımı profilleri (Gelişmiş/Klasik Parabolik, Sigmoid, Üçgen) NumPy ile
+tek geçişte; toplamı koruyan en büyük kalan (Hamilton) yuvarlaması vektör, rol x ay
+matrisi ve uzun projeler için aynı fonksiyonla yapılır.
+"""
+
+import logging
+from typing import Sequence
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DISTRIBUTION_TYPES = ("Gelişmiş Parabolik", "Klasik Parabolik", "Sigmoid", "Üçgen")
+SIGMOID_K = 6.0   # Sigmoid yumuşaklık parametresi
+
+
+def distribution_weights(n_months: int, dist_type: str, peak_pos: float = 0.45, left_smooth: float = 2.5,
+                         right_smooth: float = 1.8, min_weight: float = 0.15) -> np.ndarray:
+    """Toplamı 1 olan aylık ağırlıklar; tanımsız tür eşit dağılım verir"""
+    if n_months <= 1:
+        return np.ones(max(n_months, 1))
+    x = np.linspace(0.0, 1.0, n_months)
+
+    if dist_type == "Gelişmiş Parabolik":
+        # Hazırlık dönemi yumuşak artış, tepe sonrası yumuşak azalış
+        rising = np.clip(x / peak_pos, 0.0, 1.0) ** left_smooth
+        falling = (1 - np.clip((x - peak_pos) / (1 - peak_pos), 0.0, 1.0)) ** right_smooth
+        weights = np.where(x <= peak_pos, rising, falling) * (1 - min_weight) + min_weight
+    elif dist_type == "Klasik Parabolik":
+        # y = -4(x-0.5)² + 1
+        weights = np.maximum(-4 * (x - 0.5) ** 2 + 1, min_weight)
+    elif dist_type == "Sigmoid":
+        weights = np.maximum(1 / (1 + np.exp(-SIGMOID_K * (x - 0.5))), min_weight)
+    elif dist_type == "Üçgen":
+        weights = np.maximum(np.where(x <= 0.5, 2 * x, 2 * (1 - x)), min_weight)
+    else:
+        weights = np.ones(n_months)
+    return weights / weights.sum()
+
+
+def round_preserve_sum(values, axis: int = -1) -> np.ndarray:
+    """En büyük kalan yöntemiyle tam sayıya yuvarla: eksen boyunca toplam round(toplam) olur.
+
+    Tabanlar alınır, eksik birimler kesir payı en büyük elemanlara (eşitlikte önce gelen)
+    birer birer verilir. 2B girdide (rol x ay) her satır/sütun ayrı korunur; O(n log n).
+    """
+    vals = np.asarray(values, dtype=float)
+    if vals.size == 0:
+        return vals.astype(np.int64)
+    vals = np.moveaxis(vals, axis, -1)
+    floors = np.floor(vals)
+    remaining = (np.rint(vals.sum(axis=-1)) - floors.sum(axis=-1)).astype(np.int64)
+    remaining = np.clip(remaining, 0, vals.shape[-1])
+    # Kesir payına göre azalan sıra (kararlı) -> her satırda ilk 'remaining' eleman +1
+    order = np.argsort(-(vals - floors), axis=-1, kind="stable")
+    ranks = np.empty_like(order)
+    np.put_along_axis(ranks, order, np.arange(vals.shape[-1]), axis=-1)
+    result = floors + (ranks < remaining[..., None])
+    return np.moveaxis(result, -1, axis).astype(np.int64)
+
+
+def headcounts(person_months_total: float, weights: Sequence[float]) -> np.ndarray:
+    """Toplam adam-ayı ağırlıklara göre aylık tam kişi sayısına dağıt"""
+    return round_preserve_sum(person_months_total * np.asarray(weights, dtype=float))
+
+
+def role_month_matrix(person_months_total: float, role_shares: Sequence[float],
+                      weights: Sequence[float]) -> np.ndarray:
+    """Rol x ay tam kişi matrisi: her rolün toplam adam-ayı (pay x toplam) aylara korunarak dağıtılır"""
+    shares = np.asarray(role_shares, dtype=float)
+    shares = shares / shares.sum() if shares.sum() > 0 else shares
+    return round_preserve_sum(np.outer(person_months_total * shares, np.asarray(weights, dtype=float)), axis=1)
@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*-
+"""
+Manpower Scheduler
+Kaynak dengeli adam planı: eleman işleri (adam-saat, süre, öncüller, maks. ekip) öncül
+sırasıyla en erken periyottan doldurulur; toplam kişi sınırı (tepe) ikili aramayla en
+küçük uygulanabilir değere indirilir. Rol ve konaklama sınırları tepe üst sınırını
+belirler. Her deneme görev başına birkaç NumPy işlemi olduğundan etkileşimli hızdadır.
+"""
+
+import logging
+from dataclasses import dataclass
+from typing import Dict, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from manpower_distribution import round_preserve_sum
+
+logger = logging.getLogger(__name__)
+
+LEVELING_TOLERANCE = 0.01   # tepe kişi sayısı için ikili arama hassasiyeti (kişi)
+_EPS = 1e-9
+
+
+@dataclass
+class ScheduleTask:
+    """Planlanacak iş: toplam adam-saat, en az kaç periyoda yayılacağı, öncüller ve ekip sınırı"""
+    key: str
+    labor_hours: float
+    predecessors: Tuple[str, ...] = ()
+    min_periods: int = 1
+    max_crew: Optional[float] = None
+
+
+@dataclass
+class SchedulePlan:
+    """Dengelenmiş plan: görev x periyot ekip (ondalık), periyot ve rol x periyot tam kişi"""
+    periods: List[str]
+    task_crew: pd.DataFrame
+    headcount: np.ndarray
+    role_matrix: pd.DataFrame
+    peak_limit: float
+    feasible: bool
+    unscheduled_hours: float
+
+
+def topological_order(tasks: Sequence[ScheduleTask]) -> List[ScheduleTask]:
+    """Öncül sırası (Kahn); aynı seviyedeki işler giriş sırasını korur"""
+    by_key = {t.key: t for t in tasks}
+    for t in tasks:
+        missing = [p for p in t.predecessors if p not in by_key]
+        if missing:
+            raise ValueError(f"{t.key}: tanımsız öncül {missing}")
+    indegree = {t.key: len(set(t.predecessors)) for t in tasks}
+    successors: Dict[str, List[str]] = {t.key: [] for t in tasks}
+    for t in tasks:
+        for p in set(t.predecessors):
+            successors[p].append(t.key)
+    ready = [t.key for t in tasks if indegree[t.key] == 0]
+    order = []
+    while ready:
+        key = ready.pop(0)
+        order.append(by_key[key])
+        for s in successors[key]:
+            indegree[s] -= 1
+            if indegree[s] == 0:
+                ready.append(s)
+    if len(order) != len(tasks):
+        raise ValueError("Öncül ilişkilerinde döngü var")
+    return order
+
+
+def _fill(order: Sequence[ScheduleTask], period_hours: np.ndarray, limit: float, lag: int):
+    """Tepe sınırı 'limit' altında işleri en erken periyotlardan doldur"""
+    n = len(period_hours)
+    load = np.zeros(n)
+    crew = np.zeros((len(order), n))
+    finish: Dict[str, int] = {}
+    mean_hours = float(period_hours[period_hours > 0].mean()) if (period_hours > 0).any() else 0.0
+    unscheduled = 0.0
+    for i, task in enumerate(order):
+        start = max((finish[p] + lag for p in task.predecessors), default=0)
+        hours = float(task.labor_hours)
+        if hours <= _EPS:
+            finish[task.key] = start
+            continue
+        crew_limit = hours / (max(task.min_periods, 1) * max(mean_hours, _EPS))
+        if task.max_crew:
+            crew_limit = min(crew_limit, float(task.max_crew))
+        if start >= n:
+            unscheduled += hours
+            finish[task.key] = n - 1
+            continue
+        ph = period_hours[start:]
+        avail = np.clip(np.minimum(limit - load[start:], crew_limit), 0.0, None) * ph
+        cum = np.cumsum(avail)
+        k = int(np.searchsorted(cum, hours - _EPS))
+        if k >= len(cum):
+            unscheduled += hours - float(cum[-1])
+            k = len(cum) - 1
+            used = avail
+        else:
+            used = avail[:k + 1].copy()
+            used[k] -= cum[k] - hours
+        persons = np.divide(used[:k + 1], ph[:k + 1], out=np.zeros(k + 1), where=ph[:k + 1] > 0)
+        load[start:start + k + 1] += persons
+        crew[i, start:start + k + 1] = persons
+        finish[task.key] = start + k
+    return crew, load, unscheduled
+
+
+def level_schedule(tasks: Sequence[ScheduleTask], period_hours: Sequence[float],
+                   periods: Optional[Sequence[str]] = None,
+                   role_shares: Optional[Mapping[str, float]] = None,
+                   role_caps: Optional[Mapping[str, float]] = None,
+                   max_headcount: Optional[float] = None, lag_periods: int = 0,
+                   tolerance: float = LEVELING_TOLERANCE) -> SchedulePlan:
+    """Tepe kişi sayısını en aza indiren plan.
+
+    period_hours: periyot başına bir kişinin çalışma saati (iş günü x saat/gün).
+    role_shares: rol -> pay (roller her periyotta bu oranla dağılır); role_caps: rol -> maks. kişi.
+    max_headcount: toplam kişi sınırı (ör. konaklama kapasitesi). Sınırlar içinde ufka
+    sığmıyorsa en sıkı sınırla plan döner, feasible=False ve sığmayan saat raporlanır.
+    """
+    ph = np.asarray(period_hours, dtype=float)
+    periods = list(periods) if periods is not None else [str(i + 1) for i in range(len(ph))]
+    order = topological_order(tasks)
+    shares = {r: float(s) for r, s in (role_shares or {}).items() if s > 0}
+    share_total = sum(shares.values())
+    shares = {r: s / share_total for r, s in shares.items()} if share_total > 0 else {}
+
+    # Sert üst sınır: konaklama ve (rol sınırı / rol payı)
+    hard = float(max_headcount) if max_headcount else np.inf
+    for role, cap in (role_caps or {}).items():
+        if cap and shares.get(role):
+            hard = min(hard, float(cap) / shares[role])
+    hard = np.floor(hard + _EPS)   # tam kişi: yuvarlanan plan da sınırları aşmaz
+    total_hours = float(sum(t.labor_hours for t in tasks))
+    hi = hard if np.isfinite(hard) else total_hours / max(float(ph[ph > 0].min()) if (ph > 0).any() else 1.0, _EPS) + 1.0
+
+    crew, load, unscheduled = _fill(order, ph, hi, lag_periods)
+    feasible = unscheduled <= _EPS * max(total_hours, 1.0)
+    if feasible:
+        lo = 0.0
+        while hi - lo > tolerance:
+            mid = (lo + hi) / 2
+            trial = _fill(order, ph, mid, lag_periods)
+            if trial[2] <= _EPS * max(total_hours, 1.0):
+                hi, (crew, load, unscheduled) = mid, trial
+            else:
+                lo = mid
+    else:
+        logger.warning(f"Plan ufka sığmıyor: {unscheduled:.1f} a·s planlanamadı (sınır {hi:.1f} kişi)")
+
+    headcount = round_preserve_sum(load)
+    if shares:
+        roles = list(shares)
+        role_counts = round_preserve_sum(np.outer([shares[r] for r in roles], headcount), axis=0)
+    else:
+        roles, role_counts = [], np.zeros((0, len(ph)), dtype=np.int64)
+    return SchedulePlan(
+        periods=periods,
+        task_crew=pd.DataFrame(crew, index=[t.key for t in order], columns=periods),
+        headcount=headcount,
+        role_matrix=pd.DataFrame(role_counts, index=roles, columns=periods),
+        peak_limit=float(hi),
+        feasible=feasible,
+        unscheduled_hours=float(unscheduled),
+    )
@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+"""
+Norm Index
+norms tablosunu locale başına bir kez belleğe alan indeks: (work_item_key, unit, locale)
+anahtarına göre kaynak önceliği çözülmüş norm ve koşul çarpanı hazır tutulur.
+Tablo değiştiğinde (sürüm sorgusu) indeks yeniden yüklenir.
+"""
+
+import time
+import json
+import logging
+import threading
+from dataclasses import dataclass
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Norm seçimi: kaynak önceliği (Internal > Poz > FER), sonra en güncel
+NORM_PRIORITY_ORDER = """
+    CASE source
+        WHEN 'Internal' THEN 1
+        WHEN 'Poz' THEN 2
+        WHEN 'FER' THEN 3
+        ELSE 4
+    END,
+    updated_at DESC"""
+
+# (work_item_key, unit) başına öncelikli tek norm
+LOAD_NORMS_SQL = f"""
+SELECT DISTINCT ON (work_item_key, unit)
+       work_item_key, unit, source, code, norm_lh_per_u, conditions_json
+FROM norms
+WHERE locale = %s
+ORDER BY work_item_key, unit, {NORM_PRIORITY_ORDER}
+"""
+
+# Tablo sürümü: satır sayısı (silme) + en büyük xmin (her INSERT/UPDATE yeni xmin alır,
+# updated_at güncellenmese bile değişikliği yakalar)
+NORMS_VERSION_SQL = "SELECT count(*), max(xmin::text::bigint) FROM norms"
+
+# Koşul -> çarpan
+CONDITION_FACTORS = {
+    ('height', '>3m'): 1.15,
+    ('weather', 'cold'): 1.20,
+    ('complexity', 'high'): 1.25,
+}
+
+
+def adjustment_factor(conditions: Optional[Dict]) -> float:
+    """Koşul çarpanlarını hesapla"""
+    factors = 1.0
+    for (key, value), factor in CONDITION_FACTORS.items():
+        if (conditions or {}).get(key) == value:
+            factors *= factor
+    return factors
+
+
+@dataclass(frozen=True)
+class NormEntry:
+    """Seçilmiş norm ve koşullarla düzeltilmiş birim adam-saat"""
+    source: str
+    code: str
+    norm_lh_per_u: float
+    conditions: Dict
+    factor: float
+    effective_lh_per_u: float
+
+
+class NormIndex:
+    """Bellekte norm indeksi (thread-safe, locale başına tembel yükleme)"""
+
+    def __init__(self, pool, refresh_interval: float = 5.0,
+                 load_sql: str = LOAD_NORMS_SQL, version_sql: str = NORMS_VERSION_SQL):
+        # pool: cursor() context manager'ı olan bağlantı yöneticisi (PostgreSQL havuzu ya da SQLite)
+        self.pool = pool
+        self.refresh_interval = refresh_interval
+        self.load_sql = load_sql
+        self.version_sql = version_sql
+        self._tables: Dict[str, Dict[Tuple[str, str], NormEntry]] = {}
+        self._version = None
+        self._last_check = float("-inf")
+        self._lock = threading.Lock()
+
+    def _load(self, locale: str) -> Dict[Tuple[str, str], NormEntry]:
+        with self.pool.cursor() as cursor:
+            cursor.execute(self.load_sql, (locale,))
+            rows = cursor.fetchall()
+        table = {}
+        for work_item_key, unit, source, code, norm_lh_per_u, conditions in rows:
+            norm = float(norm_lh_per_u)
+            if isinstance(conditions, str):
+                conditions = json.loads(conditions)  # SQLite: JSON metin
+            factor = adjustment_factor(conditions)
+            table[(work_item_key, unit)] = NormEntry(source, code, norm, conditions or {}, factor, norm * factor)
+        logger.info(f"📚 Norm indeksi yüklendi: {len(table)} norm ({locale})")
+        return table
+
+    def _check_version(self):
+        """refresh_interval dolduysa tablo sürümüne bak; değiştiyse yüklü locale'leri bırak"""
+        now = time.monotonic()
+        if now - self._last_check < self.refresh_interval:
+            return
+        with self.pool.cursor() as cursor:
+            cursor.execute(self.version_sql)
+            version = tuple(cursor.fetchone())
+        self._last_check = now
+        if version != self._version:
+            if self._version is not None:
+                logger.info("🔄 norms tablosu değişti, norm indeksi yenileniyor")
+            self._version = version
+            self._tables = {}
+
+    def table(self, locale: str = 'tr') -> Dict[Tuple[str, str], NormEntry]:
+        """Locale'in (work_item_key, unit) -> NormEntry tablosu"""
+        with self._lock:
+            self._check_version()
+            table = self._tables.get(locale)
+            if table is None:
+                table = self._tables[locale] = self._load(locale)
+            return table
+
+    def refresh(self):
+        """Bir sonraki erişimde sürümü yeniden kontrol et ve gerekirse yükle"""
+        with self._lock:
+            self._last_check = float("-inf")
+            self._tables = {}
+
+    def lookup(self, work_item_key: str, unit: str, locale: str = 'tr') -> Optional[NormEntry]:
+        """Tek iş kalemi için öncelikli normu döndür (yoksa None)"""
+        return self.table(locale).get((work_item_key, unit))
+
+    def labor_hours(self, keys: Sequence[str], qtys: Sequence[float], units: Sequence[str],
+                    locale: str = 'tr') -> np.ndarray:
+        """Tüm metraj için adam-saat vektörü (normu olmayan kalemler 0)"""
+        table = self.table(locale)
+        effective = np.fromiter(
+            (entry.effective_lh_per_u if entry is not None else np.nan
+             for entry in map(table.get, zip(keys, units))),
+            dtype=float, count=len(keys),
+        )
+        missing = np.isnan(effective)
+        if missing.any():
+            logger.warning(f"Norm bulunamadı: {int(missing.sum())} kalem (adam-saat 0)")
+        return np.where(missing, 0.0, np.asarray(qtys, dtype=float) * effective)
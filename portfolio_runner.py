@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+"""
+Portfolio Runner
+Proje deposundaki birden çok kayıtlı projeyi arayüzsüz maliyet motoruyla süreç havuzunda
+paralel değerlendirir ve tek karşılaştırma tablosu (m³ maliyeti, A·S fiyatı, tepe kişi)
+üretir. Her işçi süreç depoyu bir kez açar; ana süreçe yalnız özet satırı döner.
+"""
+
+import os
+import time
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Optional, Sequence
+
+import pandas as pd
+
+from cost_engine import DEFAULT_DISTRIBUTION, evaluate_estimate
+from project_store import PROJECT_DB_PATH, ProjectStore
+
+logger = logging.getLogger(__name__)
+
+PORTFOLIO_PARALLEL_MIN = 4   # bundan az projede süreç havuzu açılmaz (başlatma maliyeti > kazanç)
+
+PORTFOLIO_COLUMNS = {
+    "project": "Proje (Проект)",
+    "version": "Sürüm (Версия)",
+    "scenario": "Senaryo (Сценарий)",
+    "total_metraj": "Metraj (m³) (Объём, м³)",
+    "total_labor_hours": "Toplam a·s (Итого чел·ч)",
+    "person_months": "Kişi-ay (Чел·мес)",
+    "n_months": "Ay (Мес.)",
+    "peak_headcount": "Tepe kişi (Пик численности)",
+    "bare_as_price": "Çıplak A·S (₽/a·s)",
+    "with_extras_as_price": "Giderli A·S (₽/a·s)",
+    "fully_loaded_as_price": "Tam yüklü A·S (₽/a·s)",
+    "cost_per_m3": "Ortalama (₽/m³) (Средняя, ₽/м³)",
+    "project_total_cost": "Toplam maliyet (₽) (Итого, ₽)",
+    "error": "Hata (Ошибка)",
+}
+
+_worker_store: Optional[ProjectStore] = None
+
+
+def summarize_state(name: str, state: Dict[str, Any], version: Optional[int] = None) -> Dict[str, Any]:
+    """Tek proje durumunu değerlendir -> karşılaştırma satırı (hata satıra yazılır)"""
+    row: Dict[str, Any] = {"project": name, "version": version}
+    try:
+        est = evaluate_estimate(state, scenario_sweep=False)
+    except Exception as e:
+        logger.warning(f"Portföy: {name} değerlendirilemedi: {e}")
+        row["error"] = str(e)
+        return row
+    row.update(
+        scenario=est.scenario,
+        total_metraj=est.total_metraj,
+        total_labor_hours=est.total_labor_hours,
+        person_months=est.person_months_total,
+        n_months=est.n_months,
+        peak_headcount=est.peak_headcount(state.get("distribution_type", DEFAULT_DISTRIBUTION)),
+        bare_as_price=est.bare_as_price,
+        with_extras_as_price=est.with_extras_as_price,
+        fully_loaded_as_price=est.fully_loaded_as_price,
+        cost_per_m3=est.general_avg_m3,
+        project_total_cost=est.project_total_cost,
+        error=None,
+    )
+    return row
+
+
+def _init_worker(store_path: str):
+    global _worker_store
+    _worker_store = ProjectStore(store_path)
+
+
+def _evaluate_saved(name: str, version: Optional[int] = None, store: Optional[ProjectStore] = None) -> Dict[str, Any]:
+    """Projeyi depodan yükle ve değerlendir (işçi süreçte işçinin deposu kullanılır)"""
+    try:
+        state = (store or _worker_store).load(name, version)
+    except KeyError as e:
+        return {"project": name, "version": version, "error": str(e)}
+    return summarize_state(name, state, version)
+
+
+def evaluate_portfolio(names: Optional[Sequence[str]] = None, store_path: str = PROJECT_DB_PATH,
+                       max_workers: Optional[int] = None) -> pd.DataFrame:
+    """Kayıtlı projeleri (verilmezse tümü, en son sürüm) değerlendir; etiketli karşılaştırma tablosu döndür.
+
+    max_workers=1 ya da PORTFOLIO_PARALLEL_MIN'den az proje seri çalışır.
+    """
+    t0 = time.perf_counter()
+    store = ProjectStore(store_path)
+    try:
+        projects = store.list_projects()
+        latest = {n: int(v) for n, v in zip(projects["name"], projects["latest_version"])}
+        names = list(latest) if names is None else list(names)
+        versions = [latest.get(n) for n in names]
+        workers = max_workers or min(len(names), os.cpu_count() or 1)
+        if workers <= 1 or len(names) < PORTFOLIO_PARALLEL_MIN:
+            rows = [_evaluate_saved(n, v, store) for n, v in zip(names, versions)]
+        else:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(store_path,)) as pool:
+                rows = list(pool.map(_evaluate_saved, names, versions))
+    finally:
+        store.close()
+
+    df = pd.DataFrame(rows, columns=list(PORTFOLIO_COLUMNS))
+    logger.info(f"Portföy: {len(names)} proje {time.perf_counter() - t0:.2f} sn ({workers} işçi)")
+    return df.rename(columns=PORTFOLIO_COLUMNS)
@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+"""
+PostgreSQL Audit Log Writer
+Retrieval audit kayıtlarını istek yolundan ayırır: olaylar sınırlı bir kuyruğa
+atılır, arka plan thread'i bunları toplu INSERT ile retrieval_logs'a yazar.
+Kuyruk dolunca olay düşürülür (drop) ya da kısa süre beklenir (block).
+"""
+
+import time
+import queue
+import logging
+import threading
+from datetime import datetime, timezone
+from typing import Optional, Sequence
+
+import psycopg2.extras
+
+logger = logging.getLogger(__name__)
+
+INSERT_RETRIEVAL_LOGS_SQL = """
+INSERT INTO retrieval_logs (ts, query, top_k, chunk_ids, scores, accepted)
+VALUES %s
+"""
+
+OVERFLOW_POLICIES = ("drop", "block")
+
+
+class AuditLogWriter:
+    """Toplu, asenkron retrieval_logs yazıcısı (thread-safe)"""
+
+    def __init__(self, pool, max_queue: int = 10000, batch_size: int = 500,
+                 flush_interval: float = 1.0, overflow: str = "drop", block_timeout: float = 1.0):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"Geçersiz overflow politikası: {overflow} ({', '.join(OVERFLOW_POLICIES)})")
+        self.pool = pool
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.overflow = overflow
+        self.block_timeout = block_timeout
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_queue)
+        self._pending = 0                      # kuyrukta + yazılmakta olan olay sayısı
+        self._submitting = 0                   # kabul edilip henüz kuyruğa girmemiş olay sayısı
+        self._pending_cond = threading.Condition()
+        self._closed = False
+        self._stop = threading.Event()         # kuyruk doluyken de kapanışı bildirir
+        self._thread = threading.Thread(target=self._run, name="audit-log-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, query: str, chunk_ids: Sequence[int], scores: Sequence[float], accepted: bool) -> bool:
+        """Olayı kuyruğa at; kuyruk doluysa politikaya göre düşür/bekle. Kabul edildiyse True"""
+        event = (datetime.now(timezone.utc), query, len(chunk_ids), list(chunk_ids), list(scores), accepted)
+        # Kapanış kontrolü ve sayaçlar close() ile aynı kilit altında: kabul edilen olay kaybolmaz
+        with self._pending_cond:
+            if self._closed:
+                return False
+            self._pending += 1
+            self._submitting += 1
+        try:
+            if self.overflow == "block":
+                self._queue.put(event, timeout=self.block_timeout)
+            else:
+                self._queue.put_nowait(event)
+            return True
+        except queue.Full:
+            self._done(1)
+            with self._pending_cond:
+                self.dropped += 1
+                dropped = self.dropped
+            if dropped == 1 or dropped % 1000 == 0:
+                logger.warning(f"Audit log kuyruğu dolu, {dropped} olay düşürüldü")
+            return False
+        finally:
+            with self._pending_cond:
+                self._submitting -= 1
+                self._pending_cond.notify_all()
+
+    def _run(self):
+        """Arka plan döngüsü: ilk olaydan sonra flush_interval kadar ya da batch dolana kadar topla"""
+        while not self._stop.is_set():
+            try:
+                item = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+            batch = [item]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size and not self._stop.is_set():
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._write(batch)
+        # Kapanış: kuyrukta kalanları ve close() öncesi kabul edilip hâlâ kuyruğa
+        # girmekte olan olayları da yaz
+        while True:
+            rest = []
+            while True:
+                try:
+                    rest.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            for i in range(0, len(rest), self.batch_size):
+                self._write(rest[i:i + self.batch_size])
+            with self._pending_cond:
+                if not self._submitting and self._queue.empty():
+                    break
+                self._pending_cond.wait(self.flush_interval)
+
+    def _write(self, batch):
+        try:
+            with self.pool.cursor() as cursor:
+                psycopg2.extras.execute_values(cursor, INSERT_RETRIEVAL_LOGS_SQL, batch,
+                                               page_size=self.batch_size)
+            self.written += len(batch)
+        except Exception as e:
+            self.failed += len(batch)
+            logger.error(f"❌ Audit log yazılamadı ({len(batch)} olay): {e}")
+        finally:
+            self._done(len(batch))
+
+    def _done(self, n: int):
+        with self._pending_cond:
+            self._pending -= n
+            if self._pending <= 0:
+                self._pending_cond.notify_all()
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Kuyruktaki olaylar yazılana kadar bekle; zaman aşımında False"""
+        with self._pending_cond:
+            return self._pending_cond.wait_for(lambda: self._pending <= 0, timeout)
+
+    def close(self, timeout: float = 10.0):
+        """Yeni olay kabul etmeyi bırak, kalanları yaz ve thread'i durdur"""
+        with self._pending_cond:
+            if self._closed:
+                return
+            self._closed = True
+        self._stop.set()
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            logger.warning("Audit log yazıcısı zaman aşımında kapanmadı")
+        else:
+            logger.info(f"✅ Audit log yazıcısı kapatıldı ({self.written} yazıldı, {self.dropped} düşürüldü)")
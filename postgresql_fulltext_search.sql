@@ -0,0 +1,35 @@
+-- PostgreSQL Full-Text Search Migrasyonu
+-- Betonarme RAG Sistemi: dil bazlı tsvector kolonu, ts_rank_cd skorlaması ve
+-- kısmi norm kodları için pg_trgm yedek araması
+
+-- 1. Trigram eklentisi (kısmi kod araması: 'FER-06-0', 'Poz 10')
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+-- 2. Locale -> text search konfigürasyonu
+CREATE OR REPLACE FUNCTION rag_ts_config(locale text) RETURNS regconfig
+LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+    SELECT CASE locale
+        WHEN 'ru' THEN 'russian'
+        WHEN 'tr' THEN 'turkish'
+        WHEN 'en' THEN 'english'
+        ELSE 'simple'
+    END::regconfig
+$$;
+
+-- 3. Saklanan (generated) tsvector kolonu: başlık A, metin B ağırlıklı
+ALTER TABLE chunks ADD COLUMN IF NOT EXISTS tsv tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector(rag_ts_config(locale), coalesce(heading, '')), 'A') ||
+        setweight(to_tsvector(rag_ts_config(locale), text), 'B')
+    ) STORED;
+
+-- 4. Indexler
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_chunks_tsv ON chunks USING gin(tsv);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_chunks_text_trgm ON chunks USING gin(text gin_trgm_ops);
+
+-- 5. tsv kolonu ile gereksizleşen ifade indexleri (yazma maliyeti)
+DROP INDEX CONCURRENTLY IF EXISTS idx_chunks_text_ru;
+DROP INDEX CONCURRENTLY IF EXISTS idx_chunks_text_tr;
+
+-- 6. Statistics güncelleme
+ANALYZE chunks;
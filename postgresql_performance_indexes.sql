@@ -62,6 +62,7 @@ CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_retrieval_logs_reviewer ON retrieval
 -- 10. Composite indexler (çoklu sütun)
 CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_chunks_locale_work_types ON chunks(locale, work_types);
 CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_norms_source_code_locale ON norms(source, code, locale);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_norms_lookup ON norms(work_item_key, unit, locale);  -- sapma raporu LATERAL norm seçimi
 CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_revit_quantities_wbs_unit ON revit_quantities(wbs_key, unit);
 CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_site_observations_date_wbs ON site_observations(work_date, wbs_key);
 
@@ -0,0 +1,23 @@
+-- PostgreSQL pgvector Migrasyonu
+-- Betonarme RAG Sistemi: chunk embedding kolonu ve yaklaşık en yakın komşu indexleri
+-- Boyut text-embedding-3-small (1536) ile aynı olmalı (RAGConfig.embedding_dim)
+
+-- 1. pgvector eklentisi
+CREATE EXTENSION IF NOT EXISTS vector;
+
+-- 2. Opsiyonel embedding kolonu (embedding'i olmayan chunk'lar NULL kalır)
+ALTER TABLE chunks ADD COLUMN IF NOT EXISTS embedding vector(1536);
+
+-- 3. HNSW index (önerilen: eğitim gerektirmez, yüksek recall)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_chunks_embedding_hnsw
+    ON chunks USING hnsw (embedding vector_cosine_ops)
+    WITH (m = 16, ef_construction = 64);
+
+-- 4. Alternatif: IVFFlat (daha hızlı kurulum, daha az bellek; veri yüklendikten sonra
+--    oluşturulmalı, lists ≈ satır sayısı / 1000). HNSW ile birlikte kullanılmaz.
+-- CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_chunks_embedding_ivfflat
+--     ON chunks USING ivfflat (embedding vector_cosine_ops)
+--     WITH (lists = 100);
+
+-- 5. Statistics güncelleme
+ANALYZE chunks;
@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+"""
+PostgreSQL Connection Pool
+ThreadedConnectionPool tabanlı bağlantı yöneticisi: her çağrı kendi bağlantısını
+alır (checkout), işlem sonunda commit/rollback yapılır ve bağlantı boşta listesine döner.
+Boşta en fazla pool_max_size bağlantı tutulur; kopmuş bağlantılar atılır, yerine yenisi açılır.
+"""
+
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import psycopg2
+import psycopg2.extensions
+from psycopg2.pool import PoolError, ThreadedConnectionPool
+
+logger = logging.getLogger(__name__)
+
+# Bağlantı kopmasına işaret eden hatalar
+DISCONNECT_ERRORS = (psycopg2.OperationalError, psycopg2.InterfaceError)
+
+
+class PostgreSQLConnectionPool:
+    """Thread-safe bağlantı havuzu (boyut ve zaman aşımları RAGConfig'ten)"""
+
+    def __init__(self, config):
+        self.config = config
+        self._pool = ThreadedConnectionPool(config.pool_min_size, config.pool_max_size, **self._dsn())
+        # Havuz dolunca PoolError yerine sırada beklemek için
+        self._slots = threading.BoundedSemaphore(config.pool_max_size)
+        # psycopg2 havuzu minconn'u aşan bağlantıları geri verilince kapatır; boştaki
+        # bağlantılar bu yüzden burada (son kullanım zamanıyla) tutulur, psycopg2'ye dönmez
+        self._idle: List[Tuple["psycopg2.extensions.connection", float]] = []
+        self._lock = threading.Lock()
+        logger.info(f"✅ PostgreSQL bağlantı havuzu hazır ({config.pool_min_size}-{config.pool_max_size})")
+
+    def _dsn(self) -> Dict:
+        return {
+            "host": self.config.db_host,
+            "port": self.config.db_port,
+            "database": self.config.db_name,
+            "user": self.config.db_user,
+            "password": self.config.db_password,
+            "connect_timeout": self.config.connect_timeout,
+            "application_name": "betonarme_rag",
+        }
+
+    def _is_healthy(self, conn, last_used: Optional[float]) -> bool:
+        """Kapalı/bozuk bağlantıyı ele; uzun süre boşta kaldıysa SELECT 1 ile yokla"""
+        if conn.closed:
+            return False
+        if conn.info.transaction_status == psycopg2.extensions.TRANSACTION_STATUS_UNKNOWN:
+            return False
+        if last_used is None or time.monotonic() - last_used < self.config.health_check_interval:
+            return True  # yeni açılmış ya da yakın zamanda kullanılmış
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except DISCONNECT_ERRORS:
+            return False
+
+    def _checkout(self):
+        """Sağlıklı bir bağlantı al (önce en son bırakılan boştaki bağlantı); kopmuşsa at ve yeniden bağlan"""
+        last_error = None
+        for attempt in range(self.config.reconnect_attempts + 1):
+            with self._lock:
+                conn, last_used = self._idle.pop() if self._idle else (None, None)
+            if conn is None:
+                try:
+                    conn = self._pool.getconn()
+                except DISCONNECT_ERRORS as e:
+                    last_error = e
+                    logger.warning(f"PostgreSQL bağlantısı açılamadı (deneme {attempt + 1}): {e}")
+                    time.sleep(min(0.2 * 2 ** attempt, 2.0))
+                    continue
+            if self._is_healthy(conn, last_used):
+                return conn
+            logger.warning("Kopmuş PostgreSQL bağlantısı atıldı, yeniden bağlanılıyor")
+            self._discard(conn)
+        raise last_error or psycopg2.OperationalError("Sağlıklı PostgreSQL bağlantısı alınamadı")
+
+    def _discard(self, conn):
+        try:
+            self._pool.putconn(conn, close=True)
+        except PoolError:
+            pass
+
+    def _release(self, conn):
+        with self._lock:
+            self._idle.append((conn, time.monotonic()))
+
+    @contextmanager
+    def connection(self) -> Iterator["psycopg2.extensions.connection"]:
+        """Bağlantı al; blok başarılıysa commit, hata varsa rollback"""
+        if not self._slots.acquire(timeout=self.config.pool_timeout):
+            raise PoolError(f"Bağlantı havuzu {self.config.pool_timeout}s içinde boşalmadı")
+        conn = None
+        try:
+            conn = self._checkout()
+            yield conn
+            conn.commit()
+        except DISCONNECT_ERRORS:
+            if conn is not None:
+                self._discard(conn)
+                conn = None
+            raise
+        except Exception:
+            if conn is not None and not conn.closed:
+                conn.rollback()
+            raise
+        finally:
+            if conn is not None:
+                if conn.closed:
+                    self._discard(conn)
+                else:
+                    self._release(conn)
+            self._slots.release()
+
+    @contextmanager
+    def cursor(self, cursor_factory=None, name: Optional[str] = None,
+               itersize: int = 2000) -> Iterator["psycopg2.extensions.cursor"]:
+        """Tek işlemlik cursor (bağlantı ve cursor blok sonunda bırakılır).
+
+        name verilirse sunucu taraflı (named) cursor açılır: satırlar itersize'lık
+        gruplar halinde çekilir, sonuç kümesi istemci belleğine alınmaz.
+        """
+        with self.connection() as conn:
+            with conn.cursor(name=name, cursor_factory=cursor_factory) as cur:
+                if name:
+                    cur.itersize = itersize
+                yield cur
+
+    def close(self):
+        """Havuzdaki tüm bağlantıları kapat"""
+        with self._lock:
+            self._idle.clear()
+        if not self._pool.closed:
+            self._pool.closeall()   # boştakiler de psycopg2'nin 'kullanımda' listesinde
+            logger.info("✅ PostgreSQL bağlantı havuzu kapatıldı")
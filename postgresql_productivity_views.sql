@@ -0,0 +1,84 @@
+-- PostgreSQL Verimlilik Özetleri Migrasyonu
+-- Betonarme RAG Sistemi: site_observations üzerinde haftalık/aylık materialized view'lar
+-- Anahtar: (period_start, wbs_key, unit, crew_id); NULL wbs_key/unit/crew_id '' olarak tutulur
+-- (REFRESH ... CONCURRENTLY tüm satırları kapsayan bir UNIQUE index ister)
+
+-- 1. Haftalık özet
+CREATE MATERIALIZED VIEW IF NOT EXISTS mv_productivity_weekly AS
+SELECT date_trunc('week', work_date)::date AS period_start,
+       COALESCE(wbs_key, '') AS wbs_key,
+       COALESCE(unit, '') AS unit,
+       COALESCE(crew_id, '') AS crew_id,
+       SUM(qty) AS qty,
+       SUM(labor_hours) AS labor_hours,
+       count(*) AS obs_count
+FROM site_observations
+GROUP BY 1, 2, 3, 4;
+
+-- 2. Aylık özet
+CREATE MATERIALIZED VIEW IF NOT EXISTS mv_productivity_monthly AS
+SELECT date_trunc('month', work_date)::date AS period_start,
+       COALESCE(wbs_key, '') AS wbs_key,
+       COALESCE(unit, '') AS unit,
+       COALESCE(crew_id, '') AS crew_id,
+       SUM(qty) AS qty,
+       SUM(labor_hours) AS labor_hours,
+       count(*) AS obs_count
+FROM site_observations
+GROUP BY 1, 2, 3, 4;
+
+-- 3. Concurrent refresh için unique indexler
+CREATE UNIQUE INDEX IF NOT EXISTS idx_mv_productivity_weekly_key
+    ON mv_productivity_weekly (period_start, wbs_key, unit, crew_id);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_mv_productivity_monthly_key
+    ON mv_productivity_monthly (period_start, wbs_key, unit, crew_id);
+
+-- 4. Rapor sorguları (wbs_key bazlı dönem toplamları)
+CREATE INDEX IF NOT EXISTS idx_mv_productivity_weekly_wbs
+    ON mv_productivity_weekly (wbs_key, period_start);
+CREATE INDEX IF NOT EXISTS idx_mv_productivity_monthly_wbs
+    ON mv_productivity_monthly (wbs_key, period_start);
+
+-- 5. Değişiklik sayacı: site_observations'a her INSERT/UPDATE/DELETE/TRUNCATE ifadesi
+--    sürümü bir artırır (satır başına değil, ifade başına tetiklenir)
+CREATE TABLE IF NOT EXISTS site_observations_version (
+    id BOOLEAN PRIMARY KEY DEFAULT true CHECK (id),
+    version BIGINT NOT NULL DEFAULT 0
+);
+INSERT INTO site_observations_version DEFAULT VALUES ON CONFLICT (id) DO NOTHING;
+
+CREATE OR REPLACE FUNCTION bump_site_observations_version() RETURNS trigger AS $$
+BEGIN
+    UPDATE site_observations_version SET version = version + 1;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_site_observations_version ON site_observations;
+CREATE TRIGGER trg_site_observations_version
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON site_observations
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_site_observations_version();
+
+-- 6. Yenileme kaydı: view'ın yansıttığı sayaç değeri; raporlar
+--    source_version <> site_observations_version.version ise ham tablodan okur
+CREATE TABLE IF NOT EXISTS productivity_view_refreshes (
+    view_name TEXT PRIMARY KEY,
+    refreshed_at TIMESTAMPTZ NOT NULL
+);
+ALTER TABLE productivity_view_refreshes ADD COLUMN IF NOT EXISTS source_version BIGINT NOT NULL DEFAULT 0;
+INSERT INTO productivity_view_refreshes (view_name, refreshed_at, source_version)
+SELECT v.name, now(), s.version
+FROM (VALUES ('mv_productivity_weekly'), ('mv_productivity_monthly')) AS v(name), site_observations_version s
+ON CONFLICT (view_name) DO NOTHING;
+
+DROP INDEX IF EXISTS idx_site_observations_created_at;
+
+-- 7. Yenileme (gözlem yüklemelerinden sonra; okumaları bloklamaz)
+--    PostgreSQLRAGSystem.refresh_productivity_views() aynı komutları çalıştırır
+--    ve productivity_view_refreshes kaydını günceller.
+-- REFRESH MATERIALIZED VIEW CONCURRENTLY mv_productivity_weekly;
+-- REFRESH MATERIALIZED VIEW CONCURRENTLY mv_productivity_monthly;
+
+-- 8. Statistics güncelleme
+ANALYZE mv_productivity_weekly;
+ANALYZE mv_productivity_monthly;
@@ -0,0 +1,230 @@
+# -*- coding: utf-8 -*-
+"""
+PostgreSQL RAG Async Client
+PostgreSQLRAGSystem'in okuma yolunun (arama + tekil işçilik saati) asyncpg tabanlı
+asenkron karşılığı: aynı sorgular ve sonuç işleme, ancak çağrılar event loop'u bloklamaz;
+arama, norm ve faktör sorguları asyncio.gather ile eşzamanlı yürütülebilir.
+Doküman ekleme, rapor ihracı ve toplu işçilik saati senkron sistemde kalır.
+"""
+
+import re
+import json
+import asyncio
+import logging
+import threading
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+from postgresql_rag_system import (
+    FEATURE_NAMES, FEATURES_SQL, FULLTEXT_SEARCH_SQL, HYBRID_SEARCH_SQL, LIKE_MATCH_SCORE,
+    PARTIAL_SEARCH_SQL, SEMANTIC_SEARCH_SQL, RAGConfig, RAGResultsMixin,
+)
+from norm_index import NORM_PRIORITY_ORDER, NormIndex, adjustment_factor
+
+# asyncpg (opsiyonel)
+try:
+    import asyncpg
+    ASYNCPG_AVAILABLE = True
+except ImportError:
+    ASYNCPG_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+_NAMED_PARAM_RE = re.compile(r'%\((\w+)\)s')
+
+LOOKUP_NORM_SQL = f"""
+SELECT norm_lh_per_u, conditions_json
+FROM norms
+WHERE work_item_key = %(wbs_key)s AND unit = %(unit)s AND locale = %(locale)s
+ORDER BY {NORM_PRIORITY_ORDER}
+LIMIT 1
+"""
+
+
+def _numeric_params(sql: str) -> Tuple[str, List[str]]:
+    """psycopg2 %(ad)s parametrelerini asyncpg $n biçimine çevir; parametre adlarını sırayla döndür"""
+    names: List[str] = []
+
+    def _sub(match):
+        name = match.group(1)
+        if name not in names:
+            names.append(name)
+        return f"${names.index(name) + 1}"
+    return _NAMED_PARAM_RE.sub(_sub, sql), names
+
+
+# Sorgular bir kez çevrilir
+_FULLTEXT = _numeric_params(FULLTEXT_SEARCH_SQL)
+_SEMANTIC = _numeric_params(SEMANTIC_SEARCH_SQL)
+_HYBRID = _numeric_params(HYBRID_SEARCH_SQL)
+_PARTIAL_TRGM = _numeric_params(PARTIAL_SEARCH_SQL.format(score="word_similarity(%(query)s, c.text)"))
+_PARTIAL_LIKE = _numeric_params(PARTIAL_SEARCH_SQL.format(score=str(LIKE_MATCH_SCORE)))
+_LOOKUP_NORM = _numeric_params(LOOKUP_NORM_SQL)
+
+
+async def _init_connection(conn):
+    """Bağlantı başına tip dönüştürücüleri: jsonb -> dict, vector <-> '[...]' metni"""
+    await conn.set_type_codec('jsonb', encoder=json.dumps, decoder=json.loads, schema='pg_catalog')
+    try:
+        await conn.set_type_codec('vector', encoder=str, decoder=str, schema='public', format='text')
+    except ValueError:
+        pass  # pgvector kurulu değil
+
+
+class AsyncPostgreSQLRAGSystem(RAGResultsMixin):
+    """asyncpg havuzlu asenkron RAG istemcisi. PostgreSQLRAGSystem'in yalnız şu metodlarını sunar:
+    search, search_semantic, search_hybrid ve calculate_labor_hours. add_documents, export_reports,
+    productivity_summary ve toplu işçilik saati (labor_hours) için senkron sistem kullanılır."""
+
+    def __init__(self, config: RAGConfig,
+                 embed_fn: Optional[Callable[[List[str]], Optional[List[List[float]]]]] = None,
+                 audit_log=None, norm_index: Optional[NormIndex] = None):
+        if not ASYNCPG_AVAILABLE:
+            raise ImportError("asyncpg kurulu değil (pip install asyncpg)")
+        self.config = config
+        self.embed_fn = embed_fn
+        # Audit yazıcısı ve norm indeksi senkron sistemle paylaşılabilir
+        self.audit_log = audit_log
+        self.norm_index = norm_index
+        self.pool = None
+        self.features: Dict[str, bool] = {}
+
+    @classmethod
+    async def create(cls, config: RAGConfig, **kwargs) -> "AsyncPostgreSQLRAGSystem":
+        """İstemciyi oluştur ve bağlan"""
+        rag = cls(config, **kwargs)
+        await rag.connect()
+        return rag
+
+    async def connect(self):
+        """Bağlantı havuzunu kur ve şema özelliklerini tespit et"""
+        try:
+            self.pool = await asyncpg.create_pool(
+                host=self.config.db_host,
+                port=self.config.db_port,
+                database=self.config.db_name,
+                user=self.config.db_user,
+                password=self.config.db_password,
+                min_size=self.config.pool_min_size,
+                max_size=self.config.pool_max_size,
+                timeout=self.config.connect_timeout,
+                server_settings={'application_name': 'betonarme_rag_async'},
+                init=_init_connection,
+            )
+            self.features = dict(zip(FEATURE_NAMES, await self.pool.fetchrow(FEATURES_SQL)))
+            logger.info("✅ PostgreSQL async bağlantısı başarılı")
+        except Exception as e:
+            logger.error(f"❌ PostgreSQL async bağlantı hatası: {e}")
+            raise
+
+    async def _fetch(self, prepared: Tuple[str, List[str]], params: Dict[str, Any],
+                     ef_search: Optional[int] = None) -> List:
+        sql, names = prepared
+        args = [params[name] for name in names]
+        async with self.pool.acquire(timeout=self.config.pool_timeout) as conn:
+            if ef_search is None:
+                return await conn.fetch(sql, *args)
+            async with conn.transaction():
+                await conn.execute(f"SET LOCAL hnsw.ef_search = {int(ef_search)}")
+                return await conn.fetch(sql, *args)
+
+    async def _embed_query_async(self, query: str) -> Optional[List[float]]:
+        """embed_fn senkron (HTTP) olduğundan thread'de çalıştır"""
+        if not self.embed_fn or not self.features.get('vector'):
+            return None
+        return await asyncio.to_thread(self._embed_query, query)
+
+    async def search(self, query: str, locales: List[str] = None,
+                     work_types: List[str] = None, top_k: int = None) -> List[Dict]:
+        """Tam metin arama (ts_rank_cd); sonuç yoksa kısmi (trigram) eşleşme"""
+        params = {
+            'query': query,
+            'locales': locales or ['tr', 'ru', 'en'],
+            'work_types': work_types or None,
+            'top_k': top_k or self.config.default_top_k,
+        }
+        results = []
+        if self.features['fts']:
+            results = await self._fetch(_FULLTEXT, params)
+
+        # Kısmi norm kodları ('FER-06-0') tsquery ile eşleşmez
+        if not results:
+            params['pattern'] = '%' + query.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+            results = await self._fetch(_PARTIAL_TRGM if self.features['trgm'] else _PARTIAL_LIKE, params)
+
+        return self._finalize_results(query, results)
+
+    async def search_semantic(self, query: str, query_embedding: Optional[Sequence[float]] = None,
+                              locales: List[str] = None, work_types: List[str] = None,
+                              top_k: int = None) -> List[Dict]:
+        """pgvector kosinüs benzerliği ile semantik arama"""
+        if query_embedding is None:
+            query_embedding = await self._embed_query_async(query)
+        params = self._vector_params(query, query_embedding, locales, work_types, top_k) \
+            if query_embedding is not None else None
+        if params is None:
+            return []
+        results = await self._fetch(_SEMANTIC, params,
+                                    ef_search=max(self.config.hnsw_ef_search, params['top_k']))
+        return self._finalize_results(query, results)
+
+    async def search_hybrid(self, query: str, query_embedding: Optional[Sequence[float]] = None,
+                            locales: List[str] = None, work_types: List[str] = None,
+                            top_k: int = None, alpha: float = None) -> List[Dict]:
+        """Vektör mesafesi ve ts_rank_cd skorunu tek sorguda birleştiren hibrit arama"""
+        if not self.features['fts']:
+            return await self.search_semantic(query, query_embedding, locales, work_types, top_k)
+        if query_embedding is None:
+            query_embedding = await self._embed_query_async(query)
+        params = self._vector_params(query, query_embedding, locales, work_types, top_k) \
+            if query_embedding is not None else None
+        if params is None:
+            return await self.search(query, locales, work_types, top_k)
+        params['alpha'] = self.config.hybrid_alpha if alpha is None else alpha
+        params['candidates'] = max(self.config.hybrid_candidates, params['top_k'])
+        results = await self._fetch(_HYBRID, params,
+                                    ef_search=max(self.config.hnsw_ef_search, params['candidates']))
+        return self._finalize_results(query, results)
+
+    async def calculate_labor_hours(self, wbs_key: str, qty: float, unit: str,
+                                    locale: str = 'tr') -> float:
+        """İşçilik saati hesapla (norm indeksi varsa bellekten, yoksa tek sorgu)"""
+        if self.norm_index is not None:
+            entry = await asyncio.to_thread(self.norm_index.lookup, wbs_key, unit, locale)
+            effective = entry.effective_lh_per_u if entry is not None else None
+        else:
+            rows = await self._fetch(_LOOKUP_NORM, {'wbs_key': wbs_key, 'unit': unit, 'locale': locale})
+            effective = (float(rows[0]['norm_lh_per_u']) * adjustment_factor(rows[0]['conditions_json'])
+                         if rows else None)
+        if effective is None:
+            logger.warning(f"Norm bulunamadı: {wbs_key}, {unit}")
+            return 0.0
+        return qty * effective
+
+    async def close(self):
+        """Havuzu kapat"""
+        if self.pool is not None:
+            await self.pool.close()
+            self.pool = None
+            logger.info("✅ PostgreSQL async bağlantısı kapatıldı")
+
+
+class AsyncLoopThread:
+    """Senkron koddan (Streamlit) coroutine çalıştırmak için arka plan event loop'u.
+
+    asyncpg havuzu oluşturulduğu loop'a bağlıdır; her çağrıda asyncio.run ile yeni
+    loop açmak yerine tüm coroutine'ler bu tek loop'a gönderilir.
+    """
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_forever, name="rag-async-loop", daemon=True)
+        self._thread.start()
+
+    def run(self, coro: Awaitable, timeout: Optional[float] = None) -> Any:
+        """Coroutine'i loop'ta çalıştır ve sonucunu bekle"""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result(timeout)
+
+    def stop(self):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join(5)
+        self.loop.close()
@@ -1,364 +1,470 @@
 # -*- coding: utf-8 -*-
 """
 PostgreSQL RAG System for Betonarme İşçilik Modülü
-pgvector olmadan basit implementasyon
+Full-text arama; pgvector kuruluysa semantik ve hibrit arama
 """
 
+import io
 import os
 import json
 import logging
 import psycopg2
 import psycopg2.extras
 import numpy as np
-from typing import List, Dict, Any, Optional, Tuple
+from typing import List, Dict, Any, Callable, Iterable, Optional, Sequence, Tuple
 from datetime import datetime, date, timedelta
 import pandas as pd
-from dataclasses import dataclass
+
+from rag_common import (
+    PRODUCTIVITY_SUMMARY_COLUMNS, SITE_OBSERVATION_COLUMNS, SITE_OBSERVATION_COLUMN_FORMATS,
+    SITE_OBSERVATION_COLUMN_TYPES, VARIANCE_COLUMNS, VARIANCE_COLUMN_FORMATS, VARIANCE_COLUMN_TYPES,
+    RAGConfig, RAGDocumentMixin, RAGResultsMixin, _vector_literal,
+)
+from postgresql_pool import PostgreSQLConnectionPool
+from postgresql_audit_log import AuditLogWriter
+from norm_index import NORM_PRIORITY_ORDER, NormIndex
+from report_writers import write_report
 
 # Logging ayarla
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-@dataclass
-class RAGConfig:
-    """RAG sistem konfigürasyonu"""
-    db_host: str = "localhost"
-    db_port: int = 5432
-    db_name: str = "betonarme_rag"
-    db_user: str = "postgres"
-    db_password: str = "1905"
-    
-    # Retriever ayarları
-    default_top_k: int = 8
-    score_threshold: float = 0.78
-    min_sources: int = 2
-    
-    # Güvenlik ayarları
-    enable_audit_log: bool = True
-    enable_source_diversification: bool = True
-    enable_score_filtering: bool = True
+# Toplu ekleme ayarları
+DOCUMENT_BATCH_SIZE = 200       # işlem (commit) başına doküman
+
+
+def _copy_value(value) -> str:
+    """Değeri COPY text formatına çevir (NULL, dizi ve kaçış karakterleri)"""
+    if value is None:
+        return '\\N'
+    if isinstance(value, list):
+        value = '{' + ','.join('"' + str(v).replace('\\', '\\\\').replace('"', '\\"') + '"'
+                               for v in value) + '}'
+    return (str(value).replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n')
+            .replace('\r', '\\r').replace('\x00', ''))
+
+
+def _copy_line(row: Tuple) -> str:
+    return '\t'.join(map(_copy_value, row)) + '\n'
+
+# Uygulanmış migrasyonlar: tsv kolonu, pg_trgm, embedding kolonu, verimlilik view'ları
+FEATURE_NAMES = ('fts', 'trgm', 'vector', 'productivity_views')
+FEATURES_SQL = """
+SELECT
+    EXISTS (SELECT 1 FROM information_schema.columns
+            WHERE table_name = 'chunks' AND column_name = 'tsv'),
+    EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'),
+    EXISTS (SELECT 1 FROM information_schema.columns
+            WHERE table_name = 'chunks' AND column_name = 'embedding'),
+    EXISTS (SELECT 1 FROM pg_matviews WHERE matviewname = 'mv_productivity_monthly')
+        AND to_regclass('productivity_view_refreshes') IS NOT NULL
+        AND to_regclass('site_observations_version') IS NOT NULL
+"""
+
+# Arama sorguları (postgresql_fulltext_search.sql migrasyonu gerekir)
+SEARCH_COLUMNS = """
+    c.id, c.document_id, c.section_path, c.heading, c.text,
+    c.work_types, c.norm_codes, c.unit, c.locale,
+    d.source, d.country, d.title as doc_title"""
+
+# Her locale kendi text search konfigürasyonu ile sorgulanır; skor 0-1 aralığına normalize (32)
+FULLTEXT_SEARCH_SQL = f"""
+SELECT {SEARCH_COLUMNS}, ts_rank_cd(c.tsv, q.tsq, 32) AS score
+FROM (SELECT l AS locale, websearch_to_tsquery(rag_ts_config(l), %(query)s) AS tsq
+      FROM unnest(%(locales)s::text[]) AS l) q
+JOIN chunks c ON c.locale = q.locale AND c.tsv @@ q.tsq
+JOIN documents d ON c.document_id = d.id
+WHERE %(work_types)s::text[] IS NULL OR c.work_types && %(work_types)s::text[]
+ORDER BY score DESC, c.id DESC
+LIMIT %(top_k)s
+"""
+
+# ILIKE '%..%' pg_trgm GIN indexi (idx_chunks_text_trgm) ile çalışır
+PARTIAL_SEARCH_SQL = f"""
+SELECT {SEARCH_COLUMNS}, {{score}} AS score
+FROM chunks c
+JOIN documents d ON c.document_id = d.id
+WHERE c.locale = ANY(%(locales)s)
+  AND (c.text ILIKE %(pattern)s OR c.heading ILIKE %(pattern)s)
+  AND (%(work_types)s::text[] IS NULL OR c.work_types && %(work_types)s::text[])
+ORDER BY score DESC, c.created_at DESC
+LIMIT %(top_k)s
+"""
+
+LIKE_MATCH_SCORE = 0.5   # pg_trgm yoksa kısmi eşleşme skoru
+
+# pgvector (postgresql_pgvector.sql migrasyonu gerekir); <=> kosinüs mesafesi
+SEMANTIC_SEARCH_SQL = f"""
+SELECT {SEARCH_COLUMNS}, 1 - (c.embedding <=> %(embedding)s::vector) AS score
+FROM chunks c
+JOIN documents d ON c.document_id = d.id
+WHERE c.embedding IS NOT NULL
+  AND c.locale = ANY(%(locales)s)
+  AND (%(work_types)s::text[] IS NULL OR c.work_types && %(work_types)s::text[])
+ORDER BY c.embedding <=> %(embedding)s::vector
+LIMIT %(top_k)s
+"""
+
+# Aday kümesi: vektör ve tam metin aramalarının ilk N sonucu; skor ağırlıklı toplam
+HYBRID_SEARCH_SQL = f"""
+WITH q AS (
+    SELECT l AS locale, websearch_to_tsquery(rag_ts_config(l), %(query)s) AS tsq
+    FROM unnest(%(locales)s::text[]) AS l
+),
+vec AS (
+    SELECT c.id FROM chunks c
+    WHERE c.embedding IS NOT NULL
+      AND c.locale = ANY(%(locales)s)
+      AND (%(work_types)s::text[] IS NULL OR c.work_types && %(work_types)s::text[])
+    ORDER BY c.embedding <=> %(embedding)s::vector
+    LIMIT %(candidates)s
+),
+fts AS (
+    SELECT c.id FROM q
+    JOIN chunks c ON c.locale = q.locale AND c.tsv @@ q.tsq
+    WHERE %(work_types)s::text[] IS NULL OR c.work_types && %(work_types)s::text[]
+    ORDER BY ts_rank_cd(c.tsv, q.tsq, 32) DESC
+    LIMIT %(candidates)s
+),
+scored AS (
+    SELECT c.id,
+           COALESCE(1 - (c.embedding <=> %(embedding)s::vector), 0) AS vector_score,
+           COALESCE(ts_rank_cd(c.tsv, q.tsq, 32), 0) AS text_score
+    FROM (SELECT id FROM vec UNION SELECT id FROM fts) cand
+    JOIN chunks c ON c.id = cand.id
+    LEFT JOIN q ON q.locale = c.locale AND c.tsv @@ q.tsq
+)
+SELECT {SEARCH_COLUMNS}, s.vector_score, s.text_score,
+       %(alpha)s * s.vector_score + (1 - %(alpha)s) * s.text_score AS score
+FROM scored s
+JOIN chunks c ON c.id = s.id
+JOIN documents d ON c.document_id = d.id
+ORDER BY score DESC
+LIMIT %(top_k)s
+"""
+
+EMBED_BATCH_SIZE = 256   # embed_fn çağrısı başına chunk
+
+# Rapor ihracı: sunucu taraflı cursor'dan her seferde çekilen satır
+REPORT_ITERSIZE = 5000
+
+# Verimlilik özetleri (postgresql_productivity_views.sql): dönem -> materialized view
+PRODUCTIVITY_VIEWS = {
+    'week': 'mv_productivity_weekly',
+    'month': 'mv_productivity_monthly',
+}
+
+# View son yenilemeden sonra eklenen gözlem yoksa true (kayıt yoksa satır dönmez)
+# site_observations değişiklik sayacı (tetikleyici her INSERT/UPDATE/DELETE ifadesinde artırır)
+SOURCE_VERSION_SQL = "SELECT version FROM site_observations_version"
+
+VIEW_FRESHNESS_SQL = """
+SELECT r.source_version = v.version
+FROM productivity_view_refreshes r, site_observations_version v
+WHERE r.view_name = %s
+"""
+
+VIEW_REFRESHED_SQL = """
+INSERT INTO productivity_view_refreshes (view_name, refreshed_at, source_version) VALUES (%s, now(), %s)
+ON CONFLICT (view_name) DO UPDATE SET
+    refreshed_at = EXCLUDED.refreshed_at, source_version = EXCLUDED.source_version
+"""
+
+# Gerçekleşen saatler (wbs_key bazında), ham tablodan
+ACTUAL_HOURS_RAW_SQL = """
+    SELECT wbs_key, SUM(labor_hours) AS actual_hours
+    FROM site_observations
+    WHERE work_date BETWEEN %(start_date)s AND %(end_date)s
+    GROUP BY wbs_key"""
 
-class PostgreSQLRAGSystem:
+# Tam aylar aylık view'dan, baş/son kısmi aylar ham tablodan (sonuç aynı, taranan satır az)
+ACTUAL_HOURS_MV_SQL = """
+    SELECT wbs_key, SUM(labor_hours) AS actual_hours
+    FROM (
+        SELECT wbs_key, labor_hours FROM mv_productivity_monthly
+        WHERE period_start >= %(full_start)s AND period_start < %(full_end)s
+        UNION ALL
+        SELECT wbs_key, labor_hours FROM site_observations
+        WHERE work_date BETWEEN %(start_date)s AND %(end_date)s
+          AND NOT (work_date >= %(full_start)s AND work_date < %(full_end)s)
+    ) x
+    GROUP BY wbs_key"""
+
+# Dashboard: dönem x wbs x birim x ekip özet satırları
+PRODUCTIVITY_SUMMARY_SQL = """
+SELECT period_start, wbs_key, unit, crew_id, qty::float8, labor_hours::float8, obs_count,
+       (qty / NULLIF(labor_hours, 0))::float8 AS productivity
+FROM {source}
+WHERE period_start BETWEEN date_trunc(%(grain)s, %(start_date)s::date)::date AND %(end_date)s
+  AND (%(wbs_key)s::text IS NULL OR wbs_key = %(wbs_key)s)
+  AND (%(crew_id)s::text IS NULL OR crew_id = %(crew_id)s)
+ORDER BY period_start, wbs_key, unit, crew_id
+"""
+
+# View yokken aynı özet ham tablodan
+PRODUCTIVITY_SUMMARY_RAW_SOURCE = """(
+    SELECT date_trunc(%(grain)s, work_date)::date AS period_start,
+           COALESCE(wbs_key, '') AS wbs_key, unit, COALESCE(crew_id, '') AS crew_id,
+           SUM(qty) AS qty, SUM(labor_hours) AS labor_hours, count(*) AS obs_count
+    FROM site_observations
+    WHERE work_date BETWEEN date_trunc(%(grain)s, %(start_date)s::date)::date AND %(end_date)s
+    GROUP BY 1, 2, 3, 4
+) s"""
+
+
+
+def _full_month_range(start_date: date, end_date: date) -> Tuple[date, date]:
+    """[start_date, end_date] içinde tamamen kalan ayların [ilk gün, son ayın ertesi ayı) aralığı"""
+    full_start = start_date if start_date.day == 1 else (start_date.replace(day=1) + timedelta(days=32)).replace(day=1)
+    full_end = (end_date + timedelta(days=1)).replace(day=1)
+    return full_start, full_end
+
+# Sapma raporu: gerçekleşen saatler + LATERAL ile satır başına seçilen norm (tek round trip)
+VARIANCE_REPORT_SQL = f"""
+SELECT v.wbs_key, v.qty, v.unit, COALESCE(a.actual_hours, 0) AS actual_hours,
+       n.norm_lh_per_u, n.conditions_json
+FROM (
+    SELECT wbs_key, qty, unit
+    FROM revit_quantities
+    GROUP BY wbs_key, qty, unit
+) v
+LEFT JOIN ({{actual_hours}}
+) a ON a.wbs_key = v.wbs_key
+LEFT JOIN LATERAL (
+    SELECT norm_lh_per_u, conditions_json
+    FROM norms
+    WHERE work_item_key = v.wbs_key AND unit = v.unit AND locale = %(locale)s
+    ORDER BY {NORM_PRIORITY_ORDER}
+    LIMIT 1
+) n ON true
+"""
+
+
+class PostgreSQLRAGSystem(RAGResultsMixin, RAGDocumentMixin):
     """PostgreSQL tabanlı RAG sistemi"""
     
-    def __init__(self, config: RAGConfig):
+    def __init__(self, config: RAGConfig, pool: Optional[PostgreSQLConnectionPool] = None,
+                 embed_fn: Optional[Callable[[List[str]], Optional[List[List[float]]]]] = None):
         self.config = config
-        self.connection = None
+        self.embed_fn = embed_fn
+        self.pool = pool
+        self._owns_pool = pool is None
+        self.audit_log: Optional[AuditLogWriter] = None
         self._connect()
+        self.norm_index = NormIndex(self.pool, refresh_interval=config.norm_refresh_interval)
+        if config.enable_audit_log:
+            self.audit_log = AuditLogWriter(
+                self.pool,
+                max_queue=config.audit_queue_size,
+                batch_size=config.audit_batch_size,
+                flush_interval=config.audit_flush_interval,
+                overflow=config.audit_overflow,
+            )
     
     def _connect(self):
-        """Veritabanına bağlan"""
+        """Bağlantı havuzunu kur ve bir bağlantıyla doğrula"""
         try:
-            self.connection = psycopg2.connect(
-                host=self.config.db_host,
-                port=self.config.db_port,
-                database=self.config.db_name,
-                user=self.config.db_user,
-                password=self.config.db_password
-            )
-            self.connection.autocommit = True
+            if self.pool is None:
+                self.pool = PostgreSQLConnectionPool(self.config)
+            self.features = self._detect_features()
             logger.info("✅ PostgreSQL bağlantısı başarılı")
         except Exception as e:
             logger.error(f"❌ PostgreSQL bağlantı hatası: {e}")
             raise
     
+    def _detect_features(self) -> Dict[str, bool]:
+        """Şemada uygulanmış migrasyonları/eklentileri tespit et"""
+        with self.pool.cursor() as cursor:
+            cursor.execute(FEATURES_SQL)
+            features = dict(zip(FEATURE_NAMES, cursor.fetchone()))
+        if not features['fts']:
+            logger.warning("chunks.tsv yok (postgresql_fulltext_search.sql uygulanmamış), ILIKE aramasına dönülüyor")
+        return features
+    
     def add_document(self, source: str, country: str, doc_type: str, 
                     title: str, lang: str, content: str, **kwargs) -> int:
-        """Doküman ekle"""
-        cursor = self.connection.cursor()
-        
-        # Dokümanı ekle
-        cursor.execute("""
+        """Doküman ekle (doküman + tüm chunk'lar tek işlemde)"""
+        return self.add_documents([{
+            'source': source, 'country': country, 'doc_type': doc_type,
+            'title': title, 'lang': lang, 'content': content,
+        }])[0]
+    
+    def add_documents(self, documents: Iterable[Dict[str, Any]],
+                      batch_size: int = DOCUMENT_BATCH_SIZE) -> List[int]:
+        """Dokümanları toplu ekle; her grup (dokümanlar + chunk'ları) tek işlemde yazılır"""
+        doc_ids: List[int] = []
+        with self.pool.connection() as conn:
+            with conn.cursor() as cursor:
+                batch: List[Dict[str, Any]] = []
+                for doc in documents:
+                    batch.append(doc)
+                    if len(batch) >= batch_size:
+                        doc_ids.extend(self._insert_document_batch(cursor, batch))
+                        conn.commit()
+                        batch = []
+                if batch:
+                    doc_ids.extend(self._insert_document_batch(cursor, batch))
+        return doc_ids
+    
+    def _insert_document_batch(self, cursor, batch: List[Dict[str, Any]]) -> List[int]:
+        """Doküman grubunu tek INSERT, chunk'larını COPY ile yaz"""
+        rows = psycopg2.extras.execute_values(cursor, """
         INSERT INTO documents (source, country, doc_type, title, lang, content)
-        VALUES (%s, %s, %s, %s, %s, %s)
+        VALUES %s
         RETURNING id
-        """, (source, country, doc_type, title, lang, content))
-        
-        doc_id = cursor.fetchone()[0]
-        
-        # İçeriği chunk'lara böl
-        chunks = self._chunk_text(content, title)
-        
-        # Chunk'ları ekle
-        for chunk in chunks:
-            self._add_chunk(doc_id, chunk)
-        
-        logger.info(f"✅ Doküman eklendi: {title} ({len(chunks)} chunk)")
-        return doc_id
+        """, [(d['source'], d['country'], d['doc_type'], d['title'], d['lang'], d['content'])
+              for d in batch], page_size=len(batch), fetch=True)
+        doc_ids = [r[0] for r in rows]
+        
+        chunk_rows = []
+        for doc_id, doc in zip(doc_ids, batch):
+            chunks = self._chunk_text(doc['content'], doc['title'])
+            chunk_rows.extend(self._chunk_row(doc_id, chunk, doc['lang']) for chunk in chunks)
+            logger.info(f"✅ Doküman eklendi: {doc['title']} ({len(chunks)} chunk)")
+        
+        columns = "document_id, section_path, heading, text, tokens, work_types, norm_codes, unit, locale"
+        embeddings = self._embed_chunk_texts([row[3] for row in chunk_rows])
+        if embeddings is not None:
+            columns += ", embedding"
+            chunk_rows = [row + (emb,) for row, emb in zip(chunk_rows, embeddings)]
+        
+        # Chunk'lar COPY FROM STDIN ile tek akışta yazılır
+        buf = io.StringIO()
+        buf.writelines(map(_copy_line, chunk_rows))
+        buf.seek(0)
+        cursor.copy_expert(f"COPY chunks ({columns}) FROM STDIN", buf)
+        return doc_ids
     
-    def _chunk_text(self, text: str, title: str) -> List[Dict]:
-        """Metni chunk'lara böl"""
-        max_tokens = 1000
-        words = text.split()
-        chunks = []
-        
-        current_chunk = []
-        current_tokens = 0
-        
-        for word in words:
-            current_chunk.append(word)
-            current_tokens += len(word.split()) + 1
-            
-            if current_tokens >= max_tokens:
-                chunk_text = " ".join(current_chunk)
-                chunks.append({
-                    'text': chunk_text,
-                    'tokens': current_tokens,
-                    'heading': title,
-                    'section_path': title
-                })
-                current_chunk = []
-                current_tokens = 0
-        
-        if current_chunk:
-            chunk_text = " ".join(current_chunk)
-            chunks.append({
-                'text': chunk_text,
-                'tokens': current_tokens,
-                'heading': title,
-                'section_path': title
-            })
-        
-        return chunks
+    def _embed_chunk_texts(self, texts: List[str]) -> Optional[List[str]]:
+        """embed_fn ve embedding kolonu varsa chunk'ları grup grup embed et (vektör literal'leri)"""
+        if not (self.embed_fn and self.features['vector'] and texts):
+            return None
+        literals: List[str] = []
+        for start in range(0, len(texts), EMBED_BATCH_SIZE):
+            try:
+                embs = self.embed_fn(texts[start:start + EMBED_BATCH_SIZE])
+            except Exception as e:
+                embs = None
+                logger.warning(f"Embedding hatası: {e}")
+            if not embs:
+                logger.warning("Embedding alınamadı, chunk'lar embedding'siz eklendi (backfill_embeddings ile tamamlanabilir)")
+                return None
+            if len(embs[0]) != self.config.embedding_dim:
+                logger.error(f"Embedding boyutu {len(embs[0])}, kolon vector({self.config.embedding_dim}) bekliyor")
+                return None
+            literals.extend(_vector_literal(e) for e in embs)
+        return literals
     
-    def _add_chunk(self, document_id: int, chunk: Dict):
-        """Chunk ekle"""
-        work_types = self._extract_work_types(chunk['text'])
-        norm_codes = self._extract_norm_codes(chunk['text'])
-        unit = self._extract_unit(chunk['text'])
-        
-        cursor = self.connection.cursor()
-        cursor.execute("""
-        INSERT INTO chunks (document_id, section_path, heading, text, tokens, 
-                           work_types, norm_codes, unit, locale)
-        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-        """, (
+    def backfill_embeddings(self, batch_size: int = EMBED_BATCH_SIZE) -> int:
+        """Embedding'i olmayan chunk'ları embed edip güncelle; güncellenen sayıyı döndür"""
+        if not (self.embed_fn and self.features['vector']):
+            return 0
+        updated = 0
+        while True:
+            with self.pool.cursor() as cursor:
+                cursor.execute("""
+                SELECT id, text FROM chunks WHERE embedding IS NULL
+                ORDER BY id LIMIT %s FOR UPDATE SKIP LOCKED
+                """, (batch_size,))
+                rows = cursor.fetchall()
+                if not rows:
+                    return updated
+                embeddings = self._embed_chunk_texts([text for _, text in rows])
+                if embeddings is None:
+                    return updated
+                psycopg2.extras.execute_values(cursor, """
+                UPDATE chunks SET embedding = v.embedding::vector
+                FROM (VALUES %s) AS v(id, embedding)
+                WHERE chunks.id = v.id
+                """, [(chunk_id, emb) for (chunk_id, _), emb in zip(rows, embeddings)])
+            updated += len(rows)
+    
+    def _chunk_row(self, document_id: int, chunk: Dict, locale: str) -> Tuple:
+        """Chunk satırı (INSERT sırası ile; locale dokümanın dili)"""
+        return (
             document_id,
             chunk['section_path'],
             chunk['heading'],
             chunk['text'],
             chunk['tokens'],
-            work_types,
-            norm_codes,
-            unit,
-            'tr'
-        ))
-    
-    def _extract_work_types(self, text: str) -> List[str]:
-        """İş tiplerini çıkar"""
-        work_types = []
-        text_lower = text.lower()
-        
-        if any(word in text_lower for word in ['donatı', 'арматура', 'rebar']):
-            work_types.append('rebar')
-        if any(word in text_lower for word in ['kalıp', 'опалубка', 'formwork']):
-            work_types.append('formwork')
-        if any(word in text_lower for word in ['beton', 'бетон', 'concrete']):
-            work_types.append('concrete')
-        
-        return work_types
-    
-    def _extract_norm_codes(self, text: str) -> List[str]:
-        """Norm kodlarını çıkar"""
-        import re
-        norm_codes = []
-        
-        fer_pattern = r'FER[-\s]?\d{2}[-\s]?\d{3}'
-        fer_matches = re.findall(fer_pattern, text, re.IGNORECASE)
-        norm_codes.extend(fer_matches)
-        
-        poz_pattern = r'Poz[-\s]?\d{3}'
-        poz_matches = re.findall(poz_pattern, text, re.IGNORECASE)
-        norm_codes.extend(poz_matches)
-        
-        return norm_codes
-    
-    def _extract_unit(self, text: str) -> Optional[str]:
-        """Birim çıkar"""
-        text_lower = text.lower()
-        
-        if 'kg' in text_lower:
-            return 'kg'
-        elif 'm2' in text_lower or 'm²' in text_lower:
-            return 'm2'
-        elif 'm3' in text_lower or 'm³' in text_lower:
-            return 'm3'
-        elif 'saat' in text_lower:
-            return 'h'
-        
-        return None
+            self._extract_work_types(chunk['text']),
+            self._extract_norm_codes(chunk['text']),
+            self._extract_unit(chunk['text']),
+            (locale or 'tr').lower()
+        )
     
     def search(self, query: str, locales: List[str] = None, 
               work_types: List[str] = None, top_k: int = None) -> List[Dict]:
-        """Basit metin arama"""
+        """Tam metin arama (ts_rank_cd); sonuç yoksa kısmi (trigram) eşleşme"""
         if not top_k:
             top_k = self.config.default_top_k
         
         if not locales:
             locales = ['tr', 'ru', 'en']
         
-        cursor = self.connection.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-        
-        # Basit LIKE arama
-        search_query = """
-        SELECT c.id, c.document_id, c.section_path, c.heading, c.text,
-               c.work_types, c.norm_codes, c.unit, c.locale,
-               d.source, d.country, d.title as doc_title
-        FROM chunks c
-        JOIN documents d ON c.document_id = d.id
-        WHERE c.text ILIKE %s AND c.locale = ANY(%s)
-        ORDER BY 
-            CASE 
-                WHEN c.text ILIKE %s THEN 1
-                WHEN c.heading ILIKE %s THEN 2
-                ELSE 3
-            END,
-            c.created_at DESC
-        LIMIT %s
-        """
-        
-        query_pattern = f'%{query}%'
-        params = [query_pattern, locales, query_pattern, query_pattern, top_k]
-        
-        cursor.execute(search_query, params)
-        results = cursor.fetchall()
-        
-        # Sonuçları işle
-        processed_results = []
-        for row in results:
-            processed_results.append({
-                'id': row['id'],
-                'document_id': row['document_id'],
-                'section_path': row['section_path'],
-                'heading': row['heading'],
-                'text': row['text'],
-                'work_types': row['work_types'] or [],
-                'norm_codes': row['norm_codes'] or [],
-                'unit': row['unit'],
-                'locale': row['locale'],
-                'score': 0.8,  # Sabit skor
-                'source': row['source'],
-                'country': row['country'],
-                'doc_title': row['doc_title']
-            })
-        
-        # Güvenlik katmanı uygula
-        filtered_results = self._apply_security_layer(query, processed_results)
-        
-        # Audit log
-        if self.config.enable_audit_log:
-            self._log_retrieval(query, filtered_results)
-        
-        return filtered_results
-    
-    def _apply_security_layer(self, query: str, results: List[Dict]) -> List[Dict]:
-        """Güvenlik katmanı uygula"""
-        
-        # Kaynak çeşitlendirmesi
-        if self.config.enable_source_diversification:
-            results = self._diversify_sources(results)
-        
-        # Minimum kaynak kontrolü
-        if len(results) < self.config.min_sources:
-            logger.warning(f"Insufficient context: only {len(results)} sources found")
-        
-        return results
-    
-    def _diversify_sources(self, results: List[Dict]) -> List[Dict]:
-        """Kaynak çeşitlendirmesi uygula"""
-        source_counts = {}
-        diversified = []
-        
-        for result in results:
-            source = result['source']
-            if source_counts.get(source, 0) < 2:  # Her kaynaktan max 2 chunk
-                diversified.append(result)
-                source_counts[source] = source_counts.get(source, 0) + 1
-        
-        return diversified
-    
-    def _log_retrieval(self, query: str, results: List[Dict]):
-        """Retrieval işlemini logla"""
-        cursor = self.connection.cursor()
-        
-        cursor.execute("""
-        INSERT INTO retrieval_logs (query, top_k, chunk_ids, scores, accepted)
-        VALUES (%s, %s, %s, %s, %s)
-        """, (
-            query,
-            len(results),
-            [r['id'] for r in results],
-            [r['score'] for r in results],
-            len(results) >= self.config.min_sources
-        ))
+        params = {
+            'query': query,
+            'locales': locales,
+            'work_types': work_types or None,
+            'top_k': top_k,
+        }
+        
+        with self.pool.cursor(psycopg2.extras.RealDictCursor) as cursor:
+            results = []
+            if self.features['fts']:
+                cursor.execute(FULLTEXT_SEARCH_SQL, params)
+                results = cursor.fetchall()
+            
+            # Kısmi norm kodları ('FER-06-0') tsquery ile eşleşmez
+            if not results:
+                score_sql = "word_similarity(%(query)s, c.text)" if self.features['trgm'] else str(LIKE_MATCH_SCORE)
+                params['pattern'] = '%' + query.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+                cursor.execute(PARTIAL_SEARCH_SQL.format(score=score_sql), params)
+                results = cursor.fetchall()
+        
+        return self._finalize_results(query, results)
     
-    def calculate_labor_hours(self, wbs_key: str, qty: float, unit: str, 
-                            locale: str = 'tr') -> float:
-        """İşçilik saati hesapla"""
-        cursor = self.connection.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-        
-        # Uygun normu bul
-        cursor.execute("""
-        SELECT norm_lh_per_u, conditions_json
-        FROM norms
-        WHERE work_item_key = %s AND unit = %s AND locale = %s
-        ORDER BY 
-            CASE source 
-                WHEN 'Internal' THEN 1
-                WHEN 'Poz' THEN 2
-                WHEN 'FER' THEN 3
-                ELSE 4
-            END,
-            updated_at DESC
-        LIMIT 1
-        """, (wbs_key, unit, locale))
-        
-        result = cursor.fetchone()
-        if not result:
-            logger.warning(f"Norm bulunamadı: {wbs_key}, {unit}")
-            return 0.0
-        
-        norm_lh_per_u = float(result['norm_lh_per_u'])
-        conditions = result['conditions_json'] or {}
-        
-        # Koşul çarpanlarını uygula
-        adjustment_factors = self._calculate_adjustment_factors(conditions)
-        effective_norm = norm_lh_per_u * adjustment_factors
-        
-        return qty * effective_norm
+    def search_semantic(self, query: str, query_embedding: Optional[Sequence[float]] = None,
+                        locales: List[str] = None, work_types: List[str] = None,
+                        top_k: int = None) -> List[Dict]:
+        """pgvector kosinüs benzerliği ile semantik arama (HNSW/IVFFlat indexli)"""
+        params = self._vector_params(query, query_embedding, locales, work_types, top_k)
+        if params is None:
+            return []
+        with self.pool.cursor(psycopg2.extras.RealDictCursor) as cursor:
+            cursor.execute("SET LOCAL hnsw.ef_search = %s", (max(self.config.hnsw_ef_search, params['top_k']),))
+            cursor.execute(SEMANTIC_SEARCH_SQL, params)
+            results = cursor.fetchall()
+        return self._finalize_results(query, results)
     
-    def _calculate_adjustment_factors(self, conditions: Dict) -> float:
-        """Koşul çarpanlarını hesapla"""
-        factors = 1.0
-        
-        if conditions.get('height') == '>3m':
-            factors *= 1.15
-        if conditions.get('weather') == 'cold':
-            factors *= 1.20
-        if conditions.get('complexity') == 'high':
-            factors *= 1.25
-        
-        return factors
+    def search_hybrid(self, query: str, query_embedding: Optional[Sequence[float]] = None,
+                      locales: List[str] = None, work_types: List[str] = None,
+                      top_k: int = None, alpha: float = None) -> List[Dict]:
+        """Vektör mesafesi ve ts_rank_cd skorunu tek sorguda birleştiren hibrit arama"""
+        if not self.features['fts']:
+            return self.search_semantic(query, query_embedding, locales, work_types, top_k)
+        params = self._vector_params(query, query_embedding, locales, work_types, top_k)
+        if params is None:
+            return self.search(query, locales, work_types, top_k)
+        params['alpha'] = self.config.hybrid_alpha if alpha is None else alpha
+        params['candidates'] = max(self.config.hybrid_candidates, params['top_k'])
+        with self.pool.cursor(psycopg2.extras.RealDictCursor) as cursor:
+            cursor.execute("SET LOCAL hnsw.ef_search = %s", (max(self.config.hnsw_ef_search, params['candidates']),))
+            cursor.execute(HYBRID_SEARCH_SQL, params)
+            results = cursor.fetchall()
+        return self._finalize_results(query, results)
     
     def add_sample_data(self):
         """Örnek veri ekle"""
         logger.info("📊 Örnek veri ekleniyor...")
         
         # Revit quantities
-        cursor = self.connection.cursor()
         revit_data = [
             ('model_001', 'elem_001', 'Structural Framing', 'rebar', 'REBAR.BEAM', 1500.0, 'kg'),
             ('model_001', 'elem_002', 'Structural Framing', 'formwork', 'FORM.BEAM', 25.0, 'm2'),
             ('model_001', 'elem_003', 'Structural Framing', 'concrete', 'CONC.BEAM', 2.5, 'm3'),
         ]
         
-        for revit in revit_data:
-            cursor.execute("""
-            INSERT INTO revit_quantities (model_id, element_id, category, class_inf, wbs_key, qty, unit)
-            VALUES (%s, %s, %s, %s, %s, %s, %s)
-            ON CONFLICT (model_id, element_id) DO NOTHING
-            """, revit)
-        
         # Site observations
         today = date.today()
         site_data = [
@@ -367,65 +473,123 @@ class PostgreSQLRAGSystem:
             (today, 'day', 'crew_003', 'CONC.BEAM', 2.5, 'm3', 1.25),
         ]
         
-        for site in site_data:
-            cursor.execute("""
-            INSERT INTO site_observations (work_date, shift, crew_id, wbs_key, qty, unit, labor_hours)
-            VALUES (%s, %s, %s, %s, %s, %s, %s)
-            """, site)
+        with self.pool.cursor() as cursor:
+            for revit in revit_data:
+                cursor.execute("""
+                INSERT INTO revit_quantities (model_id, element_id, category, class_inf, wbs_key, qty, unit)
+                VALUES (%s, %s, %s, %s, %s, %s, %s)
+                ON CONFLICT (model_id, element_id) DO NOTHING
+                """, revit)
+            
+            for site in site_data:
+                cursor.execute("""
+                INSERT INTO site_observations (work_date, shift, crew_id, wbs_key, qty, unit, labor_hours)
+                VALUES (%s, %s, %s, %s, %s, %s, %s)
+                """, site)
         
         logger.info("✅ Örnek veri eklendi")
     
     def export_reports(self, start_date: date, end_date: date, 
-                      output_dir: str = ".") -> Dict[str, str]:
-        """Raporları ihraç et"""
+                      output_dir: str = ".", locale: str = 'tr',
+                      formats: Sequence[str] = ('csv',)) -> Dict[str, str]:
+        """Raporları ihraç et (sunucu taraflı cursor + akış halinde yazım, sabit bellek)"""
         logger.info("📊 Raporlar ihraç ediliyor...")
         
-        cursor = self.connection.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-        
-        # Variance summary
-        cursor.execute("""
-        SELECT 
-            rq.wbs_key,
-            rq.qty,
-            rq.unit,
-            COALESCE(SUM(so.labor_hours), 0) as actual_hours
-        FROM revit_quantities rq
-        LEFT JOIN site_observations so ON rq.wbs_key = so.wbs_key 
-            AND so.work_date BETWEEN %s AND %s
-        GROUP BY rq.wbs_key, rq.qty, rq.unit
-        """, (start_date, end_date))
-        
-        results = cursor.fetchall()
-        
-        # CSV oluştur
-        variance_path = os.path.join(output_dir, "variance_summary.csv")
-        with open(variance_path, 'w', encoding='utf-8-sig') as f:
-            f.write("period;wbs_key;qty;unit;LH_theo;LH_actual;delta;delta_%;productivity\n")
-            
-            for row in results:
-                wbs_key = row['wbs_key']
-                qty = float(row['qty'])
-                unit = row['unit']
-                actual_hours = float(row['actual_hours'])
-                
-                # Teorik saat hesapla
-                theoretical_hours = self.calculate_labor_hours(wbs_key, qty, unit)
-                
-                # Sapma hesapla
-                delta = actual_hours - theoretical_hours
-                delta_percent = (delta / theoretical_hours * 100) if theoretical_hours > 0 else 0
-                productivity = qty / actual_hours if actual_hours > 0 else 0
-                
-                period = f"{start_date} - {end_date}"
-                f.write(f"{period};{wbs_key};{qty};{unit};{theoretical_hours:.2f};{actual_hours:.2f};{delta:.2f};{delta_percent:.2f};{productivity:.2f}\n")
-        
-        logger.info(f"✅ Rapor ihraç edildi: {variance_path}")
-        return {'variance_summary': variance_path}
+        stats = {'missing': 0}
+        
+        # Gerçekleşen saatler: view güncelse tam aylar özetten okunur
+        full_start, full_end = _full_month_range(start_date, end_date)
+        use_views = full_start < full_end and self._views_fresh(PRODUCTIVITY_VIEWS['month'])
+        sql = VARIANCE_REPORT_SQL.format(actual_hours=ACTUAL_HOURS_MV_SQL if use_views else ACTUAL_HOURS_RAW_SQL)
+        
+        # Variance summary + her satırın normu tek sorguda (N+1 yok)
+        with self.pool.cursor(name='variance_report', itersize=REPORT_ITERSIZE) as cursor:
+            cursor.execute(sql, {
+                'start_date': start_date,
+                'end_date': end_date,
+                'full_start': full_start,
+                'full_end': full_end,
+                'locale': locale,
+            })
+            paths = write_report(self._variance_rows(cursor, start_date, end_date, stats),
+                                 os.path.join(output_dir, "variance_summary"), VARIANCE_COLUMNS, formats,
+                                 VARIANCE_COLUMN_TYPES, VARIANCE_COLUMN_FORMATS)
+        
+        if stats['missing']:
+            logger.warning(f"Norm bulunamadı: {stats['missing']} satır (teorik saat 0)")
+        logger.info(f"✅ Rapor ihraç edildi: {', '.join(paths.values())}")
+        return {('variance_summary' if fmt == 'csv' else f'variance_summary_{fmt}'): path
+                for fmt, path in paths.items()}
+    
+    def productivity_summary(self, start_date: date, end_date: date, grain: str = 'month',
+                             wbs_key: Optional[str] = None, crew_id: Optional[str] = None) -> pd.DataFrame:
+        """Dönem (week/month) x wbs x birim x ekip verimlilik özeti (view'lardan)"""
+        if grain not in PRODUCTIVITY_VIEWS:
+            raise ValueError(f"Geçersiz dönem: {grain} ({', '.join(PRODUCTIVITY_VIEWS)})")
+        source = PRODUCTIVITY_VIEWS[grain] if self._views_fresh(PRODUCTIVITY_VIEWS[grain]) else PRODUCTIVITY_SUMMARY_RAW_SOURCE
+        with self.pool.cursor() as cursor:
+            cursor.execute(PRODUCTIVITY_SUMMARY_SQL.format(source=source), {
+                'grain': grain,
+                'start_date': start_date,
+                'end_date': end_date,
+                'wbs_key': wbs_key,
+                'crew_id': crew_id,
+            })
+            rows = cursor.fetchall()
+        return pd.DataFrame(rows, columns=PRODUCTIVITY_SUMMARY_COLUMNS)
+    
+    def _views_fresh(self, view: str) -> bool:
+        """View var ve son yenilemeden sonra gözlemler değişmemişse (ekleme/güncelleme/silme) True"""
+        if not self.features.get('productivity_views'):
+            return False
+        with self.pool.cursor() as cursor:
+            cursor.execute(VIEW_FRESHNESS_SQL, (view,))
+            row = cursor.fetchone()
+        if not (row and row[0]):
+            logger.info(f"{view} güncel değil (refresh_productivity_views çağrılmadı), ham tablodan okunuyor")
+            return False
+        return True
+    
+    def refresh_productivity_views(self, concurrently: bool = True):
+        """Verimlilik view'larını yenile (CONCURRENTLY: okumalar beklemez)"""
+        if not self.features.get('productivity_views'):
+            logger.warning("Verimlilik view'ları yok (postgresql_productivity_views.sql uygulanmamış)")
+            return
+        mode = " CONCURRENTLY" if concurrently else ""
+        for view in PRODUCTIVITY_VIEWS.values():
+            with self.pool.cursor() as cursor:
+                # Sayaç yenilemeden önce okunur: arada işlenen değişiklik view'da olsa da
+                # view bayat sayılır (yanlışlıkla güncel sayılmaz)
+                cursor.execute(SOURCE_VERSION_SQL)
+                version = cursor.fetchone()[0]
+                cursor.execute(f"REFRESH MATERIALIZED VIEW{mode} {view}")
+                cursor.execute(VIEW_REFRESHED_SQL, (view, version))
+        logger.info("✅ Verimlilik view'ları yenilendi")
+    
+    def export_site_observations(self, start_date: date, end_date: date,
+                                 output_dir: str = ".",
+                                 formats: Sequence[str] = ('csv',)) -> Dict[str, str]:
+        """Saha gözlemlerini dönem için akış halinde ihraç et (aylık/yıllık dökümler)"""
+        with self.pool.cursor(name='site_observation_export', itersize=REPORT_ITERSIZE) as cursor:
+            cursor.execute("""
+            SELECT work_date, shift, crew_id, wbs_key, qty::float8, unit,
+                   labor_hours::float8, weather, source
+            FROM site_observations
+            WHERE work_date BETWEEN %s AND %s
+            ORDER BY work_date, id
+            """, (start_date, end_date))
+            paths = write_report(cursor, os.path.join(output_dir, "site_observations"),
+                                 SITE_OBSERVATION_COLUMNS, formats, SITE_OBSERVATION_COLUMN_TYPES,
+                                 SITE_OBSERVATION_COLUMN_FORMATS)
+        logger.info(f"✅ Saha gözlemleri ihraç edildi: {', '.join(paths.values())}")
+        return paths
     
     def close(self):
-        """Veritabanını kapat"""
-        if self.connection:
-            self.connection.close()
+        """Veritabanını kapat (havuz dışarıdan verildiyse sahibi kapatır)"""
+        if self.audit_log is not None:
+            self.audit_log.close()
+        if self.pool and self._owns_pool:
+            self.pool.close()
             logger.info("✅ PostgreSQL bağlantısı kapatıldı")
 
 def demo_postgresql_rag():
@@ -435,7 +599,7 @@ def demo_postgresql_rag():
     
     try:
         # Konfigürasyon
-        config = RAGConfig()
+        config = RAGConfig.from_env()
         
         # Sistem başlat
         rag_system = PostgreSQLRAGSystem(config)
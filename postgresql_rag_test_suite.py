@@ -0,0 +1,522 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+PostgreSQL RAG Test Suite
+Tests the PostgreSQL RAG system against a local database (DB_* from .env);
+skipped when psycopg2 or the database is not available
+"""
+
+import sys
+import os
+import time
+import asyncio
+import unittest
+import threading
+import tempfile
+import shutil
+from datetime import date
+from dataclasses import replace
+
+# Add the current directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+try:
+    import psycopg2
+    from postgresql_rag_system import PostgreSQLRAGSystem, RAGConfig
+    from postgresql_pool import PostgreSQLConnectionPool
+    import report_writers
+    from postgresql_audit_log import AuditLogWriter
+    import postgresql_rag_async
+    from revit_import import RevitImporter
+    PSYCOPG2_AVAILABLE = True
+except ImportError:
+    PSYCOPG2_AVAILABLE = False
+
+
+class TestPostgreSQLRAG(unittest.TestCase):
+    """Test suite for the PostgreSQL RAG system"""
+
+    @classmethod
+    def setUpClass(cls):
+        """Connect to the local test database"""
+        if not PSYCOPG2_AVAILABLE:
+            raise unittest.SkipTest("psycopg2 not installed")
+        cls.config = RAGConfig.from_env(pool_min_size=1, pool_max_size=3, enable_audit_log=False,
+                                        norm_refresh_interval=0)
+        try:
+            cls.rag = PostgreSQLRAGSystem(cls.config)
+        except Exception as e:
+            raise unittest.SkipTest(f"PostgreSQL not reachable: {e}")
+
+    @classmethod
+    def tearDownClass(cls):
+        """Close the pool"""
+        cls.rag.close()
+
+    def test_config_from_env(self):
+        """Pool sizes and flags are read from the environment"""
+        os.environ["DB_POOL_MAX"] = "7"
+        os.environ["ENABLE_AUDIT_LOG"] = "false"
+        try:
+            config = RAGConfig.from_env()
+        finally:
+            del os.environ["DB_POOL_MAX"], os.environ["ENABLE_AUDIT_LOG"]
+        self.assertEqual(config.pool_max_size, 7)
+        self.assertFalse(config.enable_audit_log)
+        print("✅ Config from environment tested successfully")
+
+    def test_pool_concurrent_checkout(self):
+        """More threads than connections wait for a free slot and reuse idle connections"""
+        pool = PostgreSQLConnectionPool(replace(self.config, pool_min_size=1, pool_max_size=3))
+        errors, pids = [], []
+
+        def worker():
+            try:
+                with pool.cursor() as cur:
+                    cur.execute("SELECT pg_backend_pid(), pg_sleep(0.05)")
+                    pids.append(cur.fetchone()[0])
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=worker) for _ in range(12)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        try:
+            self.assertEqual(errors, [])
+            self.assertEqual(len(pids), 12)
+            # Geri verilen bağlantılar kapanmaz: hiçbir zaman 3'ten fazla backend açılmaz
+            self.assertLessEqual(len(set(pids)), 3)
+            self.assertEqual(len(pool._idle), len(set(pids)))
+        finally:
+            pool.close()
+        print("✅ Concurrent pool checkout tested successfully")
+
+    def test_pool_reconnects_broken_connection(self):
+        """A connection killed on the server is replaced on the next checkout"""
+        pool = PostgreSQLConnectionPool(replace(self.config, pool_max_size=1, health_check_interval=0))
+        try:
+            with pool.cursor() as cur:
+                cur.execute("SELECT pg_backend_pid()")
+                pid = cur.fetchone()[0]
+            with self.rag.pool.cursor() as cur:
+                cur.execute("SELECT pg_terminate_backend(%s)", (pid,))
+            with pool.cursor() as cur:
+                cur.execute("SELECT pg_backend_pid()")
+                self.assertNotEqual(cur.fetchone()[0], pid)
+        finally:
+            pool.close()
+        print("✅ Broken connection reconnect tested successfully")
+
+    def test_failed_block_rolls_back(self):
+        """An exception inside the block rolls the transaction back"""
+        with self.assertRaises(RuntimeError):
+            with self.rag.pool.cursor() as cur:
+                cur.execute("INSERT INTO crews (name, locale) VALUES ('rollback_test', 'tr')")
+                raise RuntimeError("iptal")
+        with self.rag.pool.cursor() as cur:
+            cur.execute("SELECT count(*) FROM crews WHERE name = 'rollback_test'")
+            self.assertEqual(cur.fetchone()[0], 0)
+        print("✅ Transaction rollback tested successfully")
+
+    def test_bulk_add_documents(self):
+        """Documents and their chunks are written in bulk and round-trip intact"""
+        docs = [{"source": "FER", "country": "RU", "doc_type": "norm", "title": f"Bulk {i}",
+                 "lang": "ru", "content": f"Donatı\tbağlama \\ \"kg\" FER-06-00{i}\nbeton Poz-101"}
+                for i in range(5)]
+        doc_ids = self.rag.add_documents(docs, batch_size=2)
+        try:
+            self.assertEqual(len(doc_ids), 5)
+            with self.rag.pool.cursor() as cur:
+                cur.execute("""
+                SELECT text, norm_codes, work_types, locale FROM chunks
+                WHERE document_id = %s ORDER BY id
+                """, (doc_ids[0],))
+                rows = cur.fetchall()
+            self.assertEqual(rows[0][0], docs[0]["content"])
+            self.assertEqual(rows[0][1], ["FER-06-000", "Poz-101"])
+            self.assertEqual(rows[0][2], ["rebar", "concrete"])
+            self.assertEqual(rows[0][3], "ru")
+        finally:
+            with self.rag.pool.cursor() as cur:
+                cur.execute("DELETE FROM chunks WHERE document_id = ANY(%s)", (doc_ids,))
+                cur.execute("DELETE FROM documents WHERE id = ANY(%s)", (doc_ids,))
+        print("✅ Bulk document ingestion tested successfully")
+
+    def test_fulltext_search_ranking(self):
+        """Search uses per-locale tsquery ranking and falls back to partial codes"""
+        if not self.rag.features["fts"]:
+            self.skipTest("postgresql_fulltext_search.sql not applied")
+        doc_ids = self.rag.add_documents([
+            {"source": "FER", "country": "RU", "doc_type": "norm", "title": "Donatı",
+             "lang": "tr", "content": "Filiz bağlama işleri. Filiz kesme ve filiz bükme."},
+            {"source": "Poz", "country": "TR", "doc_type": "norm", "title": "Kalıp",
+             "lang": "tr", "content": "Kalıp kurulumu, filiz kontrolü. Kod FER-06-123"},
+        ])
+        try:
+            results = [r for r in self.rag.search("filiz", locales=["tr"]) if r["document_id"] in doc_ids]
+            self.assertEqual([r["document_id"] for r in results], doc_ids)
+            self.assertGreater(results[0]["score"], results[1]["score"])
+
+            partial = self.rag.search("FER-06-12", locales=["tr"])
+            self.assertIn(doc_ids[1], [r["document_id"] for r in partial])
+        finally:
+            with self.rag.pool.cursor() as cur:
+                cur.execute("DELETE FROM chunks WHERE document_id = ANY(%s)", (doc_ids,))
+                cur.execute("DELETE FROM documents WHERE id = ANY(%s)", (doc_ids,))
+        print("✅ Full-text search ranking tested successfully")
+
+    def test_semantic_and_hybrid_search(self):
+        """Chunks are embedded on insert and ranked by vector distance"""
+        if not self.rag.features["vector"]:
+            self.skipTest("postgresql_pgvector.sql not applied")
+        topics = ["donatı", "kalıp", "beton"]
+
+        def fake_embed(texts):
+            # Konu başına tek eksen: aynı konudaki metinler aynı yöne bakar
+            embs = []
+            for t in texts:
+                vec = [0.0] * self.config.embedding_dim
+                for i, topic in enumerate(topics):
+                    if topic in t.lower():
+                        vec[i] = 1.0
+                vec[-1] = 0.01
+                embs.append(vec)
+            return embs
+
+        rag = PostgreSQLRAGSystem(self.config, pool=self.rag.pool, embed_fn=fake_embed)
+        doc_ids = rag.add_documents([
+            {"source": s, "country": "TR", "doc_type": "norm", "title": t,
+             "lang": "tr", "content": f"{t} işleri"}
+            for s, t in [("FER", "Donatı"), ("Poz", "Kalıp"), ("Internal", "Beton")]
+        ])
+        try:
+            semantic = [r for r in rag.search_semantic("kalıp sökümü", locales=["tr"])
+                        if r["document_id"] in doc_ids]
+            self.assertEqual(semantic[0]["document_id"], doc_ids[1])
+            self.assertAlmostEqual(semantic[0]["score"], 1.0, places=3)
+
+            hybrid = [r for r in rag.search_hybrid("beton", locales=["tr"])
+                      if r["document_id"] in doc_ids]
+            self.assertEqual(hybrid[0]["document_id"], doc_ids[2])
+        finally:
+            with self.rag.pool.cursor() as cur:
+                cur.execute("DELETE FROM chunks WHERE document_id = ANY(%s)", (doc_ids,))
+                cur.execute("DELETE FROM documents WHERE id = ANY(%s)", (doc_ids,))
+        print("✅ Semantic and hybrid search tested successfully")
+
+    def test_variance_report_single_query(self):
+        """Report norms and the norm index follow the same source priority and refresh on change"""
+        out_dir = tempfile.mkdtemp()
+        try:
+            with self.rag.pool.cursor() as cur:
+                cur.execute("""
+                INSERT INTO norms (source, code, work_item_key, unit, norm_lh_per_u, conditions_json, locale)
+                VALUES ('FER', 'F1', 'TEST.VAR', 'kg', 0.50, NULL, 'tr'),
+                       ('Internal', 'I1', 'TEST.VAR', 'kg', 0.10, '{"height": ">3m"}', 'tr')
+                """)
+                cur.execute("""
+                INSERT INTO revit_quantities (model_id, element_id, wbs_key, qty, unit)
+                VALUES ('test_model', 'e1', 'TEST.VAR', 200, 'kg'),
+                       ('test_model', 'e2', 'TEST.NONORM', 5, 'm3')
+                """)
+            paths = self.rag.export_reports(date.today(), date.today(), output_dir=out_dir)
+            with open(paths["variance_summary"], encoding="utf-8-sig") as f:
+                rows = {line.split(";")[1]: line.split(";") for line in f.read().splitlines()[1:]}
+            expected = self.rag.calculate_labor_hours("TEST.VAR", 200, "kg")
+            self.assertAlmostEqual(expected, 200 * 0.10 * 1.15)
+            self.assertEqual(rows["TEST.VAR"][4], f"{expected:.2f}")
+            self.assertEqual(rows["TEST.NONORM"][4], "0.00")
+
+            hours = self.rag.labor_hours(["TEST.VAR", "TEST.NONORM", "TEST.VAR"], [200, 5, 10], ["kg", "m3", "kg"])
+            self.assertEqual(hours.round(2).tolist(), [round(expected, 2), 0.0, round(expected / 20, 2)])
+            with self.rag.pool.cursor() as cur:
+                cur.execute("UPDATE norms SET norm_lh_per_u = 0.20 WHERE work_item_key = 'TEST.VAR' AND source = 'Internal'")
+            self.assertAlmostEqual(self.rag.calculate_labor_hours("TEST.VAR", 200, "kg"), 200 * 0.20 * 1.15)
+        finally:
+            shutil.rmtree(out_dir)
+            with self.rag.pool.cursor() as cur:
+                cur.execute("DELETE FROM norms WHERE work_item_key = 'TEST.VAR'")
+                cur.execute("DELETE FROM revit_quantities WHERE model_id = 'test_model'")
+        print("✅ Single-query variance report tested successfully")
+
+    def test_site_observation_streamed_export(self):
+        """Observations stream through a server-side cursor into every requested format"""
+        out_dir = tempfile.mkdtemp()
+        day = date(1999, 1, 4)
+        try:
+            with self.rag.pool.cursor() as cur:
+                cur.execute("""
+                INSERT INTO site_observations (work_date, shift, crew_id, wbs_key, qty, unit, labor_hours, source)
+                SELECT %s, 'gündüz', 'C' || g, 'TEST.OBS', g, 'm3', g * 0.5, 'test'
+                FROM generate_series(1, 25) g
+                """, (day,))
+            formats = [f for f in ("csv", "xlsx", "parquet") if f in report_writers.available_formats()]
+            paths = self.rag.export_site_observations(day, day, output_dir=out_dir, formats=formats)
+            self.assertEqual(sorted(paths), sorted(formats))
+            with open(paths["csv"], encoding="utf-8-sig") as f:
+                lines = f.read().splitlines()
+            self.assertEqual(len(lines), 26)
+            self.assertEqual(lines[1].split(";")[4:7], ["1.000", "m3", "0.50"])
+            if "parquet" in paths:
+                import pyarrow.parquet as pq
+                self.assertEqual(pq.read_table(paths["parquet"]).num_rows, 25)
+        finally:
+            shutil.rmtree(out_dir)
+            with self.rag.pool.cursor() as cur:
+                cur.execute("DELETE FROM site_observations WHERE wbs_key = 'TEST.OBS'")
+        print("✅ Streamed site observation export tested successfully")
+
+    def test_audit_log_batched_writer(self):
+        """Audit events are queued, dropped when the buffer is full and flushed on close"""
+        writer = AuditLogWriter(self.rag.pool, max_queue=2, batch_size=1, flush_interval=0.01)
+        try:
+            with self.rag.pool.cursor() as cur:
+                # Tablo kilitliyken yazıcı ilk INSERT'te bekler, kuyruk dolar
+                cur.execute("LOCK TABLE retrieval_logs IN ACCESS EXCLUSIVE MODE")
+                self.assertTrue(writer.submit("audit_test", [1], [0.9], True))
+                time.sleep(0.2)
+                accepted = [writer.submit("audit_test", [2], [0.8], False) for _ in range(3)]
+            self.assertEqual(accepted, [True, True, False])
+            self.assertEqual(writer.dropped, 1)
+            writer.close()
+            self.assertEqual(writer.written, 3)
+            with self.rag.pool.cursor() as cur:
+                cur.execute("SELECT count(*) FROM retrieval_logs WHERE query = 'audit_test'")
+                self.assertEqual(cur.fetchone()[0], 3)
+        finally:
+            writer.close()
+            with self.rag.pool.cursor() as cur:
+                cur.execute("DELETE FROM retrieval_logs WHERE query = 'audit_test'")
+        print("✅ Batched audit log writer tested successfully")
+
+    def test_audit_log_close_with_full_queue(self):
+        """close() returns within its timeout while the queue is full and the writer is stuck"""
+        writer = AuditLogWriter(self.rag.pool, max_queue=1, batch_size=1, flush_interval=0.01)
+        try:
+            with self.rag.pool.cursor() as cur:
+                cur.execute("LOCK TABLE retrieval_logs IN ACCESS EXCLUSIVE MODE")
+                writer.submit("audit_close_test", [1], [0.9], True)
+                time.sleep(0.2)
+                self.assertTrue(writer.submit("audit_close_test", [2], [0.8], True))
+                t0 = time.monotonic()
+                writer.close(timeout=0.3)
+                self.assertLess(time.monotonic() - t0, 2.0)
+                self.assertFalse(writer.submit("audit_close_test", [3], [0.7], True))
+            # Kilit kalkınca kuyrukta kalan olay da yazılır
+            writer._thread.join(10)
+            self.assertFalse(writer._thread.is_alive())
+            self.assertEqual(writer.written, 2)
+        finally:
+            with self.rag.pool.cursor() as cur:
+                cur.execute("DELETE FROM retrieval_logs WHERE query = 'audit_close_test'")
+        print("✅ Audit log close with a full queue tested successfully")
+
+    def test_audit_log_submit_racing_close(self):
+        """An event accepted just before close() is still written by the final drain"""
+        writer = AuditLogWriter(self.rag.pool, batch_size=1, flush_interval=0.01, overflow="block")
+        real_put = writer._queue.put
+        closer = threading.Thread(target=writer.close)
+
+        def slow_put(event, timeout=None):
+            # close() araya girer: yazıcı durur, olay ancak sonra kuyruğa düşer
+            closer.start()
+            time.sleep(0.2)
+            real_put(event, timeout=timeout)
+
+        writer._queue.put = slow_put
+        try:
+            self.assertTrue(writer.submit("audit_race_test", [1], [0.9], True))
+            closer.join(10)
+            self.assertFalse(writer._thread.is_alive())
+            self.assertEqual(writer.written, 1)
+            self.assertTrue(writer.flush(timeout=1))
+            self.assertFalse(writer.submit("audit_race_test", [2], [0.8], True))
+        finally:
+            with self.rag.pool.cursor() as cur:
+                cur.execute("DELETE FROM retrieval_logs WHERE query = 'audit_race_test'")
+        print("✅ Audit log submit/close race tested successfully")
+
+    def test_async_client_matches_sync(self):
+        """The asyncpg client returns the same results and runs queries concurrently"""
+        if not postgresql_rag_async.ASYNCPG_AVAILABLE:
+            self.skipTest("asyncpg not installed")
+        doc_ids = self.rag.add_documents([
+            {"source": "FER", "country": "RU", "doc_type": "norm", "title": "Async donatı",
+             "lang": "tr", "content": "Asenkron donatı bağlama işleri. Kod FER-07-321"},
+        ])
+
+        async def fan_out():
+            rag = await postgresql_rag_async.AsyncPostgreSQLRAGSystem.create(
+                self.config, norm_index=self.rag.norm_index)
+            try:
+                return await asyncio.gather(
+                    rag.search("asenkron donatı", locales=["tr"]),
+                    rag.search("FER-07-32", locales=["tr"]),
+                    rag.calculate_labor_hours("TEST.NONE", 10, "kg"),
+                )
+            finally:
+                await rag.close()
+
+        try:
+            fts, partial, hours = asyncio.run(fan_out())
+            expected = self.rag.search("asenkron donatı", locales=["tr"])
+            self.assertEqual([r["id"] for r in fts], [r["id"] for r in expected])
+            self.assertAlmostEqual(fts[0]["score"], expected[0]["score"], places=5)
+            self.assertIn(doc_ids[0], [r["document_id"] for r in partial])
+            self.assertEqual(hours, 0.0)
+        finally:
+            with self.rag.pool.cursor() as cur:
+                cur.execute("DELETE FROM chunks WHERE document_id = ANY(%s)", (doc_ids,))
+                cur.execute("DELETE FROM documents WHERE id = ANY(%s)", (doc_ids,))
+        print("✅ Async client tested successfully")
+
+    def test_productivity_views(self):
+        """Reports read full months from the views and match the raw-table totals"""
+        if not self.rag.features["productivity_views"]:
+            self.skipTest("postgresql_productivity_views.sql not applied")
+        out_dir = tempfile.mkdtemp()
+        start, end = date(1998, 1, 20), date(1998, 3, 5)
+        try:
+            with self.rag.pool.cursor() as cur:
+                cur.execute("""
+                INSERT INTO site_observations (work_date, shift, crew_id, wbs_key, qty, unit, labor_hours)
+                SELECT d::date, 'gündüz', 'C' || (extract(day FROM d)::int % 2), 'TEST.MV', 10, 'm3', 8
+                FROM generate_series('1998-01-10'::date, '1998-03-20'::date, interval '1 day') d
+                """)
+                cur.execute("""
+                INSERT INTO revit_quantities (model_id, element_id, wbs_key, qty, unit)
+                VALUES ('test_mv_model', 'e1', 'TEST.MV', 100, 'm3')
+                """)
+            self.rag.refresh_productivity_views()
+
+            def actual_hours():
+                paths = self.rag.export_reports(start, end, output_dir=out_dir)
+                with open(paths["variance_summary"], encoding="utf-8-sig") as f:
+                    rows = {line.split(";")[1]: line.split(";") for line in f.read().splitlines()[1:]}
+                return rows["TEST.MV"][5]
+
+            expected = f"{((end - start).days + 1) * 8:.2f}"
+            self.assertEqual(actual_hours(), expected)
+            features = self.rag.features
+            self.rag.features = dict(features, productivity_views=False)
+            try:
+                self.assertEqual(actual_hours(), expected)
+            finally:
+                self.rag.features = features
+
+            summary = self.rag.productivity_summary(start, end, grain="month", wbs_key="TEST.MV")
+            self.assertEqual(sorted(set(summary["crew_id"])), ["C0", "C1"])
+            self.assertEqual(summary["obs_count"].sum(), 22 + 28 + 20)
+            self.assertAlmostEqual(summary["productivity"].iloc[0], 10 / 8)
+        finally:
+            shutil.rmtree(out_dir)
+            with self.rag.pool.cursor() as cur:
+                cur.execute("DELETE FROM site_observations WHERE wbs_key = 'TEST.MV'")
+                cur.execute("DELETE FROM revit_quantities WHERE model_id = 'test_mv_model'")
+            self.rag.refresh_productivity_views()
+        print("✅ Productivity views tested successfully")
+
+    def test_productivity_views_staleness(self):
+        """Observations added, updated or deleted after the last refresh are reported from the raw table"""
+        if not self.rag.features["productivity_views"]:
+            self.skipTest("postgresql_productivity_views.sql not applied")
+        out_dir = tempfile.mkdtemp()
+        start, end = date(1997, 1, 1), date(1997, 2, 28)
+        insert_sql = """
+        INSERT INTO site_observations (work_date, shift, crew_id, wbs_key, qty, unit, labor_hours)
+        VALUES (%s, 'gündüz', 'C1', 'TEST.STALE', 10, 'm3', 8)
+        """
+
+        def actual_hours():
+            paths = self.rag.export_reports(start, end, output_dir=out_dir)
+            with open(paths["variance_summary"], encoding="utf-8-sig") as f:
+                rows = {line.split(";")[1]: line.split(";") for line in f.read().splitlines()[1:]}
+            return rows["TEST.STALE"][5]
+
+        try:
+            with self.rag.pool.cursor() as cur:
+                cur.execute(insert_sql, (date(1997, 1, 15),))
+                cur.execute("""
+                INSERT INTO revit_quantities (model_id, element_id, wbs_key, qty, unit)
+                VALUES ('test_stale_model', 'e1', 'TEST.STALE', 100, 'm3')
+                """)
+            self.rag.refresh_productivity_views()
+            self.assertTrue(self.rag._views_fresh("mv_productivity_monthly"))
+            self.assertEqual(actual_hours(), "8.00")
+
+            with self.rag.pool.cursor() as cur:
+                cur.execute(insert_sql, (date(1997, 2, 10),))
+            self.assertFalse(self.rag._views_fresh("mv_productivity_monthly"))
+            self.assertEqual(actual_hours(), "16.00")
+            summary = self.rag.productivity_summary(start, end, grain="month", wbs_key="TEST.STALE")
+            self.assertEqual(summary["obs_count"].sum(), 2)
+
+            self.rag.refresh_productivity_views()
+            self.assertTrue(self.rag._views_fresh("mv_productivity_monthly"))
+            self.assertEqual(actual_hours(), "16.00")
+
+            # Güncelleme ve silme de view'ı bayatlatır
+            with self.rag.pool.cursor() as cur:
+                cur.execute("UPDATE site_observations SET labor_hours = 12 "
+                            "WHERE wbs_key = 'TEST.STALE' AND work_date = %s", (date(1997, 2, 10),))
+            self.assertFalse(self.rag._views_fresh("mv_productivity_monthly"))
+            self.assertEqual(actual_hours(), "20.00")
+
+            self.rag.refresh_productivity_views()
+            with self.rag.pool.cursor() as cur:
+                cur.execute("DELETE FROM site_observations WHERE wbs_key = 'TEST.STALE' AND work_date = %s",
+                            (date(1997, 1, 15),))
+            self.assertFalse(self.rag._views_fresh("mv_productivity_monthly"))
+            self.assertEqual(actual_hours(), "12.00")
+        finally:
+            shutil.rmtree(out_dir)
+            with self.rag.pool.cursor() as cur:
+                cur.execute("DELETE FROM site_observations WHERE wbs_key = 'TEST.STALE'")
+                cur.execute("DELETE FROM revit_quantities WHERE model_id = 'test_stale_model'")
+            self.rag.refresh_productivity_views()
+        print("✅ Productivity view staleness tested successfully")
+
+    def test_revit_import_copy_upsert(self):
+        """Schedule rows are staged with COPY and upserted on (model_id, element_id)"""
+        out_dir = tempfile.mkdtemp()
+        path = os.path.join(out_dir, "schedule.csv")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("Element ID,Category,Volume,Level\n1,Walls,3.5,L1\n2,Walls,1.5,L2\n2,Walls,2.0,L2\n")
+        try:
+            with self.rag.pool.cursor() as cur:
+                cur.execute("INSERT INTO mappings (source_field, pattern, mapped_key) VALUES ('category', '^walls$', 'TEST.WALL')")
+            importer = RevitImporter(self.rag.pool)
+            self.assertEqual(importer.import_file(path, "test_revit_model").upserted, 2)
+            self.assertEqual(importer.import_file(path, "test_revit_model").upserted, 2)
+            aggregates = importer.aggregate("test_revit_model")
+            self.assertEqual(aggregates.to_dict("records"),
+                             [{"wbs_key": "TEST.WALL", "unit": "m3", "qty": 5.5, "elements": 2}])
+        finally:
+            with self.rag.pool.cursor() as cur:
+                cur.execute("DELETE FROM revit_quantities WHERE model_id = 'test_revit_model'")
+                cur.execute("DELETE FROM mappings WHERE mapped_key = 'TEST.WALL'")
+            shutil.rmtree(out_dir, ignore_errors=True)
+        print("✅ Revit import tested successfully")
+
+
+def run_postgresql_rag_tests():
+    """Run all PostgreSQL RAG tests"""
+    print("🧪 Starting PostgreSQL RAG Test Suite")
+    print("=" * 80)
+
+    test_suite = unittest.TestLoader().loadTestsFromTestCase(TestPostgreSQLRAG)
+    runner = unittest.TextTestRunner(verbosity=2)
+    result = runner.run(test_suite)
+
+    print("\n" + "=" * 80)
+    print(f"Tests run: {result.testsRun}")
+    print(f"Failures: {len(result.failures)}")
+    print(f"Errors: {len(result.errors)}")
+    return result.wasSuccessful()
+
+
+if __name__ == "__main__":
+    success = run_postgresql_rag_tests()
+    sys.exit(0 if success else 1)
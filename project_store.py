@@ -0,0 +1,254 @@
+# -*- coding: utf-8 -*-
+"""
+Project Store
+Tahmin durumunun (roller, metraj, zorluk, matris, override'lar, widget değerleri) SQLite'ta
+proje sürümleri olarak saklanması. Her sürüm tek sıkıştırılmış blob'dur (MessagePack varsa
+o, yoksa kompakt JSON + zlib); aynı durum yeniden kaydedilirse yeni sürüm açılmaz.
+"""
+
+import os
+import json
+import zlib
+import hashlib
+import logging
+import threading
+from dataclasses import dataclass
+from datetime import date, datetime
+from typing import Any, Dict, List, Mapping, Optional
+
+import numpy as np
+import pandas as pd
+
+from sqlite_pool import SQLiteConnectionManager
+
+logger = logging.getLogger(__name__)
+
+# Opsiyonel bağımlılık
+try:
+    import msgpack
+    MSGPACK_AVAILABLE = True
+except ImportError:
+    MSGPACK_AVAILABLE = False
+
+PROJECT_DB_PATH = os.getenv("PROJECT_DB_PATH", "betonarme_projects.db")
+ZLIB_LEVEL = 6
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS projects (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT UNIQUE NOT NULL,
+    latest_version INTEGER NOT NULL DEFAULT 0,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS project_versions (
+    project_id INTEGER NOT NULL REFERENCES projects(id),
+    version INTEGER NOT NULL,
+    note TEXT,
+    codec TEXT NOT NULL,
+    state_hash TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    state BLOB NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (project_id, version)
+);
+"""
+
+
+# ---------------- Kodlama ----------------
+
+def _to_plain(value: Any) -> Any:
+    """Durum değerini JSON/MessagePack uyumlu etiketli yapıya çevir"""
+    if isinstance(value, pd.DataFrame):
+        return {"__df__": {"columns": [str(c) for c in value.columns],
+                           "dtypes": [str(t) for t in value.dtypes],
+                           "data": [[_to_plain(v) for v in row] for row in value.itertuples(index=False, name=None)]}}
+    if isinstance(value, dict):
+        return {str(k): _to_plain(v) for k, v in sorted(value.items(), key=lambda kv: str(kv[0]))}
+    if isinstance(value, (list, tuple)):
+        return [_to_plain(v) for v in value]
+    if isinstance(value, datetime):
+        return {"__datetime__": value.isoformat()}
+    if isinstance(value, date):
+        return {"__date__": value.isoformat()}
+    if isinstance(value, float) and value != value:
+        return None   # NaN
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def _from_plain(value: Any) -> Any:
+    if isinstance(value, dict):
+        if "__df__" in value:
+            spec = value["__df__"]
+            df = pd.DataFrame([[_from_plain(v) for v in row] for row in spec["data"]], columns=spec["columns"])
+            for col, dtype in zip(spec["columns"], spec["dtypes"]):
+                if dtype != "object" and not df.empty:
+                    try:
+                        df[col] = df[col].astype(dtype)
+                    except (TypeError, ValueError):
+                        pass
+            return df
+        if "__date__" in value:
+            return date.fromisoformat(value["__date__"])
+        if "__datetime__" in value:
+            return datetime.fromisoformat(value["__datetime__"])
+        return {k: _from_plain(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_from_plain(v) for v in value]
+    return value
+
+
+def encode_state(state: Mapping[str, Any]) -> tuple:
+    """Durum -> (codec, blob); anahtarlar sıralı olduğundan aynı durum aynı blob'u verir"""
+    plain = _to_plain(dict(state))
+    if MSGPACK_AVAILABLE:
+        return "msgpack+zlib", zlib.compress(msgpack.packb(plain, use_bin_type=True), ZLIB_LEVEL)
+    raw = json.dumps(plain, ensure_ascii=False, separators=(",", ":"), sort_keys=True)
+    return "json+zlib", zlib.compress(raw.encode("utf-8"), ZLIB_LEVEL)
+
+
+def decode_state(codec: str, blob: bytes) -> Dict[str, Any]:
+    raw = zlib.decompress(blob)
+    if codec == "msgpack+zlib":
+        plain = msgpack.unpackb(raw, raw=False)
+    elif codec == "json+zlib":
+        plain = json.loads(raw.decode("utf-8"))
+    else:
+        raise ValueError(f"Bilinmeyen codec: {codec}")
+    return _from_plain(plain)
+
+
+# ---------------- Fark ----------------
+
+@dataclass
+class StateChange:
+    """İki sürüm arasındaki tek fark (iç içe sözlüklerde 'a.b' yolu)"""
+    path: str
+    change: str      # added | removed | changed
+    old: Any = None
+    new: Any = None
+
+
+def _frame_summary(value: Any) -> Any:
+    """Tablolar boyutuyla, diğer değerler olduğu gibi gösterilir"""
+    if isinstance(value, pd.DataFrame):
+        return f"{len(value)} satır x {len(value.columns)} kolon"
+    return value
+
+
+def diff_states(old: Mapping[str, Any], new: Mapping[str, Any], prefix: str = "") -> List[StateChange]:
+    """Sözlükler anahtar anahtar, tablolar satır/hücre sayısıyla karşılaştırılır"""
+    changes: List[StateChange] = []
+    for key in sorted(set(old) | set(new), key=str):
+        path = f"{prefix}{key}"
+        if key not in old:
+            changes.append(StateChange(path, "added", new=new[key]))
+        elif key not in new:
+            changes.append(StateChange(path, "removed", old=old[key]))
+        else:
+            a, b = old[key], new[key]
+            if isinstance(a, dict) and isinstance(b, dict):
+                changes.extend(diff_states(a, b, prefix=f"{path}."))
+            elif isinstance(a, pd.DataFrame) and isinstance(b, pd.DataFrame):
+                if a.shape != b.shape or list(a.columns) != list(b.columns):
+                    changes.append(StateChange(path, "changed", _frame_summary(a), _frame_summary(b)))
+                else:
+                    fa, fb = a.reset_index(drop=True).astype(object), b.reset_index(drop=True).astype(object)
+                    # İki tarafta da boş (NaN/None) olan hücre değişmiş sayılmaz
+                    cells = int((~((fa == fb) | (fa.isna() & fb.isna()))).to_numpy().sum())
+                    if cells:
+                        changes.append(StateChange(path, "changed", _frame_summary(a), f"{cells} hücre değişti"))
+            elif isinstance(a, pd.DataFrame) or isinstance(b, pd.DataFrame):
+                # Tablo <-> tablo olmayan değer: a != b hücre bazlı döner, doğruluk değeri yok
+                changes.append(StateChange(path, "changed", _frame_summary(a), _frame_summary(b)))
+            elif a != b:
+                changes.append(StateChange(path, "changed", a, b))
+    return changes
+
+
+# ---------------- Depo ----------------
+
+class ProjectStore:
+    """SQLite proje deposu: save/load/list/diff"""
+
+    def __init__(self, path: str = PROJECT_DB_PATH, pool: Optional[SQLiteConnectionManager] = None):
+        self.pool = pool or SQLiteConnectionManager(path)
+        with self.pool.connection() as conn:
+            conn.executescript(SCHEMA)
+
+    def save(self, name: str, state: Mapping[str, Any], note: str = "") -> int:
+        """Durumu yeni sürüm olarak kaydet; son sürümle aynıysa onun numarasını döndür"""
+        codec, blob = encode_state(state)
+        state_hash = hashlib.sha256(blob).hexdigest()
+        with self.pool.cursor() as cur:
+            cur.execute("INSERT OR IGNORE INTO projects (name) VALUES (?)", (name,))
+            project_id, latest = cur.execute(
+                "SELECT id, latest_version FROM projects WHERE name = ?", (name,)).fetchone()
+            if latest:
+                last_hash = cur.execute(
+                    "SELECT state_hash FROM project_versions WHERE project_id = ? AND version = ?",
+                    (project_id, latest)).fetchone()[0]
+                if last_hash == state_hash:
+                    return latest
+            version = latest + 1
+            cur.execute("""
+            INSERT INTO project_versions (project_id, version, note, codec, state_hash, size, state)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            """, (project_id, version, note, codec, state_hash, len(blob), blob))
+            cur.execute("UPDATE projects SET latest_version = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?",
+                        (version, project_id))
+        logger.info(f"Proje kaydedildi: {name} v{version} ({len(blob)} bayt)")
+        return version
+
+    def load(self, name: str, version: Optional[int] = None) -> Dict[str, Any]:
+        """Proje durumunu yükle (sürüm verilmezse en son)"""
+        with self.pool.cursor() as cur:
+            row = cur.execute("""
+            SELECT v.codec, v.state FROM project_versions v JOIN projects p ON p.id = v.project_id
+            WHERE p.name = ? AND v.version = COALESCE(?, p.latest_version)
+            """, (name, version)).fetchone()
+        if row is None:
+            raise KeyError(f"Proje/sürüm bulunamadı: {name} v{version or 'son'}")
+        return decode_state(row[0], row[1])
+
+    def list_projects(self) -> pd.DataFrame:
+        with self.pool.cursor() as cur:
+            rows = cur.execute(
+                "SELECT name, latest_version, updated_at FROM projects ORDER BY updated_at DESC, name").fetchall()
+        return pd.DataFrame([tuple(r) for r in rows], columns=["name", "latest_version", "updated_at"])
+
+    def list_versions(self, name: str) -> pd.DataFrame:
+        with self.pool.cursor() as cur:
+            rows = cur.execute("""
+            SELECT v.version, v.created_at, v.note, v.size FROM project_versions v
+            JOIN projects p ON p.id = v.project_id WHERE p.name = ? ORDER BY v.version DESC
+            """, (name,)).fetchall()
+        return pd.DataFrame([tuple(r) for r in rows], columns=["version", "created_at", "note", "size"])
+
+    def diff(self, name: str, old_version: int, new_version: Optional[int] = None) -> List[StateChange]:
+        """İki sürüm arasındaki farklar (new_version verilmezse en son sürüm)"""
+        return diff_states(self.load(name, old_version), self.load(name, new_version))
+
+    def delete(self, name: str):
+        with self.pool.cursor() as cur:
+            cur.execute("DELETE FROM project_versions WHERE project_id IN (SELECT id FROM projects WHERE name = ?)", (name,))
+            cur.execute("DELETE FROM projects WHERE name = ?", (name,))
+
+    def close(self):
+        self.pool.close()
+
+
+_project_store = None
+_project_store_lock = threading.Lock()
+
+
+def get_project_store() -> ProjectStore:
+    """Global proje deposu"""
+    global _project_store
+    with _project_store_lock:
+        if _project_store is None:
+            _project_store = ProjectStore()
+        return _project_store
@@ -1,14 +1,30 @@
 import os
 import json
+import threading
+import functools
 import numpy as np
 import faiss
 from typing import List, Dict, Optional, Any
 import logging
 
+from ingest_queue import get_ingest_queue
+
 # Logging ayarları
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# FAISS indeksi ve meta.jsonl aynı anda yalnız bir thread tarafından değiştirilir
+# (arka plan ingestion kuyruğu + Streamlit script thread'i)
+_index_lock = threading.RLock()
+
+def _locked(func):
+    """Fonksiyonu indeks kilidi altında çalıştır"""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with _index_lock:
+            return func(*args, **kwargs)
+    return wrapper
+
 class RAGBackend:
     def __init__(self):
         self.rag_data_dir = "rag_data"
@@ -78,17 +94,40 @@ class RAGBackend:
         """Bir sonraki ID'yi al"""
         if os.path.exists(self.meta_path):
             try:
-                with open(self.meta_path, 'r', encoding='utf-8') as f:
-                    lines = f.readlines()
+                # Tüm dosyayı okumadan yalnız son satırı oku (büyük meta.jsonl için)
+                with open(self.meta_path, 'rb') as f:
+                    f.seek(0, os.SEEK_END)
+                    pos = f.tell()
+                    block = b""
+                    while pos > 0 and block.count(b"\n") < 2:
+                        step = min(8192, pos)
+                        pos -= step
+                        f.seek(pos)
+                        block = f.read(step) + block
+                    lines = [ln for ln in block.splitlines() if ln.strip()]
                     if lines:
-                        last_line = lines[-1].strip()
-                        if last_line:
-                            last_record = json.loads(last_line)
-                            return last_record.get("id", 0) + 1
+                        last_record = json.loads(lines[-1].decode('utf-8'))
+                        return last_record.get("id", 0) + 1
             except Exception as e:
                 logger.error(f"Son ID okunurken hata: {e}")
         return 0
+    
+    def _repair_meta_divergence(self):
+        """meta.jsonl FAISS'ten uzunsa (yarım kalmış ekleme) fazla satırları kırp"""
+        if self.index is None or not os.path.exists(self.meta_path):
+            return
+        keep = self.index.ntotal
+        try:
+            with open(self.meta_path, 'rb') as f:
+                lines = [ln for ln in f if ln.strip()]
+            if len(lines) > keep:
+                with open(self.meta_path, 'wb') as f:
+                    f.writelines(lines[:keep])
+                logger.warning(f"meta.jsonl FAISS ile eşitlendi: {len(lines) - keep} yetim kayıt silindi")
+        except Exception as e:
+            logger.error(f"meta.jsonl onarılırken hata: {e}")
 
+@_locked
 def init_backend() -> None:
     """RAG backend'ini başlat"""
     global rag_backend
@@ -97,8 +136,10 @@ def init_backend() -> None:
     
     # Mevcut indeksi yükle veya yeni oluştur
     meta_data = rag_backend._load_index_meta()
+    loaded_from_disk = False
     if meta_data["dim"] is not None:
         rag_backend._load_faiss_index()
+        loaded_from_disk = rag_backend.index is not None
         if rag_backend.index is None:
             # Yükleme başarısız, yeni oluştur
             rag_backend._create_new_index(meta_data["dim"])
@@ -107,8 +148,12 @@ def init_backend() -> None:
         rag_backend._create_new_index(1536)  # OpenAI embedding boyutu
     
     rag_backend.count = meta_data["count"]
+    if loaded_from_disk:
+        rag_backend._repair_meta_divergence()
+        rag_backend.count = rag_backend.index.ntotal
     logger.info(f"RAG backend başlatıldı: {rag_backend.count} kayıt, {rag_backend.dimension} boyut")
 
+@_locked
 def reset_backend() -> None:
     """Backend'i sıfırla"""
     global rag_backend
@@ -124,11 +169,15 @@ def reset_backend() -> None:
         # Yeni indeks oluştur
         rag_backend._create_new_index(rag_backend.dimension or 1536)
         rag_backend._save_index_meta()
+
+        # Kuyruk geçmişi de silinmeli; yoksa aynı dosyalar "zaten indekslendi" diye atlanır
+        get_ingest_queue().clear()
         
         logger.info("RAG backend sıfırlandı")
     except Exception as e:
         logger.error(f"Backend sıfırlanırken hata: {e}")
 
+@_locked
 def add_records(texts: List[str], metas: List[Dict], embeddings: np.ndarray) -> List[int]:
     """Kayıtları ekle"""
     global rag_backend
@@ -179,8 +228,10 @@ def add_records(texts: List[str], metas: List[Dict], embeddings: np.ndarray) ->
         return ids
     except Exception as e:
         logger.error(f"FAISS indeksine eklenirken hata: {e}")
+        rag_backend._repair_meta_divergence()
         raise
 
+@_locked
 def search(query_emb: np.ndarray, topk: int = 6, filters: Optional[Dict] = None) -> List[Dict]:
     """Arama yap"""
     global rag_backend
@@ -315,6 +366,19 @@ def migrate_from_jsonl_if_needed(old_path: str = "rag_data/store.jsonl") -> Dict
         logger.error(f"Migrasyon sırasında hata: {e}")
         return {"migrated": 0, "skipped": 0}
 
+@_locked
+def has_batch(batch_key: str) -> bool:
+    """Verilen ingestion grup anahtarıyla eklenmiş kayıt var mı (kaldığı yerden devam için)"""
+    global rag_backend
+    if rag_backend is None or not os.path.exists(rag_backend.meta_path):
+        return False
+    needle = json.dumps(batch_key, ensure_ascii=False)
+    with open(rag_backend.meta_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if f'"ingest_batch": {needle}' in line:
+                return True
+    return False
+
 def get_status() -> Dict[str, Any]:
     """Backend durumunu al"""
     global rag_backend
@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+"""
+RAG Chunker
+Token farkında, yapı farkında ortak parçalayıcı: başlıklar bölüm sınırıdır,
+tablo satırları bölünmez, parçalar arasında token bazlı örtüşme uygulanır.
+Metin tek geçişte (satır satır) işlenir; FAISS ve PostgreSQL yolları aynı
+parçalayıcıyı kullanır.
+"""
+
+import re
+import logging
+from functools import lru_cache
+from typing import Any, Dict, Iterable, Iterator, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+# text-embedding-3-small girdi sınırı 8191 token; arama kalitesi için çok daha küçük parçalar
+CHUNK_MAX_TOKENS = 512
+CHUNK_OVERLAP_TOKENS = 64
+EMBEDDING_ENCODING = "cl100k_base"
+
+# tiktoken opsiyonel; yoksa UTF-8 bayt/4 ile (güvenli tarafta kalan) tahmin
+try:
+    import tiktoken  # pyright: ignore[reportMissingImports]
+    _ENCODER = tiktoken.get_encoding(EMBEDDING_ENCODING)
+except Exception:
+    _ENCODER = None
+
+_MD_HEADING = re.compile(r"^(#{1,6})\s+\S")
+_NUM_HEADING = re.compile(r"^(\d+(?:\.\d+)*)[.)]?\s+\S")
+_CODE_HEADING = re.compile(r"^(?:FER|GESN|ФЕР|ГЭСН|Poz)[-\s]?\d", re.IGNORECASE)
+
+HEADING_MAX_CHARS = 100
+
+
+@lru_cache(maxsize=65536)
+def count_tokens(text: str) -> int:
+    """Embedding modelinin tokenizer'ı ile token sayısı (önbellekli)"""
+    if _ENCODER is not None:
+        return len(_ENCODER.encode_ordinary(text))
+    return max(1, (len(text.encode("utf-8")) + 3) // 4)
+
+
+def classify_line(line: str) -> Tuple[str, int]:
+    """Satır türü: ('blank'|'heading'|'row'|'text', başlık seviyesi)"""
+    s = line.strip()
+    if not s:
+        return "blank", 0
+    if s.count("|") >= 2 or "\t" in s or s.count(";") >= 2:
+        return "row", 0
+    if len(s) <= HEADING_MAX_CHARS:
+        m = _MD_HEADING.match(s)
+        if m:
+            return "heading", len(m.group(1))
+        if _CODE_HEADING.match(s):
+            return "heading", 0  # norm kodu: mevcut bölümün altına
+        m = _NUM_HEADING.match(s)
+        if m and not s.endswith("."):
+            return "heading", m.group(1).count(".") + 1
+        if s.isupper() and len(s.split()) >= 2:
+            return "heading", 1
+    return "text", 0
+
+
+def _split_long(text: str, max_tokens: int) -> List[str]:
+    """Sınırı aşan tek birimi kelime pencerelerine böl (token/kelime oranıyla)"""
+    words = text.split()
+    ratio = count_tokens(text) / max(len(words), 1)
+    step = max(1, int(max_tokens / max(ratio, 1e-9)))
+    return [" ".join(words[i:i + step]) for i in range(0, len(words), step)]
+
+
+def pack_units(units: Iterable[Tuple[str, str, int]], title: str = "",
+               max_tokens: int = CHUNK_MAX_TOKENS,
+               overlap_tokens: int = CHUNK_OVERLAP_TOKENS) -> Iterator[Dict[str, Any]]:
+    """(tür, metin, seviye) birimlerini tek geçişte parçalara paketle.
+
+    Başlık her zaman yeni parça başlatır (örtüşme bölüm sınırını geçmez);
+    'row' birimleri bölünmez, yalnız tek başına sınırı aşan birim kelime
+    pencerelerine ayrılır. Çıktıdaki unit_start/unit_end girdi birim sırasıdır.
+    """
+    sections: List[str] = []
+    buf: List[Tuple[str, int, int]] = []   # (metin, token, birim sırası)
+    buf_tokens = 0
+
+    def section_path() -> str:
+        return " > ".join([p for p in [title] + sections if p])
+
+    def make_chunk() -> Dict[str, Any]:
+        return {
+            "text": "\n".join(t for t, _, _ in buf),
+            "tokens": buf_tokens,
+            "heading": sections[-1] if sections else title,
+            "section_path": section_path(),
+            "unit_start": buf[0][2],
+            "unit_end": buf[-1][2],
+        }
+
+    for idx, (kind, text, level) in enumerate(units):
+        if kind == "blank":
+            continue
+
+        if kind == "heading":
+            if buf:
+                yield make_chunk()
+                buf, buf_tokens = [], 0
+            if level > 0:
+                del sections[level - 1:]
+            elif sections and _CODE_HEADING.match(sections[-1]):
+                sections.pop()  # ardışık norm kodları kardeştir
+            sections.append(text.strip().lstrip("#").strip())
+
+        n = count_tokens(text)
+        pieces = [(text, n)] if n <= max_tokens else [(p, count_tokens(p)) for p in _split_long(text, max_tokens)]
+
+        for piece, pn in pieces:
+            if buf and buf_tokens + pn > max_tokens:
+                yield make_chunk()
+                # Örtüşme: son birimlerden overlap_tokens kadarını taşı
+                carry, carry_tokens = [], 0
+                for t, tn, ui in reversed(buf):
+                    if carry_tokens + tn > overlap_tokens or len(carry) + 1 >= len(buf):
+                        break
+                    carry.append((t, tn, ui))
+                    carry_tokens += tn
+                buf, buf_tokens = carry[::-1], carry_tokens
+                if buf_tokens + pn > max_tokens:
+                    buf, buf_tokens = [], 0
+            buf.append((piece, pn, idx))
+            buf_tokens += pn
+
+    if buf:
+        yield make_chunk()
+
+
+def iter_chunks(lines: Iterable[str], title: str = "",
+                max_tokens: int = CHUNK_MAX_TOKENS,
+                overlap_tokens: int = CHUNK_OVERLAP_TOKENS) -> Iterator[Dict[str, Any]]:
+    """Satır akışını yapı farkında parçalara böl"""
+    def units():
+        for line in lines:
+            kind, level = classify_line(line)
+            yield kind, line.rstrip("\r\n"), level
+    return pack_units(units(), title, max_tokens, overlap_tokens)
+
+
+def chunk_document(text: str, title: str = "",
+                   max_tokens: int = CHUNK_MAX_TOKENS,
+                   overlap_tokens: int = CHUNK_OVERLAP_TOKENS) -> List[Dict[str, Any]]:
+    """Belgeyi {'text','tokens','heading','section_path'} parçalarına böl"""
+    return list(iter_chunks(text.splitlines(), title, max_tokens, overlap_tokens))
+
+
+def chunk_rows(row_texts: Iterable[str], title: str = "",
+               max_tokens: int = CHUNK_MAX_TOKENS) -> Iterator[Dict[str, Any]]:
+    """Tablo satırlarını kayıt ortasından bölmeden paketle (örtüşme yok)"""
+    return pack_units((("row", t, 0) for t in row_texts), title, max_tokens, overlap_tokens=0)
@@ -0,0 +1,315 @@
+# -*- coding: utf-8 -*-
+"""
+RAG Common
+PostgreSQL ve SQLite RAG sistemlerinin ortak parçaları: konfigürasyon, chunk
+zenginleştirme (iş tipi/norm kodu/birim), sonuç işleme ve rapor satırları.
+Veritabanı sürücüsü import etmez.
+"""
+
+import os
+import re
+import logging
+from dataclasses import dataclass, fields
+from datetime import date
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from rag_chunker import chunk_document
+from norm_index import adjustment_factor
+
+try:
+    from dotenv import load_dotenv
+    DOTENV_AVAILABLE = True
+except ImportError:
+    DOTENV_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+_FER_CODE_RE = re.compile(r'FER[-\s]?\d{2}[-\s]?\d{3}', re.IGNORECASE)
+_POZ_CODE_RE = re.compile(r'Poz[-\s]?\d{3}', re.IGNORECASE)
+
+# Rapor kolonları
+VARIANCE_COLUMNS = ["period", "wbs_key", "qty", "unit", "LH_theo", "LH_actual",
+                    "delta", "delta_%", "productivity"]
+SITE_OBSERVATION_COLUMNS = ["work_date", "shift", "crew_id", "wbs_key", "qty", "unit",
+                            "labor_hours", "weather", "source"]
+# Parquet şeması (verilmeyen kolonlar string)
+VARIANCE_COLUMN_TYPES = {c: "float64" for c in ("qty", "LH_theo", "LH_actual", "delta", "delta_%", "productivity")}
+SITE_OBSERVATION_COLUMN_TYPES = {"work_date": "date32", "qty": "float64", "labor_hours": "float64"}
+# CSV ondalık basamakları (metraj 3, saat/oran 2 basamak; değerler XLSX/Parquet ile aynı kalır)
+VARIANCE_COLUMN_FORMATS = {"qty": "{:.3f}", **{c: "{:.2f}" for c in ("LH_theo", "LH_actual", "delta",
+                                                                     "delta_%", "productivity")}}
+SITE_OBSERVATION_COLUMN_FORMATS = {"qty": "{:.3f}", "labor_hours": "{:.2f}"}
+PRODUCTIVITY_SUMMARY_COLUMNS = ["period_start", "wbs_key", "unit", "crew_id", "qty",
+                                "labor_hours", "obs_count", "productivity"]
+
+
+def _vector_literal(values: Sequence[float]) -> str:
+    """pgvector metin formatı: '[0.1,0.2,...]'"""
+    return '[' + ','.join(map(str, values)) + ']'
+
+
+@dataclass
+class RAGConfig:
+    """RAG sistem konfigürasyonu"""
+    db_host: str = "localhost"
+    db_port: int = 5432
+    db_name: str = "betonarme_rag"
+    db_user: str = "postgres"
+    db_password: str = "1905"
+    
+    # Yerel SQLite/FTS5 arka ucu (SQLiteRAGSystem)
+    sqlite_path: str = "betonarme_rag.db"
+    
+    # Retriever ayarları
+    default_top_k: int = 8
+    score_threshold: float = 0.78
+    min_sources: int = 2
+    
+    # Güvenlik ayarları
+    enable_audit_log: bool = True
+    enable_source_diversification: bool = True
+    enable_score_filtering: bool = True
+    
+    # Audit log yazıcısı (arka planda toplu yazım)
+    audit_queue_size: int = 10000
+    audit_batch_size: int = 500
+    audit_flush_interval: float = 1.0    # ilk olaydan sonra batch için bekleme (sn)
+    audit_overflow: str = "drop"         # kuyruk dolunca: drop | block
+    
+    # Norm indeksi: norms tablosu sürümünün en sık kontrol aralığı (sn)
+    norm_refresh_interval: float = 5.0
+    
+    # Bağlantı havuzu ayarları
+    pool_min_size: int = 1              # açılışta açılan bağlantı (boşta en fazla pool_max_size tutulur)
+    pool_max_size: int = 10
+    pool_timeout: float = 30.0          # havuz doluyken bekleme (sn)
+    connect_timeout: int = 5
+    health_check_interval: float = 30.0  # bu süreden uzun boşta kalan bağlantı yoklanır
+    reconnect_attempts: int = 3
+    
+    # Semantik arama (pgvector)
+    embedding_dim: int = 1536            # text-embedding-3-small
+    hybrid_alpha: float = 0.5            # hibrit skorda vektör ağırlığı
+    hybrid_candidates: int = 50          # her aramadan alınan aday sayısı
+    hnsw_ef_search: int = 40
+    
+    # .env anahtarı -> alan adı
+    ENV_KEYS = {
+        'DB_HOST': 'db_host', 'DB_PORT': 'db_port', 'DB_NAME': 'db_name',
+        'DB_USER': 'db_user', 'DB_PASSWORD': 'db_password', 'SQLITE_PATH': 'sqlite_path',
+        'DEFAULT_TOP_K': 'default_top_k', 'SCORE_THRESHOLD': 'score_threshold',
+        'MIN_SOURCES': 'min_sources', 'ENABLE_AUDIT_LOG': 'enable_audit_log',
+        'ENABLE_SOURCE_DIVERSIFICATION': 'enable_source_diversification',
+        'DB_POOL_MIN': 'pool_min_size', 'DB_POOL_MAX': 'pool_max_size',
+        'DB_POOL_TIMEOUT': 'pool_timeout', 'DB_CONNECT_TIMEOUT': 'connect_timeout',
+        'EMBEDDING_DIM': 'embedding_dim', 'HYBRID_ALPHA': 'hybrid_alpha',
+        'AUDIT_QUEUE_SIZE': 'audit_queue_size', 'AUDIT_BATCH_SIZE': 'audit_batch_size',
+        'AUDIT_OVERFLOW': 'audit_overflow', 'NORM_REFRESH_INTERVAL': 'norm_refresh_interval',
+    }
+    
+    @classmethod
+    def from_env(cls, **overrides) -> "RAGConfig":
+        """Ayarları ortam değişkenlerinden / .env dosyasından oku"""
+        if DOTENV_AVAILABLE:
+            load_dotenv()
+        types = {f.name: f.type for f in fields(cls)}
+        values = {}
+        for env_key, name in cls.ENV_KEYS.items():
+            raw = os.getenv(env_key)
+            if raw is None or raw == '':
+                continue
+            ftype = types[name]
+            if ftype in (bool, 'bool'):
+                values[name] = raw.strip().lower() in ('1', 'true', 'yes', 'on')
+            elif ftype in (int, 'int'):
+                values[name] = int(raw)
+            elif ftype in (float, 'float'):
+                values[name] = float(raw)
+            else:
+                values[name] = raw
+        values.update(overrides)
+        return cls(**values)
+
+
+class RAGResultsMixin:
+    """Senkron ve asenkron istemcilerin ortak sonuç işleme adımları
+    (self.config, self.features, self.embed_fn ve self.audit_log bekler)"""
+    
+    def _embed_query(self, query: str) -> Optional[List[float]]:
+        """Sorgu embedding'i (embed_fn yoksa ya da hata olursa None)"""
+        if not self.embed_fn:
+            return None
+        try:
+            embs = self.embed_fn([query])
+        except Exception as e:
+            logger.warning(f"Sorgu embedding hatası: {e}")
+            return None
+        return embs[0] if embs else None
+    
+    def _vector_params(self, query: str, query_embedding: Optional[Sequence[float]],
+                       locales: List[str], work_types: List[str], top_k: int) -> Optional[Dict]:
+        """Vektör sorgu parametreleri; embedding kolonu/sorgu embedding'i yoksa None"""
+        if not self.features['vector']:
+            logger.warning("chunks.embedding yok (postgresql_pgvector.sql uygulanmamış)")
+            return None
+        if query_embedding is None:
+            query_embedding = self._embed_query(query)
+        if query_embedding is None:
+            return None
+        return {
+            'query': query,
+            'embedding': _vector_literal(query_embedding),
+            'locales': locales or ['tr', 'ru', 'en'],
+            'work_types': work_types or None,
+            'top_k': top_k or self.config.default_top_k,
+        }
+    
+    def _finalize_results(self, query: str, results: List[Dict]) -> List[Dict]:
+        """Satırları sonuç sözlüğüne çevir, güvenlik katmanı ve audit log uygula"""
+        processed_results = []
+        for row in results:
+            processed_results.append({
+                'id': row['id'],
+                'document_id': row['document_id'],
+                'section_path': row['section_path'],
+                'heading': row['heading'],
+                'text': row['text'],
+                'work_types': row['work_types'] or [],
+                'norm_codes': row['norm_codes'] or [],
+                'unit': row['unit'],
+                'locale': row['locale'],
+                'score': float(row['score']),
+                'source': row['source'],
+                'country': row['country'],
+                'doc_title': row['doc_title']
+            })
+        
+        # Güvenlik katmanı uygula
+        filtered_results = self._apply_security_layer(query, processed_results)
+        
+        # Audit log
+        if self.audit_log is not None:
+            self._log_retrieval(query, filtered_results)
+        
+        return filtered_results
+    
+    def _apply_security_layer(self, query: str, results: List[Dict]) -> List[Dict]:
+        """Güvenlik katmanı uygula"""
+        
+        # Kaynak çeşitlendirmesi
+        if self.config.enable_source_diversification:
+            results = self._diversify_sources(results)
+        
+        # Minimum kaynak kontrolü
+        if len(results) < self.config.min_sources:
+            logger.warning(f"Insufficient context: only {len(results)} sources found")
+        
+        return results
+    
+    def _diversify_sources(self, results: List[Dict]) -> List[Dict]:
+        """Kaynak çeşitlendirmesi uygula"""
+        source_counts = {}
+        diversified = []
+        
+        for result in results:
+            source = result['source']
+            if source_counts.get(source, 0) < 2:  # Her kaynaktan max 2 chunk
+                diversified.append(result)
+                source_counts[source] = source_counts.get(source, 0) + 1
+        
+        return diversified
+    
+    def _log_retrieval(self, query: str, results: List[Dict]):
+        """Retrieval işlemini audit kuyruğuna at (yazım arka planda, toplu)"""
+        self.audit_log.submit(
+            query,
+            [r['id'] for r in results],
+            [r['score'] for r in results],
+            len(results) >= self.config.min_sources
+        )
+
+
+class RAGDocumentMixin:
+    """Chunk zenginleştirme ve norm hesapları (self.norm_index bekler)"""
+    
+    def _chunk_text(self, text: str, title: str) -> List[Dict]:
+        """Metni başlık/tablo sınırlarına saygılı, token bazlı chunk'lara böl"""
+        return chunk_document(text, title)
+    
+    def _extract_work_types(self, text: str) -> List[str]:
+        """İş tiplerini çıkar"""
+        work_types = []
+        text_lower = text.lower()
+        
+        if any(word in text_lower for word in ['donatı', 'арматура', 'rebar']):
+            work_types.append('rebar')
+        if any(word in text_lower for word in ['kalıp', 'опалубка', 'formwork']):
+            work_types.append('formwork')
+        if any(word in text_lower for word in ['beton', 'бетон', 'concrete']):
+            work_types.append('concrete')
+        
+        return work_types
+    
+    def _extract_norm_codes(self, text: str) -> List[str]:
+        """Norm kodlarını çıkar"""
+        return _FER_CODE_RE.findall(text) + _POZ_CODE_RE.findall(text)
+    
+    def _extract_unit(self, text: str) -> Optional[str]:
+        """Birim çıkar"""
+        text_lower = text.lower()
+        
+        if 'kg' in text_lower:
+            return 'kg'
+        elif 'm2' in text_lower or 'm²' in text_lower:
+            return 'm2'
+        elif 'm3' in text_lower or 'm³' in text_lower:
+            return 'm3'
+        elif 'saat' in text_lower:
+            return 'h'
+        
+        return None
+    
+    def calculate_labor_hours(self, wbs_key: str, qty: float, unit: str, 
+                            locale: str = 'tr') -> float:
+        """İşçilik saati hesapla (norm indeksinden, koşul çarpanları uygulanmış)"""
+        entry = self.norm_index.lookup(wbs_key, unit, locale)
+        if entry is None:
+            logger.warning(f"Norm bulunamadı: {wbs_key}, {unit}")
+            return 0.0
+        
+        return qty * entry.effective_lh_per_u
+    
+    def labor_hours(self, wbs_keys: Sequence[str], qtys: Sequence[float], units: Sequence[str],
+                    locale: str = 'tr') -> np.ndarray:
+        """Tüm metraj (BoQ) için vektörel işçilik saati"""
+        return self.norm_index.labor_hours(wbs_keys, qtys, units, locale)
+    
+    def _calculate_adjustment_factors(self, conditions: Dict) -> float:
+        """Koşul çarpanlarını hesapla"""
+        return adjustment_factor(conditions)
+    
+    def _variance_rows(self, rows: Iterable[Tuple], start_date: date, end_date: date,
+                       stats: Dict[str, int]) -> Iterator[Tuple]:
+        """(wbs_key, qty, unit, actual_hours, norm_lh_per_u, conditions) satırlarından sapma raporu satırları"""
+        period = f"{start_date} - {end_date}"
+        for wbs_key, qty, unit, actual_hours, norm_lh_per_u, conditions in rows:
+            qty = float(qty)
+            actual_hours = float(actual_hours)
+            
+            # Teorik saat hesapla (calculate_labor_hours ile aynı norm ve çarpanlar)
+            if norm_lh_per_u is None:
+                stats['missing'] += 1
+                theoretical_hours = 0.0
+            else:
+                factors = self._calculate_adjustment_factors(conditions or {})
+                theoretical_hours = qty * float(norm_lh_per_u) * factors
+            
+            # Sapma hesapla
+            delta = actual_hours - theoretical_hours
+            delta_percent = (delta / theoretical_hours * 100) if theoretical_hours > 0 else 0.0
+            productivity = qty / actual_hours if actual_hours > 0 else 0.0
+            
+            yield (period, wbs_key, qty, unit, theoretical_hours, actual_hours,
+                   delta, delta_percent, productivity)
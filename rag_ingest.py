@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+"""
+RAG Ingestion Pipeline
+Büyük TXT/CSV/XLSX yüklemelerini akış halinde (bellek sınırlı) parçalara böler
+ve parça gruplarını ingestion kuyruğunun (ingest_queue) embedding + indeksleme adımına aktarır.
+Ayrıştırma, kuyruk işçisinin süreç havuzunda (parse_spooled_file) çalışır.
+"""
+
+import io
+import logging
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, List
+
+import pandas as pd
+
+from rag_chunker import CHUNK_MAX_TOKENS, chunk_rows, count_tokens, iter_chunks
+
+logger = logging.getLogger(__name__)
+
+# Akış ayarları
+CSV_READ_CHUNKSIZE = 5000   # read_csv / openpyxl satır bloğu
+EMBED_BATCH_SIZE = 256      # embedding çağrısı başına parça sayısı
+
+
+def rows_to_texts(df: pd.DataFrame) -> pd.Series:
+    """Satırları 'kolon=değer, ...' metnine vektörel olarak çevir (iterrows yok)"""
+    if df.empty or len(df.columns) == 0:
+        return pd.Series([], dtype=object)
+    parts = [f"{c}=" + df[c].astype(str) for c in df.columns]
+    return parts[0].str.cat(parts[1:], sep=", ") if len(parts) > 1 else parts[0]
+
+
+def _header_names(header: tuple) -> List[str]:
+    """Boş başlıkları pandas gibi 'Unnamed: i' olarak adlandır"""
+    return [str(h) if h is not None else f"Unnamed: {i}" for i, h in enumerate(header)]
+
+
+def iter_csv_frames(fileobj, chunksize: int = CSV_READ_CHUNKSIZE) -> Iterator[pd.DataFrame]:
+    """CSV dosyasını satır blokları halinde oku"""
+    reader = pd.read_csv(fileobj, chunksize=chunksize, dtype=str, keep_default_na=False)
+    for frame in reader:
+        yield frame
+
+
+def iter_xlsx_frames(fileobj, chunksize: int = CSV_READ_CHUNKSIZE) -> Iterator[pd.DataFrame]:
+    """XLSX dosyasını openpyxl read-only modunda satır blokları halinde oku"""
+    from openpyxl import load_workbook  # pyright: ignore[reportMissingImports]
+
+    wb = load_workbook(fileobj, read_only=True, data_only=True)
+    try:
+        ws = wb.worksheets[0]
+        rows = ws.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        columns = _header_names(header)
+        width = len(columns)
+
+        buf = []
+        for row in rows:
+            if row is None or all(v is None for v in row):
+                continue
+            buf.append(tuple(row[:width]) + (None,) * (width - len(row)))
+            if len(buf) >= chunksize:
+                yield pd.DataFrame(buf, columns=columns, dtype=object).fillna("").astype(str)
+                buf = []
+        if buf:
+            yield pd.DataFrame(buf, columns=columns, dtype=object).fillna("").astype(str)
+    finally:
+        wb.close()
+
+
+def iter_xls_frames(fileobj, chunksize: int = CSV_READ_CHUNKSIZE) -> Iterator[pd.DataFrame]:
+    """Eski .xls formatı (akış desteği yok) — tek okuma, dilimler halinde ver"""
+    df = pd.read_excel(fileobj, dtype=str).fillna("")
+    for start in range(0, len(df), chunksize):
+        yield df.iloc[start:start + chunksize]
+
+
+def iter_text_chunks(fileobj, max_tokens: int = CHUNK_MAX_TOKENS) -> Iterator[Dict[str, Any]]:
+    """Düz metni satır satır okuyup yapı farkında parçalayıcıdan geçir"""
+    wrapped = _is_binary(fileobj)
+    stream = io.TextIOWrapper(fileobj, encoding="utf-8", errors="ignore") if wrapped else fileobj
+    try:
+        yield from iter_chunks(stream, max_tokens=max_tokens)
+    finally:
+        if wrapped:
+            stream.detach()  # yüklenen dosya nesnesini kapatma
+
+
+def _is_binary(fileobj) -> bool:
+    return isinstance(fileobj, (io.BufferedIOBase, io.RawIOBase)) or "b" in getattr(fileobj, "mode", "b")
+
+
+FRAME_READERS = {
+    "csv": iter_csv_frames,
+    "xlsx": iter_xlsx_frames,
+    "xls": iter_xls_frames,
+}
+
+
+def iter_file_chunks(name: str, fileobj, chunksize: int = CSV_READ_CHUNKSIZE) -> Iterator[Dict[str, Any]]:
+    """Dosyayı {'text', 'meta'} parçaları olarak akış halinde üret"""
+    ext = name.lower().split(".")[-1]
+    try:
+        if ext == "txt":
+            for i, ch in enumerate(iter_text_chunks(fileobj)):
+                yield {"text": ch["text"], "meta": {"filename": name, "kind": "txt", "part": i,
+                                                    "section_path": ch["section_path"]}}
+        elif ext in FRAME_READERS:
+            kind = "csv" if ext == "csv" else "xlsx"
+            row_offset = 0
+            for frame in FRAME_READERS[ext](fileobj, chunksize):
+                texts = rows_to_texts(frame)
+                # Token sayısı bayt sayısını, bayt sayısı 4×karakteri geçemez:
+                # kısa satırlar (çoğunluk) tokenizer'a hiç uğramadan tek parça kalır
+                maybe_long = (texts.str.len() * 4 > CHUNK_MAX_TOKENS).tolist()
+                for i, (s, check) in enumerate(zip(texts.tolist(), maybe_long)):
+                    row = row_offset + i
+                    if check and count_tokens(s) > CHUNK_MAX_TOKENS:
+                        pieces = [c["text"] for c in chunk_rows([s])]
+                    else:
+                        pieces = [s]
+                    for j, ch in enumerate(pieces):
+                        yield {"text": ch, "meta": {"filename": name, "kind": kind, "row": row, "part": j}}
+                row_offset += len(frame)
+        else:
+            yield {"text": f"[desteklenmeyen tür] {name}", "meta": {"filename": name, "kind": ext}}
+    except Exception as e:
+        logger.error(f"{name} okunurken hata: {e}")
+        yield {"text": f"[okuma hatası: {e}]", "meta": {"filename": name, "kind": "err"}}
+
+
+def iter_batches(items: Iterable[Any], batch_size: int = EMBED_BATCH_SIZE) -> Iterator[List[Any]]:
+    """Herhangi bir akışı sabit boyutlu gruplara böl"""
+    it = iter(items)
+    while True:
+        batch = list(islice(it, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+def parse_spooled_file(name: str, path: str, batch_size: int, out_q, tag: Any, abort=None) -> int:
+    """Süreç havuzunda çalışır: biriktirilmiş dosyayı parçalayıp grupları sınırlı kuyruğa akıtır.
+    Üretilen grup sayısını döndürür; abort kurulursa erken biter."""
+    n_batches = 0
+    with open(path, "rb") as fh:
+        for batch in iter_batches(iter_file_chunks(name, fh), batch_size):
+            if abort is not None and abort.is_set():
+                break
+            out_q.put(("batch", tag, n_batches, batch))
+            n_batches += 1
+    return n_batches
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+RAG Pipeline Test Suite
+Tests ingestion, chunking and local storage helpers of the RAG modules
+"""
+
+import sys
+import os
+import io
+import unittest
+import tempfile
+import shutil
+import pandas as pd
+
+# Add the current directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import rag_ingest
+import rag_chunker
+import ingest_queue
+
+
+class TestRAGPipeline(unittest.TestCase):
+    """Test suite for the RAG ingestion pipeline"""
+
+    def setUp(self):
+        """Set up test environment"""
+        self.test_data_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        """Clean up test environment"""
+        if os.path.exists(self.test_data_dir):
+            shutil.rmtree(self.test_data_dir)
+
+    def test_rows_to_texts_vectorized(self):
+        """Row text must match the old per-row 'col=value' format"""
+        df = pd.DataFrame({"Kod": ["FER-06-001", "FER-06-002"], "Birim": ["kg", "m2"]})
+        texts = rag_ingest.rows_to_texts(df).tolist()
+        self.assertEqual(texts, ["Kod=FER-06-001, Birim=kg", "Kod=FER-06-002, Birim=m2"])
+        print("✅ Vectorized row-to-text tested successfully")
+
+    def test_csv_streaming_rows(self):
+        """CSV is read in blocks and row numbers stay global"""
+        csv_bytes = "a,b\n" + "\n".join(f"{i},x{i}" for i in range(25))
+        chunks = list(rag_ingest.iter_file_chunks("norms.csv", io.BytesIO(csv_bytes.encode()), chunksize=10))
+        self.assertEqual(len(chunks), 25)
+        self.assertEqual(chunks[-1]["meta"]["row"], 24)
+        self.assertEqual(chunks[3]["text"], "a=3, b=x3")
+        print("✅ CSV streaming tested successfully")
+
+    def test_text_streaming(self):
+        """Plain text is chunked by tokens and headings start new chunks"""
+        body = "\n".join(["Beton dökümü ve vibrasyon işleri yapılır."] * 200)
+        data = io.BytesIO(f"# Kalıp\nKalıp kurulur.\n# Beton\n{body}".encode())
+        parts = list(rag_ingest.iter_text_chunks(data, max_tokens=128))
+        self.assertEqual(parts[0]["text"], "# Kalıp\nKalıp kurulur.")
+        self.assertTrue(all(p["tokens"] <= 128 for p in parts))
+        self.assertEqual(parts[-1]["section_path"], "Beton")
+        print("✅ Text streaming tested successfully")
+
+    def test_chunker_structure_and_overlap(self):
+        """Table rows are never split and consecutive chunks overlap"""
+        rows = "\n".join(f"| FER-{i:03d} | Donatı | kg | 0.{i} |" for i in range(60))
+        chunks = rag_chunker.chunk_document(f"TABLO 1 NORMLAR\n{rows}", "Katalog",
+                                            max_tokens=100, overlap_tokens=30)
+        self.assertGreater(len(chunks), 1)
+        for ch in chunks:
+            for line in ch["text"].split("\n")[1:]:
+                self.assertTrue(line.startswith("| FER-") and line.endswith("|"))
+        self.assertEqual(chunks[0]["section_path"], "Katalog > TABLO 1 NORMLAR")
+        self.assertIn(chunks[0]["text"].split("\n")[-1], chunks[1]["text"])
+        print("✅ Structure-aware chunker tested successfully")
+
+    def test_job_queue_resume_is_idempotent(self):
+        """A job interrupted mid-way resumes without re-adding finished batches"""
+        q = ingest_queue.IngestQueue(db_path=os.path.join(self.test_data_dir, "jobs.db"),
+                                     spool_dir=os.path.join(self.test_data_dir, "spool"),
+                                     batch_size=4)
+        data = ("a,b\n" + "\n".join(f"{j},z" for j in range(10))).encode()
+        job_id = q.enqueue([("norms.csv", data)])
+        indexed = []
+
+        def flaky_add(texts, metas, embs):
+            if len(indexed) >= 4:
+                raise RuntimeError("disk dolu")
+            indexed.extend(m["ingest_batch"] for m in metas)
+            return list(range(len(texts)))
+
+        q._embed_fn = lambda texts: [[1.0]] * len(texts)
+        q._add_fn = flaky_add
+        q._has_batch_fn = lambda key: key in indexed
+        q.process_job(job_id)
+        self.assertEqual(q.get_status(job_id)["status"], "failed")
+
+        q._add_fn = lambda texts, metas, embs: indexed.extend(m["ingest_batch"] for m in metas) or list(range(len(texts)))
+        q.retry_job(job_id)
+        q.process_job(job_id)
+        status = q.get_status(job_id)
+        self.assertEqual(status["status"], "done")
+        self.assertEqual(len(indexed), 10)
+        self.assertEqual(status["added"], 10)
+
+        # Aynı içerik tekrar gelirse atlanır
+        again = q.enqueue([("kopya.csv", data)])
+        self.assertEqual(q.get_status(again)["files"][0]["status"], "skipped")
+        print("✅ Resumable ingestion queue tested successfully")
+
+    def test_job_queue_parallel_pipeline(self):
+        """The queue worker parses files in a process pool and tracks per-file progress"""
+        q = ingest_queue.IngestQueue(db_path=os.path.join(self.test_data_dir, "jobs.db"),
+                                     spool_dir=os.path.join(self.test_data_dir, "spool"),
+                                     batch_size=3, max_workers=2)
+        files = [(f"f{i}.csv", ("a,b\n" + "\n".join(f"{j},y{i}" for j in range(7))).encode()) for i in range(3)]
+        files.append(("bozuk.pdf", b"%PDF"))
+        indexed = []
+        q._embed_fn = lambda texts: [[0.5, 0.5]] * len(texts)
+        q._add_fn = lambda texts, metas, embs: indexed.extend(texts) or list(range(len(texts)))
+        q._has_batch_fn = lambda key: False
+
+        job_id = q.enqueue(files)
+        q.process_job(job_id)
+        status = q.get_status(job_id)
+
+        self.assertEqual(status["status"], "done")
+        self.assertEqual(len(indexed), 3 * 7 + 1)
+        self.assertEqual(status["added"], 3 * 7 + 1)
+        self.assertTrue(all(f["status"] == "done" for f in status["files"]))
+        self.assertEqual(status["files"][0]["total_batches"], 3)
+        self.assertEqual(status["files"][0]["added"], 7)
+        print("✅ Parallel ingestion pipeline tested successfully")
+
+    def test_job_queue_clear_allows_reindex(self):
+        """After a RAG reset the same upload is indexed again instead of skipped"""
+        q = ingest_queue.IngestQueue(db_path=os.path.join(self.test_data_dir, "jobs.db"),
+                                     spool_dir=os.path.join(self.test_data_dir, "spool"),
+                                     batch_size=4)
+        data = ("a,b\n" + "\n".join(f"{j},z" for j in range(6))).encode()
+        indexed = []
+        q._embed_fn = lambda texts: [[1.0]] * len(texts)
+        q._add_fn = lambda texts, metas, embs: indexed.extend(texts) or list(range(len(texts)))
+        q._has_batch_fn = lambda key: False
+        q.process_job(q.enqueue([("norms.csv", data)]))
+
+        q.clear()
+        self.assertEqual(os.listdir(os.path.join(self.test_data_dir, "spool")), [])
+        job_id = q.enqueue([("norms.csv", data)])
+        self.assertEqual(q.get_status(job_id)["files"][0]["status"], "pending")
+        q.process_job(job_id)
+        self.assertEqual(len(indexed), 12)
+        self.assertEqual(q.get_status(job_id)["files"][0]["total_batches"], 2)
+        print("✅ Ingestion queue reset tested successfully")
+
+
+def run_rag_pipeline_tests():
+    """Run all RAG pipeline tests"""
+    print("🧪 Starting RAG Pipeline Test Suite")
+    print("=" * 80)
+
+    test_suite = unittest.TestLoader().loadTestsFromTestCase(TestRAGPipeline)
+    runner = unittest.TextTestRunner(verbosity=2)
+    result = runner.run(test_suite)
+
+    print("\n" + "=" * 80)
+    print(f"Tests run: {result.testsRun}")
+    print(f"Failures: {len(result.failures)}")
+    print(f"Errors: {len(result.errors)}")
+    return result.wasSuccessful()
+
+
+if __name__ == "__main__":
+    success = run_rag_pipeline_tests()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,232 @@
+# -*- coding: utf-8 -*-
+"""
+Report Writers
+Satır akışını sabit bellekle CSV / XLSX / Parquet dosyalarına yazan yazıcılar.
+Tek geçişte birden çok formata yazılabilir (satırlar bir kez üretilir).
+"""
+
+import csv
+import math
+import numbers
+import logging
+from datetime import date
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Opsiyonel bağımlılıklar
+try:
+    import xlsxwriter
+    XLSX_AVAILABLE = True
+except ImportError:
+    XLSX_AVAILABLE = False
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    PARQUET_AVAILABLE = True
+except ImportError:
+    PARQUET_AVAILABLE = False
+
+PARQUET_ROW_GROUP = 50000   # Parquet'e yazılmadan önce bellekte tutulan en fazla satır
+
+
+class CSVReportWriter:
+    """Noktalı virgüllü CSV (Excel uyumlu utf-8-sig).
+    Ondalıklar tam hassasiyetle yazılır (XLSX/Parquet ile aynı değer);
+    float_formats ile yalnız istenen kolonlar sabit basamağa yuvarlanır."""
+
+    def __init__(self, path: str, columns: Sequence[str], delimiter: str = ";",
+                 float_formats: Optional[Dict[str, str]] = None):
+        # float_formats: kolon -> format dizesi (ör. {'tutar': '{:.2f}'})
+        self.path = path
+        self._file = open(path, "w", encoding="utf-8-sig", newline="")
+        self._writer = csv.writer(self._file, delimiter=delimiter)
+        self._writer.writerow(columns)
+        float_formats = float_formats or {}
+        self._formats = [float_formats.get(c) for c in columns]
+
+    def write_row(self, row: Sequence[Any]):
+        self._writer.writerow([fmt.format(v) if fmt and isinstance(v, float) else v
+                               for v, fmt in zip(row, self._formats)])
+
+    def close(self):
+        self._file.close()
+
+
+XLSX_MAX_ROWS = 1048576      # Excel sayfa satır sınırı (başlık dahil)
+
+
+class XLSXWorkbookWriter:
+    """Çok sayfalı xlsx (constant_memory): sayfalar sırayla, satır satır yazılır.
+    Sayı biçimleri kolon başına; sınırı aşan tablolar '<ad> (2)' sayfasında sürer."""
+
+    def __init__(self, target, default_num_format: str = "#,##0.00"):
+        # target: dosya yolu ya da BytesIO
+        self.path = target
+        self._wb = xlsxwriter.Workbook(target, {"constant_memory": True})
+        self._header_format = self._wb.add_format({"bold": True, "bg_color": "#DCE6F1", "border": 1})
+        self._title_format = self._wb.add_format({"bold": True, "font_size": 18})
+        self._label_format = self._wb.add_format({"bold": True, "font_size": 14, "bg_color": "#EEF3FF", "border": 1})
+        self._date_format = self._wb.add_format({"num_format": "yyyy-mm-dd"})
+        self._default_num_format = default_num_format
+        self._formats: Dict[str, Any] = {}
+
+    def _num_format(self, num_format: str):
+        fmt = self._formats.get(num_format)
+        if fmt is None:
+            fmt = self._formats[num_format] = self._wb.add_format({"num_format": num_format})
+        return fmt
+
+    def add_summary(self, name: str, items: Sequence[Tuple[str, Any]], title: Optional[str] = None,
+                    num_format: Optional[str] = None):
+        """Başlık + (etiket, değer) satırlarından özet sayfası"""
+        ws = self._wb.add_worksheet(name)
+        ws.set_column(0, 0, 40)
+        ws.set_column(1, 1, 22)
+        row = 0
+        if title:
+            ws.write_string(0, 0, title, self._title_format)
+            row = 2
+        value_format = self._wb.add_format({"bold": True, "font_size": 14, "bg_color": "#EEF3FF", "border": 1,
+                                            "num_format": num_format or self._default_num_format})
+        for label, value in items:
+            ws.write_string(row, 0, str(label), self._label_format)
+            if isinstance(value, numbers.Number):
+                ws.write_number(row, 1, value, value_format)
+            else:
+                ws.write(row, 1, value, value_format)
+            row += 1
+
+    def begin_table(self, name: str, columns: Sequence[str], num_formats: Optional[Dict[str, str]] = None,
+                    width: int = 18):
+        """write_row ile satır satır doldurulacak tablo sayfasını aç"""
+        num_formats = num_formats or {}
+        self._table = (name, list(columns), width)
+        self._col_formats = [self._num_format(num_formats.get(c, self._default_num_format)) for c in columns]
+        self._part, self._ws, self._row = 1, self._table_sheet(name, columns, width), 1
+
+    def write_row(self, row: Sequence[Any]):
+        if self._row >= XLSX_MAX_ROWS:
+            name, columns, width = self._table
+            self._part += 1
+            self._ws, self._row = self._table_sheet(f"{name} ({self._part})", columns, width), 1
+        ws, r = self._ws, self._row
+        for c, value in enumerate(row):
+            if value is None or (isinstance(value, float) and math.isnan(value)):
+                continue
+            if isinstance(value, bool):
+                ws.write_boolean(r, c, value)
+            elif isinstance(value, numbers.Number):
+                ws.write_number(r, c, value, self._col_formats[c])
+            elif isinstance(value, date):
+                ws.write_datetime(r, c, value, self._date_format)
+            else:
+                ws.write_string(r, c, str(value))
+        self._row += 1
+
+    def add_table(self, name: str, columns: Sequence[str], rows: Iterable[Sequence[Any]],
+                  num_formats: Optional[Dict[str, str]] = None, width: int = 18) -> int:
+        """Satır akışını tabloya yaz; yazılan satır sayısını döndür"""
+        self.begin_table(name, columns, num_formats, width)
+        written = 0
+        for row in rows:
+            self.write_row(row)
+            written += 1
+        return written
+
+    def add_dataframe(self, name: str, df, num_formats: Optional[Dict[str, str]] = None, width: int = 18) -> int:
+        """DataFrame'i satır satır yaz (kopya oluşturmadan)"""
+        return self.add_table(name, [str(c) for c in df.columns], df.itertuples(index=False, name=None),
+                              num_formats, width)
+
+    def _table_sheet(self, name: str, columns: Sequence[str], width: int):
+        ws = self._wb.add_worksheet(name[:31])
+        ws.set_column(0, max(len(columns) - 1, 0), width)
+        ws.write_row(0, 0, columns, self._header_format)
+        ws.freeze_panes(1, 0)
+        return ws
+
+    def close(self):
+        self._wb.close()
+
+
+class ParquetReportWriter:
+    """Satırları row group'lar halinde Parquet'e yaz"""
+
+    def __init__(self, path: str, columns: Sequence[str], types: Optional[Dict[str, str]] = None,
+                 row_group_size: Optional[int] = None):
+        # types: kolon -> Arrow tip adı ('float64', 'date32', ...); verilmeyen kolonlar string
+        self.path = path
+        self._columns = list(columns)
+        types = types or {}
+        self._schema = pa.schema([(c, pa.type_for_alias(types.get(c, "string"))) for c in self._columns])
+        self._row_group_size = row_group_size or PARQUET_ROW_GROUP
+        self._buf: List[Sequence[Any]] = []
+        self._writer = pq.ParquetWriter(path, self._schema)
+
+    def write_row(self, row: Sequence[Any]):
+        self._buf.append(row)
+        if len(self._buf) >= self._row_group_size:
+            self._flush()
+
+    def _flush(self):
+        if not self._buf:
+            return
+        # Şema sabit: ilk grupta hep None olan kolon null tipine düşmez
+        table = pa.Table.from_pylist([dict(zip(self._columns, r)) for r in self._buf], schema=self._schema)
+        self._writer.write_table(table)
+        self._buf = []
+
+    def close(self):
+        self._flush()
+        self._writer.close()
+
+
+def _xlsx_report_writer(path: str, columns: Sequence[str]) -> XLSXWorkbookWriter:
+    """Tek tablolu rapor; satır sınırında sonraki sayfaya geçer"""
+    writer = XLSXWorkbookWriter(path)
+    writer.begin_table("Rapor", columns)
+    return writer
+
+
+REPORT_WRITERS = {
+    "csv": CSVReportWriter,
+    "xlsx": _xlsx_report_writer,
+    "parquet": ParquetReportWriter,
+}
+
+
+def available_formats() -> List[str]:
+    """Kurulu bağımlılıklara göre desteklenen formatlar"""
+    return ["csv"] + (["xlsx"] if XLSX_AVAILABLE else []) + (["parquet"] if PARQUET_AVAILABLE else [])
+
+
+def write_report(rows: Iterable[Sequence[Any]], base_path: str, columns: Sequence[str],
+                 formats: Sequence[str] = ("csv",), types: Optional[Dict[str, str]] = None,
+                 float_formats: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+    """Satır akışını tek geçişte istenen formatlara yaz; {format: dosya yolu} döndür.
+    types: Parquet şeması için kolon tipleri (kolon -> Arrow tip adı)
+    float_formats: CSV'de sabit basamakla yazılacak kolonlar (kolon -> format dizesi)"""
+    supported = available_formats()
+    writers = {}
+    for fmt in formats:
+        if fmt not in supported:
+            logger.warning(f"{fmt} formatı kullanılamıyor (bağımlılık eksik), atlandı")
+            continue
+        path = f"{base_path}.{fmt}"
+        writer_cls = REPORT_WRITERS[fmt]
+        if fmt == "parquet":
+            writers[fmt] = writer_cls(path, columns, types)
+        elif fmt == "csv":
+            writers[fmt] = writer_cls(path, columns, float_formats=float_formats)
+        else:
+            writers[fmt] = writer_cls(path, columns)
+    try:
+        for row in rows:
+            for w in writers.values():
+                w.write_row(row)
+    finally:
+        for w in writers.values():
+            w.close()
+    return {fmt: w.path for fmt, w in writers.items()}
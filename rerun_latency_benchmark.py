@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Rerun Latency Benchmark
+Measures what one widget edit costs before and after the tab fragments:
+  before - the whole script reruns (every tab and the sidebar)
+  after  - only the edited tab's fragment body reruns (its `_tab_timings` entry)
+AppTest always reruns the full script, so the "after" figure is the instrumented
+fragment body time recorded by `tab_fragment`, not an AppTest wall time.
+"""
+
+import sys
+import os
+import time
+import statistics
+
+# Add the current directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from streamlit.testing.v1 import AppTest
+
+APP_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "betonarme_hesap_modulu_r0.py")
+REPEATS = 5
+
+
+def _first_key(widgets, prefix):
+    return next(w.key for w in widgets if (w.key or "").startswith(prefix) and not w.disabled)
+
+
+def _edits(at):
+    """(label, tab, edit) triples; each edit flips a widget so every repeat changes state"""
+    mx_key = _first_key(at.checkbox, "mx_on_")
+    return [
+        ("Sabit düzenle (edit_NDFL_RUS)", "sabitler",
+         lambda i: at.toggle(key="edit_NDFL_RUS").set_value(i % 2 == 0)),
+        (f"Matris kutusu ({mx_key})", "matris",
+         lambda i: at.checkbox(key=mx_key).set_value(not at.checkbox(key=mx_key).value)),
+        ("Gider girişi (food_inp)", "gider",
+         lambda i: at.number_input(key="food_inp").set_value(10000.0 + i)),
+    ]
+
+
+def run_rerun_latency_benchmark(repeats=REPEATS):
+    """Run the benchmark and print median milliseconds per edit"""
+    print("⏱️ Starting Rerun Latency Benchmark")
+    print("=" * 80)
+
+    at = AppTest.from_file(APP_FILE, default_timeout=120)
+    at.run()
+    if at.exception:
+        print(f"❌ App raised: {at.exception[0].value}")
+        return False
+
+    print(f"{'Edit':<44}{'before (ms)':>14}{'after (ms)':>14}{'speed-up':>10}")
+    for label, tab, edit in _edits(at):
+        full_ms, tab_ms = [], []
+        for i in range(repeats):
+            edit(i)
+            t0 = time.perf_counter()
+            at.run()
+            full_ms.append((time.perf_counter() - t0) * 1000)
+            tab_ms.append(at.session_state["_tab_timings"][tab])
+        before, after = statistics.median(full_ms), statistics.median(tab_ms)
+        print(f"{label:<44}{before:>14.1f}{after:>14.1f}{before / max(after, 0.1):>9.1f}x")
+
+    print("=" * 80)
+    return not at.exception
+
+
+if __name__ == "__main__":
+    success = run_rerun_latency_benchmark()
+    sys.exit(0 if success else 1)
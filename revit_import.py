@@ -0,0 +1,320 @@
+# -*- coding: utf-8 -*-
+"""
+Revit Quantity Import
+Revit/IFC metraj çizelgesi (CSV/XLSX) toplu yükleyici: satırlar akış halinde okunur,
+category/class_inf -> WBS eşlemesi mappings tablosundaki regex'lerle (derlenmiş, önbellekli)
+yapılır ve revit_quantities'e (model_id, element_id) anahtarıyla gruplar halinde upsert edilir.
+"""
+
+import io
+import re
+import csv
+import time
+import logging
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+import pandas as pd
+
+# openpyxl (opsiyonel: XLSX çizelgeleri)
+try:
+    import openpyxl
+    OPENPYXL_AVAILABLE = True
+except ImportError:
+    OPENPYXL_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+IMPORT_BATCH_SIZE = 5000        # işlem (commit) başına eleman
+
+# Çizelge başlığı (küçük harf) -> kolon
+COLUMN_ALIASES = {
+    'model_id': 'model_id', 'model': 'model_id',
+    'element_id': 'element_id', 'element id': 'element_id', 'elementid': 'element_id', 'id': 'element_id',
+    'guid': 'element_id', 'globalid': 'element_id', 'ifcguid': 'element_id', 'unique id': 'element_id',
+    'category': 'category', 'kategori': 'category', 'категория': 'category',
+    'class_inf': 'class_inf', 'class': 'class_inf', 'classification': 'class_inf', 'ifc class': 'class_inf',
+    'ifcclass': 'class_inf', 'sınıf': 'class_inf', 'класс': 'class_inf',
+    'wbs_key': 'wbs_key', 'wbs': 'wbs_key',
+    'unit': 'unit', 'birim': 'unit', 'ед. изм.': 'unit',
+    'level': 'level', 'reference level': 'level', 'base constraint': 'level', 'kat': 'level', 'уровень': 'level',
+}
+
+# Miktar kolonları (öncelik sırası) ve unit kolonu yoksa varsayılan birim
+QTY_COLUMNS = (
+    ('qty', None), ('quantity', None), ('miktar', None),
+    ('volume', 'm3'), ('hacim', 'm3'), ('объём', 'm3'), ('объем', 'm3'),
+    ('area', 'm2'), ('alan', 'm2'), ('площадь', 'm2'),
+    ('length', 'm'), ('uzunluk', 'm'), ('длина', 'm'),
+    ('count', 'adet'), ('adet', 'adet'),
+)
+
+UNIT_ALIASES = {'m³': 'm3', 'м³': 'm3', 'м3': 'm3', 'm²': 'm2', 'м²': 'm2', 'м2': 'm2', 'м': 'm', 'кг': 'kg'}
+
+# Sayı + isteğe bağlı birim: "2,50 m³", "1 250.5", "12"
+_QTY_RE = re.compile(r'^\s*([-+]?[\d\s .,]*\d)\s*(\S*)\s*$')
+
+ROW_COLUMNS = ('model_id', 'element_id', 'category', 'class_inf', 'wbs_key', 'qty', 'unit', 'level')
+
+LOAD_MAPPINGS_SQL = """
+SELECT source_field, pattern, mapped_key
+FROM mappings
+WHERE source_field IN ('category', 'class_inf')
+ORDER BY confidence DESC, CASE source_field WHEN 'class_inf' THEN 0 ELSE 1 END, id
+"""
+
+UPSERT_SET = """
+    category = EXCLUDED.category,
+    class_inf = EXCLUDED.class_inf,
+    wbs_key = EXCLUDED.wbs_key,
+    qty = EXCLUDED.qty,
+    unit = EXCLUDED.unit,
+    level = EXCLUDED.level,
+    captured_at = CURRENT_TIMESTAMP"""
+
+# PostgreSQL: grup COPY ile geçici tabloya, oradan tek INSERT ... ON CONFLICT
+STAGE_TABLE_SQL = """
+CREATE TEMP TABLE revit_quantities_stage (
+    model_id TEXT, element_id TEXT, category TEXT, class_inf TEXT,
+    wbs_key TEXT, qty NUMERIC, unit TEXT, level TEXT
+) ON COMMIT DROP
+"""
+
+UPSERT_FROM_STAGE_SQL = f"""
+INSERT INTO revit_quantities ({', '.join(ROW_COLUMNS)})
+SELECT {', '.join(ROW_COLUMNS)} FROM revit_quantities_stage
+ON CONFLICT (model_id, element_id) DO UPDATE SET{UPSERT_SET}
+"""
+
+# SQLite: sabit sorgu executemany ile (hazırlanmış ifade tekrar kullanılır)
+UPSERT_SQLITE_SQL = f"""
+INSERT INTO revit_quantities ({', '.join(ROW_COLUMNS)})
+VALUES ({', '.join('?' * len(ROW_COLUMNS))})
+ON CONFLICT (model_id, element_id) DO UPDATE SET{UPSERT_SET.replace('EXCLUDED.', 'excluded.')}
+"""
+
+AGGREGATE_SQL = """
+SELECT COALESCE(wbs_key, '') AS wbs_key, unit, SUM(qty) AS qty, count(*) AS elements
+FROM revit_quantities
+WHERE model_id = {param}
+GROUP BY 1, 2
+ORDER BY 1, 2
+"""
+
+AGGREGATE_COLUMNS = ['wbs_key', 'unit', 'qty', 'elements']
+
+
+@dataclass
+class ImportStats:
+    """Yükleme özeti"""
+    rows: int = 0
+    upserted: int = 0
+    skipped: int = 0
+    unmapped: int = 0
+    seconds: float = 0.0
+
+
+def _normalize_unit(unit: Optional[str]) -> Optional[str]:
+    if not unit:
+        return None
+    unit = unit.strip()
+    return UNIT_ALIASES.get(unit, unit.lower())
+
+
+def _parse_qty(value) -> Tuple[Optional[float], Optional[str]]:
+    """Hücre değerinden miktar ve (varsa) birim: ondalık virgül ve binlik ayırıcılar desteklenir"""
+    if value is None or value == '':
+        return None, None
+    if isinstance(value, (int, float)):
+        return float(value), None
+    match = _QTY_RE.match(str(value))
+    if not match:
+        return None, None
+    number = match.group(1).replace(' ', '').replace(' ', '')
+    if ',' in number and '.' in number:
+        # Son ayırıcı ondalık: "1.250,5" / "1,250.5"
+        if number.rfind(',') > number.rfind('.'):
+            number = number.replace('.', '').replace(',', '.')
+        else:
+            number = number.replace(',', '')
+    elif ',' in number:
+        # Yalnız virgül: her grup tam 3 haneyse binlik ayırıcı ("1,250", "1,250,000"),
+        # değilse ondalık virgül ("2,5"); "0,125" gibi sıfırla başlayanlar ondalıktır
+        head, *groups = number.split(',')
+        if all(len(g) == 3 for g in groups) and head.lstrip('+-') not in ('', '0'):
+            number = number.replace(',', '')
+        else:
+            number = number.replace(',', '.')
+    try:
+        return float(number), _normalize_unit(match.group(2))
+    except ValueError:
+        return None, None
+
+
+class MappingCache:
+    """mappings tablosundaki regex kuralları: bir kez derlenir, (category, class_inf) sonucu önbelleğe alınır"""
+
+    def __init__(self, rules: Sequence[Tuple[str, str, str]]):
+        self.rules = []
+        for source_field, pattern, mapped_key in rules:
+            try:
+                self.rules.append((source_field, re.compile(pattern, re.IGNORECASE), mapped_key))
+            except re.error as e:
+                logger.warning(f"Geçersiz eşleme deseni atlandı: {pattern} ({e})")
+        self._resolved: Dict[Tuple[Optional[str], Optional[str]], Optional[str]] = {}
+
+    @classmethod
+    def load(cls, pool) -> "MappingCache":
+        with pool.cursor() as cursor:
+            cursor.execute(LOAD_MAPPINGS_SQL)
+            rows = cursor.fetchall()
+        return cls([tuple(r) for r in rows])
+
+    def resolve(self, category: Optional[str], class_inf: Optional[str]) -> Optional[str]:
+        """İlk eşleşen kuralın WBS anahtarı (confidence sırasıyla; yoksa None)"""
+        key = (category, class_inf)
+        try:
+            return self._resolved[key]
+        except KeyError:
+            pass
+        fields = {'category': category or '', 'class_inf': class_inf or ''}
+        wbs_key = next((mapped_key for source_field, regex, mapped_key in self.rules
+                        if regex.search(fields[source_field])), None)
+        self._resolved[key] = wbs_key
+        return wbs_key
+
+
+def _header_index(header: Sequence) -> Tuple[Dict[str, int], Optional[int], Optional[str]]:
+    """Başlık satırından kolon indeksleri, miktar kolonu ve varsayılan birimi"""
+    names = [str(h).strip().lower() if h is not None else '' for h in header]
+    index = {}
+    for i, name in enumerate(names):
+        column = COLUMN_ALIASES.get(name)
+        if column and column not in index:
+            index[column] = i
+    for name, default_unit in QTY_COLUMNS:
+        if name in names:
+            return index, names.index(name), default_unit
+    return index, None, None
+
+
+def _iter_csv(path: str) -> Iterator[Sequence]:
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        sample = f.read(4096)
+        f.seek(0)
+        try:
+            dialect = csv.Sniffer().sniff(sample, delimiters=',;\t')
+        except csv.Error:
+            dialect = csv.excel
+        yield from csv.reader(f, dialect)
+
+
+def _iter_xlsx(path: str) -> Iterator[Sequence]:
+    if not OPENPYXL_AVAILABLE:
+        raise ImportError("openpyxl kurulu değil (pip install openpyxl)")
+    workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        yield from workbook.active.iter_rows(values_only=True)
+    finally:
+        workbook.close()
+
+
+def iter_schedule_rows(path: str) -> Iterator[Sequence]:
+    """Çizelgenin ham satırları (başlık dahil), dosya türüne göre akış halinde"""
+    if path.lower().endswith(('.xlsx', '.xlsm')):
+        return _iter_xlsx(path)
+    return _iter_csv(path)
+
+
+class RevitImporter:
+    """revit_quantities toplu yükleyicisi (PostgreSQL: COPY + ON CONFLICT, SQLite: executemany upsert)"""
+
+    def __init__(self, pool, backend: str = 'postgresql', batch_size: int = IMPORT_BATCH_SIZE):
+        if backend not in ('postgresql', 'sqlite'):
+            raise ValueError(f"Geçersiz backend: {backend}")
+        self.pool = pool
+        self.backend = backend
+        self.batch_size = batch_size
+
+    def _rows(self, raw_rows: Iterator[Sequence], model_id: str, mappings: MappingCache,
+              stats: ImportStats) -> Iterator[Tuple]:
+        """Ham satırları ROW_COLUMNS sırasında eşlenmiş satırlara çevir"""
+        header = next(raw_rows, None)
+        if header is None:
+            return
+        index, qty_col, default_unit = _header_index(header)
+        if 'element_id' not in index or qty_col is None:
+            raise ValueError(f"Çizelgede element_id ve miktar kolonları gerekli (başlık: {list(header)})")
+
+        def cell(row, column):
+            i = index.get(column)
+            if i is None or i >= len(row) or row[i] is None:
+                return None
+            value = str(row[i]).strip()
+            return value or None
+
+        for row in raw_rows:
+            stats.rows += 1
+            element_id = cell(row, 'element_id')
+            qty, value_unit = _parse_qty(row[qty_col] if qty_col < len(row) else None)
+            unit = _normalize_unit(cell(row, 'unit')) or value_unit or default_unit
+            if element_id is None or qty is None or unit is None:
+                stats.skipped += 1
+                continue
+            category = cell(row, 'category')
+            class_inf = cell(row, 'class_inf')
+            wbs_key = cell(row, 'wbs_key') or mappings.resolve(category, class_inf)
+            if wbs_key is None:
+                stats.unmapped += 1
+            yield (cell(row, 'model_id') or model_id, element_id, category, class_inf,
+                   wbs_key, qty, unit, cell(row, 'level'))
+
+    def import_rows(self, raw_rows: Iterator[Sequence], model_id: str) -> ImportStats:
+        """Başlık + satır akışını yükle; her grup tek işlemde upsert edilir"""
+        started = time.perf_counter()
+        stats = ImportStats()
+        mappings = MappingCache.load(self.pool)
+        with self.pool.connection() as conn:
+            # Aynı grupta tekrar eden eleman: son satır geçerli (ON CONFLICT bir satırı iki kez güncelleyemez)
+            batch: Dict[Tuple[str, str], Tuple] = {}
+            for row in self._rows(iter(raw_rows), model_id, mappings, stats):
+                batch[(row[0], row[1])] = row
+                if len(batch) >= self.batch_size:
+                    stats.upserted += self._write_batch(conn, list(batch.values()))
+                    conn.commit()
+                    batch = {}
+            if batch:
+                stats.upserted += self._write_batch(conn, list(batch.values()))
+        stats.seconds = time.perf_counter() - started
+        logger.info(f"✅ Revit metrajı yüklendi: {stats.upserted} eleman, {stats.skipped} atlandı, "
+                    f"{stats.unmapped} WBS eşlemesiz ({stats.seconds:.1f} sn)")
+        return stats
+
+    def import_file(self, path: str, model_id: str) -> ImportStats:
+        """CSV/XLSX çizelgesini yükle"""
+        return self.import_rows(iter_schedule_rows(path), model_id)
+
+    def _write_batch(self, conn, rows: List[Tuple]) -> int:
+        if self.backend == 'sqlite':
+            conn.executemany(UPSERT_SQLITE_SQL, rows)
+            return len(rows)
+        # PostgreSQL COPY metin formatı (postgresql_rag_system ile aynı kaçış kuralları)
+        from postgresql_rag_system import _copy_line
+        buf = io.StringIO()
+        buf.writelines(map(_copy_line, rows))
+        buf.seek(0)
+        with conn.cursor() as cursor:
+            cursor.execute(STAGE_TABLE_SQL)
+            cursor.copy_expert(f"COPY revit_quantities_stage ({', '.join(ROW_COLUMNS)}) FROM STDIN", buf)
+            cursor.execute(UPSERT_FROM_STAGE_SQL)
+            return cursor.rowcount
+
+    def aggregate(self, model_id: str) -> pd.DataFrame:
+        """Modelin WBS x birim toplam metrajı (maliyet modeline girdi)"""
+        param = '?' if self.backend == 'sqlite' else '%s'
+        with self.pool.cursor() as cursor:
+            cursor.execute(AGGREGATE_SQL.format(param=param), (model_id,))
+            rows = [tuple(r) for r in cursor.fetchall()]
+        df = pd.DataFrame(rows, columns=AGGREGATE_COLUMNS)
+        df['qty'] = df['qty'].astype(float)
+        return df
@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+"""
+SQLite Connection Manager
+Thread başına bir sqlite3 bağlantısı (WAL, synchronous=NORMAL, önbelleğe alınan sorgular);
+PostgreSQLConnectionPool ile aynı connection()/cursor() arayüzü. RAG arka ucu ve proje deposu
+aynı yöneticiyi kullanır.
+"""
+
+import sqlite3
+import threading
+import weakref
+from contextlib import contextmanager
+from typing import Iterator
+
+STATEMENT_CACHE_SIZE = 256      # bağlantı başına hazırlanmış (prepared) sorgu önbelleği
+
+
+class _ThreadConnection:
+    """Thread-local bağlantı kutusu; thread bitince toplanır ve finalizer bağlantıyı kapatır"""
+    __slots__ = ("conn", "__weakref__")
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+
+
+def _release_connection(connections: set, lock: threading.Lock, conn: sqlite3.Connection):
+    with lock:
+        connections.discard(conn)
+    conn.close()
+
+
+class SQLiteConnectionManager:
+    """Thread başına bir bağlantı (sqlite3 bağlantıları thread'ler arasında paylaşılmaz).
+    Biten thread'lerin bağlantıları kapatılır; açık bağlantı sayısı canlı thread sayısını geçmez.
+    PostgreSQLConnectionPool ile aynı connection()/cursor() arayüzü."""
+
+    def __init__(self, path: str, timeout: float = 30.0):
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+        self._connections: set = set()
+        self._lock = threading.Lock()
+
+    def _get(self) -> sqlite3.Connection:
+        holder = getattr(self._local, "holder", None)
+        if holder is None:
+            conn = sqlite3.connect(self.path, timeout=self.timeout, check_same_thread=False,
+                                   cached_statements=STATEMENT_CACHE_SIZE)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")      # okuyucular yazıcıyı beklemez
+            conn.execute("PRAGMA synchronous=NORMAL")    # WAL ile güvenli, commit başına fsync yok
+            conn.execute("PRAGMA temp_store=MEMORY")
+            holder = self._local.holder = _ThreadConnection(conn)
+            with self._lock:
+                self._connections.add(conn)
+            weakref.finalize(holder, _release_connection, self._connections, self._lock, conn)
+        return holder.conn
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        """Bağlantı al; blok başarılıysa commit, hata varsa rollback"""
+        conn = self._get()
+        try:
+            yield conn
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+    @contextmanager
+    def cursor(self) -> Iterator[sqlite3.Cursor]:
+        """Tek işlemlik cursor"""
+        with self.connection() as conn:
+            cur = conn.cursor()
+            try:
+                yield cur
+            finally:
+                cur.close()
+
+    def close(self):
+        """Tüm thread'lerin bağlantılarını kapat"""
+        with self._lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()   # aynı küme: finalizer'lar onu tutar, yönetici yeniden açılabilir
+        self._local = threading.local()
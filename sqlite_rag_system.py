@@ -0,0 +1,555 @@
+# -*- coding: utf-8 -*-
+"""
+SQLite RAG System for Betonarme İşçilik Modülü
+PostgreSQLRAGSystem ile aynı arayüz, sunucusuz: betonarme_rag.db şeması, FTS5 tam metin
+araması (bm25), WAL modu ve sabit (önbelleğe alınan) parametreli sorgular.
+Diziler (work_types, norm_codes) JSON metin olarak saklanır.
+"""
+
+import os
+import re
+import json
+import sqlite3
+import logging
+from datetime import date, timedelta
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import pandas as pd
+
+from rag_common import (
+    PRODUCTIVITY_SUMMARY_COLUMNS, SITE_OBSERVATION_COLUMNS, SITE_OBSERVATION_COLUMN_FORMATS,
+    SITE_OBSERVATION_COLUMN_TYPES, VARIANCE_COLUMNS, VARIANCE_COLUMN_FORMATS, VARIANCE_COLUMN_TYPES,
+    RAGConfig, RAGDocumentMixin, RAGResultsMixin,
+)
+from norm_index import NormIndex
+from sqlite_pool import SQLiteConnectionManager
+from report_writers import write_report
+
+logger = logging.getLogger(__name__)
+
+DOCUMENT_BATCH_SIZE = 200       # işlem (commit) başına doküman
+
+# betonarme_rag.db ile aynı tablolar + mappings, retrieval_logs ve norms sürüm sayacı
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    source TEXT NOT NULL,
+    country TEXT NOT NULL,
+    doc_type TEXT NOT NULL,
+    title TEXT NOT NULL,
+    lang TEXT NOT NULL,
+    version TEXT,
+    imported_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    content TEXT
+);
+CREATE TABLE IF NOT EXISTS chunks (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    document_id INTEGER,
+    section_path TEXT,
+    heading TEXT,
+    text TEXT NOT NULL,
+    tokens INTEGER,
+    work_types TEXT,
+    norm_codes TEXT,
+    unit TEXT,
+    locale TEXT NOT NULL,
+    tags TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (document_id) REFERENCES documents (id)
+);
+CREATE TABLE IF NOT EXISTS norms (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    source TEXT NOT NULL,
+    code TEXT NOT NULL,
+    revision TEXT NOT NULL,
+    work_item_key TEXT NOT NULL,
+    description TEXT NOT NULL,
+    unit TEXT NOT NULL,
+    norm_lh_per_u REAL NOT NULL,
+    crew_comp_json TEXT,
+    conditions_json TEXT,
+    locale TEXT NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE IF NOT EXISTS wbs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    key TEXT UNIQUE NOT NULL,
+    parent_key TEXT,
+    name TEXT NOT NULL,
+    name_ru TEXT,
+    name_en TEXT,
+    locale TEXT NOT NULL DEFAULT 'tr',
+    description TEXT,
+    work_type TEXT,
+    unit TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE IF NOT EXISTS revit_quantities (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    model_id TEXT NOT NULL,
+    element_id TEXT NOT NULL,
+    category TEXT,
+    class_inf TEXT,
+    wbs_key TEXT,
+    qty REAL NOT NULL,
+    unit TEXT NOT NULL,
+    level TEXT,
+    meta TEXT,
+    captured_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE (model_id, element_id)
+);
+CREATE TABLE IF NOT EXISTS site_observations (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    work_date DATE NOT NULL,
+    shift TEXT,
+    crew_id TEXT,
+    wbs_key TEXT,
+    qty REAL NOT NULL,
+    unit TEXT NOT NULL,
+    labor_hours REAL NOT NULL,
+    weather TEXT,
+    notes TEXT,
+    source TEXT DEFAULT 'manual',
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE IF NOT EXISTS mappings (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    source_field TEXT NOT NULL,
+    pattern TEXT NOT NULL,
+    mapped_key TEXT NOT NULL,
+    confidence REAL DEFAULT 1.0
+);
+CREATE TABLE IF NOT EXISTS retrieval_logs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    ts TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    query TEXT,
+    top_k INTEGER,
+    chunk_ids TEXT,
+    scores TEXT,
+    accepted INTEGER,
+    reviewer TEXT
+);
+
+-- Norm indeksi için sürüm sayacı (her norms değişikliğinde artar)
+CREATE TABLE IF NOT EXISTS table_versions (
+    name TEXT PRIMARY KEY,
+    version INTEGER NOT NULL DEFAULT 0
+);
+INSERT OR IGNORE INTO table_versions (name, version) VALUES ('norms', 0);
+CREATE TRIGGER IF NOT EXISTS norms_version_ai AFTER INSERT ON norms BEGIN
+    UPDATE table_versions SET version = version + 1 WHERE name = 'norms';
+END;
+CREATE TRIGGER IF NOT EXISTS norms_version_au AFTER UPDATE ON norms BEGIN
+    UPDATE table_versions SET version = version + 1 WHERE name = 'norms';
+END;
+CREATE TRIGGER IF NOT EXISTS norms_version_ad AFTER DELETE ON norms BEGIN
+    UPDATE table_versions SET version = version + 1 WHERE name = 'norms';
+END;
+
+CREATE INDEX IF NOT EXISTS idx_chunks_document_id ON chunks(document_id);
+CREATE INDEX IF NOT EXISTS idx_chunks_locale ON chunks(locale);
+CREATE INDEX IF NOT EXISTS idx_norms_lookup ON norms(work_item_key, unit, locale);
+CREATE INDEX IF NOT EXISTS idx_revit_quantities_wbs_unit ON revit_quantities(wbs_key, unit);
+CREATE INDEX IF NOT EXISTS idx_site_observations_date_wbs ON site_observations(work_date, wbs_key);
+"""
+
+# FTS5 (external content): chunk metni tekrar saklanmaz, tetikleyicilerle senkron tutulur
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE chunks_fts USING fts5(
+    heading, text,
+    content='chunks', content_rowid='id',
+    tokenize='unicode61 remove_diacritics 2'
+);
+CREATE TRIGGER chunks_fts_ai AFTER INSERT ON chunks BEGIN
+    INSERT INTO chunks_fts(rowid, heading, text) VALUES (new.id, new.heading, new.text);
+END;
+CREATE TRIGGER chunks_fts_ad AFTER DELETE ON chunks BEGIN
+    INSERT INTO chunks_fts(chunks_fts, rowid, heading, text) VALUES ('delete', old.id, old.heading, old.text);
+END;
+CREATE TRIGGER chunks_fts_au AFTER UPDATE ON chunks BEGIN
+    INSERT INTO chunks_fts(chunks_fts, rowid, heading, text) VALUES ('delete', old.id, old.heading, old.text);
+    INSERT INTO chunks_fts(rowid, heading, text) VALUES (new.id, new.heading, new.text);
+END;
+INSERT INTO chunks_fts(chunks_fts) VALUES ('rebuild');
+"""
+
+# Kaynak önceliği norm_index.NORM_PRIORITY_ORDER ile aynı (SQLite şemasında updated_at yok)
+NORM_PRIORITY_ORDER = """
+    CASE source
+        WHEN 'Internal' THEN 1
+        WHEN 'Poz' THEN 2
+        WHEN 'FER' THEN 3
+        ELSE 4
+    END,
+    created_at DESC, id DESC"""
+
+RANKED_NORMS_SQL = f"""
+SELECT work_item_key, unit, source, code, norm_lh_per_u, conditions_json,
+       ROW_NUMBER() OVER (PARTITION BY work_item_key, unit ORDER BY {NORM_PRIORITY_ORDER}) AS rn
+FROM norms
+WHERE locale = ?"""
+
+LOAD_NORMS_SQL = f"""
+SELECT work_item_key, unit, source, code, norm_lh_per_u, conditions_json
+FROM ({RANKED_NORMS_SQL})
+WHERE rn = 1
+"""
+
+NORMS_VERSION_SQL = "SELECT version FROM table_versions WHERE name = 'norms'"
+
+INSERT_DOCUMENT_SQL = """
+INSERT INTO documents (source, country, doc_type, title, lang, content)
+VALUES (?, ?, ?, ?, ?, ?)
+"""
+
+INSERT_CHUNK_SQL = """
+INSERT INTO chunks (document_id, section_path, heading, text, tokens, work_types, norm_codes, unit, locale)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+INSERT_RETRIEVAL_LOG_SQL = """
+INSERT INTO retrieval_logs (query, top_k, chunk_ids, scores, accepted)
+VALUES (?, ?, ?, ?, ?)
+"""
+
+SEARCH_COLUMNS = """
+    c.id, c.document_id, c.section_path, c.heading, c.text,
+    c.work_types, c.norm_codes, c.unit, c.locale,
+    d.source, d.country, d.title as doc_title"""
+
+# Ortak filtreler: locale listesi ve iş tipleri JSON dizisi olarak tek parametre
+SEARCH_FILTERS = """
+  AND c.locale IN (SELECT value FROM json_each(:locales))
+  AND (:work_types IS NULL OR EXISTS (
+        SELECT 1 FROM json_each(c.work_types) w
+        WHERE w.value IN (SELECT value FROM json_each(:work_types))))"""
+
+HEADING_WEIGHT = 2.0    # PostgreSQL tsv'deki A (başlık) / B (metin) ağırlığının karşılığı
+
+# bm25 negatiftir (küçük = iyi); x/(1+x) ile 0-1 aralığına (ts_rank_cd normalizasyon 32 gibi)
+FULLTEXT_SEARCH_SQL = f"""
+SELECT {SEARCH_COLUMNS},
+       -bm25(chunks_fts, {HEADING_WEIGHT}, 1.0) / (1 - bm25(chunks_fts, {HEADING_WEIGHT}, 1.0)) AS score
+FROM chunks_fts
+JOIN chunks c ON c.id = chunks_fts.rowid
+JOIN documents d ON d.id = c.document_id
+WHERE chunks_fts MATCH :match{SEARCH_FILTERS}
+ORDER BY score DESC, c.id DESC
+LIMIT :top_k
+"""
+
+LIKE_MATCH_SCORE = 0.5
+
+PARTIAL_SEARCH_SQL = f"""
+SELECT {SEARCH_COLUMNS}, {LIKE_MATCH_SCORE} AS score
+FROM chunks c
+JOIN documents d ON d.id = c.document_id
+WHERE (c.text LIKE :pattern ESCAPE '\\' OR c.heading LIKE :pattern ESCAPE '\\'){SEARCH_FILTERS}
+ORDER BY c.created_at DESC, c.id DESC
+LIMIT :top_k
+"""
+
+VARIANCE_REPORT_SQL = f"""
+WITH actual AS (
+    SELECT wbs_key, SUM(labor_hours) AS actual_hours
+    FROM site_observations
+    WHERE work_date BETWEEN :start_date AND :end_date
+    GROUP BY wbs_key
+),
+ranked_norms AS ({RANKED_NORMS_SQL.replace('?', ':locale')}
+)
+SELECT v.wbs_key, v.qty, v.unit, COALESCE(a.actual_hours, 0) AS actual_hours,
+       n.norm_lh_per_u, n.conditions_json
+FROM (
+    SELECT wbs_key, qty, unit
+    FROM revit_quantities
+    GROUP BY wbs_key, qty, unit
+) v
+LEFT JOIN actual a ON a.wbs_key = v.wbs_key
+LEFT JOIN ranked_norms n ON n.work_item_key = v.wbs_key AND n.unit = v.unit AND n.rn = 1
+"""
+
+SITE_OBSERVATIONS_EXPORT_SQL = """
+SELECT work_date, shift, crew_id, wbs_key, qty, unit, labor_hours, weather, source
+FROM site_observations
+WHERE work_date BETWEEN ? AND ?
+ORDER BY work_date, id
+"""
+
+# Dönem başlangıcı: hafta (pazartesi) / ay
+PRODUCTIVITY_PERIODS = {
+    'week': "date(work_date, 'weekday 0', '-6 days')",
+    'month': "date(work_date, 'start of month')",
+}
+
+PRODUCTIVITY_SUMMARY_SQL = """
+SELECT {period} AS period_start,
+       COALESCE(wbs_key, '') AS wbs_key, unit, COALESCE(crew_id, '') AS crew_id,
+       SUM(qty) AS qty, SUM(labor_hours) AS labor_hours, count(*) AS obs_count,
+       SUM(qty) / NULLIF(SUM(labor_hours), 0) AS productivity
+FROM site_observations
+WHERE work_date BETWEEN :start_date AND :end_date
+  AND (:wbs_key IS NULL OR wbs_key = :wbs_key)
+  AND (:crew_id IS NULL OR crew_id = :crew_id)
+GROUP BY 1, 2, 3, 4
+ORDER BY 1, 2, 3, 4
+"""
+
+_FTS_TOKEN_RE = re.compile(r'\w+')
+
+
+def _fts_query(query: str) -> Optional[str]:
+    """Kullanıcı sorgusunu FTS5 ifadesine çevir: her kelime tırnaklı önek terimi, hepsi AND.
+    Önek eşleşmesi Türkçe/Rusça ekleri için kök bulmanın yerini tutar (donatı -> donatının)."""
+    tokens = _FTS_TOKEN_RE.findall(query)
+    return ' '.join(f'"{t}"*' for t in tokens) if tokens else None
+
+
+def _json_list(value: Optional[str]) -> List:
+    """JSON dizi kolonu -> liste"""
+    return json.loads(value) if value else []
+
+
+class SQLiteAuditLog:
+    """retrieval_logs'a doğrudan yazım (yerel, WAL + synchronous=NORMAL: fsync yok)"""
+
+    def __init__(self, pool: SQLiteConnectionManager):
+        self.pool = pool
+
+    def submit(self, query: str, chunk_ids: Sequence[int], scores: Sequence[float], accepted: bool) -> bool:
+        with self.pool.cursor() as cursor:
+            cursor.execute(INSERT_RETRIEVAL_LOG_SQL, (
+                query, len(chunk_ids), json.dumps(list(chunk_ids)), json.dumps(list(scores)), int(accepted)))
+        return True
+
+    def close(self):
+        pass
+
+
+class SQLiteRAGSystem(RAGResultsMixin, RAGDocumentMixin):
+    """SQLite/FTS5 tabanlı RAG sistemi (PostgreSQLRAGSystem ile aynı metodlar)"""
+
+    def __init__(self, config: RAGConfig, pool: Optional[SQLiteConnectionManager] = None,
+                 embed_fn: Optional[Callable[[List[str]], Optional[List[List[float]]]]] = None):
+        self.config = config
+        self.embed_fn = embed_fn
+        self.pool = pool
+        self._owns_pool = pool is None
+        self.audit_log: Optional[SQLiteAuditLog] = None
+        self._connect()
+        self.norm_index = NormIndex(self.pool, refresh_interval=config.norm_refresh_interval,
+                                    load_sql=LOAD_NORMS_SQL, version_sql=NORMS_VERSION_SQL)
+        if config.enable_audit_log:
+            self.audit_log = SQLiteAuditLog(self.pool)
+
+    def _connect(self):
+        """Veritabanını aç ve şemayı (FTS5 dahil) hazırla"""
+        try:
+            if self.pool is None:
+                self.pool = SQLiteConnectionManager(self.config.sqlite_path)
+            with self.pool.connection() as conn:
+                conn.executescript(SCHEMA)
+                has_fts = conn.execute(
+                    "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'chunks_fts'").fetchone()
+                if not has_fts:
+                    # Mevcut chunk'lar 'rebuild' ile indekslenir
+                    conn.executescript(FTS_SCHEMA)
+                    logger.info("✅ chunks_fts (FTS5) indeksi oluşturuldu")
+            # SQLite'ta pg_trgm, pgvector ve materialized view yok
+            self.features = {'fts': True, 'trgm': False, 'vector': False, 'productivity_views': False}
+            logger.info(f"✅ SQLite bağlantısı başarılı ({self.config.sqlite_path})")
+        except Exception as e:
+            logger.error(f"❌ SQLite bağlantı hatası: {e}")
+            raise
+
+    def add_document(self, source: str, country: str, doc_type: str,
+                     title: str, lang: str, content: str, **kwargs) -> int:
+        """Doküman ekle (doküman + tüm chunk'lar tek işlemde)"""
+        return self.add_documents([{
+            'source': source, 'country': country, 'doc_type': doc_type,
+            'title': title, 'lang': lang, 'content': content,
+        }])[0]
+
+    def add_documents(self, documents: Iterable[Dict[str, Any]],
+                      batch_size: int = DOCUMENT_BATCH_SIZE) -> List[int]:
+        """Dokümanları toplu ekle; her grup tek işlemde, chunk'lar executemany ile"""
+        doc_ids: List[int] = []
+        with self.pool.connection() as conn:
+            batch: List[Dict[str, Any]] = []
+            for doc in documents:
+                batch.append(doc)
+                if len(batch) >= batch_size:
+                    doc_ids.extend(self._insert_document_batch(conn, batch))
+                    conn.commit()
+                    batch = []
+            if batch:
+                doc_ids.extend(self._insert_document_batch(conn, batch))
+        return doc_ids
+
+    def _insert_document_batch(self, conn: sqlite3.Connection, batch: List[Dict[str, Any]]) -> List[int]:
+        doc_ids = []
+        chunk_rows = []
+        for doc in batch:
+            doc_id = conn.execute(INSERT_DOCUMENT_SQL, (
+                doc['source'], doc['country'], doc['doc_type'], doc['title'], doc['lang'], doc['content'],
+            )).lastrowid
+            doc_ids.append(doc_id)
+            chunks = self._chunk_text(doc['content'], doc['title'])
+            chunk_rows.extend(self._chunk_row(doc_id, chunk, doc['lang']) for chunk in chunks)
+            logger.info(f"✅ Doküman eklendi: {doc['title']} ({len(chunks)} chunk)")
+        conn.executemany(INSERT_CHUNK_SQL, chunk_rows)
+        return doc_ids
+
+    def _chunk_row(self, document_id: int, chunk: Dict, locale: str) -> Tuple:
+        """Chunk satırı (INSERT sırası ile; diziler JSON, locale dokümanın dili)"""
+        return (
+            document_id,
+            chunk['section_path'],
+            chunk['heading'],
+            chunk['text'],
+            chunk['tokens'],
+            json.dumps(self._extract_work_types(chunk['text'])),
+            json.dumps(self._extract_norm_codes(chunk['text']), ensure_ascii=False),
+            self._extract_unit(chunk['text']),
+            (locale or 'tr').lower()
+        )
+
+    def backfill_embeddings(self, batch_size: int = 0) -> int:
+        """SQLite arka ucunda embedding kolonu yok"""
+        return 0
+
+    def _search_params(self, locales: Optional[List[str]], work_types: Optional[List[str]],
+                       top_k: Optional[int]) -> Dict[str, Any]:
+        return {
+            'locales': json.dumps(locales or ['tr', 'ru', 'en']),
+            'work_types': json.dumps(work_types) if work_types else None,
+            'top_k': top_k or self.config.default_top_k,
+        }
+
+    def _decode_rows(self, rows: Iterable[sqlite3.Row]) -> List[Dict]:
+        """JSON dizi kolonlarını listeye çevir"""
+        decoded = []
+        for row in rows:
+            row = dict(row)
+            row['work_types'] = _json_list(row['work_types'])
+            row['norm_codes'] = _json_list(row['norm_codes'])
+            decoded.append(row)
+        return decoded
+
+    def search(self, query: str, locales: List[str] = None,
+               work_types: List[str] = None, top_k: int = None) -> List[Dict]:
+        """FTS5 bm25 araması; sonuç yoksa kısmi (LIKE) eşleşme"""
+        params = self._search_params(locales, work_types, top_k)
+        results = []
+        with self.pool.cursor() as cursor:
+            match = _fts_query(query)
+            if match:
+                params['match'] = match
+                results = cursor.execute(FULLTEXT_SEARCH_SQL, params).fetchall()
+            if not results:
+                params['pattern'] = '%' + query.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+                results = cursor.execute(PARTIAL_SEARCH_SQL, params).fetchall()
+        return self._finalize_results(query, self._decode_rows(results))
+
+    def search_semantic(self, query: str, query_embedding: Optional[Sequence[float]] = None,
+                        locales: List[str] = None, work_types: List[str] = None,
+                        top_k: int = None) -> List[Dict]:
+        """SQLite arka ucunda vektör indeksi yok: boş sonuç"""
+        logger.warning("SQLite arka ucunda semantik arama yok (pgvector gerekir)")
+        return []
+
+    def search_hybrid(self, query: str, query_embedding: Optional[Sequence[float]] = None,
+                      locales: List[str] = None, work_types: List[str] = None,
+                      top_k: int = None, alpha: float = None) -> List[Dict]:
+        """Vektör indeksi olmadığından tam metin aramasına döner"""
+        return self.search(query, locales, work_types, top_k)
+
+    def add_sample_data(self):
+        """Örnek veri ekle"""
+        logger.info("📊 Örnek veri ekleniyor...")
+        today = date.today().isoformat()
+        with self.pool.cursor() as cursor:
+            cursor.executemany("""
+            INSERT OR IGNORE INTO revit_quantities (model_id, element_id, category, class_inf, wbs_key, qty, unit)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            """, [
+                ('model_001', 'elem_001', 'Structural Framing', 'rebar', 'REBAR.BEAM', 1500.0, 'kg'),
+                ('model_001', 'elem_002', 'Structural Framing', 'formwork', 'FORM.BEAM', 25.0, 'm2'),
+                ('model_001', 'elem_003', 'Structural Framing', 'concrete', 'CONC.BEAM', 2.5, 'm3'),
+            ])
+            cursor.executemany("""
+            INSERT INTO site_observations (work_date, shift, crew_id, wbs_key, qty, unit, labor_hours)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            """, [
+                (today, 'day', 'crew_001', 'REBAR.BEAM', 1500.0, 'kg', 180.0),
+                (today, 'day', 'crew_002', 'FORM.BEAM', 25.0, 'm2', 20.0),
+                (today, 'day', 'crew_003', 'CONC.BEAM', 2.5, 'm3', 1.25),
+            ])
+        logger.info("✅ Örnek veri eklendi")
+
+    def export_reports(self, start_date: date, end_date: date,
+                       output_dir: str = ".", locale: str = 'tr',
+                       formats: Sequence[str] = ('csv',)) -> Dict[str, str]:
+        """Raporları ihraç et (cursor satır satır okunur, akış halinde yazım)"""
+        logger.info("📊 Raporlar ihraç ediliyor...")
+        stats = {'missing': 0}
+        with self.pool.cursor() as cursor:
+            cursor.execute(VARIANCE_REPORT_SQL, {
+                'start_date': start_date.isoformat(),
+                'end_date': end_date.isoformat(),
+                'locale': locale,
+            })
+            rows = ((wbs_key, qty, unit, actual, norm, json.loads(conditions) if conditions else None)
+                    for wbs_key, qty, unit, actual, norm, conditions in cursor)
+            paths = write_report(self._variance_rows(rows, start_date, end_date, stats),
+                                 os.path.join(output_dir, "variance_summary"), VARIANCE_COLUMNS, formats,
+                                 VARIANCE_COLUMN_TYPES, VARIANCE_COLUMN_FORMATS)
+
+        if stats['missing']:
+            logger.warning(f"Norm bulunamadı: {stats['missing']} satır (teorik saat 0)")
+        logger.info(f"✅ Rapor ihraç edildi: {', '.join(paths.values())}")
+        return {('variance_summary' if fmt == 'csv' else f'variance_summary_{fmt}'): path
+                for fmt, path in paths.items()}
+
+    def productivity_summary(self, start_date: date, end_date: date, grain: str = 'month',
+                             wbs_key: Optional[str] = None, crew_id: Optional[str] = None) -> pd.DataFrame:
+        """Dönem (week/month) x wbs x birim x ekip verimlilik özeti"""
+        if grain not in PRODUCTIVITY_PERIODS:
+            raise ValueError(f"Geçersiz dönem: {grain} ({', '.join(PRODUCTIVITY_PERIODS)})")
+        # PostgreSQL ile aynı: başlangıç tarihinin dönemi tümüyle dahil
+        period_start = (start_date - timedelta(days=start_date.weekday()) if grain == 'week'
+                        else start_date.replace(day=1))
+        with self.pool.cursor() as cursor:
+            cursor.execute(PRODUCTIVITY_SUMMARY_SQL.format(period=PRODUCTIVITY_PERIODS[grain]), {
+                'start_date': period_start.isoformat(),
+                'end_date': end_date.isoformat(),
+                'wbs_key': wbs_key,
+                'crew_id': crew_id,
+            })
+            rows = [tuple(r) for r in cursor.fetchall()]
+        df = pd.DataFrame(rows, columns=PRODUCTIVITY_SUMMARY_COLUMNS)
+        df['period_start'] = pd.to_datetime(df['period_start']).dt.date
+        return df
+
+    def refresh_productivity_views(self, concurrently: bool = True):
+        """SQLite'ta özetler sorgu anında hesaplanır; yenilenecek view yok"""
+        return
+
+    def export_site_observations(self, start_date: date, end_date: date,
+                                 output_dir: str = ".",
+                                 formats: Sequence[str] = ('csv',)) -> Dict[str, str]:
+        """Saha gözlemlerini dönem için akış halinde ihraç et"""
+        with self.pool.cursor() as cursor:
+            cursor.execute(SITE_OBSERVATIONS_EXPORT_SQL, (start_date.isoformat(), end_date.isoformat()))
+            rows = ((date.fromisoformat(r[0]),) + tuple(r)[1:] for r in cursor)
+            paths = write_report(rows, os.path.join(output_dir, "site_observations"),
+                                 SITE_OBSERVATION_COLUMNS, formats, SITE_OBSERVATION_COLUMN_TYPES,
+                                 SITE_OBSERVATION_COLUMN_FORMATS)
+        logger.info(f"✅ Saha gözlemleri ihraç edildi: {', '.join(paths.values())}")
+        return paths
+
+    def close(self):
+        """Veritabanını kapat (bağlantı yöneticisi dışarıdan verildiyse sahibi kapatır)"""
+        if self.pool and self._owns_pool:
+            self.pool.close()
+            logger.info("✅ SQLite bağlantısı kapatıldı")
@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+SQLite RAG Test Suite
+Tests the SQLite/FTS5 RAG backend on a temporary database file (no server needed)
+"""
+
+import sys
+import os
+import unittest
+import tempfile
+import shutil
+import threading
+import gc
+from datetime import date
+from unittest import mock
+
+# Add the current directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from rag_common import RAGConfig
+from sqlite_rag_system import SQLiteRAGSystem, _fts_query
+from revit_import import RevitImporter, _parse_qty
+import betonarme_postgresql_integration as integration
+
+APP_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "betonarme_hesap_modulu_r0.py")
+
+
+class TestSQLiteRAG(unittest.TestCase):
+    """Test suite for the SQLite RAG system"""
+
+    def setUp(self):
+        """Create a fresh database in a temporary directory"""
+        self.tmp_dir = tempfile.mkdtemp()
+        self.config = RAGConfig(sqlite_path=os.path.join(self.tmp_dir, "rag.db"), norm_refresh_interval=0)
+        self.rag = SQLiteRAGSystem(self.config)
+
+    def tearDown(self):
+        """Close the database and remove the directory"""
+        self.rag.close()
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def test_wal_and_existing_database(self):
+        """An existing betonarme_rag.db gets WAL mode and an FTS index over its chunks"""
+        self.rag.close()
+        path = os.path.join(self.tmp_dir, "existing.db")
+        shutil.copy(os.path.join(os.path.dirname(os.path.abspath(__file__)), "betonarme_rag.db"), path)
+        self.rag = SQLiteRAGSystem(RAGConfig(sqlite_path=path, enable_audit_log=False))
+        with self.rag.pool.cursor() as cur:
+            self.assertEqual(cur.execute("PRAGMA journal_mode").fetchone()[0], "wal")
+            chunks = cur.execute("SELECT count(*) FROM chunks").fetchone()[0]
+        results = self.rag.search("betonarme")
+        self.assertEqual(len(results), chunks)
+        self.assertIsInstance(results[0]["work_types"], list)
+        print("✅ WAL mode and existing database tested successfully")
+
+    def test_fulltext_search(self):
+        """FTS5 ranks heading and prefix matches, falls back to LIKE for partial codes"""
+        self.assertEqual(_fts_query("kolon-kalıbı"), '"kolon"* "kalıbı"*')
+        self.rag.add_documents([
+            {"source": "FER", "country": "RU", "doc_type": "norm", "title": "Kolon kalıbı",
+             "lang": "tr", "content": "Kolon kalıp montajı FER-06-001 için 1.2 adam-saat/m2."},
+            {"source": "Poz", "country": "TR", "doc_type": "norm", "title": "Perde betonu",
+             "lang": "tr", "content": "Perde betonu dökümü, kolon sökümünden sonra yapılır."},
+            {"source": "GESN", "country": "RU", "doc_type": "norm", "title": "Опалубка колонн",
+             "lang": "ru", "content": "Монтаж опалубки колонн ГЭСН 08-02-001."},
+        ])
+        results = self.rag.search("kolon montaj", work_types=["formwork"])
+        self.assertEqual([r["doc_title"] for r in results], ["Kolon kalıbı"])
+        self.assertTrue(0 < results[0]["score"] < 1)
+        self.assertEqual(results[0]["norm_codes"], ["FER-06-001"])
+        partial = self.rag.search("06-0")
+        self.assertEqual(partial[0]["doc_title"], "Kolon kalıbı")
+        self.assertEqual(self.rag.search_hybrid("perde")[0]["doc_title"], "Perde betonu")
+        self.assertEqual([r["doc_title"] for r in self.rag.search("опалубки", locales=["ru"])], ["Опалубка колонн"])
+        self.assertEqual(self.rag.search("опалубки", locales=["tr"]), [])
+        with self.rag.pool.cursor() as cur:
+            logged = cur.execute("SELECT count(*) FROM retrieval_logs").fetchone()[0]
+        self.assertEqual(logged, 5)
+        print("✅ Full-text search tested successfully")
+
+    def test_norm_index_follows_changes(self):
+        """Labor hours use source priority and the index reloads after norm changes"""
+        with self.rag.pool.cursor() as cur:
+            cur.executemany("""
+            INSERT INTO norms (source, code, revision, work_item_key, description, unit, norm_lh_per_u,
+                               conditions_json, locale)
+            VALUES (?, ?, 'r0', 'REBAR.BEAM', 'Kiriş donatısı', 'kg', ?, ?, 'tr')
+            """, [("FER", "FER-06-001", 0.2, None), ("Internal", "INT-1", 0.1, '{"weather": "cold"}')])
+        self.assertAlmostEqual(self.rag.calculate_labor_hours("REBAR.BEAM", 100, "kg"), 12.0)
+        with self.rag.pool.cursor() as cur:
+            cur.execute("DELETE FROM norms WHERE source = 'Internal'")
+        self.assertAlmostEqual(self.rag.calculate_labor_hours("REBAR.BEAM", 100, "kg"), 20.0)
+        print("✅ Norm index refresh tested successfully")
+
+    def test_reports_and_productivity(self):
+        """Variance, observation export and weekly summaries run on the local database"""
+        self.rag.add_sample_data()
+        with self.rag.pool.cursor() as cur:
+            cur.execute("""
+            INSERT INTO norms (source, code, revision, work_item_key, description, unit, norm_lh_per_u, locale)
+            VALUES ('FER', 'FER-06-002', 'r0', 'FORM.BEAM', 'Kiriş kalıbı', 'm2', 0.8, 'tr')
+            """)
+            cur.execute("""
+            INSERT INTO site_observations (work_date, crew_id, wbs_key, qty, unit, labor_hours)
+            VALUES ('2025-03-05', 'crew_9', 'FORM.BEAM', 10, 'm2', 8), ('2025-03-07', 'crew_9', 'FORM.BEAM', 30, 'm2', 16)
+            """)
+        paths = self.rag.export_reports(date(2025, 3, 1), date(2025, 3, 31), output_dir=self.tmp_dir)
+        with open(paths["variance_summary"], encoding="utf-8-sig") as f:
+            form_row = next(line for line in f if ";FORM.BEAM;" in line)
+        self.assertIn(";FORM.BEAM;25.000;m2;20.00;24.00;", form_row)
+
+        weekly = self.rag.productivity_summary(date(2025, 3, 6), date(2025, 3, 31), grain="week", crew_id="crew_9")
+        self.assertEqual(len(weekly), 1)
+        self.assertEqual(weekly.iloc[0]["period_start"], date(2025, 3, 3))
+        self.assertEqual(weekly.iloc[0]["obs_count"], 2)
+        self.assertAlmostEqual(weekly.iloc[0]["productivity"], 40 / 24)
+
+        exported = self.rag.export_site_observations(date(2025, 3, 1), date(2025, 3, 31), output_dir=self.tmp_dir)
+        with open(exported["csv"], encoding="utf-8") as f:
+            self.assertEqual(len(f.readlines()), 3)
+        print("✅ Reports and productivity summary tested successfully")
+
+    def test_revit_schedule_import(self):
+        """Schedules are mapped by regex rules, upserted per element and aggregated by WBS key"""
+        with self.rag.pool.cursor() as cur:
+            cur.execute("""
+            INSERT INTO mappings (source_field, pattern, mapped_key, confidence)
+            VALUES ('category', 'floor', 'CONC.SLAB', 0.5), ('class_inf', '^IfcFooting$', 'CONC.FOUNDATION', 0.9)
+            """)
+        path = os.path.join(self.tmp_dir, "schedule.csv")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("Element ID;Category;IFC Class;Volume\n"
+                    "1;Floors;IfcSlab;2,5 m³\n"
+                    "2;Structural Foundations;IfcFooting;4\n"
+                    "2;Structural Foundations;IfcFooting;5\n"
+                    "3;Generic Models;;\n")
+        importer = RevitImporter(self.rag.pool, backend="sqlite", batch_size=2)
+        stats = importer.import_file(path, "model_a")
+        self.assertEqual((stats.rows, stats.skipped, stats.unmapped), (4, 1, 0))
+        stats = importer.import_file(path, "model_a")
+        aggregates = importer.aggregate("model_a").set_index("wbs_key")
+        self.assertEqual(aggregates.loc["CONC.SLAB", "qty"], 2.5)
+        self.assertEqual(aggregates.loc["CONC.FOUNDATION", "qty"], 5.0)
+        self.assertEqual(aggregates["elements"].sum(), 2)
+        print("✅ Revit schedule import tested successfully")
+
+    def test_revit_quantity_parsing(self):
+        """Thousands commas, decimal commas and mixed separators parse to the same numbers Revit shows"""
+        cases = {
+            "1,250": 1250.0, "1,250,000": 1250000.0, "1.250,5": 1250.5, "1,250.5": 1250.5,
+            "2,5": 2.5, "0,125": 0.125, "1,25": 1.25, "1 250,5": 1250.5, "12.5": 12.5,
+        }
+        for text, expected in cases.items():
+            self.assertEqual(_parse_qty(text)[0], expected, text)
+        self.assertEqual(_parse_qty("1,250 m³"), (1250.0, "m3"))
+        print("✅ Revit quantity parsing tested successfully")
+
+    def test_revit_metraj_handoff(self):
+        """An imported schedule becomes the Eleman tab's metraj table and is kept on the next app run"""
+        from streamlit.testing.v1 import AppTest
+
+        with self.rag.pool.cursor() as cur:
+            cur.execute("""
+            INSERT INTO mappings (source_field, pattern, mapped_key, confidence)
+            VALUES ('category', 'wall', 'CONC.WALL', 0.9), ('category', 'foundation', 'CONC.FOUNDATION', 0.9),
+                   ('category', 'floor', 'CONC.SLAB', 0.9)
+            """)
+        path = os.path.join(self.tmp_dir, "schedule.csv")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("Element ID,Category,Volume\n1,Walls,3.5\n2,Walls,1.5\n3,Structural Foundations,12\n"
+                    "4,Floors,8\n")
+        elements = list(integration.ELEMENT_LABELS)
+        with mock.patch.dict(os.environ, {"RAG_BACKEND": "sqlite", "SQLITE_PATH": self.config.sqlite_path}):
+            rag = integration.BetonarmeRAGIntegration()
+        try:
+            stats, metraj_df = rag.import_revit_schedule(path, "model_b", elements)
+        finally:
+            rag.close()
+        self.assertEqual(stats.upserted, 4)
+        volumes = dict(zip(metraj_df[integration.METRAJ_ELEMENT_COL], metraj_df[integration.METRAJ_QTY_COL]))
+        self.assertEqual(volumes[integration.ELEMENT_LABELS["perde"]], 5.0)
+        self.assertEqual(volumes[integration.ELEMENT_LABELS["temel"]], 12.0)
+        # Grobeton ve döşeme aynı CONC.SLAB anahtarını paylaşır: toplam bölünür, kaybolmaz
+        self.assertEqual(volumes[integration.ELEMENT_LABELS["grobeton"]], 4.0)
+        self.assertEqual(volumes[integration.ELEMENT_LABELS["doseme"]], 4.0)
+
+        at = AppTest.from_file(APP_FILE, default_timeout=120)
+        at.run()
+        integration.apply_revit_metraj(at.session_state, metraj_df, elements)
+        at.run()
+        self.assertFalse(at.exception)
+        self.assertTrue(at.checkbox(key="use_metraj").value)
+        kept = at.session_state["metraj_df"]
+        self.assertEqual(kept[integration.METRAJ_QTY_COL].tolist(), metraj_df[integration.METRAJ_QTY_COL].tolist())
+        print("✅ Revit metraj hand-off tested successfully")
+
+    def test_thread_local_connections(self):
+        """Concurrent readers each use their own connection, closed when the thread ends"""
+        self.rag.add_sample_data()
+        errors = []
+
+        def worker():
+            try:
+                self.rag.search("beton")
+                self.rag.calculate_labor_hours("CONC.BEAM", 1, "m3")
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(errors, [])
+        gc.collect()
+        self.assertEqual(len(self.rag.pool._connections), 1)   # yalnız ana thread'inki
+        print("✅ Thread-local connections tested successfully")
+
+
+def run_sqlite_rag_tests():
+    """Run all SQLite RAG tests"""
+    print("🧪 Starting SQLite RAG Test Suite")
+    print("=" * 80)
+
+    test_suite = unittest.TestLoader().loadTestsFromTestCase(TestSQLiteRAG)
+    runner = unittest.TextTestRunner(verbosity=2)
+    result = runner.run(test_suite)
+
+    print("\n" + "=" * 80)
+    print(f"Tests run: {result.testsRun}")
+    print(f"Failures: {len(result.failures)}")
+    print(f"Errors: {len(result.errors)}")
+    return result.wasSuccessful()
+
+
+if __name__ == "__main__":
+    success = run_sqlite_rag_tests()
+    sys.exit(0 if success else 1)